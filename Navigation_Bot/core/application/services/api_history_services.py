@@ -3,7 +3,7 @@
 from dataclasses import asdict, is_dataclass
 from typing import Any, Callable
 
-from Navigation_Bot.core.infrastructure.api.api_client import NavigationApiClient
+from Navigation_Bot.core.infrastructure.api.api_client import NavigationApiClient, NavigationApiError
 from Navigation_Bot.core.logging import noop_log, normalize_log_func
 
 
@@ -41,6 +41,25 @@ class _ApiHistoryBase:
         for trip_number, rows in _group_rows_by_trip_number(items).items():
             self.client.post(f"/api/v1/tasks/{trip_number}/{endpoint}/batch", json={"items": rows})
 
+    def _append_many_cross_trip(self, items: list[Any], endpoint: str) -> None:
+        """
+        Отправляет историю многих рейсов одним запросом на /{endpoint}/batch.
+
+        Сервер сам находит рейсы и отбрасывает дубли; если общего endpoint нет
+        (старый сервер отвечает 404/405), история уходит прежним способом — запросом
+        на каждый рейс. Остальные ошибки пробрасываются как есть.
+        """
+        rows = [row for row in map(_to_row, items) if _trip_number_from(row) is not None]
+        if not rows:
+            return
+        try:
+            self.client.post(f"/api/v1/{endpoint}/batch", json={"items": rows})
+        except NavigationApiError as exc:
+            if exc.status_code not in {404, 405}:
+                raise
+            self._log(f"⚠️ Пакетная запись истории недоступна, отправляю по рейсам: {exc}")
+            self._append_many_by_trip_number(rows, endpoint)
+
 
 class ApiStatusEventService(_ApiHistoryBase):
     def append(self, item: Any) -> None:
@@ -52,7 +71,7 @@ class ApiStatusEventService(_ApiHistoryBase):
         self.client.post(f"/api/v1/tasks/{trip_number}/status-events", json={"item": row})
 
     def append_many(self, items: list[Any]) -> None:
-        self._append_many_by_trip_number(items, "status-events")
+        self._append_many_cross_trip(items, "status-events")
 
     def get_by_trip_number(self, trip_number: int) -> list[dict]:
         return self._get_items(f"/api/v1/tasks/{trip_number}/status-events")
@@ -71,7 +90,7 @@ class ApiRouteEstimateHistoryService(_ApiHistoryBase):
         self.append(estimate)
 
     def append_many(self, items: list[Any]) -> None:
-        self._append_many_by_trip_number(items, "route-estimates")
+        self._append_many_cross_trip(items, "route-estimates")
 
     def get_by_trip_number(self, trip_number: int) -> list[dict]:
         return self._get_items(f"/api/v1/tasks/{trip_number}/route-estimates")
@@ -103,7 +122,7 @@ class ApiNavigationHistoryService(_ApiHistoryBase):
         self.client.post(f"/api/v1/tasks/{trip_number}/navigation", json=row)
 
     def append_many(self, items: list[Any]) -> None:
-        self._append_many_by_trip_number(items, "navigation")
+        self._append_many_cross_trip(items, "navigation")
 
     def append_snapshot(self, snapshot: Any) -> None:
         self.append(snapshot)
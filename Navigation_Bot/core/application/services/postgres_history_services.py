@@ -1,6 +1,8 @@
 ﻿from __future__ import annotations
 
 import re
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
 from dataclasses import asdict, is_dataclass
 from datetime import datetime
 from typing import Any, Callable
@@ -8,6 +10,59 @@ from typing import Any, Callable
 from Navigation_Bot.core.logging import noop_log, normalize_log_func
 
 
+HistorySkip = dict[str, Any]
+
+INSERT_STATUS_EVENTS_SQL = """
+    INSERT INTO status_events(
+        task_id, user_id, event_type, field_name, old_value, new_value, message, source, created_at
+    )
+    SELECT v.task_id, v.user_id, v.event_type, v.field_name, v.old_value, v.new_value,
+           v.message, v.source, v.created_at::timestamptz
+    FROM unnest(
+        %s::bigint[], %s::bigint[], %s::text[], %s::text[], %s::text[],
+        %s::text[], %s::text[], %s::text[], %s::text[]
+    ) AS v(task_id, user_id, event_type, field_name, old_value, new_value, message, source, created_at)
+    ON CONFLICT (task_id, event_type, field_name, created_at, message) DO NOTHING
+    RETURNING id
+"""
+
+INSERT_ROUTE_ESTIMATES_SQL = """
+    INSERT INTO route_estimates(
+        task_id, target_sequence, distance_km, duration_minutes,
+        arrival_time, on_time, buffer_minutes, time_buffer_text, calculated_at
+    )
+    SELECT v.task_id, v.target_sequence, v.distance_km, v.duration_minutes,
+           v.arrival_time, v.on_time, v.buffer_minutes, v.time_buffer_text, v.calculated_at::timestamptz
+    FROM unnest(
+        %s::bigint[], %s::integer[], %s::double precision[], %s::integer[],
+        %s::text[], %s::boolean[], %s::integer[], %s::text[], %s::text[]
+    ) AS v(task_id, target_sequence, distance_km, duration_minutes,
+           arrival_time, on_time, buffer_minutes, time_buffer_text, calculated_at)
+    ON CONFLICT (task_id, target_sequence, calculated_at, arrival_time) DO NOTHING
+    RETURNING id
+"""
+
+INSERT_NAVIGATION_SQL = """
+    INSERT INTO vehicle_navigation_history(
+        vehicle_id, task_id, latitude, longitude, coordinates,
+        geo_text, geo_zona, speed_kmh, gps_fix_text,
+        gps_fix_age_seconds, has_fresh_coordinates, is_navigation_stale, collected_at
+    )
+    SELECT v.vehicle_id, v.task_id, v.latitude, v.longitude, v.coordinates,
+           v.geo_text, v.geo_zona, v.speed_kmh, v.gps_fix_text,
+           v.gps_fix_age_seconds, v.has_fresh_coordinates, v.is_navigation_stale, v.collected_at::timestamptz
+    FROM unnest(
+        %s::bigint[], %s::bigint[], %s::double precision[], %s::double precision[], %s::text[],
+        %s::text[], %s::text[], %s::double precision[], %s::text[],
+        %s::integer[], %s::boolean[], %s::boolean[], %s::text[]
+    ) AS v(vehicle_id, task_id, latitude, longitude, coordinates,
+           geo_text, geo_zona, speed_kmh, gps_fix_text,
+           gps_fix_age_seconds, has_fresh_coordinates, is_navigation_stale, collected_at)
+    ON CONFLICT (vehicle_id, (COALESCE(task_id, 0)), collected_at, coordinates, geo_text) DO NOTHING
+    RETURNING id
+"""
+
+
 def _now_text() -> str:
     return datetime.now().strftime("%d.%m.%Y %H:%M:%S")
 
@@ -33,6 +88,14 @@ def _to_int_or_none(value: Any) -> int | None:
     return None
 
 
+def _text_or_none(value: Any) -> str | None:
+    return None if value is None else str(value)
+
+
+def _float_or_none(value: Any) -> float | None:
+    return None if value is None else float(value)
+
+
 def _parse_coordinates(value: Any) -> tuple[float | None, float | None]:
     text = str(value or "").strip()
     if not text or "," not in text:
@@ -45,10 +108,28 @@ def _parse_coordinates(value: Any) -> tuple[float | None, float | None]:
 
 
 class _PostgresHistoryBase:
+    _history_table = ""
+    _version_extra_sql = ""
+
     def __init__(self, connection: Any, log: Callable[[str], None] | None = None):
         self.connection = connection
         self.log = normalize_log_func(log or noop_log)
 
+    def version_by_trip_number(self, trip_number: int) -> str:
+        """Версия истории рейса для ETag: число записей, последний id и связанные отметки времени."""
+        task_id = self._task_id_by_trip_number(trip_number)
+        if task_id is None:
+            return "missing"
+        row = self.connection.execute(
+            f"""
+            SELECT COUNT(*) AS count, MAX(id) AS max_id{self._version_extra_sql}
+            FROM {self._history_table}
+            WHERE task_id = %s
+            """,
+            (task_id,),
+        ).fetchone()
+        return "|".join(str(value) for value in row.values())
+
     def _log(self, msg: str) -> None:
         self.log(msg)
 
@@ -71,49 +152,102 @@ class _PostgresHistoryBase:
         return row.get("trip_number")
 
 
-class PostgresStatusEventService(_PostgresHistoryBase):
+class _PostgresBatchHistoryBase(_PostgresHistoryBase, ABC):
+    """
+    История с уникальным ключом дедупликации.
+
+    Запись идёт одним INSERT ... SELECT FROM unnest(...) ON CONFLICT DO NOTHING:
+    повтор уже записанного элемента просто пропускается базой.
+    """
+
+    _insert_sql = ""
+    _timestamp_field = ""
+    _skip_label = ""
+
     def append(self, item: Any) -> None:
-        row = _to_row(item)
-        task_id = self._task_id_by_trip_number(self._trip_number_from_row(row))
-        if task_id is None:
-            self._log(f"PostgreSQL status event skipped: task not found for trip_number={self._trip_number_from_row(row)}")
+        row = self._history_row(item)
+        trip_number = self._trip_number_from_row(row)
+        values = self._insert_values(row, self._tasks_by_trip_number([trip_number]).get(_to_int_or_none(trip_number)))
+        if values is None:
+            self._log(f"PostgreSQL {self._skip_label} skipped: task not found for trip_number={trip_number}")
+            return
+        inserted = self._insert([values]).fetchone()
+        if inserted is None:
             return
-
-        created_at = row.get("created_at") or _now_text()
-        with self.connection.transaction():
-            if self.connection.execute(
-                """
-                SELECT 1 FROM status_events
-                WHERE task_id = %s AND event_type = %s AND field_name = %s
-                  AND created_at = %s AND message = %s
-                """,
-                (task_id, row.get("event_type") or "", row.get("field_name") or "", created_at, row.get("message") or ""),
-            ).fetchone():
-                return
-            inserted = self.connection.execute(
-                """
-                INSERT INTO status_events(
-                    task_id, user_id, event_type, field_name, old_value, new_value, message, source, created_at
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (
-                    task_id,
-                    row.get("user_id"),
-                    row.get("event_type") or "",
-                    row.get("field_name") or "",
-                    row.get("old_value"),
-                    row.get("new_value"),
-                    row.get("message") or "",
-                    row.get("source") or "user",
-                    created_at,
-                ),
-            ).fetchone()
         if hasattr(item, "id"):
             item.id = int(inserted["id"])
-        if hasattr(item, "created_at") and not getattr(item, "created_at"):
-            item.created_at = created_at
+        if hasattr(item, self._timestamp_field) and not getattr(item, self._timestamp_field):
+            setattr(item, self._timestamp_field, row[self._timestamp_field])
+
+    def append_many(self, items: Iterable[Any]) -> tuple[int, list[HistorySkip]]:
+        """
+        Пишет историю сразу для многих рейсов.
+
+        Рейсы ищутся одним запросом по trip_number = ANY(...), записи вставляются одним INSERT.
+        Возвращает число новых записей и элементы, для которых рейс не найден.
+        """
+        rows = [self._history_row(item) for item in items]
+        tasks = self._tasks_by_trip_number(self._trip_number_from_row(row) for row in rows)
+        values, skipped = self._batch_values(rows, tasks)
+        if not values:
+            return 0, skipped
+        return self._insert(values).rowcount, skipped
+
+    def _history_row(self, item: Any) -> dict[str, Any]:
+        row = _to_row(item)
+        row[self._timestamp_field] = str(row.get(self._timestamp_field) or "") or _now_text()
+        return row
+
+    def _tasks_by_trip_number(self, values: Iterable[Any]) -> dict[int, dict]:
+        trip_numbers = sorted({parsed for parsed in map(_to_int_or_none, values) if parsed is not None})
+        if not trip_numbers:
+            return {}
+        rows = self.connection.execute(
+            "SELECT id, trip_number, vehicle_id FROM tasks WHERE trip_number = ANY(%s)",
+            (trip_numbers,),
+        ).fetchall()
+        return {int(row["trip_number"]): row for row in rows}
+
+    def _batch_values(self, rows: list[dict], tasks: dict[int, dict]) -> tuple[list[tuple], list[HistorySkip]]:
+        values: list[tuple] = []
+        skipped: list[HistorySkip] = []
+        for index, row in enumerate(rows):
+            trip_number = self._trip_number_from_row(row)
+            row_values = self._insert_values(row, tasks.get(_to_int_or_none(trip_number)))
+            if row_values is None:
+                skipped.append({"index": index, "trip_number": trip_number, "reason": "task_not_found"})
+            else:
+                values.append(row_values)
+        return values, skipped
+
+    def _insert(self, values: list[tuple]) -> Any:
+        return self.connection.execute(self._insert_sql, [list(column) for column in zip(*values)])
+
+    @abstractmethod
+    def _insert_values(self, row: dict, task: dict | None) -> tuple | None:
+        """Значения для колонок _insert_sql или None, если рейс не найден."""
+
+
+class PostgresStatusEventService(_PostgresBatchHistoryBase):
+    _history_table = "status_events"
+    _insert_sql = INSERT_STATUS_EVENTS_SQL
+    _timestamp_field = "created_at"
+    _skip_label = "status event"
+
+    def _insert_values(self, row: dict, task: dict | None) -> tuple | None:
+        if task is None:
+            return None
+        return (
+            int(task["id"]),
+            _to_int_or_none(row.get("user_id")),
+            row.get("event_type") or "",
+            row.get("field_name") or "",
+            _text_or_none(row.get("old_value")),
+            _text_or_none(row.get("new_value")),
+            row.get("message") or "",
+            row.get("source") or "user",
+            row["created_at"],
+        )
 
     def get_by_trip_number(self, trip_number: int) -> list[dict]:
         task_id = self._task_id_by_trip_number(trip_number)
@@ -145,48 +279,26 @@ class PostgresStatusEventService(_PostgresHistoryBase):
         ]
 
 
-class PostgresRouteEstimateHistoryService(_PostgresHistoryBase):
-    def append(self, item: Any) -> None:
-        row = _to_row(item)
-        task_id = self._task_id_by_trip_number(self._trip_number_from_row(row))
-        if task_id is None:
-            self._log(f"PostgreSQL route estimate skipped: task not found for trip_number={self._trip_number_from_row(row)}")
-            return
-        calculated_at = row.get("calculated_at") or _now_text()
-        with self.connection.transaction():
-            if self.connection.execute(
-                """
-                SELECT 1 FROM route_estimates
-                WHERE task_id = %s AND target_sequence = %s AND calculated_at = %s AND arrival_time = %s
-                """,
-                (task_id, int(row.get("target_sequence") or 0), calculated_at, row.get("arrival_time") or ""),
-            ).fetchone():
-                return
-            inserted = self.connection.execute(
-                """
-                INSERT INTO route_estimates(
-                    task_id, target_sequence, distance_km, duration_minutes,
-                    arrival_time, on_time, buffer_minutes, time_buffer_text, calculated_at
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (
-                    task_id,
-                    int(row.get("target_sequence") or 0),
-                    float(row.get("distance_km") or 0),
-                    int(row.get("duration_minutes") or 0),
-                    row.get("arrival_time") or "",
-                    bool(row.get("on_time")),
-                    int(row.get("buffer_minutes") or 0),
-                    row.get("time_buffer_text") or "",
-                    calculated_at,
-                ),
-            ).fetchone()
-        if hasattr(item, "id"):
-            item.id = int(inserted["id"])
-        if hasattr(item, "calculated_at") and not getattr(item, "calculated_at"):
-            item.calculated_at = calculated_at
+class PostgresRouteEstimateHistoryService(_PostgresBatchHistoryBase):
+    _history_table = "route_estimates"
+    _insert_sql = INSERT_ROUTE_ESTIMATES_SQL
+    _timestamp_field = "calculated_at"
+    _skip_label = "route estimate"
+
+    def _insert_values(self, row: dict, task: dict | None) -> tuple | None:
+        if task is None:
+            return None
+        return (
+            int(task["id"]),
+            int(row.get("target_sequence") or 0),
+            float(row.get("distance_km") or 0),
+            int(row.get("duration_minutes") or 0),
+            row.get("arrival_time") or "",
+            bool(row.get("on_time")),
+            int(row.get("buffer_minutes") or 0),
+            row.get("time_buffer_text") or "",
+            row["calculated_at"],
+        )
 
     def append_estimate(self, estimate: Any) -> None:
         self.append(estimate)
@@ -223,6 +335,9 @@ class PostgresRouteEstimateHistoryService(_PostgresHistoryBase):
 
 
 class PostgresNoteHistoryService(_PostgresHistoryBase):
+    _history_table = "task_notes"
+    _version_extra_sql = ", MAX(updated_at) AS max_updated_at"
+
     def append(self, item: Any) -> None:
         row = _to_row(item)
         task_id = self._task_id_by_trip_number(self._trip_number_from_row(row))
@@ -300,56 +415,12 @@ class PostgresNoteHistoryService(_PostgresHistoryBase):
         }
 
 
-class PostgresNavigationHistoryService(_PostgresHistoryBase):
-    def append(self, item: Any) -> None:
-        row = _to_row(item)
-        task_id = self._task_id_by_trip_number(self._trip_number_from_row(row))
-        vehicle_id = self._vehicle_id(row, task_id)
-        if vehicle_id is None:
-            self._log("PostgreSQL navigation skipped: vehicle not found")
-            return
-        collected_at = row.get("collected_at") or _now_text()
-        latitude, longitude = _parse_coordinates(row.get("coordinates"))
-        with self.connection.transaction():
-            if self.connection.execute(
-                """
-                SELECT 1 FROM vehicle_navigation_history
-                WHERE vehicle_id = %s AND task_id IS NOT DISTINCT FROM %s AND collected_at = %s
-                  AND coordinates = %s AND geo_text = %s
-                """,
-                (vehicle_id, task_id, collected_at, row.get("coordinates") or "", row.get("geo_text") or ""),
-            ).fetchone():
-                return
-            inserted = self.connection.execute(
-                """
-                INSERT INTO vehicle_navigation_history(
-                    vehicle_id, task_id, latitude, longitude, coordinates,
-                    geo_text, geo_zona, speed_kmh, gps_fix_text,
-                    gps_fix_age_seconds, has_fresh_coordinates, is_navigation_stale, collected_at
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (
-                    vehicle_id,
-                    task_id,
-                    latitude,
-                    longitude,
-                    row.get("coordinates") or "",
-                    row.get("geo_text") or "",
-                    row.get("geo_zona") or "",
-                    row.get("speed_kmh"),
-                    row.get("gps_fix_text") or "",
-                    row.get("gps_fix_age_seconds"),
-                    bool(row.get("has_fresh_coordinates")),
-                    bool(row.get("is_navigation_stale")),
-                    collected_at,
-                ),
-            ).fetchone()
-        if hasattr(item, "id"):
-            item.id = int(inserted["id"])
-        if hasattr(item, "collected_at") and not getattr(item, "collected_at"):
-            item.collected_at = collected_at
+class PostgresNavigationHistoryService(_PostgresBatchHistoryBase):
+    _history_table = "vehicle_navigation_history"
+    _version_extra_sql = ", (SELECT MAX(updated_at) FROM vehicles) AS vehicles_updated_at"
+    _insert_sql = INSERT_NAVIGATION_SQL
+    _timestamp_field = "collected_at"
+    _skip_label = "navigation"
 
     def append_snapshot(self, snapshot: Any) -> None:
         self.append(snapshot)
@@ -388,21 +459,43 @@ class PostgresNavigationHistoryService(_PostgresHistoryBase):
         ).fetchall()
         return [self._navigation_row_to_dict(row) for row in rows]
 
-    def _vehicle_id(self, row: dict, task_id: int | None) -> int | None:
-        if task_id is not None:
-            task_row = self.connection.execute("SELECT vehicle_id FROM tasks WHERE id = %s", (task_id,)).fetchone()
-            if task_row is not None and task_row["vehicle_id"] is not None:
-                return int(task_row["vehicle_id"])
+    def _insert_values(self, row: dict, task: dict | None, known: dict | None = None) -> tuple:
+        latitude, longitude = _parse_coordinates(row.get("coordinates"))
+        gps_fix_age_seconds = row.get("gps_fix_age_seconds")
+        return (
+            self._vehicle_id(row, task, known),
+            int(task["id"]) if task is not None else None,
+            latitude,
+            longitude,
+            row.get("coordinates") or "",
+            row.get("geo_text") or "",
+            row.get("geo_zona") or "",
+            _float_or_none(row.get("speed_kmh")),
+            row.get("gps_fix_text") or "",
+            int(gps_fix_age_seconds) if gps_fix_age_seconds is not None else None,
+            bool(row.get("has_fresh_coordinates")),
+            bool(row.get("is_navigation_stale")),
+            row["collected_at"],
+        )
+
+    def _batch_values(self, rows: list[dict], tasks: dict[int, dict]) -> tuple[list[tuple], list[HistorySkip]]:
+        task_by_row = [tasks.get(_to_int_or_none(self._trip_number_from_row(row))) for row in rows]
+        known = self._known_vehicles(
+            [row for row, task in zip(rows, task_by_row) if task is None or task["vehicle_id"] is None]
+        )
+        return [self._insert_values(row, task, known) for row, task in zip(rows, task_by_row)], []
+
+    def _vehicle_id(self, row: dict, task: dict | None, known: dict | None = None) -> int:
+        if task is not None and task["vehicle_id"] is not None:
+            return int(task["vehicle_id"])
+        if known is None:
+            known = self._known_vehicles([row])
         monitoring_id = _to_int_or_none(row.get("vehicle_monitoring_id"))
         plate = str(row.get("vehicle_plate") or "").strip()
-        if monitoring_id is not None:
-            found = self.connection.execute("SELECT id FROM vehicles WHERE monitoring_id = %s", (monitoring_id,)).fetchone()
-            if found is not None:
-                return int(found["id"])
-        if plate:
-            found = self.connection.execute("SELECT id FROM vehicles WHERE plate_number = %s", (plate,)).fetchone()
-            if found is not None:
-                return int(found["id"])
+        if monitoring_id is not None and ("monitoring_id", monitoring_id) in known:
+            return known[("monitoring_id", monitoring_id)]
+        if plate and ("plate_number", plate) in known:
+            return known[("plate_number", plate)]
         plate = plate or (f"monitoring_id:{monitoring_id}" if monitoring_id is not None else "unknown")
         with self.connection.transaction():
             inserted = self.connection.execute(
@@ -416,7 +509,29 @@ class PostgresNavigationHistoryService(_PostgresHistoryBase):
                 """,
                 (plate, monitoring_id),
             ).fetchone()
-        return int(inserted["id"])
+        vehicle_id = int(inserted["id"])
+        known[("plate_number", plate)] = vehicle_id
+        if monitoring_id is not None:
+            known[("monitoring_id", monitoring_id)] = vehicle_id
+        return vehicle_id
+
+    def _known_vehicles(self, rows: list[dict]) -> dict[tuple[str, Any], int]:
+        """Машины для строк без привязки через рейс: один запрос по monitoring_id и госномеру."""
+        monitoring_ids = sorted({parsed for row in rows
+                                 if (parsed := _to_int_or_none(row.get("vehicle_monitoring_id"))) is not None})
+        plates = sorted({plate for row in rows if (plate := str(row.get("vehicle_plate") or "").strip())})
+        if not monitoring_ids and not plates:
+            return {}
+        found = self.connection.execute(
+            "SELECT id, monitoring_id, plate_number FROM vehicles WHERE monitoring_id = ANY(%s) OR plate_number = ANY(%s)",
+            (monitoring_ids, plates),
+        ).fetchall()
+        known: dict[tuple[str, Any], int] = {}
+        for vehicle in found:
+            if vehicle["monitoring_id"] is not None:
+                known[("monitoring_id", int(vehicle["monitoring_id"]))] = int(vehicle["id"])
+            known[("plate_number", vehicle["plate_number"])] = int(vehicle["id"])
+        return known
 
     @staticmethod
     def _navigation_row_to_dict(row: dict) -> dict:
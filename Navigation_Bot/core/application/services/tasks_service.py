@@ -10,6 +10,7 @@ from Navigation_Bot.core.domain.processed_flags import init_processed_flags
 from Navigation_Bot.core.application.services.google.task_merge_service import GoogleTaskMergeService
 from Navigation_Bot.core.domain.entities.status_event import StatusEvent
 from Navigation_Bot.core.domain.task_identity import google_sheet_row, row_identity_for_gui, trip_number
+from Navigation_Bot.core.domain.task_store import TaskStore
 
 AUDITED_USER_FIELDS = {
     "id",
@@ -132,6 +133,12 @@ class TasksService:
         data, err = self._get_data()
         if err or data is None:
             return None
+        if isinstance(data, TaskStore):
+            for field in ("google_sheet_row", "index"):
+                row = data.find_row(field, google_row)
+                if row is not None and google_sheet_row(row) == google_row:
+                    return data.position(row)
+            return None
         for i, row in enumerate(data):
             if isinstance(row, dict) and google_sheet_row(row) == google_row:
                 return i
@@ -141,6 +148,8 @@ class TasksService:
         data, err = self._get_data()
         if err or data is None:
             return None
+        if isinstance(data, TaskStore):
+            return data.find_position("trip_number", task_trip_number)
         for i, row in enumerate(data):
             if isinstance(row, dict) and trip_number(row) == task_trip_number:
                 return i
@@ -216,13 +225,16 @@ class TasksService:
         if changed:
             self._sync_row_task_formats(row)
 
+        # init_processed_flags может поправить флаги и в других строках — тогда сохраняем все.
+        touched_rows = [row]
         if any(key in patch for key in ("Выгрузка", "Погрузка", "unloads", "loads")):
             init_processed_flags(data, data, loads_key="Выгрузка")
             self._sync_row_task_formats(row)
             changed = True
+            touched_rows = None
 
         if changed:
-            self.task_repository.save(source=source)
+            self.task_repository.save(source=source, rows=touched_rows)
             self._save_patch_status_events(old_row, row, patch, source)
 
         return True, row, None
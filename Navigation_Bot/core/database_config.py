@@ -15,6 +15,7 @@ class DatabaseConfig:
     postgres_dsn: str
     api_base_url: str
     api_key: str
+    postgres_replica_dsn: str = ""
 
     @classmethod
     def from_env(cls) -> "DatabaseConfig":
@@ -23,15 +24,21 @@ class DatabaseConfig:
         postgres_dsn = os.getenv("POSTGRES_DSN", DEFAULT_POSTGRES_DSN).strip() or DEFAULT_POSTGRES_DSN
         api_base_url = os.getenv("NAV_API_BASE_URL", DEFAULT_API_BASE_URL).strip() or DEFAULT_API_BASE_URL
         api_key = os.getenv("NAV_API_KEY", "").strip()
+        postgres_replica_dsn = os.getenv("POSTGRES_REPLICA_DSN", "").strip()
         return cls(backend=backend,
                    postgres_dsn=postgres_dsn,
                    api_base_url=api_base_url,
-                   api_key=api_key)
+                   api_key=api_key,
+                   postgres_replica_dsn=postgres_replica_dsn)
 
     @property
     def is_postgres(self) -> bool:
         return self.backend in {"postgres", "postgresql"}
 
+    @property
+    def has_replica(self) -> bool:
+        return bool(self.postgres_replica_dsn)
+
     @property
     def is_api(self) -> bool:
         return self.backend == "api"
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+from copy import deepcopy
+from operator import index as operator_index
+from typing import Any, Iterable, SupportsIndex
+
+from Navigation_Bot.core.domain.task_identity import to_int_or_none
+
+INDEXED_FIELDS = ("db_task_id", "trip_number", "google_sheet_row", "index")
+
+Key = tuple[str, Any]
+
+
+class TaskStore(list):
+    """
+    Список строк рейсов GUI с hash-индексами по db_task_id, trip_number, google_sheet_row и index.
+
+    «Реальный индекс» строки по-прежнему её позиция в списке: таблица и TasksService
+    работают с data[real_idx] как раньше. Все изменения списка (append, pop, data[i] = row,
+    del, sort...) обновляют индексы. Позиции строк пересчитываются лениво — один раз после
+    сдвига, а не на каждое удаление; remove_rows удаляет пачку строк за один проход.
+
+    Ключевые поля строки, изменённые на месте, нужно передать в reindex(row). Найденная
+    по устаревшему ключу строка перепроверяется, и индексы при расхождении строятся заново.
+    """
+
+    __slots__ = ("_owners", "_row_keys", "_shared", "_positions")
+
+    def __init__(self, rows: Iterable[Any] = ()):
+        super().__init__(rows)
+        self._reindex_all()
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+    def __copy__(self) -> "TaskStore":
+        return type(self)(self)
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> "TaskStore":
+        return type(self)(deepcopy(list(self), memo))
+
+    # Поиск
+
+    def find_row(self, field: str, value: Any) -> dict[str, Any] | None:
+        key = _key(field, value)
+        if key is None:
+            return None
+        row = self._owners.get(key)
+        if row is None:
+            return None
+        if _key(field, row.get(field)) != key or id(row) not in self._row_keys:
+            self._reindex_all()
+            row = self._owners.get(key)
+        return row
+
+    def find_position(self, field: str, value: Any) -> int | None:
+        row = self.find_row(field, value)
+        return self.position(row) if row is not None else None
+
+    def match(self, row: dict[str, Any]) -> dict[str, Any] | None:
+        """Строка хранилища с тем же первым совпавшим ключом (db_task_id, trip_number, google_sheet_row, index)."""
+        for field in INDEXED_FIELDS:
+            found = self.find_row(field, row.get(field))
+            if found is not None:
+                return found
+        return None
+
+    def position(self, row: dict[str, Any]) -> int | None:
+        if self._positions is None:
+            self._positions = {id(item): index for index, item in enumerate(self)}
+        return self._positions.get(id(row))
+
+    # Изменения
+
+    def replace(self, old_row: dict[str, Any], new_row: dict[str, Any]) -> int | None:
+        index = self.position(old_row)
+        if index is not None:
+            self[index] = new_row
+        return index
+
+    def remove_rows(self, rows: Iterable[dict[str, Any]]) -> int:
+        removed = {id(row): row for row in rows}
+        if not removed:
+            return 0
+        kept = [row for row in self if id(row) not in removed]
+        count = len(self) - len(kept)
+        super().__setitem__(slice(None), kept)
+        self._positions = None
+        for row in removed.values():
+            self._unindex(row)
+        return count
+
+    def reindex(self, row: dict[str, Any]) -> None:
+        if id(row) in self._row_keys:
+            self._unindex(row)
+            self._index(row)
+
+    # Операции list
+
+    def append(self, row: Any) -> None:
+        super().append(row)
+        self._index(row)
+        if self._positions is not None:
+            self._positions[id(row)] = len(self) - 1
+
+    def extend(self, rows: Iterable[Any]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def __iadd__(self, rows: Iterable[Any]) -> "TaskStore":
+        self.extend(rows)
+        return self
+
+    def insert(self, index: SupportsIndex, row: Any) -> None:
+        super().insert(index, row)
+        self._index(row)
+        self._positions = None
+
+    def pop(self, index: SupportsIndex = -1) -> Any:
+        last = operator_index(index) in (-1, len(self) - 1)
+        row = super().pop(index)
+        self._unindex(row)
+        if last and self._positions is not None:
+            self._positions.pop(id(row), None)
+        else:
+            self._positions = None
+        return row
+
+    def remove(self, row: Any) -> None:
+        super().remove(row)
+        self._unindex(row)
+        self._positions = None
+
+    def clear(self) -> None:
+        super().clear()
+        self._reindex_all()
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            super().__setitem__(index, value)
+            self._reindex_all()
+            return
+        old_row = self[index]
+        super().__setitem__(index, value)
+        if old_row is value:
+            self.reindex(value)
+            return
+        self._unindex(old_row)
+        self._index(value)
+        if self._positions is not None:
+            self._positions.pop(id(old_row), None)
+            self._positions[id(value)] = operator_index(index) % len(self)
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._reindex_all()
+
+    def __imul__(self, count: SupportsIndex) -> "TaskStore":
+        super().__imul__(count)
+        self._reindex_all()
+        return self
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        super().sort(*args, **kwargs)
+        self._positions = None
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._positions = None
+
+    # Индексы
+
+    def _reindex_all(self) -> None:
+        self._owners: dict[Key, dict[str, Any]] = {}
+        self._row_keys: dict[int, tuple[Key, ...]] = {}
+        self._shared: set[Key] = set()
+        self._positions: dict[int, int] | None = None
+        for row in self:
+            self._index(row)
+
+    def _index(self, row: Any) -> None:
+        if not isinstance(row, dict):
+            return
+        keys = tuple(key for key in (_key(field, row.get(field)) for field in INDEXED_FIELDS) if key is not None)
+        self._row_keys[id(row)] = keys
+        for key in keys:
+            owner = self._owners.setdefault(key, row)
+            if owner is not row:
+                self._shared.add(key)
+
+    def _unindex(self, row: Any) -> None:
+        keys = self._row_keys.pop(id(row), ())
+        for key in keys:
+            if self._owners.get(key) is not row:
+                continue
+            del self._owners[key]
+            if key in self._shared:
+                self._shared.discard(key)
+                self._restore_owner(key)
+
+    def _restore_owner(self, key: Key) -> None:
+        """Ключ был у нескольких строк: владельцем становится следующая по порядку."""
+        owner = None
+        for row in self:
+            if isinstance(row, dict) and key in self._row_keys.get(id(row), ()):
+                if owner is None:
+                    owner = row
+                    self._owners[key] = row
+                else:
+                    self._shared.add(key)
+                    break
+
+
+def _key(field: str, value: Any) -> Key | None:
+    if value is None:
+        return None
+    number = to_int_or_none(value)
+    if number is not None:
+        return field, number
+    text = str(value).strip()
+    return (field, text) if text else None
@@ -1,20 +1,84 @@
 from __future__ import annotations
 
+import json
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
 from typing import Any
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from Navigation_Bot.core.env import env_int
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+PATH_ID_RE = re.compile(r"/\d+(?=/|$)")
 
 
 class NavigationApiError(RuntimeError):
-    pass
+    def __init__(self, message: str, *, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(slots=True)
+class ApiCallStats:
+    count: int = 0
+    errors: int = 0
+    retries: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def add(self, elapsed_ms: float, *, failed: bool, retries: int) -> None:
+        self.count += 1
+        self.errors += int(failed)
+        self.retries += retries
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
 
 
 class NavigationApiClient:
-    def __init__(self, base_url: str, api_key: str = "", timeout: float = 30.0):
+    """
+    HTTP-клиент GUI.
+
+    GET-ответы с ETag запоминаются (до etag_cache_size штук); повторный GET того же
+    URL отправляет If-None-Match, и на 304 клиент отдаёт сохранённый ответ.
+    Каждый вызов получает собственную копию данных.
+
+    iter_ndjson читает потоковые выгрузки (application/x-ndjson) построчно,
+    не собирая весь ответ в памяти.
+
+    Запросы идут через requests.Session: keep-alive соединения из пула (pool_size),
+    сжатые ответы (gzip, br при установленном brotli) распаковываются автоматически.
+    GET и HEAD повторяются до retries раз при обрыве соединения и ответах 502/503/504
+    с экспоненциальной паузой и случайной добавкой; Retry-After сервера учитывается.
+    Ошибки соединения до отправки запроса повторяются для любого метода.
+    Время вызовов копится в call_stats по методу и шаблону пути (/tasks/{id}/notes).
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 api_key: str = "",
+                 timeout: float = 30.0,
+                 etag_cache_size: int = 256,
+                 *,
+                 retries: int | None = None,
+                 pool_size: int | None = None):
         self.base_url = base_url.rstrip("/") + "/"
         self.api_key = api_key
         self.timeout = timeout
+        self.etag_cache_size = max(int(etag_cache_size), 0)
+        self._etag_cache: OrderedDict[tuple[str, tuple[tuple[str, str], ...]], tuple[str, bytes]] = OrderedDict()
+        self.call_stats: dict[str, ApiCallStats] = {}
+        self.session = self._build_session(env_int("NAV_API_CLIENT_RETRIES", 3) if retries is None else retries,
+                                           env_int("NAV_API_CLIENT_POOL_SIZE", 10) if pool_size is None else pool_size)
+
+    def close(self) -> None:
+        self.session.close()
 
     def get(self, path: str, *, params: dict[str, Any] | None = None) -> Any:
         return self._request("GET", path, params=params)
@@ -25,9 +89,64 @@ class NavigationApiClient:
     def put(self, path: str, *, json: dict[str, Any] | None = None) -> Any:
         return self._request("PUT", path, json=json)
 
+    def patch(self, path: str, *, json: dict[str, Any] | None = None) -> Any:
+        return self._request("PATCH", path, json=json)
+
     def delete(self, path: str) -> Any:
         return self._request("DELETE", path)
 
+    def iter_ndjson(self, path: str, *, params: dict[str, Any] | None = None) -> Iterator[Any]:
+        url = urljoin(self.base_url, path.lstrip("/"))
+        try:
+            with self.session.get(url, headers=self._auth_headers(), params=params, timeout=self.timeout,
+                                  stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+        except requests.RequestException as exc:
+            raise self._api_error("GET", url, exc) from exc
+        except ValueError as exc:
+            raise NavigationApiError(f"GET {url} returned invalid NDJSON: {exc}") from exc
+
+    def iter_sse(self,
+                 path: str,
+                 *,
+                 params: dict[str, Any] | None = None,
+                 read_timeout: float = 60.0) -> Iterator[tuple[str, Any]]:
+        """
+        События text/event-stream как (event, data) с data, разобранным из JSON.
+
+        read_timeout должен быть больше интервала keepalive сервера: тишина дольше него
+        считается обрывом соединения.
+        """
+        url = urljoin(self.base_url, path.lstrip("/"))
+        try:
+            with self.session.get(url, headers=self._auth_headers({"Accept": "text/event-stream"}), params=params,
+                                  timeout=(self.timeout, read_timeout), stream=True) as response:
+                response.raise_for_status()
+                event, data_lines = "message", []
+                # chunk_size=None: строки отдаются по мере прихода, без ожидания заполнения буфера.
+                for raw_line in response.iter_lines(chunk_size=None):
+                    line = raw_line.decode("utf-8")
+                    if not line:
+                        if data_lines:
+                            yield event, json.loads("\n".join(data_lines))
+                        event, data_lines = "message", []
+                        continue
+                    if line.startswith(":"):
+                        continue
+                    field, _, value = line.partition(":")
+                    value = value[1:] if value.startswith(" ") else value
+                    if field == "event":
+                        event = value
+                    elif field == "data":
+                        data_lines.append(value)
+        except requests.RequestException as exc:
+            raise self._api_error("GET", url, exc) from exc
+        except ValueError as exc:
+            raise NavigationApiError(f"GET {url} returned invalid event data: {exc}") from exc
+
     def login(self, username: str, password: str) -> dict[str, Any]:
         payload = self.post("/api/v1/auth/login", json={"username": username, "password": password})
         if isinstance(payload, dict):
@@ -37,22 +156,86 @@ class NavigationApiClient:
         return payload
 
     def _request(self, method: str, path: str, **kwargs: Any) -> Any:
-        headers = dict(kwargs.pop("headers", {}) or {})
-        if self.api_key:
-            headers["X-API-Key"] = self.api_key
+        headers = self._auth_headers(kwargs.pop("headers", None))
         url = urljoin(self.base_url, path.lstrip("/"))
+        cache_key = self._etag_cache_key(url, kwargs.get("params")) if method == "GET" else None
+        cached = self._etag_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        started = time.perf_counter()
+        response = None
         try:
-            response = requests.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
             response.raise_for_status()
         except requests.RequestException as exc:
-            response = getattr(exc, "response", None)
-            detail = ""
-            if response is not None:
-                try:
-                    detail = f": {response.json()}"
-                except ValueError:
-                    detail = f": {response.text}"
-            raise NavigationApiError(f"{method} {url} failed: {exc}{detail}") from exc
+            raise self._api_error(method, url, exc) from exc
+        finally:
+            self._record_call(method, url, (time.perf_counter() - started) * 1000, response)
+        if cache_key is not None:
+            if response.status_code == 304 and cached is not None:
+                self._etag_cache.move_to_end(cache_key)
+                return json.loads(cached[1])
+            self._remember_etag(cache_key, response)
         if not response.content:
             return None
         return response.json()
+
+    def _auth_headers(self, headers: dict[str, str] | None = None) -> dict[str, str]:
+        headers = dict(headers or {})
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        return headers
+
+    @staticmethod
+    def _api_error(method: str, url: str, exc: requests.RequestException) -> NavigationApiError:
+        response = getattr(exc, "response", None)
+        detail = ""
+        if response is not None:
+            try:
+                detail = f": {response.json()}"
+            except ValueError:
+                detail = f": {response.text}"
+        return NavigationApiError(f"{method} {url} failed: {exc}{detail}",
+                                  status_code=response.status_code if response is not None else None)
+
+    @staticmethod
+    def _build_session(retries: int, pool_size: int) -> requests.Session:
+        retry = Retry(total=max(int(retries), 0),
+                      status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset({"GET", "HEAD"}),
+                      backoff_factor=0.2,
+                      backoff_jitter=0.2,
+                      respect_retry_after_header=True,
+                      raise_on_status=False)
+        pool_size = max(int(pool_size), 1)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _record_call(self, method: str, url: str, elapsed_ms: float, response: Any) -> None:
+        key = f"{method} {PATH_ID_RE.sub('/{id}', urlsplit(url).path)}"
+        retries = getattr(getattr(getattr(response, "raw", None), "retries", None), "history", ())
+        failed = response is None or response.status_code >= 400
+        stats = self.call_stats.get(key)
+        if stats is None:
+            stats = self.call_stats[key] = ApiCallStats()
+        stats.add(elapsed_ms, failed=failed, retries=len(retries))
+
+    def clear_etag_cache(self) -> None:
+        self._etag_cache.clear()
+
+    def _remember_etag(self, cache_key: tuple[str, tuple[tuple[str, str], ...]], response: Any) -> None:
+        etag = response.headers.get("ETag")
+        if not etag or not response.content or self.etag_cache_size <= 0:
+            self._etag_cache.pop(cache_key, None)
+            return
+        self._etag_cache[cache_key] = (etag, response.content)
+        self._etag_cache.move_to_end(cache_key)
+        while len(self._etag_cache) > self.etag_cache_size:
+            self._etag_cache.popitem(last=False)
+
+    @staticmethod
+    def _etag_cache_key(url: str, params: dict[str, Any] | None) -> tuple[str, tuple[tuple[str, str], ...]]:
+        return url, tuple(sorted((str(key), str(value)) for key, value in (params or {}).items()))
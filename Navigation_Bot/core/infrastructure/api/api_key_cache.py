@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from Navigation_Bot.core.env import env_float
+
+
+class ApiKeyUserCache:
+    """
+    In-process кэш пользователей по hash X-API-Key.
+
+    Запись живёт не дольше ttl_seconds и не дольше expires_at самого ключа.
+    Отзыв ключа и изменение пользователя сбрасывают записи в этом процессе;
+    другие worker-процессы увидят изменение не позже чем через TTL.
+    Отметки last_used_at копятся в памяти и пишутся одним UPDATE в flush().
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, *, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = max(float(ttl_seconds), 0.0)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[float, dict[str, Any]]] = {}
+        self._pending_touches: set[int] = set()
+
+    @classmethod
+    def from_env(cls) -> "ApiKeyUserCache":
+        return cls(env_float("NAV_API_KEY_CACHE_TTL_SECONDS", 30.0))
+
+    def get(self, key_hash: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= self._clock():
+                self._entries.pop(key_hash, None)
+                return None
+            return dict(user)
+
+    def put(self, key_hash: str, user: dict[str, Any], *, key_expires_at: datetime | None = None) -> None:
+        ttl = self.ttl_seconds
+        if key_expires_at is not None:
+            ttl = min(ttl, (key_expires_at - datetime.now(timezone.utc)).total_seconds())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key_hash] = (self._clock() + ttl, dict(user))
+
+    def invalidate_api_key(self, api_key_id: int) -> None:
+        self._invalidate(lambda user: user.get("api_key_id") == api_key_id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        self._invalidate(lambda user: user.get("id") == user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def touch(self, api_key_id: int | None) -> None:
+        if api_key_id is None:
+            return
+        with self._lock:
+            self._pending_touches.add(int(api_key_id))
+
+    def flush(self, connection: Any) -> int:
+        with self._lock:
+            key_ids = sorted(self._pending_touches)
+            self._pending_touches.clear()
+        if not key_ids:
+            return 0
+
+        from Navigation_Bot.core.repositories.postgres_user_repository import PostgresUserRepository
+
+        try:
+            PostgresUserRepository(connection).touch_api_keys(key_ids)
+        except Exception:
+            with self._lock:
+                self._pending_touches.update(key_ids)
+            raise
+        return len(key_ids)
+
+    def _invalidate(self, predicate: Callable[[dict[str, Any]], bool]) -> None:
+        with self._lock:
+            stale = [key_hash for key_hash, (_, user) in self._entries.items() if predicate(user)]
+            for key_hash in stale:
+                self._entries.pop(key_hash, None)
+
+
+class ApiKeyTouchFlusher:
+    """Фоновый поток, который периодически сбрасывает last_used_at из ApiKeyUserCache в БД."""
+
+    def __init__(self, cache: ApiKeyUserCache, pool: Any, interval_seconds: float = 60.0):
+        self.cache = cache
+        self.pool = pool
+        self.interval_seconds = max(float(interval_seconds), 1.0)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls, cache: ApiKeyUserCache, pool: Any) -> "ApiKeyTouchFlusher":
+        return cls(cache, pool, env_float("NAV_API_KEY_TOUCH_FLUSH_SECONDS", 60.0))
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="api-key-touch-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds)
+            self._thread = None
+        self.flush()
+
+    def flush(self) -> None:
+        try:
+            with self.pool.connection() as connection:
+                self.cache.flush(connection)
+        except Exception as exc:
+            print(f"⚠️ Не удалось записать last_used_at API-ключей: {exc}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.flush()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, Callable
+
+from fastapi import Depends, Header, HTTPException, Request, status
+
+from Navigation_Bot.core.infrastructure.api.api_key_cache import ApiKeyUserCache
+from Navigation_Bot.core.infrastructure.api.dependencies import (AuditSink, UserCache, _cached_user, _wrote_recently,
+                                                                 dev_admin_user, env_admin_user)
+from Navigation_Bot.core.repositories.postgres_async_audit_repository import PostgresAsyncAuditRepository
+from Navigation_Bot.core.repositories.postgres_async_user_repository import PostgresAsyncUserRepository
+from Navigation_Bot.core.repositories.postgres_user_repository import hash_api_key
+
+
+async def async_postgres_connection(request: Request) -> AsyncIterator:
+    async with _async_pooled_connection(request, _async_primary_pool(request)) as connection:
+        yield connection
+
+
+def _async_primary_pool(request: Request) -> Any:
+    pool = getattr(request.app.state, "async_postgres_pool", None)
+    if pool is None:
+        raise RuntimeError("PostgreSQL async pool is not initialized")
+    return pool
+
+
+@asynccontextmanager
+async def _async_pooled_connection(request: Request, pool: Any) -> AsyncIterator:
+    metrics = getattr(request.app.state, "metrics", None)
+    started = time.perf_counter()
+    async with pool.connection() as connection:
+        if metrics is not None:
+            metrics.observe_pool_wait(time.perf_counter() - started)
+        yield connection
+
+
+AsyncConnection = Annotated[Any, Depends(async_postgres_connection)]
+
+
+async def async_read_postgres_connection(request: Request,
+                                         x_api_key: Annotated[str | None,
+                                         Header(alias="X-API-Key")] = None, ) -> AsyncIterator:
+    """
+    Async-вариант read_postgres_connection: пул реплики или primary после недавней записи клиента.
+    Слот primary берётся только во втором случае; пользователь проверяется через async_read_user.
+    """
+    replica_pool = getattr(request.app.state, "async_postgres_replica_pool", None)
+    if replica_pool is None or _wrote_recently(request, x_api_key):
+        async with _async_pooled_connection(request, _async_primary_pool(request)) as connection:
+            yield connection
+        return
+    async with _async_pooled_connection(request, replica_pool) as replica_connection:
+        yield replica_connection
+
+
+AsyncReadConnection = Annotated[Any, Depends(async_read_postgres_connection)]
+
+
+def async_audit_repository(connection: AsyncConnection, buffer: AuditSink) -> PostgresAsyncAuditRepository:
+    return PostgresAsyncAuditRepository(connection, buffer)
+
+
+AsyncAuditLog = Annotated[PostgresAsyncAuditRepository, Depends(async_audit_repository)]
+
+
+async def async_current_user(connection: AsyncConnection,
+                             cache: UserCache,
+                             x_api_key: Annotated[str | None,
+                             Header(alias="X-API-Key")] = None, ) -> dict[str, Any]:
+    return await _async_resolve_user(connection, cache, x_api_key)
+
+
+async def async_read_user(request: Request,
+                          cache: UserCache,
+                          x_api_key: Annotated[str | None,
+                          Header(alias="X-API-Key")] = None, ) -> dict[str, Any]:
+    """Для маршрутов на AsyncReadConnection: primary занимается только на промах кэша ключей, как в read_user."""
+    user = _cached_user(cache, x_api_key)
+    if user is not None:
+        return user
+    async with _async_pooled_connection(request, _async_primary_pool(request)) as connection:
+        return await _async_resolve_user(connection, cache, x_api_key)
+
+
+async def _async_resolve_user(connection: Any, cache: ApiKeyUserCache, x_api_key: str | None) -> dict[str, Any]:
+    repository = PostgresAsyncUserRepository(connection)
+    env_api_key = os.getenv("NAV_API_KEY", "").strip()
+
+    if x_api_key:
+        key_hash = hash_api_key(x_api_key)
+        user = cache.get(key_hash)
+        if user is None:
+            user = await repository.find_user_by_api_key_hash(key_hash)
+            if user:
+                key_expires_at = user.pop("api_key_expires_at", None)
+                cache.put(key_hash, user, key_expires_at=key_expires_at)
+        if user:
+            cache.touch(user["api_key_id"])
+            return user
+
+        if env_api_key and x_api_key == env_api_key:
+            return env_admin_user()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_api_key")
+
+    if env_api_key or await repository.has_active_admin_api_keys():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="api_key_required")
+
+    return dev_admin_user()
+
+
+AsyncCurrentUser = Annotated[dict[str, Any], Depends(async_current_user)]
+
+
+def async_require_roles(*roles: str,
+                        user_dependency: Callable[..., Any] = async_current_user) -> Callable[..., Any]:
+    allowed = {role.strip().lower() for role in roles}
+
+    async def dependency(user: dict[str, Any] = Depends(user_dependency)) -> dict[str, Any]:
+        if user.get("role") not in allowed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="insufficient_role")
+        return user
+
+    return dependency
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from Navigation_Bot.core.infrastructure.api.async_dependencies import (AsyncAuditLog,
+                                                                       AsyncConnection,
+                                                                       AsyncReadConnection,
+                                                                       async_read_user,
+                                                                       async_require_roles)
+from Navigation_Bot.core.infrastructure.api.routes import (IfNoneMatch,
+                                                           _batch_completion,
+                                                           _completed_task,
+                                                           _conditional_response,
+                                                           _conflict_detail,
+                                                           _cursor_page_response,
+                                                           _decode_task_cursor,
+                                                           _offset_page_response,
+                                                           _user_source)
+from Navigation_Bot.core.infrastructure.api.schemas import (TaskBatchCompleteRequest,
+                                                            TaskCompleteRequest,
+                                                            TaskUpsertRequest)
+from Navigation_Bot.core.repositories.postgres_async_task_reader import PostgresAsyncTaskReader
+from Navigation_Bot.core.repositories.postgres_async_task_writer import PostgresAsyncTaskWriter
+from Navigation_Bot.core.repositories.postgres_task_writer import TaskConflictError
+from Navigation_Bot.core.storage.postgres_connection import async_postgres_healthcheck
+
+async_router = APIRouter()
+
+ReadAccess = Annotated[dict[str, Any], Depends(async_require_roles("admin", "dispatcher", "viewer"))]
+WriteAccess = Annotated[dict[str, Any], Depends(async_require_roles("admin", "dispatcher"))]
+# Маршруты на AsyncReadConnection: проверка ключа не держит слот primary, пока идёт чтение с реплики.
+ReplicaReadAccess = Annotated[dict[str, Any], Depends(async_require_roles("admin", "dispatcher", "viewer",
+                                                                          user_dependency=async_read_user))]
+
+
+@async_router.get("/me")
+async def get_me(user: ReadAccess) -> dict[str, Any]:
+    return {"user": user}
+
+
+@async_router.get("/health")
+async def health(connection: AsyncConnection, _user: ReadAccess) -> dict[str, Any]:
+    info = await async_postgres_healthcheck(connection)
+    return {"ok": True, "database": info}
+
+
+@async_router.get("/tasks")
+async def list_tasks(_user: ReplicaReadAccess,
+                     connection: AsyncReadConnection,
+                     response: Response,
+                     if_none_match: IfNoneMatch = None,
+                     source_key: str = Query(default=""),
+                     strict_source_key: bool = Query(default=False),
+                     limit: int | None = Query(default=None, ge=1, le=1000),
+                     offset: int = Query(default=0, ge=0),
+                     cursor: str | None = Query(default=None),
+                     include_total: bool | None = Query(default=None),
+                     updated_since: str | None = Query(default=None),
+                     include_completed: bool = Query(default=False),
+                     date_from: str | None = Query(default=None),
+                     date_to: str | None = Query(default=None),
+                     full: bool = Query(default=False)) -> dict[str, Any]:
+    paged = cursor is not None or limit is not None or bool(updated_since)
+    if not paged and not full:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="tasks_query_requires_limit_updated_since_or_full_true",
+        )
+
+    reader = PostgresAsyncTaskReader(connection)
+    after = _decode_task_cursor(cursor) if cursor is not None else None
+    if paged:
+        version = await reader.page_version(source_key,
+                                            include_null_source=not strict_source_key,
+                                            updated_since=updated_since,
+                                            include_completed=include_completed,
+                                            date_from=date_from,
+                                            date_to=date_to,
+                                            updated_since_inclusive=after is not None)
+    else:
+        version = await reader.active_rows_version(source_key,
+                                                   include_null_source=not (strict_source_key and source_key))
+    not_modified = _conditional_response(response, if_none_match, "tasks", version)
+    if not_modified is not None:
+        return not_modified
+
+    if cursor is not None:
+        page_limit = limit or 100
+        rows, next_after, total = await reader.load_active_rows_after(
+            source_key,
+            include_null_source=not strict_source_key,
+            limit=page_limit,
+            after=after,
+            updated_since=updated_since,
+            include_completed=include_completed,
+            date_from=date_from,
+            date_to=date_to,
+            include_total=include_total if include_total is not None else after is None)
+        return _cursor_page_response(rows, next_after, total, limit=page_limit, cursor=cursor)
+
+    if paged:
+        rows, total = await reader.load_active_rows_page(source_key,
+                                                         include_null_source=not strict_source_key,
+                                                         limit=limit or 100,
+                                                         offset=offset,
+                                                         updated_since=updated_since,
+                                                         include_completed=include_completed,
+                                                         date_from=date_from,
+                                                         date_to=date_to,
+                                                         include_total=include_total is not False)
+        return _offset_page_response(rows, total, limit=limit or 100, offset=offset)
+
+    rows = await reader.load_active_rows(source_key, include_null_source=not (strict_source_key and source_key))
+    return {"count": len(rows), "items": rows, "full": True}
+
+
+@async_router.post("/tasks")
+async def upsert_task(payload: TaskUpsertRequest,
+                      connection: AsyncConnection,
+                      audit: AsyncAuditLog,
+                      user: WriteAccess) -> dict[str, Any]:
+    writer = PostgresAsyncTaskWriter(connection, payload.source_key)
+    try:
+        result = await writer.upsert_from_row(payload.row, source=_user_source(user))
+    except TaskConflictError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_conflict_detail(exc)) from exc
+
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_task_row")
+    before = result.pop("before_data", None)
+    after = result.pop("after_data", None)
+    await audit.record(user=user,
+                       entity_type="tasks",
+                       entity_id=result["task_id"],
+                       action="create" if before is None else "update",
+                       before_data=before,
+                       after_data=after)
+
+    return {"ok": True, **result}
+
+
+@async_router.post("/tasks/complete/batch")
+async def complete_tasks_batch(payload: TaskBatchCompleteRequest,
+                               connection: AsyncConnection,
+                               audit: AsyncAuditLog,
+                               user: WriteAccess) -> dict[str, Any]:
+    writer = PostgresAsyncTaskWriter(connection, payload.source_key)
+    found = await writer.complete_tasks(payload.row_identities, source=_user_source(user))
+    completed, skipped = _batch_completion(payload.row_identities, found)
+    await audit.record_compact_many(user=user,
+                                    entity_type="tasks",
+                                    action="complete",
+                                    items=[(found[row_identity]["id"], {"batch": True, "row_identity": row_identity})
+                                           for row_identity in completed])
+    return {"ok": True, "count": len(completed), "items": completed, "skipped": skipped}
+
+
+@async_router.post("/tasks/{row_identity}/complete")
+async def complete_task(row_identity: int,
+                        payload: TaskCompleteRequest,
+                        connection: AsyncConnection,
+                        audit: AsyncAuditLog,
+                        user: WriteAccess) -> dict[str, Any]:
+    writer = PostgresAsyncTaskWriter(connection, payload.source_key)
+    completed = _completed_task(await writer.complete_task(row_identity, source=_user_source(user)), row_identity)
+    if completed is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="task_not_found")
+    await audit.record(user=user,
+                       entity_type="tasks",
+                       entity_id=completed["id"],
+                       action="complete",
+                       before_data=completed["before_data"],
+                       after_data=completed["after_data"])
+
+    return {"ok": True, "row_identity": row_identity}
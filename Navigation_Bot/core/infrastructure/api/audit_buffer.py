@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from psycopg.types.json import Jsonb
+
+from Navigation_Bot.core.env import env_float, env_int
+from Navigation_Bot.core.paths import AUDIT_SPOOL_FILE
+from Navigation_Bot.core.repositories.postgres_audit_repository import AUDIT_COLUMNS, PostgresAuditRepository
+
+
+class AuditBuffer:
+    """
+    In-process буфер записей audit_log.
+
+    Маршруты только добавляют готовые параметры записи; в БД они уходят пачкой
+    через COPY в flush(). created_at фиксируется в момент add(), поэтому порядок
+    и время событий не зависят от задержки записи. Записи, которые не удалось
+    записать при остановке, сохраняются в spool-файл и дописываются при следующем старте.
+    """
+
+    def __init__(self, batch_size: int = 200, *, spool_path: Path | str = AUDIT_SPOOL_FILE):
+        self.batch_size = max(int(batch_size), 1)
+        self.spool_path = Path(spool_path)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries: list[dict[str, Any]] = []
+        self._flush_requested = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> "AuditBuffer":
+        return cls(env_int("NAV_API_AUDIT_BATCH_SIZE", 200),
+                   spool_path=os.getenv("NAV_API_AUDIT_SPOOL_PATH", "").strip() or AUDIT_SPOOL_FILE)
+
+    def add(self, params: dict[str, Any]) -> None:
+        entry = dict(params)
+        entry.setdefault("created_at", datetime.now(timezone.utc))
+        with self._lock:
+            self._entries.append(entry)
+            if len(self._entries) >= self.batch_size:
+                self._flush_requested.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def request_flush(self) -> None:
+        self._flush_requested.set()
+
+    def wait_for_flush_request(self, timeout: float) -> bool:
+        requested = self._flush_requested.wait(timeout)
+        self._flush_requested.clear()
+        return requested
+
+    def flush(self, connection: Any) -> int:
+        with self._flush_lock:
+            with self._lock:
+                entries = self._entries
+                self._entries = []
+            if not entries:
+                return 0
+            try:
+                self._copy_entries(connection, entries)
+            except Exception:
+                with self._lock:
+                    self._entries[:0] = entries
+                raise
+            return len(entries)
+
+    def spool(self) -> int:
+        with self._lock:
+            entries = self._entries
+            self._entries = []
+            if not entries:
+                return 0
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.spool_path.open("a", encoding="utf-8") as file:
+                for entry in entries:
+                    file.write(json.dumps(self._spool_entry(entry), ensure_ascii=False) + "\n")
+        return len(entries)
+
+    def replay_spool(self, connection: Any) -> int:
+        if not self.spool_path.exists():
+            return 0
+        claimed = self.spool_path.with_name(f"{self.spool_path.name}.{os.getpid()}")
+        try:
+            os.replace(self.spool_path, claimed)
+        except FileNotFoundError:
+            return 0
+        try:
+            with claimed.open("r", encoding="utf-8") as file:
+                entries = [json.loads(line) for line in file if line.strip()]
+            if entries:
+                self._copy_entries(connection, entries)
+        except Exception:
+            self._return_claimed(claimed)
+            raise
+        claimed.unlink()
+        return len(entries)
+
+    def _return_claimed(self, claimed: Path) -> None:
+        with self._lock:
+            with self.spool_path.open("a", encoding="utf-8") as target:
+                target.write(claimed.read_text(encoding="utf-8"))
+        claimed.unlink()
+
+    @staticmethod
+    def _copy_entries(connection: Any, entries: list[dict[str, Any]]) -> None:
+        PostgresAuditRepository(connection).copy_entries(entries)
+
+    @staticmethod
+    def _spool_entry(entry: dict[str, Any]) -> dict[str, Any]:
+        spooled = {}
+        for column in AUDIT_COLUMNS:
+            value = entry.get(column)
+            if isinstance(value, Jsonb):
+                value = value.obj
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            spooled[column] = value
+        return spooled
+
+
+class AuditFlusher:
+    """Фоновый поток, который пишет AuditBuffer в БД по таймеру или по заполнению пачки."""
+
+    def __init__(self, buffer: AuditBuffer, pool: Any, interval_seconds: float = 2.0):
+        self.buffer = buffer
+        self.pool = pool
+        self.interval_seconds = max(float(interval_seconds), 0.1)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls, buffer: AuditBuffer, pool: Any) -> "AuditFlusher":
+        return cls(buffer, pool, env_float("NAV_API_AUDIT_FLUSH_SECONDS", 2.0))
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        try:
+            with self.pool.connection() as connection:
+                self.buffer.replay_spool(connection)
+        except Exception as exc:
+            print(f"⚠️ Не удалось дописать отложенные записи audit_log: {exc}")
+        self._thread = threading.Thread(target=self._run, name="audit-log-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.buffer.request_flush()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.interval_seconds, 5.0))
+            self._thread = None
+        if not self.flush():
+            spooled = self.buffer.spool()
+            if spooled:
+                print(f"⚠️ {spooled} записей audit_log сохранены в {self.buffer.spool_path}")
+
+    def flush(self) -> bool:
+        try:
+            with self.pool.connection() as connection:
+                self.buffer.flush(connection)
+            return True
+        except Exception as exc:
+            print(f"⚠️ Не удалось записать audit_log: {exc}")
+            return False
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.buffer.wait_for_flush_request(self.interval_seconds)
+            if self.buffer.pending_count():
+                self.flush()
@@ -1,49 +1,192 @@
 from __future__ import annotations
 
 import os
+import time
 from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager
 from typing import Annotated, Any, Callable
 
 from fastapi import Depends, Header, HTTPException, Request, status
 
-from Navigation_Bot.core.repositories.postgres_user_repository import PostgresUserRepository
+from Navigation_Bot.core.infrastructure.api.api_key_cache import ApiKeyUserCache
+from Navigation_Bot.core.infrastructure.api.audit_buffer import AuditBuffer
+from Navigation_Bot.core.infrastructure.api.password_hasher import PasswordHasher
+from Navigation_Bot.core.infrastructure.api.read_routing import RecentWrites
+from Navigation_Bot.core.repositories.postgres_audit_repository import PostgresAuditRepository
+from Navigation_Bot.core.repositories.postgres_user_repository import PostgresUserRepository, hash_api_key
 
 
 def postgres_connection(request: Request) -> Iterator:
     pool = getattr(request.app.state, "postgres_pool", None)
     if pool is None:
         raise RuntimeError("PostgreSQL pool is not initialized")
+    with _pooled_connection(request, pool) as connection:
+        yield connection
+
+
+@contextmanager
+def _pooled_connection(request: Request, pool: Any) -> Iterator:
+    metrics = getattr(request.app.state, "metrics", None)
+    started = time.perf_counter()
     with pool.connection() as connection:
+        if metrics is not None:
+            metrics.observe_pool_wait(time.perf_counter() - started)
         yield connection
 
 
 Connection = Annotated[Any, Depends(postgres_connection)]
+# Для долгих потоков: соединение возвращается в pool сразу после обработчика, а не после ответа.
+ShortConnection = Annotated[Any, Depends(postgres_connection, scope="function")]
+
+
+def postgres_connection_factory(request: Request) -> Callable[[], AbstractContextManager]:
+    """Для маршрутов, которые берут соединение на отдельные шаги, а не на весь запрос (например, /auth/login)."""
+    pool = getattr(request.app.state, "postgres_pool", None)
+    if pool is None:
+        raise RuntimeError("PostgreSQL pool is not initialized")
+    return lambda: _pooled_connection(request, pool)
+
+
+ConnectionFactory = Annotated[Callable[[], AbstractContextManager], Depends(postgres_connection_factory)]
+
+
+def read_postgres_connection(request: Request,
+                             x_api_key: Annotated[str | None,
+                             Header(alias="X-API-Key")] = None, ) -> Iterator:
+    """
+    Соединение для маршрутов только на чтение: из пула реплики (POSTGRES_REPLICA_DSN), если он есть.
+
+    Клиент, который писал в последние NAV_API_REPLICA_STICKY_SECONDS, читает из primary, чтобы сразу
+    видеть свои изменения. Слот primary берётся только в этой ветке: пользователь для таких маршрутов
+    проверяется через read_user, который возвращает своё соединение в pool до запроса.
+    """
+    replica_pool = getattr(request.app.state, "postgres_replica_pool", None)
+    if replica_pool is None or _wrote_recently(request, x_api_key):
+        yield from postgres_connection(request)
+        return
+    with _pooled_connection(request, replica_pool) as replica_connection:
+        yield replica_connection
+
+
+def _wrote_recently(request: Request, x_api_key: str | None) -> bool:
+    recent_writes: RecentWrites | None = getattr(request.app.state, "recent_writes", None)
+    return recent_writes is not None and recent_writes.wrote_recently(x_api_key)
+
+
+ReadConnection = Annotated[Any, Depends(read_postgres_connection)]
+
+
+def api_key_cache(request: Request) -> ApiKeyUserCache:
+    cache = getattr(request.app.state, "api_key_cache", None)
+    if cache is None:
+        cache = ApiKeyUserCache.from_env()
+        request.app.state.api_key_cache = cache
+    return cache
+
+
+UserCache = Annotated[ApiKeyUserCache, Depends(api_key_cache)]
+
+
+def password_hasher(request: Request) -> PasswordHasher:
+    hasher = getattr(request.app.state, "password_hasher", None)
+    if hasher is None:
+        hasher = PasswordHasher(workers=0)
+        request.app.state.password_hasher = hasher
+    return hasher
+
+
+Hasher = Annotated[PasswordHasher, Depends(password_hasher)]
+
+
+def audit_buffer(request: Request) -> AuditBuffer | None:
+    return getattr(request.app.state, "audit_buffer", None)
+
+
+AuditSink = Annotated[AuditBuffer | None, Depends(audit_buffer)]
+
+
+def audit_repository(connection: Connection, buffer: AuditSink) -> PostgresAuditRepository:
+    return PostgresAuditRepository(connection, buffer)
+
+
+AuditLog = Annotated[PostgresAuditRepository, Depends(audit_repository)]
 
 
 def current_user(connection: Connection,
+                 cache: UserCache,
                  x_api_key: Annotated[str | None,
                  Header(alias="X-API-Key")] = None, ) -> dict[str, Any]:
+    return _resolve_user(connection, cache, x_api_key)
+
+
+def stream_user(connection: ShortConnection,
+                cache: UserCache,
+                x_api_key: Annotated[str | None,
+                Header(alias="X-API-Key")] = None, ) -> dict[str, Any]:
+    return _resolve_user(connection, cache, x_api_key)
+
+
+def read_user(connections: ConnectionFactory,
+              cache: UserCache,
+              x_api_key: Annotated[str | None,
+              Header(alias="X-API-Key")] = None, ) -> dict[str, Any]:
+    """
+    Для маршрутов на ReadConnection: ключ из кэша проверяется без соединения, а primary
+    занимается только на промах кэша или проверку без ключа — и не на весь запрос.
+    """
+    user = _cached_user(cache, x_api_key)
+    if user is not None:
+        return user
+    with connections() as connection:
+        return _resolve_user(connection, cache, x_api_key)
+
+
+def _cached_user(cache: ApiKeyUserCache, x_api_key: str | None) -> dict[str, Any] | None:
+    if not x_api_key:
+        return None
+    user = cache.get(hash_api_key(x_api_key))
+    if user is not None:
+        cache.touch(user["api_key_id"])
+    return user
+
+
+def _resolve_user(connection: Any, cache: ApiKeyUserCache, x_api_key: str | None) -> dict[str, Any]:
     repository = PostgresUserRepository(connection)
     env_api_key = os.getenv("NAV_API_KEY", "").strip()
 
     if x_api_key:
-        user = repository.get_user_by_api_key(x_api_key)
+        key_hash = hash_api_key(x_api_key)
+        user = cache.get(key_hash)
+        if user is None:
+            user = repository.find_user_by_api_key_hash(key_hash)
+            if user:
+                key_expires_at = user.pop("api_key_expires_at", None)
+                cache.put(key_hash, user, key_expires_at=key_expires_at)
         if user:
+            cache.touch(user["api_key_id"])
             return user
 
         if env_api_key and x_api_key == env_api_key:
-            return {"id": None,
-                    "username": "env_admin",
-                    "display_name": "Environment Admin",
-                    "role": "admin",
-                    "is_active": True,
-                    "api_key_id": None,
-                    }
+            return env_admin_user()
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_api_key")
 
     if env_api_key or repository.has_active_admin_api_keys():
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="api_key_required")
 
+    return dev_admin_user()
+
+
+def env_admin_user() -> dict[str, Any]:
+    return {"id": None,
+            "username": "env_admin",
+            "display_name": "Environment Admin",
+            "role": "admin",
+            "is_active": True,
+            "api_key_id": None,
+            }
+
+
+def dev_admin_user() -> dict[str, Any]:
     return {"id": None,
             "username": "dev_admin",
             "display_name": "Development Admin",
@@ -55,10 +198,11 @@ def current_user(connection: Connection,
 CurrentUser = Annotated[dict[str, Any], Depends(current_user)]
 
 
-def require_roles(*roles: str) -> Callable[[CurrentUser], dict[str, Any]]:
+def require_roles(*roles: str,
+                  user_dependency: Callable[..., dict[str, Any]] = current_user) -> Callable[..., dict[str, Any]]:
     allowed = {role.strip().lower() for role in roles}
 
-    def dependency(user: CurrentUser) -> dict[str, Any]:
+    def dependency(user: dict[str, Any] = Depends(user_dependency)) -> dict[str, Any]:
         if user.get("role") not in allowed:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="insufficient_role")
         return user
@@ -4,6 +4,7 @@ import argparse
 import random
 import statistics
 import sys
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
@@ -175,6 +176,25 @@ class SmokeClient:
             audit_after = self._count_smoke_audit_rows(connection)
         return stats, purged_tasks, purged_audit_rows, route_points_before, route_points_after, audit_before, audit_after
 
+    def login(self, *, username: str, password: str, iterations: int) -> list[RequestStat]:
+        stats: list[RequestStat] = []
+        for _ in range(iterations):
+            _, stat = self._request("POST /auth/login",
+                                    "POST",
+                                    "/api/v1/auth/login",
+                                    json={"username": username, "password": password})
+            stats.append(stat)
+        return stats
+
+    def read_until(self, done: threading.Event, *, source_key: str, page_limit: int) -> list[RequestStat]:
+        params: dict[str, Any] = {"source_key": source_key, "strict_source_key": "true"} if source_key else {}
+        params["limit"] = page_limit
+        stats: list[RequestStat] = []
+        while not done.is_set():
+            _, stat = self._request("GET /tasks during login", "GET", "/api/v1/tasks", params=params)
+            stats.append(stat)
+        return stats
+
     def incremental_check(self, *, source_key: str) -> list[RequestStat]:
         stats: list[RequestStat] = []
         trip_number = self._incremental_check_trip_number()
@@ -493,6 +513,31 @@ def threshold_failures(args: argparse.Namespace, stats: list[RequestStat]) -> li
     return failures
 
 
+def login_check(args: argparse.Namespace) -> list[RequestStat]:
+    """Всплеск входов (смена диспетчеров) и задержка GET /tasks у клиента, который в это время работает."""
+    done = threading.Event()
+    reader = SmokeClient(base_url=args.base_url, api_key=args.api_key, timeout=args.timeout, client_id=0)
+    with ThreadPoolExecutor(max_workers=max(1, args.clients) + 1) as executor:
+        reads = executor.submit(reader.read_until,
+                                done,
+                                source_key=str(args.source_key or ""),
+                                page_limit=max(1, int(args.page_limit or 100)))
+        logins = [executor.submit(SmokeClient(base_url=args.base_url,
+                                              api_key="",
+                                              timeout=args.timeout,
+                                              client_id=client_id).login,
+                                  username=args.login_username,
+                                  password=args.login_password,
+                                  iterations=max(1, args.iterations))
+                  for client_id in range(1, max(1, args.clients) + 1)]
+        stats: list[RequestStat] = []
+        for future in as_completed(logins):
+            stats.extend(future.result())
+        done.set()
+        stats.extend(reads.result())
+    return stats
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Parallel API smoke test for Navigation Bot.")
     parser.add_argument("--base-url", default="http://127.0.0.1:8000")
@@ -517,6 +562,12 @@ def parse_args() -> argparse.Namespace:
                         help="Delete generated smoke tasks directly from PostgreSQL and cascade-delete their route_points.")
     parser.add_argument("--incremental-check", action="store_true",
                         help="Check that GET /tasks?updated_since returns updated and completed smoke rows.")
+    parser.add_argument("--login-check", action="store_true",
+                        help="Run --clients parallel logins x --iterations while one client reads GET /tasks "
+                             "with --api-key. Each login revokes the previous GUI session of --login-username, "
+                             "so --api-key must belong to another user.")
+    parser.add_argument("--login-username", default="")
+    parser.add_argument("--login-password", default="")
     parser.add_argument("--fail-on-errors", action=argparse.BooleanOptionalAction, default=True,
                         help="Exit with code 1 when any request failed.")
     parser.add_argument("--max-p95-ms", type=float, default=0.0,
@@ -547,6 +598,17 @@ def main() -> int:
                 print(f"  {failure}")
         return 1 if failures else 0
 
+    if args.login_check:
+        result.extend(login_check(args))
+        print_summary(result.stats)
+        print(f"wall time: {time.perf_counter() - started:.1f}s")
+        failures = threshold_failures(args, result.stats)
+        if failures:
+            print("threshold failures:")
+            for failure in failures:
+                print(f"  {failure}")
+        return 1 if failures else 0
+
     if args.cleanup_generated or args.purge_generated:
         client = SmokeClient(base_url=args.base_url,
                              api_key=args.api_key,
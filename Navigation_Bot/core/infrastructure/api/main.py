@@ -1,35 +1,152 @@
 from __future__ import annotations
 
+import os
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.routing import APIRoute
 
+from Navigation_Bot.core.infrastructure.api.api_key_cache import ApiKeyTouchFlusher, ApiKeyUserCache
+from Navigation_Bot.core.infrastructure.api.async_routes import async_router
+from Navigation_Bot.core.infrastructure.api.audit_buffer import AuditBuffer, AuditFlusher
+from Navigation_Bot.core.infrastructure.api.metrics import ApiMetrics, RouteTimingMiddleware
+from Navigation_Bot.core.infrastructure.api.password_hasher import PasswordHasher
+from Navigation_Bot.core.infrastructure.api.read_routing import RecentWriteMiddleware, RecentWrites
 from Navigation_Bot.core.infrastructure.api.routes import router
+from Navigation_Bot.core.infrastructure.api.task_change_feed import TaskChangeFeed
+from Navigation_Bot.core.database_config import DatabaseConfig
 from Navigation_Bot.core.storage.postgres_connection import initialize_postgres_schema
-from Navigation_Bot.core.storage.postgres_pool import create_postgres_pool
+from Navigation_Bot.core.storage.postgres_pool import create_async_postgres_pool, create_postgres_pool
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     initialize_postgres_schema()
-    pool = create_postgres_pool()
+    metrics = app.state.metrics
+    cursor_factory = metrics.cursor_class() if metrics is not None else None
+    async_cursor_factory = metrics.async_cursor_class() if metrics is not None else None
+    replica_dsn = DatabaseConfig.from_env().postgres_replica_dsn
+    pool = create_postgres_pool(cursor_factory=cursor_factory)
     pool.open()
     app.state.postgres_pool = pool
+    replica_pool = None
+    if replica_dsn:
+        replica_pool = create_postgres_pool(replica_dsn, cursor_factory=cursor_factory)
+        replica_pool.open()
+    app.state.postgres_replica_pool = replica_pool
+    async_pool = None
+    async_replica_pool = None
+    if app.state.async_mode:
+        async_pool = create_async_postgres_pool(cursor_factory=async_cursor_factory)
+        await async_pool.open()
+        app.state.async_postgres_pool = async_pool
+        if replica_dsn:
+            async_replica_pool = create_async_postgres_pool(replica_dsn, cursor_factory=async_cursor_factory)
+            await async_replica_pool.open()
+        app.state.async_postgres_replica_pool = async_replica_pool
+    if metrics is not None:
+        metrics.watch_pool("sync", pool)
+        if replica_pool is not None:
+            metrics.watch_pool("replica", replica_pool)
+        if async_pool is not None:
+            metrics.watch_pool("async", async_pool)
+        if async_replica_pool is not None:
+            metrics.watch_pool("async_replica", async_replica_pool)
+        metrics.watch_audit_buffer(app.state.audit_buffer)
+    app.state.password_hasher.start()
+    touch_flusher = ApiKeyTouchFlusher.from_env(app.state.api_key_cache, pool)
+    touch_flusher.start()
+    audit_flusher = None
+    if app.state.audit_buffer is not None:
+        audit_flusher = AuditFlusher.from_env(app.state.audit_buffer, pool)
+        audit_flusher.start()
+    change_feed = None
+    if _change_feed_enabled():
+        change_feed = TaskChangeFeed(pool)
+        change_feed.start()
+    app.state.task_change_feed = change_feed
     try:
         yield
     finally:
+        if change_feed is not None:
+            change_feed.stop()
+        if audit_flusher is not None:
+            audit_flusher.stop()
+        touch_flusher.stop()
+        app.state.password_hasher.stop()
+        if async_replica_pool is not None:
+            await async_replica_pool.close()
+        if async_pool is not None:
+            await async_pool.close()
+        if replica_pool is not None:
+            replica_pool.close()
         pool.close()
 
 
-def create_app() -> FastAPI:
+def create_app(*, async_mode: bool = False) -> FastAPI:
+    """
+    async_mode=True подключает async-маршруты (AsyncConnectionPool) для горячих путей:
+    /me, /health, GET /tasks, POST /tasks и завершение задач. Остальные маршруты
+    работают через sync-пул, как и в обычном режиме.
+
+    С POSTGRES_REPLICA_DSN маршруты только на чтение (ReadConnection) берут соединение
+    из отдельного пула реплики; RecentWriteMiddleware отмечает клиентов после записи.
+    Ключ на этих маршрутах проверяется через read_user: из кэша — без primary, при промахе слот primary
+    возвращается в pool до чтения.
+    """
     app = FastAPI(title="Navigation Bot API",
                   version="0.1.0",
                   docs_url="/docs",
                   redoc_url="/redoc",
                   lifespan=lifespan)
 
-    app.include_router(router, prefix="/api/v1")
+    app.state.api_key_cache = ApiKeyUserCache.from_env()
+    app.state.password_hasher = PasswordHasher.from_env()
+    app.state.audit_buffer = AuditBuffer.from_env() if _audit_buffer_enabled() else None
+    app.state.async_mode = async_mode
+    if _gzip_enabled():
+        # text/event-stream (GET /tasks/changes) GZipMiddleware не сжимает.
+        app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+    app.state.metrics = ApiMetrics.from_env() if _metrics_enabled() else None
+    if app.state.metrics is not None:
+        app.add_middleware(RouteTimingMiddleware, metrics=app.state.metrics)
+    app.state.recent_writes = RecentWrites.from_env() if DatabaseConfig.from_env().has_replica else None
+    if app.state.recent_writes is not None:
+        app.add_middleware(RecentWriteMiddleware, recent_writes=app.state.recent_writes)
+    if async_mode:
+        app.include_router(async_router, prefix="/api/v1")
+        app.include_router(_without_routes(router, async_router), prefix="/api/v1")
+    else:
+        app.include_router(router, prefix="/api/v1")
     return app
 
 
+def _audit_buffer_enabled() -> bool:
+    return os.getenv("NAV_API_AUDIT_BUFFER", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _change_feed_enabled() -> bool:
+    return os.getenv("NAV_API_CHANGE_FEED", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _gzip_enabled() -> bool:
+    return os.getenv("NAV_API_GZIP", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _metrics_enabled() -> bool:
+    return os.getenv("NAV_API_METRICS", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _without_routes(source: APIRouter, shadowing: APIRouter) -> APIRouter:
+    shadowed = {(route.path, method) for route in shadowing.routes if isinstance(route, APIRoute)
+                for method in route.methods}
+    filtered = APIRouter()
+    filtered.routes = [route for route in source.routes
+                       if not isinstance(route, APIRoute)
+                       or not any((route.path, method) in shadowed for method in route.methods)]
+    return filtered
+
+
 app = create_app()
+async_app = create_app(async_mode=True)
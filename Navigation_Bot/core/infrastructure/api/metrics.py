@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+import psycopg
+
+from Navigation_Bot.core.env import env_float
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STATEMENT_TARGET_RE = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE|COPY|TABLE)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+SQL_KEYWORDS = {"select", "only", "lateral", "unnest", "jsonb_to_recordset", "generate_series"}
+
+# Показатели пула psycopg_pool.get_stats(): текущие значения и накопительные счётчики.
+POOL_GAUGES = ("pool_min", "pool_max", "pool_size", "pool_available", "requests_waiting")
+POOL_COUNTERS = ("requests_num", "requests_queued", "requests_wait_ms", "requests_errors", "returns_bad",
+                 "connections_num", "connections_ms", "connections_errors", "connections_lost")
+
+METRIC_HELP = {
+    "nav_api_request_duration_seconds": ("histogram", "HTTP request duration by route template."),
+    "nav_api_request_db_seconds": ("histogram", "Time spent in SQL statements within a request."),
+    "nav_api_request_pool_wait_seconds": ("histogram", "Time spent waiting for a pool connection within a request."),
+    "nav_api_requests_in_progress": ("gauge", "HTTP requests currently being handled."),
+    "nav_api_statement_duration_seconds": ("histogram", "SQL statement duration by operation and target table."),
+    "nav_api_statement_errors_total": ("counter", "SQL statements that raised an error."),
+    "nav_api_slow_statements_total": ("counter", "SQL statements slower than NAV_API_SLOW_STATEMENT_MS."),
+    "nav_api_audit_pending": ("gauge", "Audit log entries buffered in memory and not yet written."),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass(slots=True)
+class RequestTimings:
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+
+
+_request_timings: ContextVar[RequestTimings | None] = ContextVar("nav_api_request_timings", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class ApiMetrics:
+    """
+    Метрики процесса API для /api/v1/metrics в текстовом формате Prometheus.
+
+    Время запросов пишет RouteTimingMiddleware, время SQL — курсор из cursor_class(),
+    ожидание соединения — зависимость postgres_connection. Состояние пулов и буфера
+    audit_log читается в момент запроса метрик.
+    """
+
+    def __init__(self, *, slow_statement_seconds: float = 0.5, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.slow_statement_seconds = max(float(slow_statement_seconds), 0.0)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, Labels], _Histogram] = {}
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._in_progress = 0
+        self._pools: dict[str, Any] = {}
+        self._audit_buffer: Any | None = None
+
+    @classmethod
+    def from_env(cls) -> "ApiMetrics":
+        return cls(slow_statement_seconds=env_float("NAV_API_SLOW_STATEMENT_MS", 500.0) / 1000.0)
+
+    def watch_pool(self, name: str, pool: Any) -> None:
+        self._pools[name] = pool
+
+    def watch_audit_buffer(self, buffer: Any | None) -> None:
+        self._audit_buffer = buffer
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            if index < len(self.buckets):
+                histogram.counts[index] += 1
+            histogram.count += 1
+            histogram.sum += seconds
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    @contextmanager
+    def track_request(self) -> Iterator[RequestTimings]:
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        with self._lock:
+            self._in_progress += 1
+        try:
+            yield timings
+        finally:
+            _request_timings.reset(token)
+            with self._lock:
+                self._in_progress -= 1
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float,
+                        timings: RequestTimings) -> None:
+        self.observe("nav_api_request_duration_seconds", seconds, method=method, route=route, status=str(status_code))
+        self.observe("nav_api_request_db_seconds", timings.db_seconds, method=method, route=route)
+        self.observe("nav_api_request_pool_wait_seconds", timings.pool_wait_seconds, method=method, route=route)
+
+    def observe_pool_wait(self, seconds: float) -> None:
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.pool_wait_seconds += seconds
+
+    def observe_statement(self, query: Any, seconds: float, *, failed: bool = False) -> None:
+        operation, table = statement_labels(_query_text(query))
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.db_seconds += seconds
+        self.observe("nav_api_statement_duration_seconds", seconds, operation=operation, table=table)
+        if failed:
+            self.increment("nav_api_statement_errors_total", operation=operation, table=table)
+        if self.slow_statement_seconds and seconds >= self.slow_statement_seconds:
+            self.increment("nav_api_slow_statements_total", operation=operation, table=table)
+            print(f"⚠️ Медленный SQL ({seconds * 1000:.0f} ms, {operation} {table}): "
+                  f"{' '.join(_query_text(query).split())[:300]}")
+
+    def cursor_class(self) -> type:
+        """Класс курсора для cursor_factory пула: execute/executemany/copy попадают в метрики."""
+        metrics = self
+
+        class TimedCursor(psycopg.Cursor):
+            def execute(self, query, params=None, **kwargs):
+                with metrics._timed(query):
+                    return super().execute(query, params, **kwargs)
+
+            def executemany(self, query, params_seq, **kwargs):
+                with metrics._timed(query):
+                    return super().executemany(query, params_seq, **kwargs)
+
+            @contextmanager
+            def copy(self, statement, params=None, **kwargs):
+                with metrics._timed(statement):
+                    with super().copy(statement, params, **kwargs) as copy:
+                        yield copy
+
+        return TimedCursor
+
+    def async_cursor_class(self) -> type:
+        metrics = self
+
+        class TimedAsyncCursor(psycopg.AsyncCursor):
+            async def execute(self, query, params=None, **kwargs):
+                with metrics._timed(query):
+                    return await super().execute(query, params, **kwargs)
+
+            async def executemany(self, query, params_seq, **kwargs):
+                with metrics._timed(query):
+                    return await super().executemany(query, params_seq, **kwargs)
+
+            @asynccontextmanager
+            async def copy(self, statement, params=None, **kwargs):
+                with metrics._timed(statement):
+                    async with super().copy(statement, params, **kwargs) as copy:
+                        yield copy
+
+        return TimedAsyncCursor
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {key: (list(value.counts), value.count, value.sum) for key, value in self._histograms.items()}
+            counters = dict(self._counters)
+            in_progress = self._in_progress
+
+        samples: dict[str, list[str]] = {name: [] for name in METRIC_HELP}
+        for (name, labels), (counts, count, total) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples[name].append(_sample(f"{name}_bucket", labels + (("le", _number(bound)),), cumulative))
+            samples[name].append(_sample(f"{name}_bucket", labels + (("le", "+Inf"),), count))
+            samples[name].append(_sample(f"{name}_sum", labels, total))
+            samples[name].append(_sample(f"{name}_count", labels, count))
+        for (name, labels), value in sorted(counters.items()):
+            samples[name].append(_sample(name, labels, value))
+        samples["nav_api_requests_in_progress"].append(_sample("nav_api_requests_in_progress", (), in_progress))
+        if self._audit_buffer is not None:
+            samples["nav_api_audit_pending"].append(_sample("nav_api_audit_pending", (),
+                                                            self._audit_buffer.pending_count()))
+
+        lines: list[str] = []
+        for name, (kind, help_text) in METRIC_HELP.items():
+            if samples[name]:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", *samples[name]]
+        lines += self._pool_lines()
+        return "\n".join(lines) + "\n"
+
+    def _pool_lines(self) -> list[str]:
+        stats = {name: pool.get_stats() for name, pool in self._pools.items()}
+        if not stats:
+            return []
+        lines: list[str] = []
+        for key in POOL_GAUGES:
+            name = f"nav_api_pool_{key.removeprefix('pool_')}"
+            lines += [f"# HELP {name} psycopg_pool {key}.", f"# TYPE {name} gauge"]
+            lines += [_sample(name, (("pool", pool),), values.get(key, 0)) for pool, values in stats.items()]
+        for key in POOL_COUNTERS:
+            name = f"nav_api_pool_{key}_total"
+            lines += [f"# HELP {name} psycopg_pool {key} since start.", f"# TYPE {name} counter"]
+            lines += [_sample(name, (("pool", pool),), values.get(key, 0)) for pool, values in stats.items()]
+        return lines
+
+    @contextmanager
+    def _timed(self, query: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.observe_statement(query, time.perf_counter() - started, failed=failed)
+
+
+@lru_cache(maxsize=1024)
+def statement_labels(query: str) -> tuple[str, str]:
+    """('SELECT', 'tasks'): первое слово запроса и первая таблица после FROM/JOIN/INTO/UPDATE/COPY."""
+    words = query.split(None, 1)
+    operation = words[0].upper() if words else ""
+    for match in STATEMENT_TARGET_RE.finditer(query):
+        table = match.group(1).lower()
+        if table not in SQL_KEYWORDS:
+            return operation, table
+    return operation, ""
+
+
+def _query_text(query: Any) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    try:
+        return query.as_string()
+    except Exception:
+        return str(query)
+
+
+def _sample(name: str, labels: Labels, value: float) -> str:
+    if not labels:
+        return f"{name} {_number(value)}"
+    rendered = ",".join(f'{key}="{_escape_label(label)}"' for key, label in labels)
+    return f"{name}{{{rendered}}} {_number(value)}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class RouteTimingMiddleware:
+    """ASGI middleware: длительность запроса, время SQL и ожидание пула по шаблону маршрута."""
+
+    def __init__(self, app: Any, metrics: ApiMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with self.metrics.track_request() as timings:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                self.metrics.observe_request(scope["method"],
+                                             getattr(route, "path", None) or "unmatched",
+                                             status_code,
+                                             time.perf_counter() - started,
+                                             timings)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from Navigation_Bot.core.env import env_float, env_int
+from Navigation_Bot.core.repositories.postgres_user_repository import hash_password, verify_password
+
+
+class LoginBusyError(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    """
+    Проверка и хэширование паролей (PBKDF2) вне потока, который держит соединение с БД.
+
+    Хэш считается в ProcessPoolExecutor на workers процессов (spawn: процесс API держит
+    потоки пулов, fork с ними небезопасен); workers=0 — в threadpool текущего процесса.
+    Одновременно считается не больше concurrency хэшей, остальные ждут в очереди
+    до queue_timeout_seconds (0 — без ограничения) и получают LoginBusyError.
+    start() и stop() вызываются в lifespan приложения.
+    """
+
+    def __init__(self, *, workers: int = 2, concurrency: int = 4, queue_timeout_seconds: float = 10.0):
+        self.workers = max(int(workers), 0)
+        self.concurrency = max(int(concurrency), 1)
+        self.queue_timeout_seconds = max(float(queue_timeout_seconds), 0.0)
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        workers = env_int("NAV_API_PASSWORD_WORKERS", min(2, os.cpu_count() or 1))
+        return cls(workers=workers,
+                   concurrency=env_int("NAV_API_LOGIN_CONCURRENCY", max(workers, 1) * 2),
+                   queue_timeout_seconds=env_float("NAV_API_LOGIN_QUEUE_SECONDS", 10.0))
+
+    def start(self) -> None:
+        self._slots = asyncio.Semaphore(self.concurrency)
+        if self.workers and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def verify(self, password: str, stored_hash: str) -> bool:
+        return await self._run(verify_password, password, stored_hash)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def _run(self, function: Callable[..., Any], *args: Any) -> Any:
+        if self._slots is None:
+            self.start()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout_seconds or None)
+        except TimeoutError as exc:
+            raise LoginBusyError("login_busy") from exc
+        try:
+            if self._executor is None:
+                return await run_in_threadpool(function, *args)
+            return await asyncio.wrap_future(self._executor.submit(function, *args))
+        finally:
+            self._slots.release()
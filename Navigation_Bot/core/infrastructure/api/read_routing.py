@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable
+
+from Navigation_Bot.core.env import env_float
+from Navigation_Bot.core.repositories.postgres_user_repository import hash_api_key
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RecentWrites:
+    """
+    Клиенты API, которые недавно писали в БД.
+
+    Ключ — hash X-API-Key (пустая строка для запросов без ключа). Пока с последней
+    записи клиента не прошло window_seconds, его чтения идут в primary, а не в реплику,
+    чтобы клиент сразу видел свои изменения. Отметки живут в памяти процесса.
+    """
+
+    def __init__(self, window_seconds: float = 5.0, *, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = max(float(window_seconds), 0.0)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._writes: dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls) -> "RecentWrites":
+        return cls(env_float("NAV_API_REPLICA_STICKY_SECONDS", 5.0))
+
+    def mark(self, api_key: str | None) -> None:
+        now = self._clock()
+        with self._lock:
+            self._writes[client_key(api_key)] = now
+            if len(self._writes) > 1024:
+                self._writes = {key: at for key, at in self._writes.items() if now - at < self.window_seconds}
+
+    def wrote_recently(self, api_key: str | None) -> bool:
+        with self._lock:
+            written_at = self._writes.get(client_key(api_key))
+        return written_at is not None and self._clock() - written_at < self.window_seconds
+
+
+def client_key(api_key: str | None) -> str:
+    return hash_api_key(api_key) if api_key else ""
+
+
+class RecentWriteMiddleware:
+    """ASGI middleware: отмечает клиента в RecentWrites в начале и в конце каждого запроса, кроме GET/HEAD/OPTIONS."""
+
+    def __init__(self, app: Any, recent_writes: RecentWrites):
+        self.app = app
+        self.recent_writes = recent_writes
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        api_key = _header(scope, b"x-api-key")
+        self.recent_writes.mark(api_key)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.recent_writes.mark(api_key)
+
+
+def _header(scope: dict[str, Any], name: bytes) -> str | None:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
@@ -1,18 +1,37 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
+import json
 import os
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, Any
-
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
-
-from Navigation_Bot.core.infrastructure.api.dependencies import postgres_connection, require_roles
-from Navigation_Bot.core.repositories.postgres_audit_repository import PostgresAuditRepository
+from collections.abc import AsyncIterator, Iterator
+from typing import Annotated, Any, Callable
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic_core import to_jsonable_python
+
+from Navigation_Bot.core.infrastructure.api.api_key_cache import ApiKeyUserCache
+from Navigation_Bot.core.infrastructure.api.dependencies import (AuditLog,
+                                                                 ConnectionFactory,
+                                                                 Hasher,
+                                                                 UserCache,
+                                                                 postgres_connection,
+                                                                 read_postgres_connection,
+                                                                 read_user,
+                                                                 require_roles,
+                                                                 stream_user)
 from Navigation_Bot.core.repositories.postgres_task_repository import PostgresTaskRepository
 from Navigation_Bot.core.repositories.postgres_task_reader import PostgresTaskReader
+from Navigation_Bot.core.repositories.postgres_task_json_reader import PostgresTaskJsonReader
 from Navigation_Bot.core.repositories.postgres_vehicle_repository import PostgresVehicleRepository
 from Navigation_Bot.core.repositories.vehicle_registry_fields import DB_ID_FIELD
-from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter, TaskConflictError
+from Navigation_Bot.core.repositories.postgres_task_writer import (PATCHABLE_TASK_FIELDS,
+                                                                  PostgresTaskWriter,
+                                                                  TaskConflictError, )
 from Navigation_Bot.core.repositories.postgres_user_repository import PostgresUserRepository
 from Navigation_Bot.core.storage.postgres_connection import postgres_healthcheck
 from Navigation_Bot.core.application.services.postgres_history_services import (PostgresNavigationHistoryService,
@@ -23,24 +42,38 @@ from Navigation_Bot.core.infrastructure.api.schemas import (ApiKeyCreateRequest,
                                                             HistoryBatchRequest,
                                                             HistoryItemRequest,
                                                             LoginRequest,
+                                                            NavigationHistoryBatchRequest,
                                                             NavigationSnapshotBatchRequest,
                                                             NavigationSnapshotRequest,
                                                             NoteBatchCreateRequest,
                                                             NoteCreateRequest,
                                                             TaskBatchCompleteRequest,
+                                                            TaskBatchPatchRequest,
                                                             RegistryEntryRequest,
                                                             TaskBatchUpsertRequest,
                                                             TaskCompleteRequest,
                                                             TaskUpsertRequest,
                                                             UserCreateRequest,
                                                             UserUpdateRequest, )
+from Navigation_Bot.core.infrastructure.api.metrics import PROMETHEUS_CONTENT_TYPE
+from Navigation_Bot.core.infrastructure.api.password_hasher import LoginBusyError
+from Navigation_Bot.core.infrastructure.api.task_change_feed import RESET_EVENT, TaskChangeFeed, TaskChangeSubscription
 
 router = APIRouter()
 
 Connection = Annotated[Any, Depends(postgres_connection)]
+ReadConnection = Annotated[Any, Depends(read_postgres_connection)]
 ReadAccess = Annotated[dict[str, Any], Depends(require_roles("admin", "dispatcher", "viewer"))]
 WriteAccess = Annotated[dict[str, Any], Depends(require_roles("admin", "dispatcher"))]
 AdminAccess = Annotated[dict[str, Any], Depends(require_roles("admin"))]
+# Маршруты на ReadConnection: проверка ключа не держит слот primary, пока идёт чтение с реплики.
+ReplicaReadAccess = Annotated[dict[str, Any], Depends(require_roles("admin", "dispatcher", "viewer",
+                                                                    user_dependency=read_user))]
+StreamReadAccess = Annotated[dict[str, Any], Depends(require_roles("admin", "dispatcher", "viewer",
+                                                                   user_dependency=stream_user))]
+IfNoneMatch = Annotated[str | None, Header(alias="If-None-Match")]
+
+CHANGE_FEED_KEEPALIVE_SECONDS = 15.0
 
 
 def _conflict_detail(exc: TaskConflictError) -> dict[str, Any]:
@@ -49,6 +82,7 @@ def _conflict_detail(exc: TaskConflictError) -> dict[str, Any]:
         "task_id": exc.task_id,
         "expected_updated_at": str(exc.expected_updated_at) if exc.expected_updated_at is not None else None,
         "current_updated_at": str(exc.current_updated_at) if exc.current_updated_at is not None else None,
+        "row_number": exc.row_number,
     }
 
 
@@ -56,13 +90,14 @@ def _user_source(user: dict[str, Any]) -> str:
     return str(user.get("username") or "api")
 
 
-def _audit(connection: Connection) -> PostgresAuditRepository:
-    return PostgresAuditRepository(connection)
+def _item_with_trip_number(item: dict[str, Any], trip_number: int, user: dict[str, Any]) -> dict[str, Any]:
+    row = _item_with_user(item, user)
+    row["trip_number"] = trip_number
+    return row
 
 
-def _item_with_trip_number(item: dict[str, Any], trip_number: int, user: dict[str, Any]) -> dict[str, Any]:
+def _item_with_user(item: dict[str, Any], user: dict[str, Any]) -> dict[str, Any]:
     row = dict(item)
-    row["trip_number"] = trip_number
     if "source" not in row:
         row["source"] = _user_source(user)
     if "user_id" not in row:
@@ -74,6 +109,15 @@ def _batch_result(count: int, skipped: list[dict[str, Any]] | None = None) -> di
     return {"ok": True, "count": count, "skipped": skipped or []}
 
 
+def _history_batch_summary(items: list[dict[str, Any]], inserted: int) -> dict[str, Any]:
+    trip_numbers = sorted({item["trip_number"] for item in items if isinstance(item.get("trip_number"), int)})
+    return {"trip_numbers": trip_numbers, "count": len(items), "inserted": inserted}
+
+
+def _json_projection_enabled() -> bool:
+    return os.getenv("NAV_API_JSON_PROJECTION", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
 def _gui_session_expires_at() -> str:
     try:
         hours = int(os.getenv("NAV_GUI_SESSION_HOURS", "12"))
@@ -83,53 +127,233 @@ def _gui_session_expires_at() -> str:
     return (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat()
 
 
-def _task_before_from_row(audit: PostgresAuditRepository, row: dict[str, Any]) -> dict[str, Any] | None:
-    task_id = row.get("db_task_id") or row.get("task_id")
-    try:
-        if task_id:
-            return audit.task_snapshot(int(task_id))
-    except (TypeError, ValueError):
-        pass
-    trip_number = row.get("trip_number")
+def _encode_task_cursor(position: tuple[Any, int]) -> str:
+    updated_at, task_id = position
+    value = updated_at.isoformat() if isinstance(updated_at, datetime) else str(updated_at)
+    raw = json.dumps([value, int(task_id)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_task_cursor(cursor: str) -> tuple[str, int] | None:
+    if not cursor:
+        return None
     try:
-        if trip_number:
-            return audit.task_snapshot(trip_number=int(trip_number))
-    except (TypeError, ValueError):
-        pass
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, task_id = json.loads(raw)
+        return str(updated_at), int(task_id)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_cursor") from exc
+
+
+def _cursor_page_response(rows: list[dict],
+                          next_after: tuple[Any, int] | None,
+                          total: int | None,
+                          *,
+                          limit: int,
+                          cursor: str) -> dict[str, Any]:
+    last_cursor = _encode_task_cursor((rows[-1]["updated_at"], rows[-1]["db_task_id"])) if rows else cursor
+    return {"count": len(rows),
+            "total": total,
+            "items": rows,
+            "limit": limit,
+            "next_cursor": _encode_task_cursor(next_after) if next_after is not None else None,
+            "last_cursor": last_cursor}
+
+
+def _offset_page_response(rows: list[dict], total: int | None, *, limit: int, offset: int) -> dict[str, Any]:
+    next_offset = offset + len(rows)
+    has_more = next_offset < total if total is not None else len(rows) == limit
+    return {"count": len(rows),
+            "total": total,
+            "items": rows,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": next_offset if has_more else None}
+
+
+def _json_items_response(page: dict[str, Any], response: Response) -> Response:
+    """
+    Ответ страницы, где items — строки PostgresTaskJsonReader: их item_json вставляется как есть.
+    Остальные поля кодируются так же, как JSONResponse, поэтому тело совпадает с обычным ответом.
+    """
+    fields = []
+    for key, value in page.items():
+        if key == "items":
+            encoded = "[" + ",".join(row["item_json"] for row in value) + "]"
+        else:
+            encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        fields.append(f"{json.dumps(key)}:{encoded}")
+    return Response(content=("{" + ",".join(fields) + "}").encode("utf-8"),
+                    media_type="application/json",
+                    headers=dict(response.headers))
+
+
+def _etag(kind: str, version: str) -> str:
+    digest = hashlib.sha1(f"{kind}:{version}".encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def _conditional_response(response: Response,
+                          if_none_match: str | None,
+                          kind: str,
+                          version: str) -> Response | None:
+    """Ставит ETag на ответ; если клиент прислал тот же ETag, возвращает готовый 304."""
+    etag = _etag(kind, version)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return None
 
 
+def _ndjson_line(value: Any) -> bytes:
+    return (json.dumps(to_jsonable_python(value), ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _raw_ndjson_line(row: dict[str, Any]) -> bytes:
+    return (row["item_json"] + "\n").encode("utf-8")
+
+
+def _ndjson_export(chunks: Iterator[list[dict]],
+                   encode_row: Callable[[dict[str, Any]], bytes] = _ndjson_line) -> Iterator[bytes]:
+    """
+    Одна задача на строку, в конце служебная строка _export_end.
+
+    По ней клиент отличает полную выгрузку от оборванного соединения,
+    а last_cursor позволяет дальше ходить за изменениями через cursor.
+    """
+    count = 0
+    last_position = None
+    for rows in chunks:
+        for row in rows:
+            if row.get("updated_at") is not None:
+                position = (row["updated_at"], int(row["db_task_id"]))
+                if last_position is None or position > last_position:
+                    last_position = position
+            count += 1
+            yield encode_row(row)
+    yield _ndjson_line({"_export_end": True,
+                        "count": count,
+                        "last_cursor": _encode_task_cursor(last_position) if last_position else None})
+
+
+def _sse_message(event: str, data: Any) -> bytes:
+    payload = json.dumps(to_jsonable_python(data), ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+async def _sse_task_changes(feed: TaskChangeFeed,
+                            subscription: TaskChangeSubscription,
+                            request: Request) -> AsyncIterator[bytes]:
+    """
+    ready сразу после подписки, tasks с изменёнными строками, reset, когда события потеряны
+    и нужна полная перезагрузка. Пустой комментарий раз в 15 секунд держит соединение.
+    """
+    try:
+        yield _sse_message("ready", {"source_key": subscription.source_key})
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=CHANGE_FEED_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield _sse_message("reset", event) if event is RESET_EVENT else _sse_message("tasks", event)
+    finally:
+        feed.unsubscribe(subscription)
+
+
+def _batch_completion(row_identities: list[Any],
+                      found: dict[int, dict[str, Any]]) -> tuple[list[int], list[dict[str, Any]]]:
+    completed = []
+    skipped = []
+    for row_identity in row_identities:
+        try:
+            parsed_identity = int(row_identity)
+        except (TypeError, ValueError):
+            skipped.append({"row_identity": row_identity, "reason": "invalid_row_identity"})
+            continue
+        if parsed_identity not in found:
+            skipped.append({"row_identity": parsed_identity, "reason": "task_not_found"})
+            continue
+        completed.append(parsed_identity)
+    return completed, skipped
+
+
+def _completed_task(rows: list[dict[str, Any]], row_identity: int) -> dict[str, Any] | None:
+    """Строка для аудита завершения: рейс с этим trip_number, иначе первая затронутая."""
+    for row in rows:
+        if row.get("trip_number") == row_identity:
+            return row
+    return rows[0] if rows else None
+
+
 @router.get("/me")
 def get_me(user: ReadAccess) -> dict[str, Any]:
     return {"user": user}
 
 
 @router.post("/auth/login")
-def login(payload: LoginRequest, connection: Connection) -> dict[str, Any]:
-    repository = PostgresUserRepository(connection)
-    user = repository.authenticate(payload.username, payload.password)
+async def login(payload: LoginRequest,
+                connections: ConnectionFactory,
+                cache: UserCache,
+                hasher: Hasher) -> dict[str, Any]:
+    # Соединение берётся только на чтение пользователя и выдачу ключа: PBKDF2 считается без него.
+    user, has_password_users = await run_in_threadpool(_login_user, connections, payload.username)
+    password_hash = user.pop("password_hash") if user else ""
+    try:
+        if user and not await hasher.verify(payload.password, password_hash):
+            user = None
+    except LoginBusyError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="login_busy",
+                            headers={"Retry-After": "1"}) from exc
     bootstrapped = False
-    if not user and not repository.has_active_password_users():
-        try:
-            user = repository.create_user(username=payload.username,
-                                          display_name=payload.username,
-                                          password=payload.password,
-                                          role="admin",
-                                          is_active=True)
-        except ValueError as exc:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if not user and not has_password_users:
+        user = await run_in_threadpool(_bootstrap_admin, connections, payload.username, payload.password)
         bootstrapped = True
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_credentials")
 
-    session_name = "GUI session"
-    repository.revoke_user_api_keys_by_name(user["id"], session_name)
-    api_key = repository.create_api_key(user_id=user["id"],
-                                        name=session_name,
-                                        expires_at=_gui_session_expires_at())
+    api_key = await run_in_threadpool(_gui_session_key, connections, cache, user["id"])
     return {"ok": True, "user": user, "api_key": api_key["api_key"], "bootstrapped": bootstrapped}
 
 
+def _login_user(connections: Callable[[], Any], username: str) -> tuple[dict[str, Any] | None, bool]:
+    with connections() as connection:
+        repository = PostgresUserRepository(connection)
+        user = repository.find_login_user(username)
+        return user, bool(user and user["password_hash"]) or repository.has_active_password_users()
+
+
+def _bootstrap_admin(connections: Callable[[], Any], username: str, password: str) -> dict[str, Any]:
+    with connections() as connection:
+        try:
+            return PostgresUserRepository(connection).create_user(username=username,
+                                                                  display_name=username,
+                                                                  password=password,
+                                                                  role="admin",
+                                                                  is_active=True)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+def _gui_session_key(connections: Callable[[], Any], cache: ApiKeyUserCache, user_id: int) -> dict[str, Any]:
+    session_name = "GUI session"
+    with connections() as connection:
+        repository = PostgresUserRepository(connection)
+        repository.revoke_user_api_keys_by_name(user_id, session_name)
+        cache.invalidate_user(user_id)
+        return repository.create_api_key(user_id=user_id,
+                                         name=session_name,
+                                         expires_at=_gui_session_expires_at())
+
+
 @router.get("/users")
 def list_users(connection: Connection, _user: AdminAccess) -> dict[str, Any]:
     rows = PostgresUserRepository(connection).list_users()
@@ -137,21 +361,26 @@ def list_users(connection: Connection, _user: AdminAccess) -> dict[str, Any]:
 
 
 @router.get("/audit-log")
-def list_audit_log(connection: Connection,
+def list_audit_log(audit: AuditLog,
                    _user: AdminAccess,
                    entity_type: str = Query(default=""),
                    entity_id: int | None = Query(default=None),
                    user_id: int | None = Query(default=None),
                    limit: int = Query(default=100, ge=1, le=500)) -> dict[str, Any]:
-    rows = _audit(connection).list_entries(entity_type=entity_type,
-                                           entity_id=entity_id,
-                                           user_id=user_id,
-                                           limit=limit)
+    audit.flush_buffer()
+    rows = audit.list_entries(entity_type=entity_type,
+                              entity_id=entity_id,
+                              user_id=user_id,
+                              limit=limit)
     return {"count": len(rows), "items": rows}
 
 
 @router.post("/users")
-def create_user(payload: UserCreateRequest, connection: Connection, user: AdminAccess) -> dict[str, Any]:
+def create_user(payload: UserCreateRequest,
+                connection: Connection,
+                audit: AuditLog,
+                cache: UserCache,
+                user: AdminAccess) -> dict[str, Any]:
     try:
         created_user = PostgresUserRepository(connection).create_user(username=payload.username,
                                                                       display_name=payload.display_name,
@@ -160,12 +389,13 @@ def create_user(payload: UserCreateRequest, connection: Connection, user: AdminA
                                                                       is_active=payload.is_active)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    cache.invalidate_user(created_user["id"])
 
-    _audit(connection).record(user=user,
-                              entity_type="app_users",
-                              entity_id=created_user["id"],
-                              action="create_or_update",
-                              after_data=created_user)
+    audit.record(user=user,
+                 entity_type="app_users",
+                 entity_id=created_user["id"],
+                 action="create_or_update",
+                 after_data=created_user)
 
     return {"ok": True, "user": created_user}
 
@@ -174,6 +404,8 @@ def create_user(payload: UserCreateRequest, connection: Connection, user: AdminA
 def update_user(user_id: int,
                 payload: UserUpdateRequest,
                 connection: Connection,
+                audit: AuditLog,
+                cache: UserCache,
                 user: AdminAccess) -> dict[str, Any]:
     try:
         updated_user = PostgresUserRepository(connection).update_user(user_id,
@@ -186,12 +418,13 @@ def update_user(user_id: int,
         detail = str(exc)
         code = status.HTTP_404_NOT_FOUND if detail == "user_not_found" else status.HTTP_400_BAD_REQUEST
         raise HTTPException(status_code=code, detail=detail) from exc
+    cache.invalidate_user(updated_user["id"])
 
-    _audit(connection).record(user=user,
-                              entity_type="app_users",
-                              entity_id=updated_user["id"],
-                              action="update",
-                              after_data=updated_user)
+    audit.record(user=user,
+                 entity_type="app_users",
+                 entity_id=updated_user["id"],
+                 action="update",
+                 after_data=updated_user)
     return {"ok": True, "user": updated_user}
 
 
@@ -199,6 +432,7 @@ def update_user(user_id: int,
 def create_user_api_key(user_id: int,
                         payload: ApiKeyCreateRequest,
                         connection: Connection,
+                        audit: AuditLog,
                         user: AdminAccess, ) -> dict[str, Any]:
     try:
         api_key = PostgresUserRepository(connection).create_api_key(user_id=user_id,
@@ -209,23 +443,28 @@ def create_user_api_key(user_id: int,
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     audit_data = {key: value for key, value in api_key.items() if key != "api_key"}
 
-    _audit(connection).record(user=user,
-                              entity_type="api_keys",
-                              entity_id=api_key["id"],
-                              action="create",
-                              after_data=audit_data)
+    audit.record(user=user,
+                 entity_type="api_keys",
+                 entity_id=api_key["id"],
+                 action="create",
+                 after_data=audit_data)
 
     return {"ok": True, "api_key": api_key}
 
 
 @router.post("/api-keys/{key_id}/revoke")
-def revoke_api_key(key_id: int, connection: Connection, user: AdminAccess) -> dict[str, Any]:
+def revoke_api_key(key_id: int,
+                   connection: Connection,
+                   audit: AuditLog,
+                   cache: UserCache,
+                   user: AdminAccess) -> dict[str, Any]:
     if not PostgresUserRepository(connection).revoke_api_key(key_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="api_key_not_found")
-    _audit(connection).record(user=user,
-                              entity_type="api_keys",
-                              entity_id=key_id,
-                              action="revoke")
+    cache.invalidate_api_key(key_id)
+    audit.record(user=user,
+                 entity_type="api_keys",
+                 entity_id=key_id,
+                 action="revoke")
 
     return {"ok": True, "api_key_id": key_id}
 
@@ -236,21 +475,83 @@ def health(connection: Connection, _user: ReadAccess) -> dict[str, Any]:
     return {"ok": True, "database": info}
 
 
+@router.get("/metrics")
+def metrics(request: Request, _user: AdminAccess) -> Response:
+    api_metrics = getattr(request.app.state, "metrics", None)
+    if api_metrics is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="metrics_disabled")
+    return Response(api_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @router.get("/tasks")
-def list_tasks(connection: Connection,
-               _user: ReadAccess,
+def list_tasks(_user: ReplicaReadAccess,
+               connection: ReadConnection,
                response: Response,
+               if_none_match: IfNoneMatch = None,
                source_key: str = Query(default=""),
                strict_source_key: bool = Query(default=False),
                limit: int | None = Query(default=None, ge=1, le=1000),
                offset: int = Query(default=0, ge=0),
+               cursor: str | None = Query(default=None),
+               include_total: bool | None = Query(default=None),
                updated_since: str | None = Query(default=None),
                include_completed: bool = Query(default=False),
                date_from: str | None = Query(default=None),
                date_to: str | None = Query(default=None),
                full: bool = Query(default=False)) -> dict[str, Any]:
-    if limit is not None or updated_since:
-        reader = PostgresTaskReader(connection)
+    paged = cursor is not None or limit is not None or bool(updated_since)
+    if not paged and not full:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="tasks_query_requires_limit_updated_since_or_full_true",
+        )
+
+    reader = PostgresTaskReader(connection)
+    after = _decode_task_cursor(cursor) if cursor is not None else None
+    if paged:
+        version = reader.page_version(source_key,
+                                      include_null_source=not strict_source_key,
+                                      updated_since=updated_since,
+                                      include_completed=include_completed,
+                                      date_from=date_from,
+                                      date_to=date_to,
+                                      updated_since_inclusive=after is not None)
+    else:
+        version = reader.active_rows_version(source_key, include_null_source=not (strict_source_key and source_key))
+    not_modified = _conditional_response(response, if_none_match, "tasks", version)
+    if not_modified is not None:
+        return not_modified
+
+    if cursor is not None and _json_projection_enabled():
+        page_limit = limit or 100
+        rows, next_after, total = PostgresTaskJsonReader(connection).load_active_json_after(
+            source_key,
+            include_null_source=not strict_source_key,
+            limit=page_limit,
+            after=after,
+            updated_since=updated_since,
+            include_completed=include_completed,
+            date_from=date_from,
+            date_to=date_to,
+            include_total=include_total if include_total is not None else after is None)
+        return _json_items_response(_cursor_page_response(rows, next_after, total, limit=page_limit, cursor=cursor),
+                                    response)
+
+    if cursor is not None:
+        page_limit = limit or 100
+        rows, next_after, total = reader.load_active_rows_after(
+            source_key,
+            include_null_source=not strict_source_key,
+            limit=page_limit,
+            after=after,
+            updated_since=updated_since,
+            include_completed=include_completed,
+            date_from=date_from,
+            date_to=date_to,
+            include_total=include_total if include_total is not None else after is None)
+        return _cursor_page_response(rows, next_after, total, limit=page_limit, cursor=cursor)
+
+    if paged:
         rows, total = reader.load_active_rows_page(source_key,
                                                    include_null_source=not strict_source_key,
                                                    limit=limit or 100,
@@ -258,23 +559,12 @@ def list_tasks(connection: Connection,
                                                    updated_since=updated_since,
                                                    include_completed=include_completed,
                                                    date_from=date_from,
-                                                   date_to=date_to)
-        next_offset = offset + len(rows)
-        return {"count": len(rows),
-                "total": total,
-                "items": rows,
-                "limit": limit or 100,
-                "offset": offset,
-                "next_offset": next_offset if next_offset < total else None}
-
-    if not full:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="tasks_query_requires_limit_updated_since_or_full_true",
-        )
+                                                   date_to=date_to,
+                                                   include_total=include_total is not False)
+        return _offset_page_response(rows, total, limit=limit or 100, offset=offset)
 
     if strict_source_key and source_key:
-        rows = PostgresTaskReader(connection).load_active_rows(source_key, include_null_source=False)
+        rows = reader.load_active_rows(source_key, include_null_source=False)
         return {"count": len(rows), "items": rows, "full": True}
 
     repository = PostgresTaskRepository(connection)
@@ -286,13 +576,57 @@ def list_tasks(connection: Connection,
     return {"count": len(rows), "items": rows, "full": True}
 
 
+@router.get("/tasks/export")
+def export_tasks(_user: ReplicaReadAccess,
+                 connection: ReadConnection,
+                 source_key: str = Query(default=""),
+                 strict_source_key: bool = Query(default=False),
+                 include_completed: bool = Query(default=False),
+                 date_from: str | None = Query(default=None),
+                 date_to: str | None = Query(default=None),
+                 chunk_size: int = Query(default=200, ge=1, le=1000)) -> StreamingResponse:
+    if _json_projection_enabled():
+        json_chunks = PostgresTaskJsonReader(connection).iter_active_json_chunks(
+            source_key,
+            include_null_source=not strict_source_key,
+            include_completed=include_completed,
+            date_from=date_from,
+            date_to=date_to,
+            chunk_size=chunk_size)
+        return StreamingResponse(_ndjson_export(json_chunks, _raw_ndjson_line), media_type="application/x-ndjson")
+
+    reader = PostgresTaskReader(connection)
+    chunks = reader.iter_active_row_chunks(source_key,
+                                           include_null_source=not strict_source_key,
+                                           include_completed=include_completed,
+                                           date_from=date_from,
+                                           date_to=date_to,
+                                           chunk_size=chunk_size)
+    return StreamingResponse(_ndjson_export(chunks), media_type="application/x-ndjson")
+
+
+@router.get("/tasks/changes")
+async def stream_task_changes(request: Request,
+                              _user: StreamReadAccess,
+                              source_key: str = Query(default=""),
+                              strict_source_key: bool = Query(default=False)) -> StreamingResponse:
+    feed = getattr(request.app.state, "task_change_feed", None)
+    if feed is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="change_feed_disabled")
+    subscription = feed.subscribe(source_key, strict_source_key=strict_source_key)
+    return StreamingResponse(_sse_task_changes(feed, subscription, request),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.post("/tasks")
-def upsert_task(payload: TaskUpsertRequest, connection: Connection, user: WriteAccess) -> dict[str, Any]:
+def upsert_task(payload: TaskUpsertRequest,
+                connection: Connection,
+                audit: AuditLog,
+                user: WriteAccess) -> dict[str, Any]:
     repository = PostgresTaskRepository(connection)
     if payload.source_key:
         repository.set_source_key(payload.source_key)
-    audit = _audit(connection)
-    before = _task_before_from_row(audit, payload.row)
     try:
         result = repository.upsert_from_row(payload.row, source=_user_source(user))
     except TaskConflictError as exc:
@@ -300,7 +634,8 @@ def upsert_task(payload: TaskUpsertRequest, connection: Connection, user: WriteA
 
     if result is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_task_row")
-    after = audit.task_snapshot(result["task_id"])
+    before = result.pop("before_data", None)
+    after = result.pop("after_data", None)
     audit.record(user=user,
                  entity_type="tasks",
                  entity_id=result["task_id"],
@@ -312,90 +647,126 @@ def upsert_task(payload: TaskUpsertRequest, connection: Connection, user: WriteA
 
 
 @router.post("/tasks/batch")
-def upsert_tasks_batch(payload: TaskBatchUpsertRequest, connection: Connection, user: WriteAccess) -> dict[str, Any]:
-    repository = PostgresTaskRepository(connection)
-    if payload.source_key:
-        repository.set_source_key(payload.source_key)
-    audit = _audit(connection)
-    results = []
+def upsert_tasks_batch(payload: TaskBatchUpsertRequest,
+                       connection: Connection,
+                       audit: AuditLog,
+                       user: WriteAccess) -> dict[str, Any]:
+    repository = PostgresTaskRepository(connection, current_source_key=payload.source_key)
     try:
-        for row_number, row in enumerate(payload.rows, start=1):
-            if not isinstance(row, dict):
-                continue
-            result = repository.upsert_from_row(row, source=_user_source(user))
-            if result is not None:
-                results.append(result)
-                audit.record_compact(user=user,
-                                     entity_type="tasks",
-                                     entity_id=result["task_id"],
-                                     action="create" if result.get("created") else "update",
-                                     summary={"batch": True,
-                                              "row_number": row_number,
-                                              "trip_number": result.get("trip_number")})
-
+        batch_results = repository.upsert_rows_batch(payload.rows, source=_user_source(user))
     except TaskConflictError as exc:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_conflict_detail(exc)) from exc
+
+    results = []
+    for row_number, result in enumerate(batch_results, start=1):
+        if result is None:
+            continue
+        results.append(result)
+        audit.record_compact(user=user,
+                             entity_type="tasks",
+                             entity_id=result["task_id"],
+                             action="create" if result.get("created") else "update",
+                             summary={"batch": True,
+                                      "row_number": row_number,
+                                      "trip_number": result.get("trip_number")})
     return {"ok": True, "count": len(results), "items": results}
 
 
+@router.patch("/tasks")
+def patch_tasks(payload: TaskBatchPatchRequest,
+                connection: Connection,
+                audit: AuditLog,
+                user: WriteAccess) -> dict[str, Any]:
+    unsupported = sorted({field for item in payload.items for field in item.fields} - PATCHABLE_TASK_FIELDS)
+    if unsupported:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail={"error": "unsupported_task_fields", "fields": unsupported})
+    repository = PostgresTaskRepository(connection, current_source_key=payload.source_key)
+    try:
+        patched = repository.patch_tasks([item.model_dump() for item in payload.items])
+    except TaskConflictError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_conflict_detail(exc)) from exc
+
+    results, skipped = [], []
+    for item, result in zip(payload.items, patched):
+        if result is None:
+            skipped.append({"trip_number": item.trip_number, "reason": "task_not_found"})
+            continue
+        before = result.pop("before_data", None)
+        after = result.pop("after_data", None)
+        audit.record(user=user,
+                     entity_type="tasks",
+                     entity_id=result["task_id"],
+                     action="update",
+                     before_data=before,
+                     after_data=after)
+        results.append(result)
+    return {"ok": True, "count": len(results), "items": results, "skipped": skipped}
+
+
 @router.post("/tasks/complete/batch")
 def complete_tasks_batch(payload: TaskBatchCompleteRequest,
                          connection: Connection,
+                         audit: AuditLog,
                          user: WriteAccess) -> dict[str, Any]:
     writer = PostgresTaskWriter(connection, payload.source_key)
-    audit = _audit(connection)
-    completed = []
-    skipped = []
-    for row_identity in payload.row_identities:
-        try:
-            parsed_identity = int(row_identity)
-        except (TypeError, ValueError):
-            skipped.append({"row_identity": row_identity, "reason": "invalid_row_identity"})
-            continue
-        if not writer.mark_task_completed(parsed_identity, source=_user_source(user)):
-            skipped.append({"row_identity": parsed_identity, "reason": "task_not_found"})
-            continue
-        completed.append(parsed_identity)
-        audit.record_compact(user=user,
-                             entity_type="tasks",
-                             action="complete",
-                             summary={"batch": True, "row_identity": parsed_identity})
+    found = writer.complete_tasks(payload.row_identities, source=_user_source(user))
+    completed, skipped = _batch_completion(payload.row_identities, found)
+    audit.record_compact_many(user=user,
+                              entity_type="tasks",
+                              action="complete",
+                              items=[(found[row_identity]["id"], {"batch": True, "row_identity": row_identity})
+                                     for row_identity in completed])
     return {"ok": True, "count": len(completed), "items": completed, "skipped": skipped}
 
 
 @router.post("/tasks/{row_identity}/complete")
-def complete_task(row_identity: int, payload: TaskCompleteRequest, connection: Connection, user: WriteAccess) -> dict[
-    str, Any]:
+def complete_task(row_identity: int,
+                  payload: TaskCompleteRequest,
+                  connection: Connection,
+                  audit: AuditLog,
+                  user: WriteAccess) -> dict[str, Any]:
     writer = PostgresTaskWriter(connection, payload.source_key)
-    audit = _audit(connection)
-    before = audit.task_snapshot(trip_number=row_identity)
-    if not writer.mark_task_completed(row_identity, source=_user_source(user)):
+    completed = _completed_task(writer.complete_task(row_identity, source=_user_source(user)), row_identity)
+    if completed is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="task_not_found")
-    after = audit.task_snapshot(trip_number=row_identity)
     audit.record(user=user,
                  entity_type="tasks",
-                 entity_id=after.get("id") if after else None, action="complete",
-                 before_data=before,
-                 after_data=after)
+                 entity_id=completed["id"],
+                 action="complete",
+                 before_data=completed["before_data"],
+                 after_data=completed["after_data"])
 
     return {"ok": True, "row_identity": row_identity}
 
 
 @router.get("/tasks/{trip_number}/notes")
-def list_task_notes(trip_number: int, connection: Connection, _user: ReadAccess) -> dict[str, Any]:
-    rows = PostgresNoteHistoryService(connection).get_by_trip_number(trip_number)
+def list_task_notes(trip_number: int,
+                    _user: ReplicaReadAccess,
+                    connection: ReadConnection,
+                    response: Response,
+                    if_none_match: IfNoneMatch = None) -> dict[str, Any]:
+    service = PostgresNoteHistoryService(connection)
+    version = service.version_by_trip_number(trip_number)
+    not_modified = _conditional_response(response, if_none_match, "task_notes", version)
+    if not_modified is not None:
+        return not_modified
+    rows = service.get_by_trip_number(trip_number)
     return {"count": len(rows), "items": rows}
 
 
 @router.post("/tasks/{trip_number}/notes")
-def add_task_note(trip_number: int, payload: NoteCreateRequest, connection: Connection, user: WriteAccess) -> dict[
-    str, Any]:
+def add_task_note(trip_number: int,
+                  payload: NoteCreateRequest,
+                  connection: Connection,
+                  audit: AuditLog,
+                  user: WriteAccess) -> dict[str, Any]:
     item = payload.model_dump()
     item["trip_number"] = trip_number
     item["author"] = _user_source(user)
     item["author_user_id"] = user.get("id")
     PostgresNoteHistoryService(connection).append(item)
-    _audit(connection).record(user=user, entity_type="task_notes", entity_id=None, action="create", after_data=item)
+    audit.record(user=user, entity_type="task_notes", entity_id=None, action="create", after_data=item)
     return {"ok": True}
 
 
@@ -403,6 +774,7 @@ def add_task_note(trip_number: int, payload: NoteCreateRequest, connection: Conn
 def add_task_notes_batch(trip_number: int,
                          payload: NoteBatchCreateRequest,
                          connection: Connection,
+                         audit: AuditLog,
                          user: WriteAccess) -> dict[str, Any]:
     service = PostgresNoteHistoryService(connection)
     for note in payload.items:
@@ -411,28 +783,40 @@ def add_task_notes_batch(trip_number: int,
         item["author"] = _user_source(user)
         item["author_user_id"] = user.get("id")
         service.append(item)
-    _audit(connection).record_compact(user=user,
-                                     entity_type="task_notes",
-                                     action="batch_create",
-                                     summary={"trip_number": trip_number, "count": len(payload.items)})
+    audit.record_compact(user=user,
+                         entity_type="task_notes",
+                         action="batch_create",
+                         summary={"trip_number": trip_number, "count": len(payload.items)})
     return _batch_result(len(payload.items))
 
 
 @router.get("/tasks/{trip_number}/status-events")
-def list_task_status_events(trip_number: int, connection: Connection, _user: ReadAccess) -> dict[str, Any]:
-    rows = PostgresStatusEventService(connection).get_by_trip_number(trip_number)
+def list_task_status_events(trip_number: int,
+                            _user: ReplicaReadAccess,
+                            connection: ReadConnection,
+                            response: Response,
+                            if_none_match: IfNoneMatch = None) -> dict[str, Any]:
+    service = PostgresStatusEventService(connection)
+    version = service.version_by_trip_number(trip_number)
+    not_modified = _conditional_response(response, if_none_match, "status_events", version)
+    if not_modified is not None:
+        return not_modified
+    rows = service.get_by_trip_number(trip_number)
     return {"count": len(rows), "items": rows}
 
 
 @router.post("/tasks/{trip_number}/status-events")
-def add_task_status_event(trip_number: int, payload: HistoryItemRequest, connection: Connection, user: WriteAccess) -> \
-        dict[str, Any]:
+def add_task_status_event(trip_number: int,
+                          payload: HistoryItemRequest,
+                          connection: Connection,
+                          audit: AuditLog,
+                          user: WriteAccess) -> dict[str, Any]:
     item = dict(payload.item)
     item["trip_number"] = trip_number
     item["source"] = _user_source(user)
     item["user_id"] = user.get("id")
     PostgresStatusEventService(connection).append(item)
-    _audit(connection).record(user=user, entity_type="status_events", entity_id=None, action="create", after_data=item)
+    audit.record(user=user, entity_type="status_events", entity_id=None, action="create", after_data=item)
     return {"ok": True}
 
 
@@ -440,30 +824,42 @@ def add_task_status_event(trip_number: int, payload: HistoryItemRequest, connect
 def add_task_status_events_batch(trip_number: int,
                                  payload: HistoryBatchRequest,
                                  connection: Connection,
+                                 audit: AuditLog,
                                  user: WriteAccess) -> dict[str, Any]:
-    service = PostgresStatusEventService(connection)
-    for item in payload.items:
-        service.append(_item_with_trip_number(item, trip_number, user))
-    _audit(connection).record_compact(user=user,
-                                     entity_type="status_events",
-                                     action="batch_create",
-                                     summary={"trip_number": trip_number, "count": len(payload.items)})
+    PostgresStatusEventService(connection).append_many(
+        [_item_with_trip_number(item, trip_number, user) for item in payload.items])
+    audit.record_compact(user=user,
+                         entity_type="status_events",
+                         action="batch_create",
+                         summary={"trip_number": trip_number, "count": len(payload.items)})
     return _batch_result(len(payload.items))
 
 
 @router.get("/tasks/{trip_number}/route-estimates")
-def list_task_route_estimates(trip_number: int, connection: Connection, _user: ReadAccess) -> dict[str, Any]:
-    rows = PostgresRouteEstimateHistoryService(connection).get_by_trip_number(trip_number)
+def list_task_route_estimates(trip_number: int,
+                              _user: ReplicaReadAccess,
+                              connection: ReadConnection,
+                              response: Response,
+                              if_none_match: IfNoneMatch = None) -> dict[str, Any]:
+    service = PostgresRouteEstimateHistoryService(connection)
+    version = service.version_by_trip_number(trip_number)
+    not_modified = _conditional_response(response, if_none_match, "route_estimates", version)
+    if not_modified is not None:
+        return not_modified
+    rows = service.get_by_trip_number(trip_number)
     return {"count": len(rows), "items": rows}
 
 
 @router.post("/tasks/{trip_number}/route-estimates")
-def add_task_route_estimate(trip_number: int, payload: HistoryItemRequest, connection: Connection, user: WriteAccess) -> \
-        dict[str, Any]:
+def add_task_route_estimate(trip_number: int,
+                            payload: HistoryItemRequest,
+                            connection: Connection,
+                            audit: AuditLog,
+                            user: WriteAccess) -> dict[str, Any]:
     item = dict(payload.item)
     item["trip_number"] = trip_number
     PostgresRouteEstimateHistoryService(connection).append(item)
-    _audit(connection).record(user=user,entity_type="route_estimates",entity_id=None,action="create",after_data=item)
+    audit.record(user=user,entity_type="route_estimates",entity_id=None,action="create",after_data=item)
     return {"ok": True}
 
 
@@ -471,32 +867,39 @@ def add_task_route_estimate(trip_number: int, payload: HistoryItemRequest, conne
 def add_task_route_estimates_batch(trip_number: int,
                                    payload: HistoryBatchRequest,
                                    connection: Connection,
+                                   audit: AuditLog,
                                    user: WriteAccess) -> dict[str, Any]:
-    service = PostgresRouteEstimateHistoryService(connection)
-    for item in payload.items:
-        row = dict(item)
-        row["trip_number"] = trip_number
-        service.append(row)
-    _audit(connection).record_compact(user=user,
-                                     entity_type="route_estimates",
-                                     action="batch_create",
-                                     summary={"trip_number": trip_number, "count": len(payload.items)})
+    PostgresRouteEstimateHistoryService(connection).append_many(
+        [{**item, "trip_number": trip_number} for item in payload.items])
+    audit.record_compact(user=user,
+                         entity_type="route_estimates",
+                         action="batch_create",
+                         summary={"trip_number": trip_number, "count": len(payload.items)})
     return _batch_result(len(payload.items))
 
 
 @router.get("/tasks/{trip_number}/navigation")
-def list_task_navigation(trip_number: int, connection: Connection, _user: ReadAccess) -> dict[str, Any]:
-    rows = PostgresNavigationHistoryService(connection).get_by_trip_number(trip_number)
+def list_task_navigation(trip_number: int,
+                         _user: ReplicaReadAccess,
+                         connection: ReadConnection,
+                         response: Response,
+                         if_none_match: IfNoneMatch = None) -> dict[str, Any]:
+    service = PostgresNavigationHistoryService(connection)
+    version = service.version_by_trip_number(trip_number)
+    not_modified = _conditional_response(response, if_none_match, "vehicle_navigation_history", version)
+    if not_modified is not None:
+        return not_modified
+    rows = service.get_by_trip_number(trip_number)
     return {"count": len(rows), "items": rows}
 
 
 @router.post("/tasks/{trip_number}/navigation")
-def add_task_navigation(trip_number: int, payload: NavigationSnapshotRequest, connection: Connection,
+def add_task_navigation(trip_number: int, payload: NavigationSnapshotRequest, connection: Connection, audit: AuditLog,
                         user: WriteAccess) -> dict[str, Any]:
     item = payload.model_dump()
     item["trip_number"] = trip_number
     PostgresNavigationHistoryService(connection).append(item)
-    _audit(connection).record(user=user,entity_type="vehicle_navigation_history",entity_id=None,action="create",after_data=item)
+    audit.record(user=user,entity_type="vehicle_navigation_history",entity_id=None,action="create",after_data=item)
     return {"ok": True}
 
 
@@ -504,28 +907,69 @@ def add_task_navigation(trip_number: int, payload: NavigationSnapshotRequest, co
 def add_task_navigation_batch(trip_number: int,
                               payload: NavigationSnapshotBatchRequest,
                               connection: Connection,
+                              audit: AuditLog,
                               user: WriteAccess) -> dict[str, Any]:
-    service = PostgresNavigationHistoryService(connection)
-    for snapshot in payload.items:
-        item = snapshot.model_dump()
-        item["trip_number"] = trip_number
-        service.append(item)
-    _audit(connection).record_compact(user=user,
-                                     entity_type="vehicle_navigation_history",
-                                     action="batch_create",
-                                     summary={"trip_number": trip_number, "count": len(payload.items)})
+    PostgresNavigationHistoryService(connection).append_many(
+        [{**snapshot.model_dump(), "trip_number": trip_number} for snapshot in payload.items])
+    audit.record_compact(user=user,
+                         entity_type="vehicle_navigation_history",
+                         action="batch_create",
+                         summary={"trip_number": trip_number, "count": len(payload.items)})
     return _batch_result(len(payload.items))
 
 
+@router.post("/status-events/batch")
+def add_status_events_batch(payload: HistoryBatchRequest,
+                            connection: Connection,
+                            audit: AuditLog,
+                            user: WriteAccess) -> dict[str, Any]:
+    items = [_item_with_user(item, user) for item in payload.items]
+    inserted, skipped = PostgresStatusEventService(connection).append_many(items)
+    audit.record_compact(user=user,
+                         entity_type="status_events",
+                         action="batch_create",
+                         summary=_history_batch_summary(items, inserted))
+    return _batch_result(inserted, skipped)
+
+
+@router.post("/route-estimates/batch")
+def add_route_estimates_batch(payload: HistoryBatchRequest,
+                              connection: Connection,
+                              audit: AuditLog,
+                              user: WriteAccess) -> dict[str, Any]:
+    inserted, skipped = PostgresRouteEstimateHistoryService(connection).append_many(payload.items)
+    audit.record_compact(user=user,
+                         entity_type="route_estimates",
+                         action="batch_create",
+                         summary=_history_batch_summary(payload.items, inserted))
+    return _batch_result(inserted, skipped)
+
+
+@router.post("/navigation/batch")
+def add_navigation_batch(payload: NavigationHistoryBatchRequest,
+                         connection: Connection,
+                         audit: AuditLog,
+                         user: WriteAccess) -> dict[str, Any]:
+    items = [snapshot.model_dump() for snapshot in payload.items]
+    inserted, skipped = PostgresNavigationHistoryService(connection).append_many(items)
+    audit.record_compact(user=user,
+                         entity_type="vehicle_navigation_history",
+                         action="batch_create",
+                         summary=_history_batch_summary(items, inserted))
+    return _batch_result(inserted, skipped)
+
+
 @router.get("/vehicles")
-def list_vehicles(connection: Connection, _user: ReadAccess) -> dict[str, Any]:
+def list_vehicles(_user: ReplicaReadAccess, connection: ReadConnection) -> dict[str, Any]:
     rows = PostgresVehicleRepository(connection).list_registry_entries()
     return {"count": len(rows), "items": rows}
 
 
 @router.post("/vehicles")
-def upsert_vehicle(payload: RegistryEntryRequest, connection: Connection, user: WriteAccess) -> dict[str, Any]:
-    audit = _audit(connection)
+def upsert_vehicle(payload: RegistryEntryRequest,
+                   connection: Connection,
+                   audit: AuditLog,
+                   user: WriteAccess) -> dict[str, Any]:
     before = None
     raw_vehicle_id = payload.entry.get("vehicle_id") or payload.entry.get(DB_ID_FIELD)
     try:
@@ -545,8 +989,10 @@ def upsert_vehicle(payload: RegistryEntryRequest, connection: Connection, user:
 
 
 @router.delete("/vehicles/{vehicle_id}/registry")
-def delete_vehicle_registry_entry(vehicle_id: int, connection: Connection, user: WriteAccess) -> dict[str, Any]:
-    audit = _audit(connection)
+def delete_vehicle_registry_entry(vehicle_id: int,
+                                  connection: Connection,
+                                  audit: AuditLog,
+                                  user: WriteAccess) -> dict[str, Any]:
     before = audit.vehicle_snapshot(vehicle_id)
     if before is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="vehicle_not_found")
@@ -566,6 +1012,8 @@ def delete_vehicle_registry_entry(vehicle_id: int, connection: Connection, user:
 
 
 @router.get("/vehicles/{monitoring_id}/navigation")
-def list_vehicle_navigation(monitoring_id: int, connection: Connection, _user: ReadAccess) -> dict[str, Any]:
+def list_vehicle_navigation(monitoring_id: int,
+                            _user: ReplicaReadAccess,
+                            connection: ReadConnection) -> dict[str, Any]:
     rows = PostgresNavigationHistoryService(connection).get_by_vehicle_monitoring_id(monitoring_id)
     return {"count": len(rows), "items": rows}
@@ -17,6 +17,18 @@ class TaskBatchUpsertRequest(BaseModel):
     source_key: str = ""
 
 
+class TaskPatchItem(BaseModel):
+    trip_number: int
+    fields: dict[str, Any] = Field(min_length=1)
+    updated_at: Any = None
+
+
+class TaskBatchPatchRequest(BaseModel):
+    items: list[TaskPatchItem]
+    source: str = "api"
+    source_key: str = ""
+
+
 class TaskBatchCompleteRequest(BaseModel):
     row_identities: list[int]
     source: str = "api"
@@ -71,6 +83,14 @@ class NavigationSnapshotBatchRequest(BaseModel):
     items: list[NavigationSnapshotRequest]
 
 
+class NavigationHistoryItemRequest(NavigationSnapshotRequest):
+    trip_number: int | None = None
+
+
+class NavigationHistoryBatchRequest(BaseModel):
+    items: list[NavigationHistoryItemRequest]
+
+
 class UserCreateRequest(BaseModel):
     username: str
     display_name: str = ""
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from Navigation_Bot.core.repositories.postgres_task_reader import PostgresTaskReader
+from Navigation_Bot.core.storage.postgres_connection import connect_postgres
+
+TASK_CHANGES_CHANNEL = "task_changes"
+RESET_EVENT: dict[str, Any] = {"reset": True}
+
+
+@dataclass(eq=False, slots=True)
+class TaskChangeSubscription:
+    source_key: str
+    strict_source_key: bool
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=100))
+
+    def accepts(self, source_key: str) -> bool:
+        # Пустой source_key подписчика — все источники; без strict ещё и рейсы без источника.
+        if not self.source_key or source_key == self.source_key:
+            return True
+        return not self.strict_source_key and source_key == ""
+
+
+class TaskChangeFeed:
+    """
+    Один LISTEN task_changes на процесс API.
+
+    Строки задач из уведомления читаются один раз и раздаются подписчикам SSE с подходящим
+    source_key. Отставшему подписчику и всем после переподключения LISTEN уходит reset:
+    уведомления могли потеряться, и клиенту нужна полная перезагрузка.
+    """
+
+    def __init__(self,
+                 pool: Any,
+                 *,
+                 dsn: str | None = None,
+                 connect: Callable[[str | None], Any] = connect_postgres,
+                 reconnect_seconds: float = 2.0):
+        self.pool = pool
+        self.dsn = dsn
+        self.connect = connect
+        self.reconnect_seconds = max(float(reconnect_seconds), 0.1)
+        self._subscriptions: set[TaskChangeSubscription] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="task-change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.reconnect_seconds + 2.0)
+            self._thread = None
+
+    def subscribe(self, source_key: str = "", *, strict_source_key: bool = False) -> TaskChangeSubscription:
+        """Вызывается из event loop обработчика: в его очередь поток LISTEN и кладёт события."""
+        subscription = TaskChangeSubscription(source_key=str(source_key or ""),
+                                              strict_source_key=bool(strict_source_key),
+                                              loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskChangeSubscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, payload: dict[str, Any]) -> int:
+        source_key = str(payload.get("source_key") or "")
+        task_ids = [int(task_id) for task_id in payload.get("task_ids") or []]
+        with self._lock:
+            targets = [subscription for subscription in self._subscriptions if subscription.accepts(source_key)]
+        if not targets or not task_ids:
+            return 0
+
+        with self.pool.connection() as connection:
+            rows = PostgresTaskReader(connection).load_rows_by_ids(task_ids)
+        event = {"source_key": source_key, "items": rows}
+        for subscription in targets:
+            self._deliver(subscription, event)
+        return len(targets)
+
+    def reset_all(self) -> None:
+        with self._lock:
+            targets = list(self._subscriptions)
+        for subscription in targets:
+            self._deliver(subscription, RESET_EVENT)
+
+    def _deliver(self, subscription: TaskChangeSubscription, event: dict[str, Any]) -> None:
+        try:
+            subscription.loop.call_soon_threadsafe(self._offer, subscription, event)
+        except RuntimeError:
+            # Event loop подписчика уже закрыт.
+            self.unsubscribe(subscription)
+
+    @staticmethod
+    def _offer(subscription: TaskChangeSubscription, event: dict[str, Any]) -> None:
+        queue = subscription.queue
+        if not queue.full():
+            queue.put_nowait(event)
+            return
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESET_EVENT)
+
+    def _run(self) -> None:
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                with self.connect(self.dsn) as connection:
+                    connection.execute(f"LISTEN {TASK_CHANGES_CHANNEL}")
+                    if connected_before:
+                        self.reset_all()
+                    connected_before = True
+                    while not self._stop.is_set():
+                        for notify in connection.notifies(timeout=1.0):
+                            self._handle(notify.payload)
+            except Exception as exc:
+                print(f"⚠️ Лента изменений задач прервана, переподключение: {exc}")
+                self._stop.wait(self.reconnect_seconds)
+
+    def _handle(self, payload: str) -> None:
+        try:
+            self.publish(json.loads(payload))
+        except Exception as exc:
+            print(f"⚠️ Не удалось разослать изменения задач: {exc}")
+            self.reset_all()
@@ -24,6 +24,8 @@ UI_SETTINGS_FILE = CONFIG_DIR / "ui_settings.json"
 DATASET_DIR = CONFIG_DIR / "datasets"
 DATASET_FILE = DATASET_DIR / "addresses.jsonl"
 BATCH_PROGRESS_FILE = CONFIG_DIR / "batch_progress.json"
+AUDIT_SPOOL_FILE = CONFIG_DIR / "audit_spool.jsonl"
+HISTORY_ARCHIVE_DIR = CONFIG_DIR / "history_archive"
 NOTE_MEDIA_DIR = CONFIG_DIR / "media" / "notes"
 CLIPBOARD_MEDIA_DIR = NOTE_MEDIA_DIR
 
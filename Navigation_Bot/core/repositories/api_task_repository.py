@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-import json
+import threading
 from os import getenv
 from copy import deepcopy
 from dataclasses import dataclass
 from typing import Any, Callable
 
-from Navigation_Bot.core.infrastructure.api.api_client import NavigationApiClient
+from Navigation_Bot.core.infrastructure.api.api_client import NavigationApiClient, NavigationApiError
 from Navigation_Bot.core.domain.entities.task import Task
+from Navigation_Bot.core.domain.task_identity import to_int_or_none
+from Navigation_Bot.core.domain.task_store import TaskStore
 from Navigation_Bot.core.domain.mappers.task_mapper import TaskMapper
 
 
@@ -15,9 +17,8 @@ from Navigation_Bot.core.domain.mappers.task_mapper import TaskMapper
 class ApiTaskRepository:
     client: NavigationApiClient
     log: Callable[[str], None] | None = None
-    data: list[dict] | None = None
-    _snapshot: dict[str, str] | None = None
-    _snapshot_rows: dict[str, dict[str, Any]] | None = None
+    data: TaskStore | None = None
+    _snapshot: dict[str, dict[str, Any]] | None = None
     current_source_key: str = ""
     include_completed: bool = False
     date_from: str = ""
@@ -25,6 +26,8 @@ class ApiTaskRepository:
     _defer_sync: bool = False
     _pending_sync_rows: dict[str, dict[str, Any]] | None = None
     _last_loaded_updated_at: str = ""
+    _last_loaded_cursor: str = ""
+    _patch_supported: bool = True
 
     _FINGERPRINT_IGNORED_FIELDS = {
         "db_task_id",
@@ -50,6 +53,16 @@ class ApiTaskRepository:
         "скорость",
     }
 
+    # Поле отпечатка -> (поле PATCH /tasks, ключи строки в порядке приоритета TaskMapper.from_dict).
+    _PATCH_FIELDS = {
+        "Телефон": ("driver_phone", ("driver_phone", "Телефон")),
+        "ФИО": ("driver_name", ("driver_name", "ФИО")),
+        "status": ("status", ("status",)),
+        "raw_load": ("raw_load", ("raw_load",)),
+        "raw_unload": ("raw_unload", ("raw_unload",)),
+        "highlight_until": ("highlight_until", ("highlight_until",)),
+    }
+
     def _log(self, msg: str) -> None:
         if self.log:
             self.log(msg)
@@ -59,8 +72,8 @@ class ApiTaskRepository:
         if new_source_key != self.current_source_key:
             self.data = None
             self._snapshot = None
-            self._snapshot_rows = None
             self._last_loaded_updated_at = ""
+            self._last_loaded_cursor = ""
         self.current_source_key = new_source_key
         if reload:
             self.reload()
@@ -84,8 +97,8 @@ class ApiTaskRepository:
         if changed:
             self.data = None
             self._snapshot = None
-            self._snapshot_rows = None
             self._last_loaded_updated_at = ""
+            self._last_loaded_cursor = ""
         if reload:
             self.reload()
 
@@ -93,8 +106,25 @@ class ApiTaskRepository:
         return bool(self.include_completed or self.date_from or self.date_to)
 
     def reload(self) -> None:
-        page_size = self._configured_page_size()
-        self.reload_all_paged(limit=page_size)
+        self._reload_full(limit=self._configured_page_size())
+
+    def reload_streamed(self, *, chunk_size: int = 500, strict_source_key: bool = True) -> None:
+        params = self._task_query_params(strict_source_key=strict_source_key, limit=chunk_size, offset=0)
+        params.pop("offset", None)
+        params["chunk_size"] = params.pop("limit")
+        rows: list[dict[str, Any]] = []
+        trailer: dict[str, Any] | None = None
+        for item in self.client.iter_ndjson("/api/v1/tasks/export", params=params):
+            if not isinstance(item, dict):
+                continue
+            if item.get("_export_end"):
+                trailer = item
+                break
+            rows.append(item)
+        if trailer is None or int(trailer.get("count") or 0) != len(rows):
+            raise NavigationApiError("tasks export stream ended before _export_end")
+        self._replace_data(rows)
+        self._last_loaded_cursor = str(trailer.get("last_cursor") or "")
 
     def reload_page(self, *, limit: int = 100, offset: int = 0, strict_source_key: bool = True) -> dict[str, Any]:
         payload = self.client.get("/api/v1/tasks",
@@ -103,18 +133,35 @@ class ApiTaskRepository:
                                                                  offset=offset))
         return payload if isinstance(payload, dict) else {}
 
+    def reload_cursor_page(self, *,
+                           limit: int = 100,
+                           cursor: str = "",
+                           updated_since: str | None = None,
+                           include_total: bool = False,
+                           strict_source_key: bool = True) -> dict[str, Any]:
+        params = self._task_query_params(strict_source_key=strict_source_key, limit=limit, offset=0)
+        params.pop("offset", None)
+        params["cursor"] = cursor or ""
+        params["include_total"] = str(bool(include_total)).lower()
+        if updated_since:
+            params["updated_since"] = updated_since
+        payload = self.client.get("/api/v1/tasks", params=params)
+        return payload if isinstance(payload, dict) else {}
+
     def reload_all_paged(self, *, limit: int = 500, strict_source_key: bool = True) -> None:
         rows: list[dict[str, Any]] = []
-        offset = 0
+        cursor = ""
         while True:
-            payload = self.reload_page(limit=limit, offset=offset, strict_source_key=strict_source_key)
+            payload = self.reload_cursor_page(limit=limit, cursor=cursor, strict_source_key=strict_source_key)
             page_rows = [row for row in payload.get("items", []) if isinstance(row, dict)]
             rows.extend(page_rows)
-            next_offset = payload.get("next_offset")
-            if next_offset is None:
+            next_cursor = payload.get("next_cursor")
+            if not next_cursor:
+                cursor = str(payload.get("last_cursor") or cursor)
                 break
-            offset = int(next_offset)
+            cursor = str(next_cursor)
         self._replace_data(rows)
+        self._last_loaded_cursor = cursor
 
     def reload_incremental(self, *,
                            updated_since: str | None = None,
@@ -136,39 +183,101 @@ class ApiTaskRepository:
 
     def reload_incremental_all(self, *, limit: int = 500, strict_source_key: bool = True) -> dict[str, Any]:
         since = self._last_loaded_updated_at
-        offset = 0
+        cursor = self._last_loaded_cursor
         total_changed = 0
-        last_payload: dict[str, Any] = {"count": 0, "items": [], "next_offset": None}
+        last_payload: dict[str, Any] = {"count": 0, "items": [], "next_cursor": None}
         while True:
-            payload = self.reload_incremental(updated_since=since,
-                                              limit=limit,
-                                              offset=offset,
+            payload = self.reload_cursor_page(limit=limit,
+                                              cursor=cursor,
+                                              updated_since=since,
                                               strict_source_key=strict_source_key)
-            total_changed += int(payload.get("count") or 0)
+            rows = [row for row in payload.get("items", []) if isinstance(row, dict)]
+            if rows:
+                self._merge_rows(rows)
+            total_changed += len(rows)
             last_payload = payload
-            next_offset = payload.get("next_offset")
-            if next_offset is None:
+            next_cursor = payload.get("next_cursor")
+            if not next_cursor:
+                cursor = str(payload.get("last_cursor") or cursor)
                 break
-            offset = int(next_offset)
+            cursor = str(next_cursor)
+        self._last_loaded_cursor = cursor
         last_payload["count"] = total_changed
         return last_payload
 
     def refresh_incremental_or_reload(self, *, limit: int | None = None) -> dict[str, Any]:
         page_size = limit or self._configured_page_size() or 500
         if self.has_task_filters():
-            self.reload_all_paged(limit=page_size)
+            self._reload_full(limit=page_size)
             return {"mode": "reload", "count": len(self.data or [])}
         if self.data is None or not self._last_loaded_updated_at:
-            self.reload_all_paged(limit=page_size)
+            self._reload_full(limit=page_size)
             return {"mode": "reload", "count": len(self.data or [])}
         try:
             payload = self.reload_incremental_all(limit=page_size)
             payload["mode"] = "incremental"
             return payload
         except Exception:
-            self.reload_all_paged(limit=page_size)
+            self._reload_full(limit=page_size)
             return {"mode": "reload", "count": len(self.data or [])}
 
+    def listen_changes(self,
+                       on_event: Callable[[str, Any], None],
+                       *,
+                       stop: threading.Event,
+                       reconnect_seconds: float = 3.0) -> None:
+        """
+        Подписка на GET /tasks/changes для фонового потока. События передаются в on_event как есть,
+        применять их нужно через apply_change_event в том потоке, который владеет data.
+        При обрыве или смене source_key соединение открывается заново.
+        """
+        while not stop.is_set():
+            source_key = self.current_source_key
+            params = {"source_key": source_key, "strict_source_key": "true"}
+            try:
+                for event, data in self.client.iter_sse("/api/v1/tasks/changes", params=params):
+                    if stop.is_set():
+                        return
+                    on_event(event, data)
+                    if self.current_source_key != source_key:
+                        break
+            except NavigationApiError as exc:
+                self._log(f"⚠️ Подписка на изменения рейсов прервана: {exc}")
+            stop.wait(reconnect_seconds)
+
+    def apply_change_event(self, event: str, data: Any) -> bool:
+        """
+        Применяет событие ленты изменений; возвращает True, если локальный список изменился.
+
+        tasks сливается в data через _merge_rows. ready (новое подключение) и reset (сервер
+        потерял события) догружают пропущенное через refresh_incremental_or_reload. С фильтрами
+        по дате или завершённым рейсам список перезагружается целиком, как и при опросе.
+        """
+        if event in {"ready", "reset"}:
+            if self.data is None:
+                return False
+            self.refresh_incremental_or_reload()
+            return True
+        if event != "tasks" or self.data is None or not isinstance(data, dict):
+            return False
+        if self.current_source_key and str(data.get("source_key") or "") != self.current_source_key:
+            return False
+        rows = [row for row in data.get("items", []) if isinstance(row, dict)]
+        if not rows:
+            return False
+        if self.has_task_filters():
+            self.refresh_incremental_or_reload()
+            return True
+        self._merge_rows(rows)
+        return True
+
+    def _reload_full(self, *, limit: int) -> None:
+        try:
+            self.reload_streamed(chunk_size=min(limit, 1000))
+        except NavigationApiError as exc:
+            self._log(f"⚠️ Потоковая выгрузка задач недоступна, загружаю страницами: {exc}")
+            self.reload_all_paged(limit=limit)
+
     def _task_query_params(self,
                            *,
                            strict_source_key: bool,
@@ -186,27 +295,38 @@ class ApiTaskRepository:
             params["date_to"] = self.date_to
         return params
 
-    def get(self) -> list[dict]:
+    def get(self) -> TaskStore:
         if self.data is None:
             self.reload()
-        return self.data if self.data is not None else []
+        if self.data is None:
+            self.data = TaskStore()
+        elif not isinstance(self.data, TaskStore):
+            self.data = TaskStore(self.data)
+        return self.data
 
     def list_tasks(self) -> list[Task]:
         return [TaskMapper.from_dict(row) for row in self.get() if isinstance(row, dict)]
 
     def get_by_index(self, index_key: int) -> Task | None:
-        for row in self.get():
-            if isinstance(row, dict) and row.get("index") == index_key:
-                return TaskMapper.from_dict(row)
-        return None
+        row = self.get().find_row("index", index_key)
+        return TaskMapper.from_dict(row) if row is not None else None
 
-    def save(self, *, source: str = "user") -> None:
-        self.sync_rows(self.get(), source=source)
+    def save(self, *, source: str = "user", rows: list[dict] | None = None) -> None:
+        """
+        Отправляет на сервер изменённые строки.
+
+        rows — строки, которые правились после прошлого сохранения: сравниваются со снимком
+        только они, и время правки не зависит от размера таблицы. Без rows проверяются все строки.
+        """
+        if rows is None:
+            self.sync_rows(self.get(), source=source)
+        else:
+            self._sync(rows, source=source, full=False)
 
     def set(self, new_data: list, *, source: str = "user") -> None:
         rows = [row for row in new_data if isinstance(row, dict)]
         self.sync_rows(rows, source=source)
-        self.data = rows
+        self.data = TaskStore(rows)
 
     def append(self, entry: dict, *, source: str = "user") -> None:
         data = self.get()
@@ -216,14 +336,13 @@ class ApiTaskRepository:
     def save_task(self, task: Task, *, source: str = "user") -> None:
         task.ensure_processing_consistency()
         task_dict = TaskMapper.to_dict(task)
-        index_key = task.index
         data = self.get()
-        for i, row in enumerate(data):
-            if isinstance(row, dict) and row.get("index") == index_key:
-                merged = {**task_dict, **{k: v for k, v in row.items() if k not in task_dict}}
-                data[i] = merged
-                self.upsert_from_row(merged, source=source)
-                return
+        row = data.find_row("index", task.index)
+        if row is not None:
+            merged = {**task_dict, **{k: v for k, v in row.items() if k not in task_dict}}
+            data.replace(row, merged)
+            self.upsert_from_row(merged, source=source)
+            return
         data.append(task_dict)
         self.upsert_from_row(task_dict, source=source)
 
@@ -236,17 +355,17 @@ class ApiTaskRepository:
 
     def delete_by_index(self, index_key: int) -> bool:
         data = self.get()
-        for i, row in enumerate(data):
-            if isinstance(row, dict) and row.get("index") == index_key:
-                row_identity = row.get("trip_number") or row.get("google_sheet_row") or row.get("index")
-                if row_identity is None:
-                    return False
-                self.client.post(f"/api/v1/tasks/{int(row_identity)}/complete",
-                                 json={"source": "user",
-                                       "source_key": self.current_source_key})
-                data.pop(i)
-                return True
-        return False
+        row = data.find_row("index", index_key)
+        if row is None:
+            return False
+        row_identity = row.get("trip_number") or row.get("google_sheet_row") or row.get("index")
+        if row_identity is None:
+            return False
+        self.client.post(f"/api/v1/tasks/{int(row_identity)}/complete",
+                         json={"source": "user",
+                               "source_key": self.current_source_key})
+        data.remove_rows([row])
+        return True
 
     def complete_row(self, real_idx: int, *, source: str = "user") -> tuple[bool, dict | None, str | None]:
         data = self.get()
@@ -275,21 +394,32 @@ class ApiTaskRepository:
                                          "source_key": self.current_source_key})
         completed = {int(item) for item in payload.get("items", [])}
         if self.data is not None and completed:
-            self.data = [row for row in self.data
-                         if self._row_identity_int(row) not in completed ]
-
-            self._snapshot = self._build_snapshot(self.data)
-            self._snapshot_rows = self._build_snapshot_rows(self.data)
+            data = self.get()
+            removed = [row for row in (self._row_by_identity(data, identity) for identity in completed)
+                       if row is not None]
+            data.remove_rows(removed)
+            if self._snapshot is not None:
+                for row in removed:
+                    self._forget(self._snapshot, row)
         return payload
 
     def sync_rows(self, rows: list[dict], *, source: str = "user") -> None:
-        snapshot = self._snapshot or {}
+        self._sync(rows, source=source, full=True)
+
+    def _sync(self, rows: list[dict], *, source: str, full: bool) -> None:
+        """
+        full=True: rows — все строки, снимок после синхронизации содержит только их.
+        full=False: rows — только тронутые строки, остальной снимок не пересчитывается.
+        """
+        snapshot = self._snapshot if self._snapshot is not None else {}
         changed_rows: list[dict[str, Any]] = []
+        fingerprints: list[tuple[dict[str, Any], dict[str, Any]]] = []
         for row in rows:
             if not isinstance(row, dict):
                 continue
 
             fingerprint = self._row_fingerprint(row)
+            fingerprints.append((row, fingerprint))
             if self._snapshot_fingerprint_for_row(snapshot, row) == fingerprint:
                 continue
 
@@ -302,9 +432,12 @@ class ApiTaskRepository:
             return
 
         if changed_rows:
-            self._upsert_rows_batch(changed_rows, source=source)
-        self._snapshot = self._build_snapshot(rows)
-        self._snapshot_rows = self._build_snapshot_rows(rows)
+            self._write_changed_rows(changed_rows, source=source)
+        if full:
+            snapshot = {}
+        for row, fingerprint in fingerprints:
+            self._remember(snapshot, row, fingerprint)
+        self._snapshot = snapshot
         # if self.log:
         #     self.log(f"API tasks saved: {len(changed_rows)} changed")
 
@@ -316,10 +449,9 @@ class ApiTaskRepository:
         pending = list((self._pending_sync_rows or {}).values())
         self._pending_sync_rows = {}
         if pending:
-            self._upsert_rows_batch(pending, source=source)
+            self._write_changed_rows(pending, source=source)
         if self.data is not None:
-            self._snapshot = self._build_snapshot(self.data)
-            self._snapshot_rows = self._build_snapshot_rows(self.data)
+            self._update_snapshot(pending)
 
     def end_deferred_sync(self, *, source: str = "user") -> None:
         try:
@@ -342,8 +474,8 @@ class ApiTaskRepository:
             row["updated_at"] = payload["updated_at"]
 
         if self.data is not None:
-            self._snapshot = self._build_snapshot(self.data)
-            self._snapshot_rows = self._build_snapshot_rows(self.data)
+            self.get().reindex(row)
+            self._update_snapshot([row])
         return result
 
     def _upsert_rows_batch(self, rows: list[dict[str, Any]], *, source: str = "user") -> list[dict[str, int]]:
@@ -356,54 +488,119 @@ class ApiTaskRepository:
 
         items = [item for item in payload.get("items", []) if isinstance(item, dict)]
         for row, item in zip(rows, items):
-            result = {key: int(item[key])
-                      for key in ("task_id", "trip_number")
-                      if key in item and item[key] is not None}
-            row.update(result)
-            if item.get("updated_at") is not None:
-                row["updated_at"] = item["updated_at"]
+            self._apply_write_result(row, item)
         return items
 
-    def _replace_data(self, rows: list[dict[str, Any]]) -> None:
-        copied = deepcopy(rows)
-        self.data = copied
-        self._snapshot = self._build_snapshot(copied)
-        self._snapshot_rows = self._build_snapshot_rows(copied)
-        self._last_loaded_updated_at = self._max_updated_at(copied)
+    def _write_changed_rows(self, rows: list[dict[str, Any]], *, source: str) -> None:
+        """
+        Строки, в которых изменились только поля из _PATCH_FIELDS, уходят одним PATCH /tasks
+        с одними изменёнными полями; остальные — целиком через POST /tasks/batch.
+        """
+        patches, full_rows = self._split_patches(rows)
+        if patches:
+            full_rows.extend(self._patch_rows(patches, source=source))
+        if full_rows:
+            self._upsert_rows_batch(full_rows, source=source)
+
+    def _split_patches(self, rows: list[dict[str, Any]]) -> tuple[list[tuple[dict[str, Any], dict[str, Any]]],
+                                                                  list[dict[str, Any]]]:
+        if not self._patch_supported or not _task_patch_enabled():
+            return [], list(rows)
+        snapshot = self._snapshot or {}
+        patches: list[tuple[dict[str, Any], dict[str, Any]]] = []
+        full_rows: list[dict[str, Any]] = []
+        for row in rows:
+            trip_number = to_int_or_none(row.get("trip_number"))
+            changed = self._changed_fields(snapshot, row)
+            if trip_number is None or not changed or not changed <= self._PATCH_FIELDS.keys():
+                full_rows.append(row)
+                continue
+            fields = {}
+            for field in changed:
+                wire_field, keys = self._PATCH_FIELDS[field]
+                fields[wire_field] = next((row[key] for key in keys if row.get(key)), row.get(keys[-1]))
+            patches.append((row, {"trip_number": trip_number, "updated_at": row.get("updated_at"), "fields": fields}))
+        return patches, full_rows
+
+    def _patch_rows(self, patches: list[tuple[dict[str, Any], dict[str, Any]]], *, source: str) -> list[dict[str, Any]]:
+        """Отправляет PATCH /tasks; возвращает строки, которые нужно записать целиком."""
+        try:
+            payload = self.client.patch("/api/v1/tasks",
+                                        json={"items": [item for _row, item in patches],
+                                              "source": source,
+                                              "source_key": self.current_source_key})
+        except NavigationApiError as exc:
+            if exc.status_code not in {404, 405}:
+                raise
+            self._log("⚠️ Сервер не поддерживает PATCH /tasks, изменения отправляются целыми строками")
+            self._patch_supported = False
+            return [row for row, _item in patches]
+
+        written = {int(item["trip_number"]): item for item in payload.get("items", [])
+                   if isinstance(item, dict) and item.get("trip_number") is not None}
+        not_found = []
+        for row, patch in patches:
+            item = written.get(patch["trip_number"])
+            if item is None:
+                not_found.append(row)
+            else:
+                self._apply_write_result(row, item)
+        return not_found
 
-    def _merge_rows(self, rows: list[dict[str, Any]]) -> None:
+    def _apply_write_result(self, row: dict[str, Any], item: dict[str, Any]) -> None:
+        result = {key: int(item[key])
+                  for key in ("task_id", "trip_number")
+                  if key in item and item[key] is not None}
+        row.update(result)
+        if item.get("updated_at") is not None:
+            row["updated_at"] = item["updated_at"]
+        if isinstance(self.data, TaskStore):
+            self.data.reindex(row)
+
+    def _replace_data(self, rows: list[dict[str, Any]], *, copy: bool = False) -> None:
+        """
+        Заменяет data строками rows. Строки переходят во владение репозитория без копирования:
+        загрузчики передают только что разобранный JSON, на который больше никто не ссылается.
+        copy=True — для строк, которые вызывающий код продолжит менять сам.
+        Снимок хранит только неизменяемые отпечатки и с data объектов не делит.
+        """
+        adopted = TaskStore(deepcopy(rows) if copy else rows)
+        self.data = adopted
+        self._snapshot = self._build_snapshot(adopted)
+        self._last_loaded_updated_at = self._max_updated_at(adopted)
+
+    def _merge_rows(self, rows: list[dict[str, Any]], *, copy: bool = False) -> None:
+        """Сливает изменённые на сервере строки в data; владение строками — как в _replace_data."""
         if self.data is None:
-            self.data = []
-        data = self.data
-        index_by_key: dict[str, int] = {}
-        for index, row in enumerate(data):
-            if isinstance(row, dict):
-                for key in self._row_keys(row):
-                    index_by_key[key] = index
-
+            self.data = TaskStore()
+        data = self.get()
+        if self._snapshot is None:
+            self._snapshot = self._build_snapshot(data)
+        snapshot = self._snapshot
+        # Завершённая строка сразу заменяется пустой заглушкой (её ключи уходят из индексов),
+        # а заглушки удаляются одним проходом в конце: до этого позиции строк не сдвигаются.
+        finished: list[dict[str, Any]] = []
         for incoming in rows:
-            matched_index = None
-            for key in self._row_keys(incoming):
-                if key in index_by_key:
-                    matched_index = index_by_key[key]
-                    break
+            matched = data.match(incoming)
+            if matched is not None:
+                self._forget(snapshot, matched)
             if self._is_inactive_status(incoming):
-                if matched_index is not None:
-                    data.pop(matched_index)
-                    index_by_key = {}
-                    for index, row in enumerate(data):
-                        if isinstance(row, dict):
-                            for key in self._row_keys(row):
-                                index_by_key[key] = index
+                if matched is not None:
+                    placeholder: dict[str, Any] = {}
+                    data.replace(matched, placeholder)
+                    finished.append(placeholder)
                 continue
-            if matched_index is None:
-                data.append(deepcopy(incoming))
+            row = deepcopy(incoming) if copy else incoming
+            if matched is None:
+                data.append(row)
             else:
-                data[matched_index] = deepcopy(incoming)
+                data.replace(matched, row)
+            self._remember(snapshot, row, self._row_fingerprint(row))
+        data.remove_rows(finished)
 
-        self._snapshot = self._build_snapshot(data)
-        self._snapshot_rows = self._build_snapshot_rows(data)
-        self._last_loaded_updated_at = max(self._max_updated_at(data), self._max_updated_at(rows))
+        # Строки попадают в data только через _replace_data и _merge_rows, поэтому отметка уже покрывает data:
+        # полный проход по листу на каждое слияние не нужен.
+        self._last_loaded_updated_at = max(self._last_loaded_updated_at or "", self._max_updated_at(rows))
 
     @staticmethod
     def _configured_page_size() -> int:
@@ -440,30 +637,36 @@ class ApiTaskRepository:
     def _row_key(cls, row: dict[str, Any]) -> str:
         return cls._row_keys(row)[0]
 
-    @classmethod
-    def _build_snapshot(cls, rows: list[dict]) -> dict[str, str]:
-        snapshot: dict[str, str] = {}
+    def _update_snapshot(self, rows: list[dict[str, Any]]) -> None:
+        if self._snapshot is None:
+            self._snapshot = self._build_snapshot(self.data or [])
+            return
         for row in rows:
-            if not isinstance(row, dict):
-                continue
-            fingerprint = cls._row_fingerprint(row)
-            for key in cls._row_keys(row):
-                snapshot[key] = fingerprint
-        return snapshot
+            if isinstance(row, dict):
+                self._remember(self._snapshot, row, self._row_fingerprint(row))
 
     @classmethod
-    def _build_snapshot_rows(cls, rows: list[dict]) -> dict[str, dict[str, Any]]:
+    def _build_snapshot(cls, rows: list[dict]) -> dict[str, dict[str, Any]]:
         snapshot: dict[str, dict[str, Any]] = {}
         for row in rows:
-            if not isinstance(row, dict):
-                continue
-            normalized = cls._normalized_row(row)
-            for key in cls._row_keys(row):
-                snapshot[key] = normalized
+            if isinstance(row, dict):
+                cls._remember(snapshot, row, cls._row_fingerprint(row))
         return snapshot
 
     @classmethod
-    def _snapshot_fingerprint_for_row(cls, snapshot: dict[str, str], row: dict[str, Any]) -> str | None:
+    def _remember(cls, snapshot: dict[str, dict[str, Any]], row: dict[str, Any], fingerprint: dict[str, Any]) -> None:
+        # Новая строка без ключей хранилась под object:id, после upsert у неё появился trip_number.
+        snapshot.pop(f"object:{id(row)}", None)
+        for key in cls._row_keys(row):
+            snapshot[key] = fingerprint
+
+    @classmethod
+    def _forget(cls, snapshot: dict[str, dict[str, Any]], row: dict[str, Any]) -> None:
+        for key in cls._row_keys(row):
+            snapshot.pop(key, None)
+
+    @classmethod
+    def _snapshot_fingerprint_for_row(cls, snapshot: dict[str, dict[str, Any]], row: dict[str, Any]) -> dict[str, Any] | None:
         for key in cls._row_keys(row):
             found = snapshot.get(key)
             if found is not None:
@@ -471,8 +674,16 @@ class ApiTaskRepository:
         return None
 
     @classmethod
-    def _row_fingerprint(cls, row: dict[str, Any]) -> str:
-        return json.dumps(cls._normalized_row(row), ensure_ascii=False, sort_keys=True, default=str)
+    def _row_fingerprint(cls, row: dict[str, Any]) -> dict[str, Any]:
+        """
+        Отпечаток строки: поле -> значение для скаляров, поле -> hash неизменяемой копии
+        для вложенных списков и словарей.
+
+        Считается почти вдвое быстрее json.dumps(sort_keys=True), сравнивается через ==,
+        не ссылается на объекты живой строки и сразу показывает, какие поля изменились.
+        """
+        return {key: value if type(value) in _SCALAR_TYPES else hash(_frozen(value))
+                for key, value in cls._normalized_row(row).items()}
 
     @classmethod
     def _normalized_row(cls, row: dict[str, Any]) -> dict[str, Any]:
@@ -491,15 +702,12 @@ class ApiTaskRepository:
         return normalized
 
     @classmethod
-    def _changed_fields(cls, snapshot_rows: dict[str, dict[str, Any]], row: dict[str, Any]) -> set[str]:
-        old = None
-        for key in cls._row_keys(row):
-            if key in snapshot_rows:
-                old = snapshot_rows[key]
-                break
-        new = cls._normalized_row(row)
-        if old is None:
+    def _changed_fields(cls, snapshot: dict[str, dict[str, Any]], row: dict[str, Any]) -> set[str]:
+        fingerprint = cls._snapshot_fingerprint_for_row(snapshot, row)
+        if fingerprint is None:
             return {"<new_or_unmatched>"}
+        old = fingerprint
+        new = cls._row_fingerprint(row)
         changed = set()
         for key in sorted(set(old) | set(new)):
             if old.get(key) != new.get(key):
@@ -507,17 +715,17 @@ class ApiTaskRepository:
         return changed
 
     @classmethod
-    def _row_diff_summary(cls, snapshot_rows: dict[str, dict[str, Any]],
+    def _row_diff_summary(cls, snapshot: dict[str, dict[str, Any]],
                           row: dict[str, Any],
                           changed_fields: set[str] | None = None, ) -> str:
         matched_key = None
         for key in cls._row_keys(row):
-            if key in snapshot_rows:
+            if key in snapshot:
                 matched_key = key
                 break
         if matched_key is None:
             return f"{cls._row_key(row)} new_or_unmatched"
-        changed = sorted(changed_fields if changed_fields is not None else cls._changed_fields(snapshot_rows, row))
+        changed = sorted(changed_fields if changed_fields is not None else cls._changed_fields(snapshot, row))
         return f"{matched_key}: {', '.join(changed[:12])}"
 
     @staticmethod
@@ -530,6 +738,14 @@ class ApiTaskRepository:
             pass
         return value
 
+    @classmethod
+    def _row_by_identity(cls, data: TaskStore, identity: int) -> dict[str, Any] | None:
+        for field in ("trip_number", "google_sheet_row", "index"):
+            row = data.find_row(field, identity)
+            if row is not None and cls._row_identity_int(row) == identity:
+                return row
+        return None
+
     @staticmethod
     def _row_identity_int(row: dict[str, Any]) -> int | None:
         value = row.get("trip_number") or row.get("google_sheet_row") or row.get("index")
@@ -539,3 +755,26 @@ class ApiTaskRepository:
             return int(value)
         except (TypeError, ValueError):
             return None
+
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _frozen(value: Any) -> Any:
+    """Неизменяемая копия JSON-значения: dict -> frozenset пар, list/tuple -> tuple, прочее -> str."""
+    kind = type(value)
+    if kind is dict:
+        return frozenset([(key, _frozen(item)) for key, item in value.items()])
+    if kind is list or kind is tuple:
+        return tuple([_frozen(item) for item in value])
+    if kind in _SCALAR_TYPES:
+        return value
+    if isinstance(value, dict):
+        return frozenset([(key, _frozen(item)) for key, item in value.items()])
+    if isinstance(value, (list, tuple)):
+        return tuple([_frozen(item) for item in value])
+    return value if isinstance(value, _SCALAR_TYPES) else str(value)
+
+
+def _task_patch_enabled() -> bool:
+    return getenv("NAV_API_TASK_PATCH", "1").strip().lower() not in {"0", "false", "no", "off"}
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import Any
+
+from Navigation_Bot.core.repositories.postgres_audit_repository import (AUDIT_COMPACT_INSERT_SQL,
+                                                                       AUDIT_COPY_SQL,
+                                                                       AUDIT_INSERT_SQL,
+                                                                       PostgresAuditRepository)
+
+
+class PostgresAsyncAuditRepository:
+    """Async-вариант PostgresAuditRepository для async-маршрутов API."""
+
+    def __init__(self, connection, buffer: Any | None = None):
+        self.connection = connection
+        self.buffer = buffer
+
+    async def record(
+        self,
+        *,
+        user: dict[str, Any],
+        entity_type: str,
+        action: str,
+        entity_id: int | None = None,
+        before_data: dict[str, Any] | None = None,
+        after_data: dict[str, Any] | None = None,
+        source: str = "api",
+    ) -> None:
+        params = PostgresAuditRepository._record_params(user=user,
+                                                        entity_type=entity_type,
+                                                        action=action,
+                                                        entity_id=entity_id,
+                                                        before_data=before_data,
+                                                        after_data=after_data,
+                                                        source=source)
+        if self.buffer is not None:
+            self.buffer.add(params)
+            return
+        await self.connection.execute(AUDIT_INSERT_SQL, params)
+
+    async def record_compact(
+        self,
+        *,
+        user: dict[str, Any],
+        entity_type: str,
+        action: str,
+        entity_id: int | None = None,
+        summary: dict[str, Any] | None = None,
+        source: str = "api",
+    ) -> None:
+        params = PostgresAuditRepository._compact_params(user=user,
+                                                         entity_type=entity_type,
+                                                         action=action,
+                                                         entity_id=entity_id,
+                                                         summary=summary,
+                                                         source=source)
+        if self.buffer is not None:
+            self.buffer.add(params)
+            return
+        await self.connection.execute(AUDIT_COMPACT_INSERT_SQL, params)
+
+    async def record_compact_many(
+        self,
+        *,
+        user: dict[str, Any],
+        entity_type: str,
+        action: str,
+        items: list[tuple[int | None, dict[str, Any]]],
+        source: str = "api",
+    ) -> None:
+        entries = [PostgresAuditRepository._compact_params(user=user,
+                                                           entity_type=entity_type,
+                                                           action=action,
+                                                           entity_id=entity_id,
+                                                           summary=summary,
+                                                           source=source)
+                   for entity_id, summary in items]
+        if self.buffer is not None:
+            for entry in entries:
+                self.buffer.add(entry)
+            return
+        if not entries:
+            return
+        async with self.connection.transaction():
+            async with self.connection.cursor() as cursor:
+                async with cursor.copy(AUDIT_COPY_SQL) as copy:
+                    for entry in entries:
+                        await copy.write_row(PostgresAuditRepository._copy_row(entry))
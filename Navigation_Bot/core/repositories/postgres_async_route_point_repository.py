@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from Navigation_Bot.core.repositories.postgres_route_point_repository import (EXISTING_ROUTE_POINTS_SQL,
+                                                                             PostgresRoutePointRepository,
+                                                                             RoutePointSync)
+from Navigation_Bot.core.storage.postgres_pipeline import async_postgres_pipeline
+
+
+@dataclass(slots=True)
+class PostgresAsyncRoutePointRepository:
+    """Async-вариант PostgresRoutePointRepository: тот же diff точек, запросы через AsyncConnection."""
+    connection: Any
+
+    async def sync_route_points_batch(self, items: list[RoutePointSync], source: str) -> None:
+        if not items:
+            return
+
+        cursor = await self.existing_route_points(items)
+        await self.write_route_points(await cursor.fetchall(), items)
+
+    async def existing_route_points(self, items: list[RoutePointSync]) -> Any:
+        return await self.connection.execute(EXISTING_ROUTE_POINTS_SQL,
+                                             (PostgresRoutePointRepository._task_ids(items),))
+
+    async def write_route_points(self, existing_rows: list[dict], items: list[RoutePointSync]) -> None:
+        async with async_postgres_pipeline(self.connection):
+            for query, params in PostgresRoutePointRepository._apply_statements(existing_rows, items):
+                await self.connection.execute(query, params)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from Navigation_Bot.core.repositories.postgres_task_reader import (LATEST_STATE_SQL,
+                                                                   ROUTE_POINTS_SQL,
+                                                                   PostgresTaskReader)
+
+
+@dataclass(slots=True)
+class PostgresAsyncTaskReader:
+    """
+    Async-вариант PostgresTaskReader для psycopg AsyncConnection.
+
+    SQL, фильтры и сборка строк для GUI берутся из PostgresTaskReader,
+    здесь только await-выполнение запросов.
+    """
+    connection: Any
+
+    async def load_active_rows(self, source_key: str = "", *, include_null_source: bool = True) -> list[dict]:
+        query, params = self._queries()._active_rows_sql(source_key, include_null_source=include_null_source)
+        rows = await (await self.connection.execute(query, params)).fetchall()
+        return await self._rows_to_gui_dicts(rows)
+
+    async def load_active_rows_page(self,
+                                    source_key: str = "",
+                                    *,
+                                    include_null_source: bool = True,
+                                    limit: int = 100,
+                                    offset: int = 0,
+                                    updated_since: str | None = None,
+                                    include_completed: bool = False,
+                                    date_from: str | None = None,
+                                    date_to: str | None = None,
+                                    include_total: bool = True) -> tuple[list[dict], int | None]:
+        queries = self._queries()
+        where_sql, params = queries._page_filter_sql(source_key,
+                                                     include_null_source=include_null_source,
+                                                     updated_since=updated_since,
+                                                     include_completed=include_completed,
+                                                     date_from=date_from,
+                                                     date_to=date_to)
+        total = await self._count_rows(where_sql, params) if include_total else None
+        query, page_params = queries._offset_page_sql(where_sql, params, limit=limit, offset=offset)
+        rows = await (await self.connection.execute(query, page_params)).fetchall()
+        return await self._rows_to_gui_dicts(rows), total
+
+    async def load_active_rows_after(self,
+                                     source_key: str = "",
+                                     *,
+                                     include_null_source: bool = True,
+                                     limit: int = 100,
+                                     after: tuple[Any, int] | None = None,
+                                     updated_since: str | None = None,
+                                     include_completed: bool = False,
+                                     date_from: str | None = None,
+                                     date_to: str | None = None,
+                                     include_total: bool = False
+                                     ) -> tuple[list[dict], tuple[Any, int] | None, int | None]:
+        queries = self._queries()
+        where_sql, params = queries._page_filter_sql(source_key,
+                                                     include_null_source=include_null_source,
+                                                     updated_since=updated_since,
+                                                     include_completed=include_completed,
+                                                     date_from=date_from,
+                                                     date_to=date_to,
+                                                     updated_since_inclusive=after is not None)
+        total = await self._count_rows(where_sql, params) if include_total else None
+        query, page_params = queries._keyset_page_sql(where_sql, params, after=after, limit=limit)
+        page_rows = await (await self.connection.execute(query, page_params)).fetchall()
+        rows, next_after = queries._split_keyset_page(page_rows, limit)
+        return await self._rows_to_gui_dicts(rows), next_after, total
+
+    async def active_rows_version(self, source_key: str = "", *, include_null_source: bool = True) -> str:
+        queries = self._queries()
+        where_sql, params = queries._active_filter_sql(source_key, include_null_source=include_null_source)
+        cursor = await self.connection.execute(queries._version_sql(where_sql), params)
+        return queries._version_token(await cursor.fetchone())
+
+    async def page_version(self,
+                           source_key: str = "",
+                           *,
+                           include_null_source: bool = True,
+                           updated_since: str | None = None,
+                           include_completed: bool = False,
+                           date_from: str | None = None,
+                           date_to: str | None = None,
+                           updated_since_inclusive: bool = False) -> str:
+        queries = self._queries()
+        where_sql, params = queries._page_filter_sql(source_key,
+                                                     include_null_source=include_null_source,
+                                                     updated_since=updated_since,
+                                                     include_completed=include_completed,
+                                                     date_from=date_from,
+                                                     date_to=date_to,
+                                                     updated_since_inclusive=updated_since_inclusive)
+        cursor = await self.connection.execute(queries._version_sql(where_sql), tuple(params))
+        return queries._version_token(await cursor.fetchone())
+
+    async def _count_rows(self, where_sql: str, params: list[Any]) -> int:
+        cursor = await self.connection.execute(PostgresTaskReader._count_sql(where_sql), tuple(params))
+        total_row = await cursor.fetchone()
+        return int(total_row["count"] or 0)
+
+    async def _rows_to_gui_dicts(self, rows: list[dict]) -> list[dict]:
+        if not rows:
+            return []
+
+        task_ids = [int(row["id"]) for row in rows]
+        route_point_rows = await (await self.connection.execute(ROUTE_POINTS_SQL, (task_ids,))).fetchall()
+        latest_state_rows = await (await self.connection.execute(LATEST_STATE_SQL, (task_ids,))).fetchall()
+        return self._queries()._build_gui_dicts(rows,
+                                                route_point_rows=route_point_rows,
+                                                latest_state_rows=latest_state_rows)
+
+    def _queries(self) -> PostgresTaskReader:
+        return PostgresTaskReader(self.connection)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from Navigation_Bot.core.domain.mappers.task_mapper import TaskMapper
+from Navigation_Bot.core.repositories.postgres_async_route_point_repository import PostgresAsyncRoutePointRepository
+from Navigation_Bot.core.repositories.postgres_task_lookup import (NEXT_TRIP_NUMBER_SQL,
+                                                                   TASK_ID_BY_TRIP_SQL,
+                                                                   TRIP_BY_SHEET_ROW_SQL,
+                                                                   TRIP_BY_SOURCE_SHEET_ROW_SQL,
+                                                                   TRIP_BY_TASK_ID_SQL,
+                                                                   PostgresTaskLookup)
+from Navigation_Bot.core.repositories.postgres_task_writer import (COMPLETE_TASK_SQL,
+                                                                   COMPLETE_TASKS_SQL,
+                                                                   INSERT_TASK_SQL,
+                                                                   TASK_UPDATED_AT_SQL,
+                                                                   PostgresTaskWriter,
+                                                                   Statement)
+from Navigation_Bot.core.storage.postgres_pipeline import async_postgres_pipeline
+
+
+@dataclass(slots=True)
+class PostgresAsyncTaskWriter:
+    """
+    Async-вариант PostgresTaskWriter для одиночных записей из async-маршрутов API.
+
+    Разбор строки, значения колонок и SQL общие с PostgresTaskWriter,
+    поэтому обе ветки пишут в БД одно и то же.
+    """
+    connection: Any
+    source_key: str = ""
+
+    async def upsert_from_row(self, row: dict[str, Any], *, source: str = "user") -> dict[str, Any] | None:
+        if not isinstance(row, dict):
+            return None
+
+        task = TaskMapper.from_dict(row)
+        values_builder = self._values()
+        google_sheet_row = values_builder._positive_int_or_none(row.get("google_sheet_row")) or \
+            values_builder._positive_int_or_none(row.get("index"))
+        trip_number = await self._resolve_trip_number(row, google_sheet_row)
+        vehicle = values_builder._vehicle_values(task, None)
+        driver = values_builder._driver_values(task, None)
+        route_points = PostgresAsyncRoutePointRepository(self.connection)
+
+        async with self.connection.transaction(), async_postgres_pipeline(self.connection):
+            carrier_sent = await self._send(values_builder._carrier_statement(task))
+            vehicle_found = await self._send(values_builder._vehicle_lookup_statement(vehicle))
+            driver_found = await self._send(values_builder._driver_lookup_statement(driver))
+            task_found = await self.connection.execute(TASK_ID_BY_TRIP_SQL, (trip_number,))
+
+            carrier_id = await self._returned_id(carrier_sent)
+            vehicle["carrier_id"] = driver["carrier_id"] = carrier_id
+            existing_vehicle_id = await self._returned_id(vehicle_found)
+            existing_driver_id = await self._returned_id(driver_found)
+            vehicle_sent = await self._send(values_builder._vehicle_write_statement(vehicle, existing_vehicle_id))
+            driver_sent = await self._send(values_builder._driver_write_statement(driver, existing_driver_id))
+            existing_task_id = await self._returned_id(task_found)
+
+            expected_updated_at = row.get("updated_at")
+            created = existing_task_id is None
+            values = values_builder._task_values(task,
+                                                 row,
+                                                 google_sheet_row=google_sheet_row,
+                                                 vehicle_id=await self._written_id(vehicle_sent, existing_vehicle_id),
+                                                 driver_id=await self._written_id(driver_sent, existing_driver_id),
+                                                 carrier_id=carrier_id)
+
+            if existing_task_id is None:
+                cursor = await self.connection.execute(INSERT_TASK_SQL, {"trip_number": trip_number, **values})
+                written = await cursor.fetchone()
+                task_id = int(written["id"])
+                route_point_items = values_builder._route_point_items(task_id, task)
+                existing_points: list[dict] = []
+            else:
+                task_id = existing_task_id
+                route_point_items = values_builder._route_point_items(task_id, task)
+                task_sent = await self.connection.execute(
+                    *values_builder._update_task_statement(task_id, expected_updated_at, values))
+                points_sent = await route_points.existing_route_points(route_point_items)
+                written = await self._updated_or_conflict(await task_sent.fetchone(), task_id, expected_updated_at)
+                existing_points = await points_sent.fetchall()
+            updated_at = written["updated_at"]
+
+            await route_points.write_route_points(existing_points, route_point_items)
+
+        row["trip_number"] = trip_number
+        row["google_sheet_row"] = google_sheet_row
+        row["db_task_id"] = task_id
+        row["updated_at"] = updated_at
+        return values_builder._upsert_result(written,
+                                             task_id=task_id,
+                                             trip_number=trip_number,
+                                             updated_at=updated_at,
+                                             created=created)
+
+    async def mark_task_completed(self, row_identity: int, *, source: str = "user") -> bool:
+        return bool(await self.complete_task(row_identity, source=source))
+
+    async def complete_task(self, row_identity: int, *, source: str = "user") -> list[dict[str, Any]]:
+        parsed = PostgresTaskLookup.to_int_or_none(row_identity)
+        if parsed is None:
+            return []
+
+        async with self.connection.transaction():
+            cursor = await self.connection.execute(
+                COMPLETE_TASK_SQL,
+                (source, parsed, parsed, self.source_key, self.source_key),
+            )
+            rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+    async def complete_tasks(self, row_identities: list[int], *, source: str = "user") -> dict[int, dict[str, Any]]:
+        values_builder = self._values()
+        identities = values_builder._identity_list(row_identities)
+        if not identities:
+            return {}
+
+        async with self.connection.transaction():
+            cursor = await self.connection.execute(COMPLETE_TASKS_SQL,
+                                                   values_builder._complete_tasks_params(identities, source))
+            rows = await cursor.fetchall()
+        return values_builder._completed_by_identity(rows, identities)
+
+    async def _resolve_trip_number(self, row: dict[str, Any], google_sheet_row: int | None) -> int:
+        explicit = PostgresTaskLookup.to_int_or_none(row.get("trip_number"))
+        if explicit is not None:
+            return explicit
+
+        db_task_id = PostgresTaskLookup.to_int_or_none(row.get("db_task_id"))
+        if db_task_id is not None:
+            found = await self._fetch_id(TRIP_BY_TASK_ID_SQL, (db_task_id,))
+            if found is not None:
+                return found
+
+        if google_sheet_row is not None:
+            if self.source_key:
+                found = await self._fetch_id(TRIP_BY_SOURCE_SHEET_ROW_SQL,
+                                             (google_sheet_row, self.source_key, self.source_key))
+                if found is not None:
+                    return found
+                return await self._next_trip_number()
+
+            found = await self._fetch_id(TRIP_BY_SHEET_ROW_SQL, (google_sheet_row,))
+            if found is not None:
+                return found
+
+        return await self._next_trip_number()
+
+    async def _next_trip_number(self) -> int:
+        row = await (await self.connection.execute(NEXT_TRIP_NUMBER_SQL)).fetchone()
+        return int(row["value"])
+
+    async def _fetch_id(self, query: str, params: tuple[Any, ...]) -> int | None:
+        return PostgresTaskLookup.first_int(await (await self.connection.execute(query, params)).fetchone())
+
+    async def _updated_or_conflict(self,
+                                   row: dict[str, Any] | None,
+                                   task_id: int,
+                                   expected_updated_at: Any) -> dict[str, Any]:
+        if row is not None:
+            return row
+
+        current = await (await self.connection.execute(TASK_UPDATED_AT_SQL, (task_id,))).fetchone()
+        raise PostgresTaskWriter._conflict(task_id, expected_updated_at, current)
+
+    async def _send(self, statement: Statement | None) -> Any | None:
+        return await self.connection.execute(*statement) if statement is not None else None
+
+    @staticmethod
+    async def _returned_id(cursor: Any | None) -> int | None:
+        return PostgresTaskLookup.first_int(await cursor.fetchone()) if cursor is not None else None
+
+    async def _written_id(self, cursor: Any | None, existing_id: int | None) -> int | None:
+        return existing_id if existing_id is not None else await self._returned_id(cursor)
+
+    def _values(self) -> PostgresTaskWriter:
+        return PostgresTaskWriter(self.connection, self.source_key)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from typing import Any
+
+from Navigation_Bot.core.repositories.postgres_user_repository import (HAS_ACTIVE_ADMIN_API_KEYS_SQL,
+                                                                      USER_BY_API_KEY_HASH_SQL,
+                                                                      PostgresUserRepository)
+
+
+class PostgresAsyncUserRepository:
+    """Async-проверка X-API-Key для async-маршрутов; управление пользователями остаётся в PostgresUserRepository."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def has_active_admin_api_keys(self) -> bool:
+        row = await (await self.connection.execute(HAS_ACTIVE_ADMIN_API_KEYS_SQL)).fetchone()
+        return bool(row and row["has_keys"])
+
+    async def find_user_by_api_key_hash(self, key_hash: str) -> dict[str, Any] | None:
+        cursor = await self.connection.execute(USER_BY_API_KEY_HASH_SQL, {"key_hash": key_hash})
+        return PostgresUserRepository._api_key_user(await cursor.fetchone())
@@ -1,15 +1,54 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 from decimal import Decimal
 from typing import Any
 
 from psycopg.types.json import Jsonb
 
 
+AUDIT_INSERT_SQL = """
+    INSERT INTO audit_log(
+        user_id, username, role, entity_type, entity_id, action,
+        before_data, after_data, changed_fields, source
+    )
+    VALUES (
+        %(user_id)s, %(username)s, %(role)s, %(entity_type)s, %(entity_id)s, %(action)s,
+        %(before_data)s, %(after_data)s, %(changed_fields)s, %(source)s
+    )
+"""
+
+AUDIT_COMPACT_INSERT_SQL = """
+    INSERT INTO audit_log(
+        user_id, username, role, entity_type, entity_id, action,
+        changed_fields, source
+    )
+    VALUES (
+        %(user_id)s, %(username)s, %(role)s, %(entity_type)s, %(entity_id)s, %(action)s,
+        %(changed_fields)s, %(source)s
+    )
+"""
+
+AUDIT_COLUMNS = ("user_id", "username", "role", "entity_type", "entity_id", "action",
+                 "before_data", "after_data", "changed_fields", "source", "created_at")
+AUDIT_JSON_COLUMNS = {"before_data", "after_data", "changed_fields"}
+AUDIT_COPY_SQL = f"COPY audit_log ({', '.join(AUDIT_COLUMNS)}) FROM STDIN"
+
+TASK_SNAPSHOT_BY_ID_SQL = "SELECT * FROM tasks WHERE id = %s"
+TASK_SNAPSHOT_BY_TRIP_SQL = "SELECT * FROM tasks WHERE trip_number = %s"
+
+
 class PostgresAuditRepository:
-    def __init__(self, connection):
+    """
+    Запись и чтение audit_log.
+
+    С buffer (AuditBuffer API) record/record_compact не ходят в БД, а только
+    кладут готовую запись в буфер; запись пачкой делает фоновый поток.
+    """
+
+    def __init__(self, connection, buffer: Any | None = None):
         self.connection = connection
+        self.buffer = buffer
 
     def record(
         self,
@@ -22,31 +61,17 @@ class PostgresAuditRepository:
         after_data: dict[str, Any] | None = None,
         source: str = "api",
     ) -> None:
-        changed_fields = self._changed_fields(before_data, after_data)
-        self.connection.execute(
-            """
-            INSERT INTO audit_log(
-                user_id, username, role, entity_type, entity_id, action,
-                before_data, after_data, changed_fields, source
-            )
-            VALUES (
-                %(user_id)s, %(username)s, %(role)s, %(entity_type)s, %(entity_id)s, %(action)s,
-                %(before_data)s, %(after_data)s, %(changed_fields)s, %(source)s
-            )
-            """,
-            {
-                "user_id": user.get("id"),
-                "username": user.get("username") or "",
-                "role": user.get("role") or "",
-                "entity_type": entity_type,
-                "entity_id": entity_id,
-                "action": action,
-                "before_data": Jsonb(self._json_safe(before_data)) if before_data is not None else None,
-                "after_data": Jsonb(self._json_safe(after_data)) if after_data is not None else None,
-                "changed_fields": Jsonb(self._json_safe(changed_fields)),
-                "source": source,
-            },
-        )
+        params = self._record_params(user=user,
+                                     entity_type=entity_type,
+                                     action=action,
+                                     entity_id=entity_id,
+                                     before_data=before_data,
+                                     after_data=after_data,
+                                     source=source)
+        if self.buffer is not None:
+            self.buffer.add(params)
+            return
+        self.connection.execute(AUDIT_INSERT_SQL, params)
 
     def record_compact(
         self,
@@ -58,34 +83,59 @@ class PostgresAuditRepository:
         summary: dict[str, Any] | None = None,
         source: str = "api",
     ) -> None:
-        self.connection.execute(
-            """
-            INSERT INTO audit_log(
-                user_id, username, role, entity_type, entity_id, action,
-                changed_fields, source
-            )
-            VALUES (
-                %(user_id)s, %(username)s, %(role)s, %(entity_type)s, %(entity_id)s, %(action)s,
-                %(changed_fields)s, %(source)s
-            )
-            """,
-            {
-                "user_id": user.get("id"),
-                "username": user.get("username") or "",
-                "role": user.get("role") or "",
-                "entity_type": entity_type,
-                "entity_id": entity_id,
-                "action": action,
-                "changed_fields": Jsonb(self._json_safe(summary or {})),
-                "source": source,
-            },
-        )
+        params = self._compact_params(user=user,
+                                      entity_type=entity_type,
+                                      action=action,
+                                      entity_id=entity_id,
+                                      summary=summary,
+                                      source=source)
+        if self.buffer is not None:
+            self.buffer.add(params)
+            return
+        self.connection.execute(AUDIT_COMPACT_INSERT_SQL, params)
+
+    def record_compact_many(
+        self,
+        *,
+        user: dict[str, Any],
+        entity_type: str,
+        action: str,
+        items: list[tuple[int | None, dict[str, Any]]],
+        source: str = "api",
+    ) -> None:
+        """Компактные записи пакета (entity_id, summary) одним COPY вместо INSERT на строку."""
+        entries = [self._compact_params(user=user,
+                                        entity_type=entity_type,
+                                        action=action,
+                                        entity_id=entity_id,
+                                        summary=summary,
+                                        source=source)
+                   for entity_id, summary in items]
+        if self.buffer is not None:
+            for entry in entries:
+                self.buffer.add(entry)
+            return
+        self.copy_entries(entries)
+
+    def copy_entries(self, entries: list[dict[str, Any]]) -> None:
+        if not entries:
+            return
+        with self.connection.transaction():
+            with self.connection.cursor() as cursor:
+                with cursor.copy(AUDIT_COPY_SQL) as copy:
+                    for entry in entries:
+                        copy.write_row(self._copy_row(entry))
+
+    def flush_buffer(self) -> int:
+        if self.buffer is None:
+            return 0
+        return self.buffer.flush(self.connection)
 
     def task_snapshot(self, task_id: int | None = None, *, trip_number: int | None = None) -> dict[str, Any] | None:
         if task_id is not None:
-            row = self.connection.execute("SELECT * FROM tasks WHERE id = %s", (task_id,)).fetchone()
+            row = self.connection.execute(TASK_SNAPSHOT_BY_ID_SQL, (task_id,)).fetchone()
         elif trip_number is not None:
-            row = self.connection.execute("SELECT * FROM tasks WHERE trip_number = %s", (trip_number,)).fetchone()
+            row = self.connection.execute(TASK_SNAPSHOT_BY_TRIP_SQL, (trip_number,)).fetchone()
         else:
             return None
         return dict(row) if row is not None else None
@@ -129,6 +179,70 @@ class PostgresAuditRepository:
         ).fetchall()
         return [dict(row) for row in rows]
 
+    @classmethod
+    def _record_params(
+        cls,
+        *,
+        user: dict[str, Any],
+        entity_type: str,
+        action: str,
+        entity_id: int | None,
+        before_data: dict[str, Any] | None,
+        after_data: dict[str, Any] | None,
+        source: str,
+    ) -> dict[str, Any]:
+        changed_fields = cls._changed_fields(before_data, after_data)
+        return {
+            **cls._user_params(user),
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "action": action,
+            "before_data": Jsonb(cls._json_safe(before_data)) if before_data is not None else None,
+            "after_data": Jsonb(cls._json_safe(after_data)) if after_data is not None else None,
+            "changed_fields": Jsonb(cls._json_safe(changed_fields)),
+            "source": source,
+        }
+
+    @classmethod
+    def _compact_params(
+        cls,
+        *,
+        user: dict[str, Any],
+        entity_type: str,
+        action: str,
+        entity_id: int | None,
+        summary: dict[str, Any] | None,
+        source: str,
+    ) -> dict[str, Any]:
+        return {
+            **cls._user_params(user),
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "action": action,
+            "changed_fields": Jsonb(cls._json_safe(summary or {})),
+            "source": source,
+        }
+
+    @staticmethod
+    def _copy_row(entry: dict[str, Any]) -> tuple[Any, ...]:
+        values = []
+        for column in AUDIT_COLUMNS:
+            value = entry.get(column)
+            if column in AUDIT_JSON_COLUMNS and value is not None and not isinstance(value, Jsonb):
+                value = Jsonb(value)
+            elif column == "created_at" and value is None:
+                value = datetime.now(timezone.utc)
+            values.append(value)
+        return tuple(values)
+
+    @staticmethod
+    def _user_params(user: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "user_id": user.get("id"),
+            "username": user.get("username") or "",
+            "role": user.get("role") or "",
+        }
+
     @classmethod
     def _changed_fields(
         cls,
@@ -3,6 +3,59 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any
 
+from Navigation_Bot.core.storage.postgres_pipeline import postgres_pipeline
+
+RoutePointSync = tuple[int, str, list[Any], list[bool]]
+
+EXISTING_ROUTE_POINTS_SQL = """
+    SELECT id, task_id, point_type, sequence, location, scheduled_time, comment, is_processed,
+           latitude, longitude, geocoding_source
+    FROM route_points
+    WHERE task_id = ANY(%s)
+"""
+
+INSERT_ROUTE_POINTS_SQL = """
+    INSERT INTO route_points (
+        task_id, sequence, point_type, location, scheduled_time,
+        comment, is_processed, latitude, longitude, geocoding_source, geocoded_at
+    )
+    SELECT v.task_id, v.sequence, v.point_type, v.location, v.scheduled_time,
+           v.comment, v.is_processed, v.latitude, v.longitude, v.geocoding_source,
+           CASE
+               WHEN v.latitude IS NOT NULL AND v.longitude IS NOT NULL THEN CURRENT_TIMESTAMP::text
+           END
+    FROM unnest(
+        %s::bigint[], %s::integer[], %s::text[], %s::text[], %s::text[],
+        %s::text[], %s::boolean[], %s::double precision[], %s::double precision[], %s::text[]
+    ) AS v(task_id, sequence, point_type, location, scheduled_time,
+           comment, is_processed, latitude, longitude, geocoding_source)
+"""
+
+UPDATE_ROUTE_POINTS_SQL = """
+    UPDATE route_points rp
+    SET location = v.location,
+        scheduled_time = v.scheduled_time,
+        comment = v.comment,
+        is_processed = v.is_processed,
+        latitude = v.latitude,
+        longitude = v.longitude,
+        geocoding_source = v.geocoding_source,
+        geocoded_at = CASE
+            WHEN v.latitude IS NOT NULL AND v.longitude IS NOT NULL
+                 AND (rp.latitude IS DISTINCT FROM v.latitude OR rp.longitude IS DISTINCT FROM v.longitude)
+            THEN CURRENT_TIMESTAMP::text
+            ELSE rp.geocoded_at
+        END,
+        updated_at = CURRENT_TIMESTAMP
+    FROM unnest(
+        %s::bigint[], %s::text[], %s::text[], %s::text[], %s::boolean[],
+        %s::double precision[], %s::double precision[], %s::text[]
+    ) AS v(id, location, scheduled_time, comment, is_processed, latitude, longitude, geocoding_source)
+    WHERE rp.id = v.id
+"""
+
+DELETE_ROUTE_POINTS_SQL = "DELETE FROM route_points WHERE id = ANY(%s)"
+
 
 @dataclass(slots=True)
 class PostgresRoutePointRepository:
@@ -10,110 +63,94 @@ class PostgresRoutePointRepository:
 
     def sync_route_points(self, task_id: int, point_type: str, points: list[Any], processed_unloads: list[bool],
                           source: str, ) -> None:
-        existing = self._existing_route_points(task_id, point_type)
-        seen_sequences: set[int] = set()
-
-        for point in points:
-            sequence = int(point.sequence)
-            seen_sequences.add(sequence)
-            is_processed = False
-            if point.kind == "unload":
-                unload_idx = max(sequence - 1, 0)
-                if unload_idx < len(processed_unloads):
-                    is_processed = bool(processed_unloads[unload_idx])
-
-            old = existing.get(sequence)
-            new_values = {"location": point.address or "",
-                          "scheduled_time": point.planned_datetime_text() or "",
-                          "comment": point.comment or "",
-                          "is_processed": is_processed,
-                          "latitude": point.latitude,
-                          "longitude": point.longitude,
-                          "geocoding_source": point.geocoding_source or (
-                              "parsed" if point.latitude is not None and point.longitude is not None else "" ),
-                          }
-
-            if old is None:
-                geocoded_at = "now" if new_values["latitude"] is not None and new_values[
-                    "longitude"] is not None else None
-                self.connection.execute(
-                    """
-                    INSERT INTO route_points (
-                        task_id, sequence, point_type, location, scheduled_time,
-                        comment, is_processed, latitude, longitude, geocoding_source, geocoded_at
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::timestamptz)
-                    """,
-                    (
-                        task_id,
-                        sequence,
-                        point.kind,
-                        new_values["location"],
-                        new_values["scheduled_time"],
-                        new_values["comment"],
-                        new_values["is_processed"],
-                        new_values["latitude"],
-                        new_values["longitude"],
-                        new_values["geocoding_source"],
-                        geocoded_at,
-                    ),
-                )
-                continue
-
-            if not any(old[field] != new_value for field, new_value in new_values.items()):
-                continue
-
-            self.connection.execute(
-                """
-                UPDATE route_points
-                SET location = %s,
-                    scheduled_time = %s,
-                    comment = %s,
-                    is_processed = %s,
-                    latitude = %s,
-                    longitude = %s,
-                    geocoding_source = %s,
-                    geocoded_at = CASE
-                        WHEN %s::double precision IS NOT NULL AND %s::double precision IS NOT NULL
-                             AND (latitude IS DISTINCT FROM %s::double precision OR longitude IS DISTINCT FROM %s::double precision)
-                        THEN CURRENT_TIMESTAMP::text
-                        ELSE geocoded_at
-                    END,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-                """,
-                (
-                    new_values["location"],
-                    new_values["scheduled_time"],
-                    new_values["comment"],
-                    new_values["is_processed"],
-                    new_values["latitude"],
-                    new_values["longitude"],
-                    new_values["geocoding_source"],
-                    new_values["latitude"],
-                    new_values["longitude"],
-                    new_values["latitude"],
-                    new_values["longitude"],
-                    old["id"],
-                ),
-            )
-
-        for sequence, old in existing.items():
-            if sequence not in seen_sequences:
-                self.connection.execute("DELETE FROM route_points WHERE id = %s", (old["id"],))
-
-    def _existing_route_points(self, task_id: int, point_type: str) -> dict[int, dict]:
-        rows = self.connection.execute(
-            """
-            SELECT id, sequence, location, scheduled_time, comment, is_processed,
-                   latitude, longitude, geocoding_source
-            FROM route_points
-            WHERE task_id = %s AND point_type = %s
-            """,
-            (task_id, point_type),
-        ).fetchall()
-        return {
-            int(row["sequence"]): {
+        self.sync_route_points_batch([(task_id, point_type, points, processed_unloads)], source)
+
+    def sync_route_points_batch(self, items: list[RoutePointSync], source: str) -> None:
+        """
+        Синхронизирует точки маршрута сразу для многих рейсов.
+
+        items: (task_id, point_type, points, processed_unloads).
+        Существующие точки читаются одним запросом по task_id = ANY(...),
+        изменения применяются не более чем тремя запросами: INSERT, UPDATE и DELETE.
+        """
+        if not items:
+            return
+
+        self.write_route_points(self.existing_route_points(items).fetchall(), items)
+
+    def existing_route_points(self, items: list[RoutePointSync]) -> Any:
+        """Отправляет чтение текущих точек рейсов из items; в pipeline ответ читается при fetchall()."""
+        return self.connection.execute(EXISTING_ROUTE_POINTS_SQL, (self._task_ids(items),))
+
+    def write_route_points(self, existing_rows: list[dict], items: list[RoutePointSync]) -> None:
+        """INSERT/UPDATE/DELETE точек по уже прочитанным existing_rows, одной пачкой в pipeline."""
+        with postgres_pipeline(self.connection):
+            for query, params in self._apply_statements(existing_rows, items):
+                self.connection.execute(query, params)
+
+    @staticmethod
+    def _task_ids(items: list[RoutePointSync]) -> list[int]:
+        return sorted({int(task_id) for task_id, *_ in items})
+
+    @classmethod
+    def _apply_statements(cls, existing_rows: list[dict], items: list[RoutePointSync]) -> list[tuple[str, Any]]:
+        existing = cls._group_existing(existing_rows)
+        inserts: list[tuple[Any, ...]] = []
+        updates: list[tuple[Any, ...]] = []
+        deletes: list[int] = []
+
+        for task_id, point_type, points, processed_unloads in items:
+            current = existing.get((int(task_id), point_type), {})
+            seen_sequences: set[int] = set()
+
+            for point in points:
+                sequence = int(point.sequence)
+                seen_sequences.add(sequence)
+                new_values = cls._point_values(point, processed_unloads)
+                old = current.get(sequence)
+
+                if old is None:
+                    inserts.append((int(task_id), sequence, point.kind, *new_values.values()))
+                    continue
+
+                if any(old[field] != new_value for field, new_value in new_values.items()):
+                    updates.append((old["id"], *new_values.values()))
+
+            deletes.extend(old["id"] for sequence, old in current.items() if sequence not in seen_sequences)
+
+        statements: list[tuple[str, Any]] = []
+        if inserts:
+            statements.append((INSERT_ROUTE_POINTS_SQL, [list(column) for column in zip(*inserts)]))
+        if updates:
+            statements.append((UPDATE_ROUTE_POINTS_SQL, [list(column) for column in zip(*updates)]))
+        if deletes:
+            statements.append((DELETE_ROUTE_POINTS_SQL, (deletes,)))
+        return statements
+
+    @staticmethod
+    def _point_values(point: Any, processed_unloads: list[bool]) -> dict[str, Any]:
+        sequence = int(point.sequence)
+        is_processed = False
+        if point.kind == "unload":
+            unload_idx = max(sequence - 1, 0)
+            if unload_idx < len(processed_unloads):
+                is_processed = bool(processed_unloads[unload_idx])
+
+        return {"location": point.address or "",
+                "scheduled_time": point.planned_datetime_text() or "",
+                "comment": point.comment or "",
+                "is_processed": is_processed,
+                "latitude": point.latitude,
+                "longitude": point.longitude,
+                "geocoding_source": point.geocoding_source or (
+                    "parsed" if point.latitude is not None and point.longitude is not None else ""),
+                }
+
+    @staticmethod
+    def _group_existing(rows: list[dict]) -> dict[tuple[int, str], dict[int, dict]]:
+        existing: dict[tuple[int, str], dict[int, dict]] = {}
+        for row in rows:
+            existing.setdefault((int(row["task_id"]), row["point_type"]), {})[int(row["sequence"])] = {
                 "id": int(row["id"]),
                 "location": row["location"] or "",
                 "scheduled_time": row["scheduled_time"] or "",
@@ -123,5 +160,4 @@ class PostgresRoutePointRepository:
                 "longitude": row["longitude"],
                 "geocoding_source": row["geocoding_source"] or "",
             }
-            for row in rows
-        }
+        return existing
@@ -0,0 +1,564 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from Navigation_Bot.core.domain.entities.task import Task
+from Navigation_Bot.core.domain.mappers.task_mapper import TaskMapper
+from Navigation_Bot.core.repositories.postgres_route_point_repository import PostgresRoutePointRepository
+from Navigation_Bot.core.repositories.postgres_task_lookup import TRIP_NUMBER_SEQUENCE, PostgresTaskLookup
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter, TaskConflictError
+from Navigation_Bot.core.storage.postgres_pipeline import postgres_pipeline
+
+STAGE_TABLE = "task_batch_stage"
+
+STAGE_COLUMNS = (
+    "row_number",
+    "trip_number",
+    "db_task_id",
+    "google_sheet_row",
+    "carrier_name",
+    "plate_number",
+    "monitoring_id",
+    "brand",
+    "model",
+    "vehicle_is_active",
+    "driver_name",
+    "driver_phone",
+    "driver_is_active",
+    "status",
+    "planned_start_at",
+    "planned_end_at",
+    "actual_start_at",
+    "actual_end_at",
+    "raw_load",
+    "raw_unload",
+    "comm_load",
+    "comm_unload",
+    "highlight_until",
+    "google_worksheet_title",
+    "expected_updated_at",
+)
+
+
+@dataclass(slots=True)
+class _StagedRow:
+    position: int
+    row: dict[str, Any]
+    task: Task
+    keys: tuple[tuple[Any, ...], ...]
+    values: tuple[Any, ...]
+
+
+@dataclass(slots=True)
+class PostgresTaskBulkWriter:
+    """
+    Set-based вариант PostgresTaskWriter.upsert_from_row для пакетов строк.
+
+    Строки копируются во временную таблицу через COPY, после чего перевозчики,
+    транспорт, водители, номера рейсов и сами рейсы разрешаются несколькими
+    INSERT ... ON CONFLICT / UPDATE ... FROM на весь сегмент пакета.
+    Сегмент обрывается на строке, которая повторно затрагивает рейс, машину или
+    водителя из того же сегмента: такие строки применяются следующим сегментом,
+    чтобы результат совпадал с построчной записью.
+    """
+    connection: Any
+    source_key: str = ""
+
+    def upsert_rows(self, rows: list[Any], *, source: str = "user") -> list[dict[str, Any] | None]:
+        results: list[dict[str, Any] | None] = [None] * len(rows)
+        staged = self._stage_rows(rows)
+        if not staged:
+            return results
+
+        with self.connection.transaction():
+            self._create_stage()
+            start = 0
+            while start < len(staged):
+                segment = self._next_segment(staged, start)
+                start += self._apply_segment(segment, source=source, results=results)
+        return results
+
+    def _stage_rows(self, rows: list[Any]) -> list[_StagedRow]:
+        lookup = PostgresTaskLookup(self.connection, self.source_key)
+        staged: list[_StagedRow] = []
+
+        for position, row in enumerate(rows):
+            if not isinstance(row, dict):
+                continue
+            task = TaskMapper.from_dict(row)
+            trip_number = lookup.to_int_or_none(row.get("trip_number"))
+            db_task_id = lookup.to_int_or_none(row.get("db_task_id"))
+            google_sheet_row = (self._positive_int_or_none(lookup, row.get("google_sheet_row"))
+                                or self._positive_int_or_none(lookup, row.get("index")))
+            plate_number = str(task.vehicle.plate_number or "").strip()
+            monitoring_id = task.vehicle.monitoring_id if plate_number else None
+            driver_name = str(task.driver.full_name or "").strip()
+            driver_phone = str(task.driver.phone or "").strip()
+
+            keys = tuple(
+                key for key, present in (
+                    (("trip", trip_number), trip_number is not None),
+                    (("task", db_task_id), db_task_id is not None),
+                    (("row", google_sheet_row), google_sheet_row is not None),
+                    (("plate", plate_number), bool(plate_number)),
+                    (("monitoring", monitoring_id), monitoring_id is not None),
+                    (("driver", driver_name, driver_phone), bool(driver_name or driver_phone)),
+                )
+                if present
+            )
+            loads = task.route_plan.loads
+            unloads = task.route_plan.unloads
+            values = (
+                position,
+                trip_number,
+                db_task_id,
+                google_sheet_row,
+                str(task.carrier.name if task.carrier else "").strip(),
+                plate_number,
+                monitoring_id,
+                task.vehicle.brand or "",
+                task.vehicle.model or "",
+                bool(task.vehicle.is_active),
+                driver_name,
+                driver_phone,
+                bool(task.driver.is_active),
+                PostgresTaskWriter._status_from_row(row),
+                PostgresTaskWriter._first_planned_time(loads),
+                PostgresTaskWriter._last_planned_time(unloads),
+                self._text_or_none(row.get("actual_start_at")),
+                self._text_or_none(row.get("actual_end_at")),
+                task.raw_load,
+                task.raw_unload,
+                task.comm_load,
+                task.comm_unload,
+                self._text_or_none(task.highlight_until),
+                self.source_key or self._text_or_none(row.get("google_worksheet_title")),
+                row.get("updated_at") or None,
+            )
+            staged.append(_StagedRow(position=position, row=row, task=task, keys=keys, values=values))
+        return staged
+
+    @staticmethod
+    def _next_segment(staged: list[_StagedRow], start: int) -> list[_StagedRow]:
+        seen: set[tuple[Any, ...]] = set()
+        segment: list[_StagedRow] = []
+        for item in staged[start:]:
+            if segment and seen.intersection(item.keys):
+                break
+            seen.update(item.keys)
+            segment.append(item)
+        return segment
+
+    def _apply_segment(self, segment: list[_StagedRow], *, source: str,
+                       results: list[dict[str, Any] | None]) -> int:
+        self.connection.execute(f"TRUNCATE {STAGE_TABLE}")
+        self._copy_stage(segment)
+        # COPY в pipeline mode недоступен; остальные шаги сегмента отправляются пачками
+        # до первого чтения результата (отсечение, конфликт, итоговые id).
+        with postgres_pipeline(self.connection):
+            self._resolve_trip_numbers()
+            self._map_existing_vehicles()
+            segment = self._cut_dependent_rows(segment)
+            self._allocate_trip_numbers()
+            self._resolve_carriers()
+            self._resolve_vehicles()
+            self._resolve_drivers()
+            self._update_existing_tasks()
+            self._raise_first_conflict()
+            self._insert_new_tasks()
+
+            resolved = {
+                int(row["row_number"]): row
+                for row in self.connection.execute(
+                    f"""
+                    SELECT row_number, task_id, trip_number, google_sheet_row, updated_at, created
+                    FROM {STAGE_TABLE}
+                    """
+                ).fetchall()
+            }
+
+            route_point_items = []
+            for item in segment:
+                stage_row = resolved[item.position]
+                task_id = int(stage_row["task_id"])
+                processed_unloads = item.task.processing.processed_unloads
+                route_point_items.append((task_id, "load", item.task.route_plan.loads, processed_unloads))
+                route_point_items.append((task_id, "unload", item.task.route_plan.unloads, processed_unloads))
+
+                item.row["trip_number"] = int(stage_row["trip_number"])
+                item.row["google_sheet_row"] = stage_row["google_sheet_row"]
+                item.row["db_task_id"] = task_id
+                item.row["updated_at"] = stage_row["updated_at"]
+                results[item.position] = {"task_id": task_id,
+                                          "trip_number": int(stage_row["trip_number"]),
+                                          "updated_at": stage_row["updated_at"],
+                                          "created": bool(stage_row["created"])}
+
+            PostgresRoutePointRepository(self.connection).sync_route_points_batch(route_point_items, source)
+        return len(segment)
+
+    def _create_stage(self) -> None:
+        self.connection.execute(
+            f"""
+            CREATE TEMP TABLE {STAGE_TABLE} (
+                row_number integer PRIMARY KEY,
+                trip_number integer,
+                db_task_id bigint,
+                google_sheet_row integer,
+                carrier_name text NOT NULL,
+                plate_number text NOT NULL,
+                monitoring_id integer,
+                brand text NOT NULL,
+                model text NOT NULL,
+                vehicle_is_active boolean NOT NULL,
+                driver_name text NOT NULL,
+                driver_phone text NOT NULL,
+                driver_is_active boolean NOT NULL,
+                status text NOT NULL,
+                planned_start_at text,
+                planned_end_at text,
+                actual_start_at text,
+                actual_end_at text,
+                raw_load text NOT NULL,
+                raw_unload text NOT NULL,
+                comm_load text NOT NULL,
+                comm_unload text NOT NULL,
+                highlight_until text,
+                google_worksheet_title text,
+                expected_updated_at timestamptz,
+                carrier_id bigint,
+                vehicle_id bigint,
+                plate_vehicle_id bigint,
+                driver_id bigint,
+                task_id bigint,
+                updated_at timestamptz,
+                created boolean NOT NULL DEFAULT false
+            ) ON COMMIT DROP
+            """
+        )
+
+    def _copy_stage(self, staged: list[_StagedRow]) -> None:
+        columns = ", ".join(STAGE_COLUMNS)
+        with self.connection.cursor() as cursor:
+            with cursor.copy(f"COPY {STAGE_TABLE} ({columns}) FROM STDIN") as copy:
+                for item in staged:
+                    copy.write_row(item.values)
+
+    def _resolve_trip_numbers(self) -> None:
+        self.connection.execute(
+            f"""
+            UPDATE {STAGE_TABLE} s
+            SET trip_number = t.trip_number
+            FROM tasks t
+            WHERE s.trip_number IS NULL
+              AND s.db_task_id IS NOT NULL
+              AND t.id = s.db_task_id
+            """
+        )
+        if self.source_key:
+            self.connection.execute(
+                f"""
+                UPDATE {STAGE_TABLE} s
+                SET trip_number = (
+                    SELECT t.trip_number
+                    FROM tasks t
+                    WHERE t.google_sheet_row = s.google_sheet_row
+                      AND (t.google_worksheet_title = %(source_key)s OR t.google_worksheet_title IS NULL)
+                    ORDER BY CASE WHEN t.google_worksheet_title = %(source_key)s THEN 0 ELSE 1 END
+                    LIMIT 1
+                )
+                WHERE s.trip_number IS NULL
+                  AND s.google_sheet_row IS NOT NULL
+                """,
+                {"source_key": self.source_key},
+            )
+            return
+
+        self.connection.execute(
+            f"""
+            UPDATE {STAGE_TABLE} s
+            SET trip_number = (
+                SELECT t.trip_number
+                FROM tasks t
+                WHERE t.google_sheet_row = s.google_sheet_row
+                LIMIT 1
+            )
+            WHERE s.trip_number IS NULL
+              AND s.google_sheet_row IS NOT NULL
+            """
+        )
+
+    def _map_existing_vehicles(self) -> None:
+        self.connection.execute(
+            f"""
+            UPDATE {STAGE_TABLE} s
+            SET vehicle_id = v.id
+            FROM vehicles v
+            WHERE s.monitoring_id IS NOT NULL
+              AND v.monitoring_id = s.monitoring_id
+            """
+        )
+        self.connection.execute(
+            f"""
+            UPDATE {STAGE_TABLE} s
+            SET plate_vehicle_id = v.id
+            FROM vehicles v
+            WHERE s.vehicle_id IS NULL
+              AND s.plate_number <> ''
+              AND v.plate_number = s.plate_number
+            """
+        )
+
+    def _cut_dependent_rows(self, segment: list[_StagedRow]) -> list[_StagedRow]:
+        # Новая строка без номера после строки с явным номером впереди последовательности
+        # уходит в следующий сегмент: построчно она получила бы номер уже после вставки явного.
+        row = self.connection.execute(
+            f"""
+            WITH sequence_state AS (
+                SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END AS issued
+                FROM {TRIP_NUMBER_SEQUENCE}
+            )
+            SELECT MIN(s.row_number) AS row_number
+            FROM {STAGE_TABLE} s
+            WHERE EXISTS (
+                SELECT 1
+                FROM {STAGE_TABLE} earlier
+                WHERE earlier.row_number < s.row_number
+                  AND (
+                      earlier.trip_number = s.trip_number
+                      OR COALESCE(earlier.vehicle_id, earlier.plate_vehicle_id)
+                         = COALESCE(s.vehicle_id, s.plate_vehicle_id)
+                      OR (s.trip_number IS NULL
+                          AND earlier.trip_number > (SELECT issued FROM sequence_state))
+                  )
+            )
+            """
+        ).fetchone()
+        cut = row["row_number"] if row is not None else None
+        if cut is None:
+            return segment
+        self.connection.execute(f"DELETE FROM {STAGE_TABLE} WHERE row_number >= %s", (cut,))
+        return [item for item in segment if item.position < cut]
+
+    def _allocate_trip_numbers(self) -> None:
+        self.connection.execute(
+            f"""
+            WITH numbered AS (
+                SELECT row_number, ROW_NUMBER() OVER (ORDER BY row_number) AS position
+                FROM {STAGE_TABLE}
+                WHERE trip_number IS NULL
+            ),
+            reserved AS (
+                SELECT value, ROW_NUMBER() OVER (ORDER BY value) AS position
+                FROM (SELECT nextval('{TRIP_NUMBER_SEQUENCE}') AS value FROM numbered) AS allocated
+            )
+            UPDATE {STAGE_TABLE} s
+            SET trip_number = reserved.value
+            FROM numbered
+            JOIN reserved ON reserved.position = numbered.position
+            WHERE s.row_number = numbered.row_number
+            """
+        )
+
+    def _resolve_carriers(self) -> None:
+        self.connection.execute(
+            f"""
+            WITH upserted AS (
+                INSERT INTO carriers(name)
+                SELECT DISTINCT carrier_name
+                FROM {STAGE_TABLE}
+                WHERE carrier_name <> ''
+                ON CONFLICT(name) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+                RETURNING id, name
+            )
+            UPDATE {STAGE_TABLE} s
+            SET carrier_id = upserted.id
+            FROM upserted
+            WHERE s.carrier_name = upserted.name
+            """
+        )
+
+    def _resolve_vehicles(self) -> None:
+        self.connection.execute(
+            f"""
+            UPDATE vehicles v
+            SET carrier_id = COALESCE(s.carrier_id, v.carrier_id),
+                brand = COALESCE(NULLIF(s.brand, ''), v.brand),
+                model = COALESCE(NULLIF(s.model, ''), v.model),
+                is_active = s.vehicle_is_active,
+                updated_at = CURRENT_TIMESTAMP
+            FROM {STAGE_TABLE} s
+            WHERE v.id = s.vehicle_id
+            """
+        )
+        self.connection.execute(
+            f"""
+            WITH upserted AS (
+                INSERT INTO vehicles(plate_number, monitoring_id, carrier_id, brand, model, is_active)
+                SELECT plate_number, monitoring_id, carrier_id, brand, model, vehicle_is_active
+                FROM {STAGE_TABLE}
+                WHERE plate_number <> ''
+                  AND vehicle_id IS NULL
+                ON CONFLICT(plate_number) DO UPDATE SET
+                    monitoring_id = COALESCE(excluded.monitoring_id, vehicles.monitoring_id),
+                    carrier_id = excluded.carrier_id,
+                    brand = excluded.brand,
+                    model = excluded.model,
+                    is_active = excluded.is_active,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING id, plate_number
+            )
+            UPDATE {STAGE_TABLE} s
+            SET vehicle_id = upserted.id
+            FROM upserted
+            WHERE s.vehicle_id IS NULL
+              AND s.plate_number = upserted.plate_number
+            """
+        )
+
+    def _resolve_drivers(self) -> None:
+        self.connection.execute(
+            f"""
+            UPDATE {STAGE_TABLE} s
+            SET driver_id = existing.id
+            FROM (
+                SELECT MIN(id) AS id, full_name, phone
+                FROM drivers
+                WHERE (full_name, phone) IN (SELECT driver_name, driver_phone FROM {STAGE_TABLE})
+                GROUP BY full_name, phone
+            ) existing
+            WHERE (s.driver_name <> '' OR s.driver_phone <> '')
+              AND existing.full_name = s.driver_name
+              AND existing.phone = s.driver_phone
+            """
+        )
+        self.connection.execute(
+            f"""
+            UPDATE drivers d
+            SET carrier_id = s.carrier_id,
+                is_active = s.driver_is_active,
+                updated_at = CURRENT_TIMESTAMP
+            FROM {STAGE_TABLE} s
+            WHERE d.id = s.driver_id
+            """
+        )
+        self.connection.execute(
+            f"""
+            WITH inserted AS (
+                INSERT INTO drivers(full_name, phone, carrier_id, is_active)
+                SELECT driver_name, driver_phone, carrier_id, driver_is_active
+                FROM {STAGE_TABLE}
+                WHERE driver_id IS NULL
+                  AND (driver_name <> '' OR driver_phone <> '')
+                RETURNING id, full_name, phone
+            )
+            UPDATE {STAGE_TABLE} s
+            SET driver_id = inserted.id
+            FROM inserted
+            WHERE s.driver_id IS NULL
+              AND s.driver_name = inserted.full_name
+              AND s.driver_phone = inserted.phone
+            """
+        )
+
+    def _update_existing_tasks(self) -> None:
+        self.connection.execute(
+            f"""
+            UPDATE {STAGE_TABLE} s
+            SET task_id = t.id
+            FROM tasks t
+            WHERE t.trip_number = s.trip_number
+            """
+        )
+        self.connection.execute(
+            f"""
+            WITH updated AS (
+                UPDATE tasks t
+                SET google_sheet_row = s.google_sheet_row,
+                    vehicle_id = s.vehicle_id,
+                    driver_id = s.driver_id,
+                    carrier_id = s.carrier_id,
+                    status = s.status,
+                    planned_start_at = s.planned_start_at,
+                    planned_end_at = s.planned_end_at,
+                    raw_load = s.raw_load,
+                    raw_unload = s.raw_unload,
+                    comm_load = s.comm_load,
+                    comm_unload = s.comm_unload,
+                    highlight_until = s.highlight_until,
+                    actual_start_at = s.actual_start_at,
+                    actual_end_at = s.actual_end_at,
+                    google_worksheet_title = s.google_worksheet_title,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM {STAGE_TABLE} s
+                WHERE t.id = s.task_id
+                  AND (s.expected_updated_at IS NULL OR t.updated_at = s.expected_updated_at)
+                RETURNING t.id, t.updated_at
+            )
+            UPDATE {STAGE_TABLE} s
+            SET updated_at = updated.updated_at
+            FROM updated
+            WHERE s.task_id = updated.id
+            """
+        )
+
+    def _raise_first_conflict(self) -> None:
+        conflict = self.connection.execute(
+            f"""
+            SELECT s.row_number, s.task_id, s.expected_updated_at, t.updated_at AS current_updated_at
+            FROM {STAGE_TABLE} s
+            LEFT JOIN tasks t ON t.id = s.task_id
+            WHERE s.task_id IS NOT NULL
+              AND s.updated_at IS NULL
+            ORDER BY s.row_number
+            LIMIT 1
+            """
+        ).fetchone()
+        if conflict is None:
+            return
+        raise TaskConflictError(task_id=int(conflict["task_id"]),
+                                expected_updated_at=conflict["expected_updated_at"],
+                                current_updated_at=conflict["current_updated_at"],
+                                row_number=int(conflict["row_number"]) + 1)
+
+    def _insert_new_tasks(self) -> None:
+        self.connection.execute(
+            f"""
+            WITH inserted AS (
+                INSERT INTO tasks (
+                    trip_number, google_sheet_row, vehicle_id, driver_id, carrier_id,
+                    status, planned_start_at, planned_end_at, actual_start_at, actual_end_at,
+                    raw_load, raw_unload, comm_load, comm_unload, highlight_until,
+                    google_worksheet_title
+                )
+                SELECT trip_number, google_sheet_row, vehicle_id, driver_id, carrier_id,
+                       status, planned_start_at, planned_end_at, actual_start_at, actual_end_at,
+                       raw_load, raw_unload, comm_load, comm_unload, highlight_until,
+                       google_worksheet_title
+                FROM {STAGE_TABLE}
+                WHERE task_id IS NULL
+                ORDER BY row_number
+                RETURNING id, trip_number, updated_at
+            )
+            UPDATE {STAGE_TABLE} s
+            SET task_id = inserted.id,
+                updated_at = inserted.updated_at,
+                created = true
+            FROM inserted
+            WHERE s.trip_number = inserted.trip_number
+            """
+        )
+
+    @staticmethod
+    def _positive_int_or_none(lookup: PostgresTaskLookup, value: Any) -> int | None:
+        parsed = lookup.to_int_or_none(value)
+        if parsed is None or parsed <= 0:
+            return None
+        return parsed
+
+    @staticmethod
+    def _text_or_none(value: Any) -> str | None:
+        if value is None:
+            return None
+        return str(value)
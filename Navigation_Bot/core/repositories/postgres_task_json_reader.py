@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from Navigation_Bot.core.repositories.postgres_task_reader import (EXPORT_ORDER_SQL,
+                                                                   TASK_SELECT_SQL,
+                                                                   PostgresTaskReader)
+
+# Точки маршрута одной задачи, уже собранные в JSON-фрагменты списков loads/unloads/Погрузка/Выгрузка.
+ROUTE_POINTS_JSON_SQL = """
+    SELECT
+        string_agg(p.view_json, ',' ORDER BY p.sequence) FILTER (WHERE p.point_type = 'load') AS loads,
+        string_agg(p.view_json, ',' ORDER BY p.sequence) FILTER (WHERE p.point_type = 'unload') AS unloads,
+        string_agg(p.processed_json, ',' ORDER BY p.sequence)
+            FILTER (WHERE p.point_type = 'unload') AS processed,
+        string_agg(p.block_json, ',' ORDER BY p.sequence) FILTER (WHERE p.point_type = 'load') AS load_blocks,
+        string_agg(p.block_json, ',' ORDER BY p.sequence) FILTER (WHERE p.point_type = 'unload') AS unload_blocks
+    FROM (
+        SELECT
+            rp.sequence,
+            rp.point_type,
+            concat('{"sequence":', to_json(rp.sequence),
+                   ',"address":', to_json(COALESCE(rp.location, '')),
+                   ',"date":', to_json(dt.date_text),
+                   ',"time":', to_json(dt.time_text),
+                   ',"comment":', to_json(COALESCE(rp.comment, '')),
+                   ',"latitude":', COALESCE(gui_float_text(rp.latitude), 'null'),
+                   ',"longitude":', COALESCE(gui_float_text(rp.longitude), 'null'),
+                   ',"is_processed":', to_json(COALESCE(rp.is_processed, false)),
+                   '}') AS view_json,
+            to_json(COALESCE(rp.is_processed, false))::text AS processed_json,
+            NULLIF(concat_ws(',',
+                CASE WHEN rp.location <> '' OR rp.scheduled_time <> '' THEN concat(
+                    '{', to_json(CASE rp.point_type WHEN 'load' THEN 'Погрузка ' ELSE 'Выгрузка ' END || rp.sequence),
+                    ':', to_json(COALESCE(rp.location, '')),
+                    ',', to_json('Дата ' || rp.sequence), ':', to_json(dt.date_text),
+                    ',', to_json('Время ' || rp.sequence), ':', to_json(dt.time_text),
+                    CASE WHEN rp.latitude IS NOT NULL AND rp.longitude IS NOT NULL THEN concat(
+                        ',', to_json('Координаты ' || rp.sequence),
+                        ':', to_json(gui_coordinate_pair_text(rp.latitude, rp.longitude)))
+                    END,
+                    '}')
+                END,
+                CASE WHEN rp.comment <> '' THEN concat('{"Комментарий":', to_json(rp.comment), '}') END
+            ), '') AS block_json
+        FROM route_points rp
+        CROSS JOIN LATERAL (
+            -- Как PostgresTaskReader._split_datetime_text: два первых слова — дата и время,
+            -- одно слово с ':' — время, иначе дата.
+            SELECT
+                CASE WHEN m.parts[2] IS NOT NULL OR strpos(m.parts[1], ':') = 0 THEN m.parts[1] ELSE '' END AS date_text,
+                CASE WHEN m.parts[2] IS NOT NULL THEN m.parts[2]
+                     WHEN strpos(m.parts[1], ':') > 0 THEN m.parts[1]
+                     ELSE '' END AS time_text
+            -- OFFSET 0 не даёт планировщику подставить regexp_match в каждое обращение к parts.
+            FROM (SELECT COALESCE(regexp_match(rp.scheduled_time, '^\\s*(\\S+)(?:\\s+(\\S+))?'),
+                                  ARRAY['', NULL]) AS parts
+                  OFFSET 0) m
+        ) dt
+        WHERE rp.task_id = t.id
+    ) p
+"""
+
+# Строка GUI целиком одним JSON-текстом: те же ключи, в том же порядке и в том же виде,
+# что даёт json.dumps(to_jsonable_python(...)) для PostgresTaskReader._task_row_to_gui_dict.
+TASK_JSON_SQL = """
+    WITH page AS ({page_sql})
+    SELECT
+        t.id AS db_task_id,
+        t.updated_at,
+        concat(
+            '{"vehicle_plate":', to_json(COALESCE(t.plate_number, '')),
+            ',"vehicle_monitoring_id":', COALESCE(to_json(t.monitoring_id)::text, 'null'),
+            ',"driver_name":', to_json(COALESCE(t.driver_name, '')),
+            ',"driver_phone":', to_json(COALESCE(t.driver_phone, '')),
+            ',"carrier_name":', to_json(COALESCE(t.carrier_name, '')),
+            ',"index":', COALESCE(to_json(t.google_sheet_row)::text, 'null'),
+            ',"google_sheet_row":', COALESCE(to_json(t.google_sheet_row)::text, 'null'),
+            ',"trip_number":', to_json(t.trip_number),
+            ',"db_task_id":', to_json(t.id),
+            ',"updated_at":', to_json(gui_timestamp_text(t.updated_at)),
+            ',"status":', to_json(COALESCE(t.status, '')),
+            ',"ТС":', to_json(COALESCE(t.plate_number, '')),
+            ',"Телефон":', to_json(COALESCE(t.driver_phone, '')),
+            ',"ФИО":', to_json(COALESCE(t.driver_name, '')),
+            ',"КА":', to_json(COALESCE(t.carrier_name, '')),
+            ',"loads":[', points.loads, ']',
+            ',"unloads":[', points.unloads, ']',
+            ',"processed_unloads":[', points.processed, ']',
+            ',"Погрузка":[', points.load_blocks, ']',
+            ',"Выгрузка":[', points.unload_blocks, ']',
+            ',"processed":[', points.processed, ']',
+            ',"raw_load":', to_json(COALESCE(t.raw_load, '')),
+            ',"raw_unload":', to_json(COALESCE(t.raw_unload, '')),
+            CASE WHEN t.monitoring_id IS NOT NULL THEN concat(',"id":', to_json(t.monitoring_id)) END,
+            CASE WHEN t.highlight_until <> '' THEN concat(',"highlight_until":', to_json(t.highlight_until)) END,
+            ',"navigation":', CASE WHEN s.navigation_id IS NULL THEN '{}' ELSE concat(
+                '{"geo_text":', to_json(COALESCE(s.geo_text, '')),
+                ',"geo_zone":', to_json(COALESCE(s.geo_zona, '')),
+                ',"coordinates":', to_json(COALESCE(s.coordinates, '')),
+                ',"speed_kmh":', COALESCE(gui_float_text(s.speed_kmh), 'null'),
+                ',"gps_fix_text":', to_json(COALESCE(s.gps_fix_text, '')),
+                ',"gps_fix_age_seconds":', COALESCE(to_json(s.gps_fix_age_seconds)::text, 'null'),
+                ',"has_fresh_coordinates":', to_json(COALESCE(s.has_fresh_coordinates, false)),
+                '}') END,
+            CASE WHEN s.navigation_id IS NOT NULL THEN concat(
+                ',"гео":', to_json(COALESCE(s.geo_text, '')),
+                ',"geo_zona":', to_json(COALESCE(s.geo_zona, '')),
+                ',"коор":', to_json(COALESCE(s.coordinates, '')),
+                ',"_новые_координаты":', to_json(COALESCE(s.has_fresh_coordinates, false)),
+                CASE WHEN s.speed_kmh IS NOT NULL THEN concat(',"скорость":', gui_float_text(s.speed_kmh)) END,
+                CASE WHEN s.gps_fix_text <> '' OR s.gps_fix_age_seconds IS NOT NULL THEN concat(
+                    ',"gps_fix_age":{"text":', to_json(COALESCE(s.gps_fix_text, '')),
+                    ',"age_second":', COALESCE(to_json(s.gps_fix_age_seconds)::text, 'null'),
+                    '}') END) END,
+            ',"route_estimate":', CASE WHEN s.estimate_id IS NULL THEN '{}' ELSE concat(
+                '{"distance_km":', COALESCE(gui_float_text(s.distance_km), 'null'),
+                ',"duration_minutes":', COALESCE(to_json(s.duration_minutes)::text, 'null'),
+                ',"arrival_time":', to_json(COALESCE(s.arrival_time, '')),
+                ',"on_time":', to_json(COALESCE(s.on_time, false)),
+                ',"buffer_minutes":', COALESCE(to_json(s.buffer_minutes)::text, 'null'),
+                ',"time_buffer_text":', to_json(COALESCE(s.time_buffer_text, '')),
+                '}') END,
+            CASE WHEN s.estimate_id IS NOT NULL THEN concat(
+                ',"Маршрут":{"расстояние":', to_json(COALESCE(gui_float_text(s.distance_km), 'None') || ' км'),
+                ',"длительность":', to_json(COALESCE(s.duration_minutes::text, 'None') || ' мин'),
+                ',"время прибытия":', to_json(COALESCE(s.arrival_time, '')),
+                ',"успеет":', to_json(COALESCE(s.on_time, false)),
+                ',"time_buffer":', to_json(COALESCE(s.time_buffer_text, '')),
+                ',"buffer_minutes":', COALESCE(to_json(s.buffer_minutes)::text, 'null'),
+                '}') END,
+            '}') AS item_json
+    FROM page t
+    LEFT JOIN task_latest_state s ON s.task_id = t.id
+    LEFT JOIN LATERAL ({route_points_sql}) points ON true
+    ORDER BY {order_sql}
+"""
+
+
+@dataclass(slots=True)
+class PostgresTaskJsonReader:
+    """
+    Строки GUI одним SQL-запросом, сразу готовым JSON-текстом.
+
+    Вместо трёх запросов (задачи, точки маршрута, последнее состояние) и сборки словаря
+    в Python сервер отдаёт item_json — ровно те байты, которые получились бы из
+    PostgresTaskReader после json.dumps(..., separators=(",", ":")). API вставляет их
+    в ответ без повторного кодирования. Фильтры и курсоры берутся из PostgresTaskReader.
+    """
+    connection: Any
+
+    def load_active_json_after(self,
+                               source_key: str = "",
+                               *,
+                               include_null_source: bool = True,
+                               limit: int = 100,
+                               after: tuple[Any, int] | None = None,
+                               updated_since: str | None = None,
+                               include_completed: bool = False,
+                               date_from: str | None = None,
+                               date_to: str | None = None,
+                               include_total: bool = False
+                               ) -> tuple[list[dict], tuple[Any, int] | None, int | None]:
+        """Keyset-страница как у PostgresTaskReader.load_active_rows_after; строки — db_task_id, updated_at, item_json."""
+        queries = self._queries()
+        where_sql, params = queries._page_filter_sql(source_key,
+                                                     include_null_source=include_null_source,
+                                                     updated_since=updated_since,
+                                                     include_completed=include_completed,
+                                                     date_from=date_from,
+                                                     date_to=date_to,
+                                                     updated_since_inclusive=after is not None)
+        total = queries._count_rows(where_sql, params) if include_total else None
+        page_sql, page_params = queries._keyset_page_sql(where_sql, params, after=after, limit=limit)
+        rows = self.connection.execute(self._json_sql(page_sql, "t.updated_at, t.id"), page_params).fetchall()
+        rows, next_after = queries._split_keyset_page(rows, limit, id_key="db_task_id")
+        return rows, next_after, total
+
+    def iter_active_json_chunks(self,
+                                source_key: str = "",
+                                *,
+                                include_null_source: bool = True,
+                                include_completed: bool = False,
+                                date_from: str | None = None,
+                                date_to: str | None = None,
+                                chunk_size: int = 200) -> Iterator[list[dict]]:
+        """Порции для /tasks/export через server-side cursor, порядок как у iter_active_row_chunks."""
+        queries = self._queries()
+        where_sql, params = queries._page_filter_sql(source_key,
+                                                     include_null_source=include_null_source,
+                                                     updated_since=None,
+                                                     include_completed=include_completed,
+                                                     date_from=date_from,
+                                                     date_to=date_to)
+        query = self._json_sql(f"{TASK_SELECT_SQL} WHERE {where_sql}", EXPORT_ORDER_SQL)
+        yield from queries._iter_query_chunks(query, params, chunk_size=chunk_size)
+
+    @staticmethod
+    def _json_sql(page_sql: str, order_sql: str) -> str:
+        # Не str.format: в SQL много литеральных фигурных скобок JSON.
+        return (TASK_JSON_SQL.replace("{page_sql}", page_sql)
+                .replace("{route_points_sql}", ROUTE_POINTS_JSON_SQL)
+                .replace("{order_sql}", order_sql))
+
+    def _queries(self) -> PostgresTaskReader:
+        return PostgresTaskReader(self.connection)
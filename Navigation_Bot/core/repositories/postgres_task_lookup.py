@@ -5,6 +5,20 @@ from dataclasses import dataclass
 from typing import Any
 
 
+TRIP_BY_TASK_ID_SQL = "SELECT trip_number FROM tasks WHERE id = %s"
+TRIP_BY_SHEET_ROW_SQL = "SELECT trip_number FROM tasks WHERE google_sheet_row = %s"
+TRIP_BY_SOURCE_SHEET_ROW_SQL = """
+    SELECT trip_number FROM tasks
+    WHERE google_sheet_row = %s
+      AND (google_worksheet_title = %s OR google_worksheet_title IS NULL)
+    ORDER BY CASE WHEN google_worksheet_title = %s THEN 0 ELSE 1 END
+    LIMIT 1
+"""
+TRIP_NUMBER_SEQUENCE = "tasks_trip_number_seq"
+NEXT_TRIP_NUMBER_SQL = f"SELECT nextval('{TRIP_NUMBER_SEQUENCE}') AS value"
+TASK_ID_BY_TRIP_SQL = "SELECT id FROM tasks WHERE trip_number = %s"
+
+
 @dataclass(slots=True)
 class PostgresTaskLookup:
     connection: Any
@@ -17,44 +31,36 @@ class PostgresTaskLookup:
 
         db_task_id = self.to_int_or_none(row.get("db_task_id"))
         if db_task_id is not None:
-            found = self.fetch_id("SELECT trip_number FROM tasks WHERE id = %s", (db_task_id,))
+            found = self.fetch_id(TRIP_BY_TASK_ID_SQL, (db_task_id,))
             if found is not None:
                 return found
 
         if google_sheet_row is not None:
             if self.source_key:
-                found = self.fetch_id(
-                    """
-                    SELECT trip_number FROM tasks
-                    WHERE google_sheet_row = %s
-                      AND (google_worksheet_title = %s OR google_worksheet_title IS NULL)
-                    ORDER BY CASE WHEN google_worksheet_title = %s THEN 0 ELSE 1 END
-                    LIMIT 1
-                    """,
-                    (google_sheet_row, self.source_key, self.source_key),
-                )
+                found = self.fetch_id(TRIP_BY_SOURCE_SHEET_ROW_SQL,
+                                      (google_sheet_row, self.source_key, self.source_key))
                 if found is not None:
                     return found
                 return self.next_trip_number()
 
-            found = self.fetch_id(
-                "SELECT trip_number FROM tasks WHERE google_sheet_row = %s",
-                (google_sheet_row,),
-            )
+            found = self.fetch_id(TRIP_BY_SHEET_ROW_SQL, (google_sheet_row,))
             if found is not None:
                 return found
 
         return self.next_trip_number()
 
     def next_trip_number(self) -> int:
-        row = self.connection.execute("SELECT COALESCE(MAX(trip_number), 0) + 1 AS value FROM tasks").fetchone()
-        return int(row["value"] or 1)
+        row = self.connection.execute(NEXT_TRIP_NUMBER_SQL).fetchone()
+        return int(row["value"])
 
     def task_id_by_trip_number(self, trip_number: int) -> int | None:
-        return self.fetch_id("SELECT id FROM tasks WHERE trip_number = %s", (trip_number,))
+        return self.fetch_id(TASK_ID_BY_TRIP_SQL, (trip_number,))
 
     def fetch_id(self, query: str, params: tuple[Any, ...]) -> int | None:
-        row = self.connection.execute(query, params).fetchone()
+        return self.first_int(self.connection.execute(query, params).fetchone())
+
+    @staticmethod
+    def first_int(row: Any) -> int | None:
         if row is None:
             return None
         value = next(iter(row.values())) if isinstance(row, dict) else row[0]
@@ -1,37 +1,77 @@
 from __future__ import annotations
 
 from collections import defaultdict
+from collections.abc import Iterator
 from dataclasses import dataclass
 from typing import Any
 
 from Navigation_Bot.core.domain.geo_coordinates import format_coordinate_pair
 
+TASK_SELECT_SQL = """
+    SELECT
+        t.*,
+        v.plate_number,
+        v.monitoring_id,
+        c.name AS carrier_name,
+        d.full_name AS driver_name,
+        d.phone AS driver_phone
+    FROM tasks t
+    LEFT JOIN vehicles v ON v.id = t.vehicle_id
+    LEFT JOIN carriers c ON c.id = t.carrier_id
+    LEFT JOIN drivers d ON d.id = t.driver_id
+"""
+
+ROUTE_POINTS_SQL = """
+    SELECT task_id, sequence, point_type, location, scheduled_time,
+           comment, latitude, longitude, is_processed
+    FROM route_points
+    WHERE task_id = ANY(%s)
+    ORDER BY task_id, point_type, sequence
+"""
+
+# Последняя навигация и последний расчёт маршрута по задаче; таблицу поддерживают триггеры на вставку истории.
+LATEST_STATE_SQL = """
+    SELECT task_id, navigation_id, geo_text, geo_zona, coordinates, speed_kmh,
+           gps_fix_text, gps_fix_age_seconds, has_fresh_coordinates,
+           estimate_id, distance_km, duration_minutes, arrival_time,
+           on_time, buffer_minutes, time_buffer_text
+    FROM task_latest_state
+    WHERE task_id = ANY(%s)
+"""
+
+EXPORT_ORDER_SQL = "COALESCE(t.google_sheet_row, t.trip_number), t.id"
+
+# Версия выборки для ETag: строки задач плюс всё, что попадает в GUI-словарь из соседних таблиц.
+# Считается только по отобранным задачам: навигация и расчёты по чужим листам версию не меняют.
+TASK_VERSION_SQL = """
+    SELECT
+        COUNT(*) AS count,
+        MAX(GREATEST(t.updated_at, ls.updated_at)) AS max_updated_at,
+        MAX(ls.navigation_id) AS navigation_id,
+        MAX(ls.estimate_id) AS estimate_id,
+        MAX(v.updated_at) AS vehicles_updated_at
+    FROM tasks t
+    LEFT JOIN task_latest_state ls ON ls.task_id = t.id
+    LEFT JOIN vehicles v ON v.id = t.vehicle_id
+    WHERE {where_sql}
+"""
+
 
 @dataclass(slots=True)
 class PostgresTaskReader:
     connection: Any
 
     def load_active_rows(self, source_key: str = "", *, include_null_source: bool = True) -> list[dict]:
-        source_filter, source_params = self._source_filter_sql(source_key, include_null_source=include_null_source)
-        rows = self.connection.execute(
-            f"""
-            SELECT
-                t.*,
-                v.plate_number,
-                v.monitoring_id,
-                c.name AS carrier_name,
-                d.full_name AS driver_name,
-                d.phone AS driver_phone
-            FROM tasks t
-            LEFT JOIN vehicles v ON v.id = t.vehicle_id
-            LEFT JOIN carriers c ON c.id = t.carrier_id
-            LEFT JOIN drivers d ON d.id = t.driver_id
-            WHERE t.status NOT IN ('completed', 'archived', 'cancelled')
-              AND {source_filter}
-            ORDER BY COALESCE(t.google_sheet_row, t.trip_number), t.id
-            """,
-            source_params,
-        ).fetchall()
+        query, params = self._active_rows_sql(source_key, include_null_source=include_null_source)
+        rows = self.connection.execute(query, params).fetchall()
+        return self._rows_to_gui_dicts(rows)
+
+    def load_rows_by_ids(self, task_ids: list[int]) -> list[dict]:
+        """Строки для GUI по id задач в любом статусе: по ним клиент и добавляет, и убирает строки."""
+        if not task_ids:
+            return []
+        rows = self.connection.execute(f"{TASK_SELECT_SQL} WHERE t.id = ANY(%s) ORDER BY t.id",
+                                       ([int(task_id) for task_id in task_ids],)).fetchall()
         return self._rows_to_gui_dicts(rows)
 
     def load_active_rows_page(self,
@@ -43,66 +83,195 @@ class PostgresTaskReader:
                               updated_since: str | None = None,
                               include_completed: bool = False,
                               date_from: str | None = None,
-                              date_to: str | None = None) -> tuple[list[dict], int]:
+                              date_to: str | None = None,
+                              include_total: bool = True) -> tuple[list[dict], int | None]:
+
+        where_sql, params = self._page_filter_sql(source_key,
+                                                  include_null_source=include_null_source,
+                                                  updated_since=updated_since,
+                                                  include_completed=include_completed,
+                                                  date_from=date_from,
+                                                  date_to=date_to)
+        total = self._count_rows(where_sql, params) if include_total else None
+        query, page_params = self._offset_page_sql(where_sql, params, limit=limit, offset=offset)
+        rows = self.connection.execute(query, page_params).fetchall()
+        return self._rows_to_gui_dicts(rows), total
+
+    def load_active_rows_after(self,
+                               source_key: str = "",
+                               *,
+                               include_null_source: bool = True,
+                               limit: int = 100,
+                               after: tuple[Any, int] | None = None,
+                               updated_since: str | None = None,
+                               include_completed: bool = False,
+                               date_from: str | None = None,
+                               date_to: str | None = None,
+                               include_total: bool = False) -> tuple[list[dict], tuple[Any, int] | None, int | None]:
+        """
+        Keyset-страница по (updated_at, id).
+
+        after — позиция последней уже полученной строки. Возвращает строки,
+        позицию для следующей страницы (None на последней) и total, если он запрошен.
+        """
+        where_sql, params = self._page_filter_sql(source_key,
+                                                  include_null_source=include_null_source,
+                                                  updated_since=updated_since,
+                                                  include_completed=include_completed,
+                                                  date_from=date_from,
+                                                  date_to=date_to,
+                                                  updated_since_inclusive=after is not None)
+        total = self._count_rows(where_sql, params) if include_total else None
+        query, page_params = self._keyset_page_sql(where_sql, params, after=after, limit=limit)
+        rows, next_after = self._split_keyset_page(self.connection.execute(query, page_params).fetchall(), limit)
+        return self._rows_to_gui_dicts(rows), next_after, total
+
+    def iter_active_row_chunks(self,
+                               source_key: str = "",
+                               *,
+                               include_null_source: bool = True,
+                               include_completed: bool = False,
+                               date_from: str | None = None,
+                               date_to: str | None = None,
+                               chunk_size: int = 200) -> Iterator[list[dict]]:
+        """
+        Строки для GUI порциями по chunk_size через server-side cursor.
+
+        Транзакция с курсором открыта, пока генератор не дочитан или не закрыт,
+        поэтому в памяти одновременно находится только одна порция.
+        """
+        where_sql, params = self._page_filter_sql(source_key,
+                                                  include_null_source=include_null_source,
+                                                  updated_since=None,
+                                                  include_completed=include_completed,
+                                                  date_from=date_from,
+                                                  date_to=date_to)
+        query = f"{TASK_SELECT_SQL} WHERE {where_sql} ORDER BY {EXPORT_ORDER_SQL}"
+        for rows in self._iter_query_chunks(query, params, chunk_size=chunk_size):
+            yield self._rows_to_gui_dicts(rows)
+
+    def _iter_query_chunks(self, query: str, params: list[Any], *, chunk_size: int) -> Iterator[list[dict]]:
+        chunk_size = max(1, int(chunk_size))
+        with self.connection.transaction():
+            with self.connection.cursor(name="task_export") as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(query, tuple(params))
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    def active_rows_version(self, source_key: str = "", *, include_null_source: bool = True) -> str:
+        where_sql, params = self._active_filter_sql(source_key, include_null_source=include_null_source)
+        return self._version_token(self.connection.execute(self._version_sql(where_sql), params).fetchone())
+
+    def page_version(self,
+                     source_key: str = "",
+                     *,
+                     include_null_source: bool = True,
+                     updated_since: str | None = None,
+                     include_completed: bool = False,
+                     date_from: str | None = None,
+                     date_to: str | None = None,
+                     updated_since_inclusive: bool = False) -> str:
+        """Версия для ETag страниц GET /tasks: меняется при любом изменении строк под фильтром."""
+        where_sql, params = self._page_filter_sql(source_key,
+                                                  include_null_source=include_null_source,
+                                                  updated_since=updated_since,
+                                                  include_completed=include_completed,
+                                                  date_from=date_from,
+                                                  date_to=date_to,
+                                                  updated_since_inclusive=updated_since_inclusive)
+        return self._version_token(self.connection.execute(self._version_sql(where_sql), tuple(params)).fetchone())
+
+    def _active_rows_sql(self, source_key: str, *, include_null_source: bool) -> tuple[str, tuple[Any, ...]]:
+        where_sql, params = self._active_filter_sql(source_key, include_null_source=include_null_source)
+        return (
+            f"""
+            {TASK_SELECT_SQL}
+            WHERE {where_sql}
+            ORDER BY {EXPORT_ORDER_SQL}
+            """,
+            params,
+        )
+
+    def _active_filter_sql(self, source_key: str, *, include_null_source: bool) -> tuple[str, tuple[Any, ...]]:
+        source_filter, source_params = self._source_filter_sql(source_key, include_null_source=include_null_source)
+        return f"t.status NOT IN ('completed', 'archived', 'cancelled') AND {source_filter}", source_params
+
+    @staticmethod
+    def _version_sql(where_sql: str) -> str:
+        return TASK_VERSION_SQL.format(where_sql=where_sql)
+
+    @staticmethod
+    def _version_token(row: dict[str, Any] | None) -> str:
+        if row is None:
+            return ""
+        return "|".join(str(value) for value in row.values())
+
+    @staticmethod
+    def _count_sql(where_sql: str) -> str:
+        return f"SELECT COUNT(*) AS count FROM tasks t WHERE {where_sql}"
+
+    @staticmethod
+    def _offset_page_sql(where_sql: str, params: list[Any], *, limit: int, offset: int) -> tuple[str, tuple[Any, ...]]:
+        return (f"{TASK_SELECT_SQL} WHERE {where_sql} ORDER BY t.updated_at, t.id LIMIT %s OFFSET %s",
+                tuple(params + [max(1, int(limit)), max(0, int(offset))]))
 
+    @staticmethod
+    def _keyset_page_sql(where_sql: str,
+                         params: list[Any],
+                         *,
+                         after: tuple[Any, int] | None,
+                         limit: int) -> tuple[str, tuple[Any, ...]]:
+        if after is not None:
+            where_sql += " AND (t.updated_at, t.id) > (%s::timestamptz, %s)"
+            params = params + [after[0], int(after[1])]
+        return (f"{TASK_SELECT_SQL} WHERE {where_sql} ORDER BY t.updated_at, t.id LIMIT %s",
+                tuple(params + [max(1, int(limit)) + 1]))
+
+    @staticmethod
+    def _split_keyset_page(rows: list[dict],
+                           limit: int,
+                           *,
+                           id_key: str = "id") -> tuple[list[dict], tuple[Any, int] | None]:
+        limit = max(1, int(limit))
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]["updated_at"], int(rows[-1][id_key]))
+
+    def _page_filter_sql(self,
+                         source_key: str,
+                         *,
+                         include_null_source: bool,
+                         updated_since: str | None,
+                         include_completed: bool,
+                         date_from: str | None,
+                         date_to: str | None,
+                         updated_since_inclusive: bool = False) -> tuple[str, list[Any]]:
         source_filter, source_params = self._source_filter_sql(source_key, include_null_source=include_null_source)
         conditions = [source_filter]
         if not updated_since and not include_completed:
             conditions.append("t.status NOT IN ('completed', 'archived', 'cancelled')")
         params: list[Any] = list(source_params)
         if updated_since:
-            conditions.append("t.updated_at > %s::timestamptz")
+            # С keyset-позицией граница включительная: строки с тем же updated_at отсекает (updated_at, id).
+            conditions.append("t.updated_at >= %s::timestamptz" if updated_since_inclusive
+                              else "t.updated_at > %s::timestamptz")
             params.append(updated_since)
-        task_date_sql = self._task_date_sql()
         if date_from:
-            conditions.append(f"{task_date_sql} >= %s::date")
+            conditions.append("t.task_date >= %s::date")
             params.append(date_from)
         if date_to:
-            conditions.append(f"{task_date_sql} <= %s::date")
+            conditions.append("t.task_date <= %s::date")
             params.append(date_to)
+        return " AND ".join(conditions), params
 
-        where_sql = " AND ".join(conditions)
-        total_row = self.connection.execute(
-            f"SELECT COUNT(*) AS count FROM tasks t WHERE {where_sql}",
-            tuple(params),
-        ).fetchone()
-        total = int(total_row["count"] or 0)
-
-        rows = self.connection.execute(
-            f"""
-            SELECT
-                t.*,
-                v.plate_number,
-                v.monitoring_id,
-                c.name AS carrier_name,
-                d.full_name AS driver_name,
-                d.phone AS driver_phone
-            FROM tasks t
-            LEFT JOIN vehicles v ON v.id = t.vehicle_id
-            LEFT JOIN carriers c ON c.id = t.carrier_id
-            LEFT JOIN drivers d ON d.id = t.driver_id
-            WHERE {where_sql}
-            ORDER BY t.updated_at, t.id
-            LIMIT %s OFFSET %s
-            """,
-            tuple(params + [max(1, int(limit)), max(0, int(offset))]),
-        ).fetchall()
-        return self._rows_to_gui_dicts(rows), total
-
-    @staticmethod
-    def _task_date_sql() -> str:
-        value_sql = "COALESCE(NULLIF(t.planned_start_at, ''), NULLIF(t.planned_end_at, ''), NULLIF(t.completed_at, ''))"
-        return f"""
-        (
-            CASE
-                WHEN {value_sql} ~ '^\\d{{2}}\\.\\d{{2}}\\.\\d{{4}}'
-                    THEN to_date(substr({value_sql}, 1, 10), 'DD.MM.YYYY')
-                WHEN {value_sql} ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}'
-                    THEN substr({value_sql}, 1, 10)::date
-                ELSE NULL
-            END
-        )
-        """
+    def _count_rows(self, where_sql: str, params: list[Any]) -> int:
+        total_row = self.connection.execute(self._count_sql(where_sql), tuple(params)).fetchone()
+        return int(total_row["count"] or 0)
 
     @staticmethod
     def _source_filter_sql(source_key: str, *, include_null_source: bool) -> tuple[str, tuple[Any, ...]]:
@@ -118,9 +287,23 @@ class PostgresTaskReader:
             return []
 
         task_ids = [int(row["id"]) for row in rows]
-        route_points = self._load_route_points(task_ids)
-        latest_navigation = self._load_latest_navigation(task_ids)
-        latest_estimates = self._load_latest_route_estimates(task_ids)
+        return self._build_gui_dicts(rows,
+                                     route_point_rows=self.connection.execute(ROUTE_POINTS_SQL, (task_ids,)).fetchall(),
+                                     latest_state_rows=self.connection.execute(LATEST_STATE_SQL,
+                                                                               (task_ids,)).fetchall())
+
+    def _build_gui_dicts(self,
+                         rows: list[dict],
+                         *,
+                         route_point_rows: list[dict],
+                         latest_state_rows: list[dict]) -> list[dict]:
+        route_points: dict[tuple[int, str], list[dict]] = defaultdict(list)
+        for row in route_point_rows:
+            route_points[(int(row["task_id"]), str(row["point_type"] or ""))].append(row)
+        latest_navigation = {int(row["task_id"]): row for row in latest_state_rows
+                             if row["navigation_id"] is not None}
+        latest_estimates = {int(row["task_id"]): row for row in latest_state_rows
+                            if row["estimate_id"] is not None}
 
         return [self._task_row_to_gui_dict(row,
                                            route_points=route_points,
@@ -128,51 +311,6 @@ class PostgresTaskReader:
                                            latest_estimates=latest_estimates )
                 for row in rows ]
 
-    def _load_route_points(self, task_ids: list[int]) -> dict[tuple[int, str], list[dict]]:
-        rows = self.connection.execute(
-            """
-            SELECT task_id, sequence, point_type, location, scheduled_time,
-                   comment, latitude, longitude, is_processed
-            FROM route_points
-            WHERE task_id = ANY(%s)
-            ORDER BY task_id, point_type, sequence
-            """,
-            (task_ids,),
-        ).fetchall()
-
-        grouped: dict[tuple[int, str], list[dict]] = defaultdict(list)
-        for row in rows:
-            grouped[(int(row["task_id"]), str(row["point_type"] or ""))].append(row)
-        return grouped
-
-    def _load_latest_navigation(self, task_ids: list[int]) -> dict[int, dict]:
-        rows = self.connection.execute(
-            """
-            SELECT DISTINCT ON (task_id)
-                   task_id, geo_text, geo_zona, coordinates, speed_kmh,
-                   gps_fix_text, gps_fix_age_seconds, has_fresh_coordinates
-            FROM vehicle_navigation_history
-            WHERE task_id = ANY(%s)
-            ORDER BY task_id, collected_at DESC, id DESC
-            """,
-            (task_ids,),
-        ).fetchall()
-        return {int(row["task_id"]): row for row in rows}
-
-    def _load_latest_route_estimates(self, task_ids: list[int]) -> dict[int, dict]:
-        rows = self.connection.execute(
-            """
-            SELECT DISTINCT ON (task_id)
-                   task_id, distance_km, duration_minutes, arrival_time,
-                   on_time, buffer_minutes, time_buffer_text
-            FROM route_estimates
-            WHERE task_id = ANY(%s)
-            ORDER BY task_id, calculated_at DESC, id DESC
-            """,
-            (task_ids,),
-        ).fetchall()
-        return {int(row["task_id"]): row for row in rows}
-
     def _task_row_to_gui_dict(
             self,
             row: dict[str, Any],
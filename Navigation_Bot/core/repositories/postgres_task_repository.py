@@ -5,8 +5,9 @@ from typing import Any, Callable
 
 from Navigation_Bot.core.domain.entities.task import Task
 from Navigation_Bot.core.domain.mappers.task_mapper import TaskMapper
+from Navigation_Bot.core.repositories.postgres_task_bulk_writer import PostgresTaskBulkWriter
 from Navigation_Bot.core.repositories.postgres_task_reader import PostgresTaskReader
-from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter, TaskConflictError
 
 
 @dataclass(slots=True)
@@ -42,8 +43,8 @@ class PostgresTaskRepository:
                 return TaskMapper.from_dict(row)
         return None
 
-    def save(self, *, source: str = "user") -> None:
-        self.sync_rows(self.get(), source=source)
+    def save(self, *, source: str = "user", rows: list[dict] | None = None) -> None:
+        self.sync_rows(self.get() if rows is None else rows, source=source)
 
     def set(self, new_data: list, *, source: str = "user") -> None:
         rows = [row for row in new_data if isinstance(row, dict)]
@@ -107,13 +108,33 @@ class PostgresTaskRepository:
         return True, removed, None
 
     def sync_rows(self, rows: list[dict], *, source: str = "user") -> None:
-        for row in rows:
-            if isinstance(row, dict):
-                self.upsert_from_row(row, source=source)
+        self.upsert_rows_batch(rows, source=source)
 
     def upsert_from_row(self, row: dict[str, Any], *, source: str = "user") -> dict[str, Any] | None:
         return self._writer().upsert_from_row(row, source=source)
 
+    def upsert_rows_batch(self, rows: list[Any], *, source: str = "user") -> list[dict[str, Any] | None]:
+        return PostgresTaskBulkWriter(self.connection, self.current_source_key).upsert_rows(rows, source=source)
+
+    def patch_tasks(self, items: list[dict[str, Any]]) -> list[dict[str, Any] | None]:
+        """
+        Точечные изменения рейсов ({"trip_number", "fields", "updated_at"}) одной транзакцией.
+        None на месте ненайденного рейса; при конфликте updated_at откатывается весь пакет,
+        а TaskConflictError получает row_number позиции в items (с 1).
+        """
+        writer = self._writer()
+        results: list[dict[str, Any] | None] = []
+        with self.connection.transaction():
+            for row_number, item in enumerate(items, start=1):
+                try:
+                    results.append(writer.patch_task(int(item["trip_number"]),
+                                                     dict(item.get("fields") or {}),
+                                                     expected_updated_at=item.get("updated_at")))
+                except TaskConflictError as exc:
+                    exc.row_number = row_number
+                    raise
+        return results
+
     @staticmethod
     def _write_not_supported() -> None:
         raise NotImplementedError("PostgreSQL task writes are not implemented yet.")
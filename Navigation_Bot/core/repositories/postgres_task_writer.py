@@ -5,14 +5,166 @@ from typing import Any
 
 from Navigation_Bot.core.domain.mappers.task_mapper import TaskMapper
 from Navigation_Bot.core.repositories.postgres_route_point_repository import PostgresRoutePointRepository
-from Navigation_Bot.core.repositories.postgres_task_lookup import PostgresTaskLookup
+from Navigation_Bot.core.repositories.postgres_task_lookup import TASK_ID_BY_TRIP_SQL, PostgresTaskLookup
+from Navigation_Bot.core.storage.postgres_pipeline import postgres_pipeline
+
+Statement = tuple[str, Any]
+
+
+INSERT_TASK_SQL = """
+    INSERT INTO tasks (
+        trip_number, google_sheet_row, vehicle_id, driver_id, carrier_id,
+        status, planned_start_at, planned_end_at, actual_start_at, actual_end_at,
+        raw_load, raw_unload, comm_load, comm_unload, highlight_until,
+        google_worksheet_title
+    )
+    VALUES (
+        %(trip_number)s, %(google_sheet_row)s, %(vehicle_id)s, %(driver_id)s, %(carrier_id)s,
+        %(status)s, %(planned_start_at)s, %(planned_end_at)s, %(actual_start_at)s, %(actual_end_at)s,
+        %(raw_load)s, %(raw_unload)s, %(comm_load)s, %(comm_unload)s, %(highlight_until)s,
+        %(google_worksheet_title)s
+    )
+    RETURNING id, updated_at, to_jsonb(tasks) AS after_data
+"""
+
+UPDATE_TASK_SQL = """
+    UPDATE tasks AS t
+    SET google_sheet_row = %(google_sheet_row)s,
+        vehicle_id = %(vehicle_id)s,
+        driver_id = %(driver_id)s,
+        carrier_id = %(carrier_id)s,
+        status = %(status)s,
+        planned_start_at = %(planned_start_at)s,
+        planned_end_at = %(planned_end_at)s,
+        raw_load = %(raw_load)s,
+        raw_unload = %(raw_unload)s,
+        comm_load = %(comm_load)s,
+        comm_unload = %(comm_unload)s,
+        highlight_until = %(highlight_until)s,
+        actual_start_at = %(actual_start_at)s,
+        actual_end_at = %(actual_end_at)s,
+        google_worksheet_title = %(google_worksheet_title)s,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (SELECT * FROM tasks WHERE id = %(task_id)s FOR UPDATE) AS previous
+    WHERE t.id = previous.id
+      AND (
+          %(expected_updated_at)s::timestamptz IS NULL
+          OR previous.updated_at = %(expected_updated_at)s::timestamptz
+      )
+    RETURNING t.updated_at, to_jsonb(previous) AS before_data, to_jsonb(t) AS after_data
+"""
+
+TASK_UPDATED_AT_SQL = "SELECT updated_at FROM tasks WHERE id = %s"
+
+# Поля, которые PATCH /tasks меняет точечно: колонки tasks и водитель рейса.
+PATCH_TASK_COLUMNS = ("status", "raw_load", "raw_unload", "highlight_until")
+PATCH_DRIVER_FIELDS = ("driver_name", "driver_phone")
+PATCHABLE_TASK_FIELDS = frozenset(PATCH_TASK_COLUMNS + PATCH_DRIVER_FIELDS)
+
+TASK_FOR_PATCH_SQL = """
+    SELECT t.id, t.carrier_id, d.full_name AS driver_name, d.phone AS driver_phone
+    FROM tasks AS t
+    LEFT JOIN drivers AS d ON d.id = t.driver_id
+    WHERE t.trip_number = %s
+"""
+
+PATCH_TASK_SQL = """
+    UPDATE tasks AS t
+    SET {assignments},
+        updated_at = CURRENT_TIMESTAMP
+    FROM (SELECT * FROM tasks WHERE id = %(task_id)s FOR UPDATE) AS previous
+    WHERE t.id = previous.id
+      AND (
+          %(expected_updated_at)s::timestamptz IS NULL
+          OR previous.updated_at = %(expected_updated_at)s::timestamptz
+      )
+    RETURNING t.updated_at, to_jsonb(previous) AS before_data, to_jsonb(t) AS after_data
+"""
+
+COMPLETE_TASK_SQL = """
+    UPDATE tasks AS t
+    SET status = 'completed',
+        actual_end_at = COALESCE(t.actual_end_at, CURRENT_TIMESTAMP::text),
+        completed_at = COALESCE(t.completed_at, CURRENT_TIMESTAMP::text),
+        completion_source = %s,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT *
+        FROM tasks
+        WHERE (google_sheet_row = %s OR trip_number = %s)
+          AND (%s = '' OR google_worksheet_title = %s OR google_worksheet_title IS NULL)
+        FOR UPDATE
+    ) AS previous
+    WHERE t.id = previous.id
+    RETURNING t.id, t.trip_number, to_jsonb(previous) AS before_data, to_jsonb(t) AS after_data
+"""
+
+COMPLETE_TASKS_SQL = """
+    UPDATE tasks
+    SET status = 'completed',
+        actual_end_at = COALESCE(actual_end_at, CURRENT_TIMESTAMP::text),
+        completed_at = COALESCE(completed_at, CURRENT_TIMESTAMP::text),
+        completion_source = %(source)s,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (trip_number = ANY(%(identities)s) OR google_sheet_row = ANY(%(identities)s))
+      AND (%(source_key)s = '' OR google_worksheet_title = %(source_key)s OR google_worksheet_title IS NULL)
+    RETURNING id, trip_number, google_sheet_row
+"""
+
+UPSERT_CARRIER_SQL = """
+    INSERT INTO carriers(name)
+    VALUES (%s)
+    ON CONFLICT(name) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+    RETURNING id
+"""
+
+VEHICLE_BY_MONITORING_ID_SQL = "SELECT id FROM vehicles WHERE monitoring_id = %s"
+
+UPDATE_VEHICLE_BY_ID_SQL = """
+    UPDATE vehicles
+    SET carrier_id = COALESCE(%s, carrier_id),
+        brand = COALESCE(NULLIF(%s, ''), brand),
+        model = COALESCE(NULLIF(%s, ''), model),
+        is_active = %s,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+UPSERT_VEHICLE_SQL = """
+    INSERT INTO vehicles(plate_number, monitoring_id, carrier_id, brand, model, is_active)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT(plate_number) DO UPDATE SET
+        monitoring_id = COALESCE(excluded.monitoring_id, vehicles.monitoring_id),
+        carrier_id = excluded.carrier_id,
+        brand = excluded.brand,
+        model = excluded.model,
+        is_active = excluded.is_active,
+        updated_at = CURRENT_TIMESTAMP
+    RETURNING id
+"""
+
+DRIVER_BY_KEY_SQL = "SELECT id FROM drivers WHERE full_name = %s AND phone = %s"
+
+INSERT_DRIVER_SQL = """
+    INSERT INTO drivers(full_name, phone, carrier_id, is_active)
+    VALUES (%s, %s, %s, %s)
+    RETURNING id
+"""
+
+UPDATE_DRIVER_SQL = """
+    UPDATE drivers
+    SET carrier_id = %s, is_active = %s, updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
 
 
 class TaskConflictError(RuntimeError):
-    def __init__(self, *, task_id: int, expected_updated_at: Any, current_updated_at: Any):
+    def __init__(self, *, task_id: int, expected_updated_at: Any, current_updated_at: Any,
+                 row_number: int | None = None):
         self.task_id = task_id
         self.expected_updated_at = expected_updated_at
         self.current_updated_at = current_updated_at
+        self.row_number = row_number
         super().__init__(f"task_conflict: task_id={task_id}")
 
 
@@ -22,6 +174,13 @@ class PostgresTaskWriter:
     source_key: str = ""
 
     def upsert_from_row(self, row: dict[str, Any], *, source: str = "user") -> dict[str, Any] | None:
+        """
+        Записывает строку таблицы: перевозчик, машина, водитель, рейс и точки маршрута.
+
+        Цепочка идёт в pipeline mode: запросы, которые не зависят от ещё не прочитанных
+        ответов, отправляются одной пачкой. Для существующего рейса это три обмена с
+        сервером вместо отдельного ожидания на каждый из ~10 запросов.
+        """
         if not isinstance(row, dict):
             return None
 
@@ -29,82 +188,100 @@ class PostgresTaskWriter:
         lookup = self._lookup()
         google_sheet_row = self._positive_int_or_none(row.get("google_sheet_row")) or self._positive_int_or_none(row.get("index"))
         trip_number = lookup.resolve_trip_number(row, google_sheet_row)
+        vehicle = self._vehicle_values(task, None)
+        driver = self._driver_values(task, None)
+        route_points = PostgresRoutePointRepository(self.connection)
 
-        with self.connection.transaction():
-            carrier_id = self._upsert_carrier(task.carrier.name if task.carrier else "")
-            vehicle_id = self._upsert_vehicle(
-                plate_number=task.vehicle.plate_number,
-                monitoring_id=task.vehicle.monitoring_id,
-                carrier_id=carrier_id,
-                brand=task.vehicle.brand,
-                model=task.vehicle.model,
-                is_active=task.vehicle.is_active,
-            )
-            driver_id = self._upsert_driver(
-                full_name=task.driver.full_name,
-                phone=task.driver.phone,
-                carrier_id=carrier_id,
-                is_active=task.driver.is_active,
-            )
+        with self.connection.transaction(), postgres_pipeline(self.connection):
+            carrier_sent = self._send(self._carrier_statement(task))
+            vehicle_found = self._send(self._vehicle_lookup_statement(vehicle))
+            driver_found = self._send(self._driver_lookup_statement(driver))
+            task_found = self.connection.execute(TASK_ID_BY_TRIP_SQL, (trip_number,))
+
+            carrier_id = self._returned_id(carrier_sent)
+            vehicle["carrier_id"] = driver["carrier_id"] = carrier_id
+            existing_vehicle_id = self._returned_id(vehicle_found)
+            existing_driver_id = self._returned_id(driver_found)
+            vehicle_sent = self._send(self._vehicle_write_statement(vehicle, existing_vehicle_id))
+            driver_sent = self._send(self._driver_write_statement(driver, existing_driver_id))
+            existing_task_id = self._returned_id(task_found)
 
-            planned_start_at = self._first_planned_time(task.route_plan.loads)
-            planned_end_at = self._last_planned_time(task.route_plan.unloads)
-            existing_task_id = lookup.task_id_by_trip_number(trip_number)
             expected_updated_at = row.get("updated_at")
             created = existing_task_id is None
+            values = self._task_values(task,
+                                       row,
+                                       google_sheet_row=google_sheet_row,
+                                       vehicle_id=self._written_id(vehicle_sent, existing_vehicle_id),
+                                       driver_id=self._written_id(driver_sent, existing_driver_id),
+                                       carrier_id=carrier_id)
 
             if existing_task_id is None:
-                inserted = self._insert_task(
-                    trip_number=trip_number,
-                    google_sheet_row=google_sheet_row,
-                    vehicle_id=vehicle_id,
-                    driver_id=driver_id,
-                    carrier_id=carrier_id,
-                    status=self._status_from_row(row),
-                    planned_start_at=planned_start_at,
-                    planned_end_at=planned_end_at,
-                    actual_start_at=row.get("actual_start_at"),
-                    actual_end_at=row.get("actual_end_at"),
-                    raw_load=task.raw_load,
-                    raw_unload=task.raw_unload,
-                    comm_load=task.comm_load,
-                    comm_unload=task.comm_unload,
-                    highlight_until=task.highlight_until,
-                    google_worksheet_title=self.source_key or row.get("google_worksheet_title"),
-                )
-                task_id = int(inserted["id"])
-                updated_at = inserted["updated_at"]
+                written = self._insert_task(trip_number=trip_number, **values)
+                task_id = int(written["id"])
+                route_point_items = self._route_point_items(task_id, task)
+                existing_points: list[dict] = []
             else:
                 task_id = existing_task_id
-                updated_at = self._update_task(
-                    task_id=task_id,
-                    expected_updated_at=expected_updated_at,
-                    google_sheet_row=google_sheet_row,
-                    vehicle_id=vehicle_id,
-                    driver_id=driver_id,
-                    carrier_id=carrier_id,
-                    status=self._status_from_row(row),
-                    planned_start_at=planned_start_at,
-                    planned_end_at=planned_end_at,
-                    actual_start_at=row.get("actual_start_at"),
-                    actual_end_at=row.get("actual_end_at"),
-                    raw_load=task.raw_load,
-                    raw_unload=task.raw_unload,
-                    comm_load=task.comm_load,
-                    comm_unload=task.comm_unload,
-                    highlight_until=task.highlight_until,
-                    google_worksheet_title=self.source_key or row.get("google_worksheet_title"),
-                )
-
-            route_points = PostgresRoutePointRepository(self.connection)
-            route_points.sync_route_points(task_id, "load", task.route_plan.loads, task.processing.processed_unloads, source)
-            route_points.sync_route_points(task_id, "unload", task.route_plan.unloads, task.processing.processed_unloads, source)
+                route_point_items = self._route_point_items(task_id, task)
+                task_sent = self.connection.execute(*self._update_task_statement(task_id, expected_updated_at, values))
+                points_sent = route_points.existing_route_points(route_point_items)
+                written = self._updated_or_conflict(task_sent.fetchone(), task_id, expected_updated_at)
+                existing_points = points_sent.fetchall()
+            updated_at = written["updated_at"]
+
+            route_points.write_route_points(existing_points, route_point_items)
 
         row["trip_number"] = trip_number
         row["google_sheet_row"] = google_sheet_row
         row["db_task_id"] = task_id
         row["updated_at"] = updated_at
-        return {"task_id": task_id, "trip_number": trip_number, "updated_at": updated_at, "created": created}
+        return self._upsert_result(written,
+                                   task_id=task_id,
+                                   trip_number=trip_number,
+                                   updated_at=updated_at,
+                                   created=created)
+
+    def patch_task(self,
+                   trip_number: int,
+                   fields: dict[str, Any],
+                   *,
+                   expected_updated_at: Any = None) -> dict[str, Any] | None:
+        """
+        Точечное изменение рейса: только поля из PATCHABLE_TASK_FIELDS, без TaskMapper
+        и без перезаписи перевозчика, машины и точек маршрута.
+
+        status, raw_load, raw_unload и highlight_until пишутся в свои колонки tasks.
+        driver_name/driver_phone дополняются текущими данными водителя, водитель ищется
+        или создаётся как в upsert_from_row, и у рейса меняется только driver_id
+        (перевозчик уже существующего водителя не переписывается).
+        Возвращает None, если рейса нет; при устаревшем updated_at — TaskConflictError.
+        """
+        if not fields:
+            raise ValueError("task patch has no fields")
+        unsupported = set(fields) - PATCHABLE_TASK_FIELDS
+        if unsupported:
+            raise ValueError(f"unsupported task fields: {sorted(unsupported)}")
+
+        with self.connection.transaction():
+            current = self.connection.execute(TASK_FOR_PATCH_SQL, (trip_number,)).fetchone()
+            if current is None:
+                return None
+            task_id = int(current["id"])
+            values = self._patch_values(fields)
+            if any(field in fields for field in PATCH_DRIVER_FIELDS):
+                values["driver_id"] = self._patched_driver_id(current, fields)
+            assignments = ", ".join(f"{column} = %({column})s" for column in values)
+            written = self._updated_or_conflict(
+                self.connection.execute(PATCH_TASK_SQL.format(assignments=assignments),
+                                        {**values, "task_id": task_id,
+                                         "expected_updated_at": expected_updated_at}).fetchone(),
+                task_id,
+                expected_updated_at)
+        return self._upsert_result(written,
+                                   task_id=task_id,
+                                   trip_number=trip_number,
+                                   updated_at=written["updated_at"],
+                                   created=False)
 
     def mark_index_inactive(self, index_key: int) -> None:
         parsed = self._lookup().to_int_or_none(index_key)
@@ -112,196 +289,221 @@ class PostgresTaskWriter:
             return
         with self.connection.transaction():
             self.connection.execute(
-                """
-                UPDATE tasks
-                SET status = 'completed',
-                    actual_end_at = COALESCE(actual_end_at, CURRENT_TIMESTAMP::text),
-                    completed_at = COALESCE(completed_at, CURRENT_TIMESTAMP::text),
-                    completion_source = 'user',
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE (google_sheet_row = %s OR trip_number = %s)
-                  AND (%s = '' OR google_worksheet_title = %s OR google_worksheet_title IS NULL)
-                """,
-                (parsed, parsed, self.source_key, self.source_key),
+                COMPLETE_TASK_SQL,
+                ("user", parsed, parsed, self.source_key, self.source_key),
             )
 
     def mark_task_completed(self, row_identity: int, *, source: str = "user") -> bool:
+        return bool(self.complete_task(row_identity, source=source))
+
+    def complete_task(self, row_identity: int, *, source: str = "user") -> list[dict[str, Any]]:
+        """
+        Завершает рейс и возвращает затронутые строки: id, trip_number и
+        снимки before_data/after_data, взятые тем же UPDATE, без отдельных SELECT.
+        """
         parsed = self._lookup().to_int_or_none(row_identity)
         if parsed is None:
-            return False
+            return []
 
         with self.connection.transaction():
-            cursor = self.connection.execute(
-                """
-                UPDATE tasks
-                SET status = 'completed',
-                    actual_end_at = COALESCE(actual_end_at, CURRENT_TIMESTAMP::text),
-                    completed_at = COALESCE(completed_at, CURRENT_TIMESTAMP::text),
-                    completion_source = %s,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE (google_sheet_row = %s OR trip_number = %s)
-                  AND (%s = '' OR google_worksheet_title = %s OR google_worksheet_title IS NULL)
-                """,
+            rows = self.connection.execute(
+                COMPLETE_TASK_SQL,
                 (source, parsed, parsed, self.source_key, self.source_key),
-            )
-        return cursor.rowcount > 0
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def complete_tasks(self, row_identities: list[int], *, source: str = "user") -> dict[int, dict[str, Any]]:
+        """
+        Завершает пакет рейсов одним UPDATE.
+
+        Возвращает {row_identity: строка (id, trip_number, google_sheet_row)} только
+        для найденных идентификаторов; остальные из row_identities не найдены.
+        """
+        identities = self._identity_list(row_identities)
+        if not identities:
+            return {}
+
+        with self.connection.transaction():
+            rows = self.connection.execute(COMPLETE_TASKS_SQL,
+                                           self._complete_tasks_params(identities, source)).fetchall()
+        return self._completed_by_identity(rows, identities)
 
     def _insert_task(self, **values: Any) -> dict[str, Any]:
-        return self.connection.execute(
-            """
-            INSERT INTO tasks (
-                trip_number, google_sheet_row, vehicle_id, driver_id, carrier_id,
-                status, planned_start_at, planned_end_at, actual_start_at, actual_end_at,
-                raw_load, raw_unload, comm_load, comm_unload, highlight_until,
-                google_worksheet_title
-            )
-            VALUES (
-                %(trip_number)s, %(google_sheet_row)s, %(vehicle_id)s, %(driver_id)s, %(carrier_id)s,
-                %(status)s, %(planned_start_at)s, %(planned_end_at)s, %(actual_start_at)s, %(actual_end_at)s,
-                %(raw_load)s, %(raw_unload)s, %(comm_load)s, %(comm_unload)s, %(highlight_until)s,
-                %(google_worksheet_title)s
-            )
-            RETURNING id, updated_at
-            """,
-            values,
-        ).fetchone()
-
-    def _update_task(self, *, task_id: int, expected_updated_at: Any = None, **values: Any) -> Any:
-        params = {**values, "task_id": task_id, "expected_updated_at": expected_updated_at}
-        row = self.connection.execute(
-            """
-            UPDATE tasks
-            SET google_sheet_row = %(google_sheet_row)s,
-                vehicle_id = %(vehicle_id)s,
-                driver_id = %(driver_id)s,
-                carrier_id = %(carrier_id)s,
-                status = %(status)s,
-                planned_start_at = %(planned_start_at)s,
-                planned_end_at = %(planned_end_at)s,
-                raw_load = %(raw_load)s,
-                raw_unload = %(raw_unload)s,
-                comm_load = %(comm_load)s,
-                comm_unload = %(comm_unload)s,
-                highlight_until = %(highlight_until)s,
-                actual_start_at = %(actual_start_at)s,
-                actual_end_at = %(actual_end_at)s,
-                google_worksheet_title = %(google_worksheet_title)s,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %(task_id)s
-              AND (
-                  %(expected_updated_at)s::timestamptz IS NULL
-                  OR updated_at = %(expected_updated_at)s::timestamptz
-              )
-            RETURNING updated_at
-            """,
-            params,
-        ).fetchone()
+        return self.connection.execute(INSERT_TASK_SQL, values).fetchone()
+
+    def _updated_or_conflict(self,
+                             row: dict[str, Any] | None,
+                             task_id: int,
+                             expected_updated_at: Any) -> dict[str, Any]:
         if row is not None:
-            return row["updated_at"]
+            return row
+
+        current = self.connection.execute(TASK_UPDATED_AT_SQL, (task_id,)).fetchone()
+        raise self._conflict(task_id, expected_updated_at, current)
+
+    def _send(self, statement: Statement | None) -> Any | None:
+        return self.connection.execute(*statement) if statement is not None else None
 
-        current = self.connection.execute(
-            "SELECT updated_at FROM tasks WHERE id = %s",
-            (task_id,),
-        ).fetchone()
-        raise TaskConflictError(
+    @staticmethod
+    def _returned_id(cursor: Any | None) -> int | None:
+        return PostgresTaskLookup.first_int(cursor.fetchone()) if cursor is not None else None
+
+    @classmethod
+    def _written_id(cls, cursor: Any | None, existing_id: int | None) -> int | None:
+        """id записи: найденный заранее или из RETURNING отправленного INSERT/UPSERT."""
+        return existing_id if existing_id is not None else cls._returned_id(cursor)
+
+    @staticmethod
+    def _carrier_statement(task: Any) -> Statement | None:
+        name = str(task.carrier.name if task.carrier else "").strip()
+        return (UPSERT_CARRIER_SQL, (name,)) if name else None
+
+    @staticmethod
+    def _vehicle_lookup_statement(vehicle: dict[str, Any]) -> Statement | None:
+        if not vehicle["plate_number"] or vehicle["monitoring_id"] is None:
+            return None
+        return VEHICLE_BY_MONITORING_ID_SQL, (vehicle["monitoring_id"],)
+
+    @staticmethod
+    def _vehicle_write_statement(vehicle: dict[str, Any], existing_id: int | None) -> Statement | None:
+        if not vehicle["plate_number"]:
+            return None
+        if existing_id is not None:
+            return UPDATE_VEHICLE_BY_ID_SQL, (vehicle["carrier_id"], vehicle["brand"], vehicle["model"],
+                                              vehicle["is_active"], existing_id)
+        return UPSERT_VEHICLE_SQL, (vehicle["plate_number"], vehicle["monitoring_id"], vehicle["carrier_id"],
+                                    vehicle["brand"], vehicle["model"], vehicle["is_active"])
+
+    @staticmethod
+    def _driver_lookup_statement(driver: dict[str, Any]) -> Statement | None:
+        if not driver["full_name"] and not driver["phone"]:
+            return None
+        return DRIVER_BY_KEY_SQL, (driver["full_name"], driver["phone"])
+
+    @staticmethod
+    def _driver_write_statement(driver: dict[str, Any], existing_id: int | None) -> Statement | None:
+        if not driver["full_name"] and not driver["phone"]:
+            return None
+        if existing_id is not None:
+            return UPDATE_DRIVER_SQL, (driver["carrier_id"], driver["is_active"], existing_id)
+        return INSERT_DRIVER_SQL, (driver["full_name"], driver["phone"], driver["carrier_id"], driver["is_active"])
+
+    @staticmethod
+    def _update_task_statement(task_id: int, expected_updated_at: Any, values: dict[str, Any]) -> Statement:
+        return UPDATE_TASK_SQL, {**values, "task_id": task_id, "expected_updated_at": expected_updated_at}
+
+    @staticmethod
+    def _conflict(task_id: int, expected_updated_at: Any, current: dict[str, Any] | None) -> TaskConflictError:
+        return TaskConflictError(
             task_id=task_id,
             expected_updated_at=expected_updated_at,
             current_updated_at=current["updated_at"] if current is not None else None,
         )
 
-    def _upsert_carrier(self, name: str) -> int | None:
-        name = str(name or "").strip()
-        if not name:
-            return None
-        row = self.connection.execute(
-            """
-            INSERT INTO carriers(name)
-            VALUES (%s)
-            ON CONFLICT(name) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
-            RETURNING id
-            """,
-            (name,),
-        ).fetchone()
-        return int(row["id"])
-
-    def _upsert_vehicle(
-        self,
-        *,
-        plate_number: str,
-        monitoring_id: int | None,
-        carrier_id: int | None,
-        brand: str,
-        model: str,
-        is_active: bool,
-    ) -> int | None:
-        plate_number = str(plate_number or "").strip()
-        if not plate_number:
-            return None
+    def _complete_tasks_params(self, identities: list[int], source: str) -> dict[str, Any]:
+        return {"identities": identities, "source": source, "source_key": self.source_key}
+
+    @staticmethod
+    def _identity_list(row_identities: list[Any]) -> list[int]:
+        parsed = (PostgresTaskLookup.to_int_or_none(value) for value in row_identities)
+        return sorted({value for value in parsed if value is not None})
+
+    @staticmethod
+    def _completed_by_identity(rows: list[dict[str, Any]], identities: list[int]) -> dict[int, dict[str, Any]]:
+        by_trip_number = {row["trip_number"]: dict(row) for row in rows}
+        by_sheet_row = {row["google_sheet_row"]: dict(row) for row in rows if row["google_sheet_row"] is not None}
+        completed = {}
+        for identity in identities:
+            row = by_trip_number.get(identity) or by_sheet_row.get(identity)
+            if row is not None:
+                completed[identity] = row
+        return completed
+
+    @staticmethod
+    def _upsert_result(written: dict[str, Any],
+                       *,
+                       task_id: int,
+                       trip_number: int,
+                       updated_at: Any,
+                       created: bool) -> dict[str, Any]:
+        return {"task_id": task_id,
+                "trip_number": trip_number,
+                "updated_at": updated_at,
+                "created": created,
+                "before_data": written.get("before_data"),
+                "after_data": written.get("after_data")}
 
-        if monitoring_id is not None:
-            existing = self._lookup().fetch_id("SELECT id FROM vehicles WHERE monitoring_id = %s", (monitoring_id,))
-            if existing is not None:
-                self.connection.execute(
-                    """
-                    UPDATE vehicles
-                    SET carrier_id = COALESCE(%s, carrier_id),
-                        brand = COALESCE(NULLIF(%s, ''), brand),
-                        model = COALESCE(NULLIF(%s, ''), model),
-                        is_active = %s,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                    """,
-                    (carrier_id, brand or "", model or "", bool(is_active), existing),
-                )
-                return existing
-
-        row = self.connection.execute(
-            """
-            INSERT INTO vehicles(plate_number, monitoring_id, carrier_id, brand, model, is_active)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT(plate_number) DO UPDATE SET
-                monitoring_id = COALESCE(excluded.monitoring_id, vehicles.monitoring_id),
-                carrier_id = excluded.carrier_id,
-                brand = excluded.brand,
-                model = excluded.model,
-                is_active = excluded.is_active,
-                updated_at = CURRENT_TIMESTAMP
-            RETURNING id
-            """,
-            (plate_number, monitoring_id, carrier_id, brand or "", model or "", bool(is_active)),
-        ).fetchone()
-        return int(row["id"])
-
-    def _upsert_driver(self, *, full_name: str, phone: str, carrier_id: int | None, is_active: bool) -> int | None:
-        full_name = str(full_name or "").strip()
-        phone = str(phone or "").strip()
-        if not full_name and not phone:
+    @staticmethod
+    def _vehicle_values(task: Any, carrier_id: int | None) -> dict[str, Any]:
+        return {"plate_number": str(task.vehicle.plate_number or "").strip(),
+                "monitoring_id": task.vehicle.monitoring_id,
+                "carrier_id": carrier_id,
+                "brand": task.vehicle.brand or "",
+                "model": task.vehicle.model or "",
+                "is_active": bool(task.vehicle.is_active)}
+
+    @staticmethod
+    def _driver_values(task: Any, carrier_id: int | None) -> dict[str, Any]:
+        return {"full_name": str(task.driver.full_name or "").strip(),
+                "phone": str(task.driver.phone or "").strip(),
+                "carrier_id": carrier_id,
+                "is_active": bool(task.driver.is_active)}
+
+    def _task_values(self,
+                     task: Any,
+                     row: dict[str, Any],
+                     *,
+                     google_sheet_row: int | None,
+                     vehicle_id: int | None,
+                     driver_id: int | None,
+                     carrier_id: int | None) -> dict[str, Any]:
+        return {"google_sheet_row": google_sheet_row,
+                "vehicle_id": vehicle_id,
+                "driver_id": driver_id,
+                "carrier_id": carrier_id,
+                "status": self._status_from_row(row),
+                "planned_start_at": self._first_planned_time(task.route_plan.loads),
+                "planned_end_at": self._last_planned_time(task.route_plan.unloads),
+                "actual_start_at": row.get("actual_start_at"),
+                "actual_end_at": row.get("actual_end_at"),
+                "raw_load": task.raw_load,
+                "raw_unload": task.raw_unload,
+                "comm_load": task.comm_load,
+                "comm_unload": task.comm_unload,
+                "highlight_until": task.highlight_until,
+                "google_worksheet_title": self.source_key or row.get("google_worksheet_title")}
+
+    @classmethod
+    def _patch_values(cls, fields: dict[str, Any]) -> dict[str, Any]:
+        values: dict[str, Any] = {}
+        if "status" in fields:
+            values["status"] = cls._status_from_row(fields)
+        for column in ("raw_load", "raw_unload"):
+            if column in fields:
+                values[column] = str(fields[column] or "")
+        if "highlight_until" in fields:
+            values["highlight_until"] = fields["highlight_until"]
+        return values
+
+    def _patched_driver_id(self, current: dict[str, Any], fields: dict[str, Any]) -> int | None:
+        driver = {"full_name": str(fields.get("driver_name", current["driver_name"]) or "").strip(),
+                  "phone": str(fields.get("driver_phone", current["driver_phone"]) or "").strip(),
+                  "carrier_id": current["carrier_id"],
+                  "is_active": True}
+        lookup = self._driver_lookup_statement(driver)
+        if lookup is None:
             return None
+        existing_id = self._returned_id(self._send(lookup))
+        if existing_id is not None:
+            return existing_id
+        return self._returned_id(self.connection.execute(
+            INSERT_DRIVER_SQL, (driver["full_name"], driver["phone"], driver["carrier_id"], driver["is_active"])))
 
-        existing = self._lookup().fetch_id(
-            "SELECT id FROM drivers WHERE full_name = %s AND phone = %s",
-            (full_name, phone),
-        )
-        if existing is None:
-            row = self.connection.execute(
-                """
-                INSERT INTO drivers(full_name, phone, carrier_id, is_active)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-                """,
-                (full_name, phone, carrier_id, bool(is_active)),
-            ).fetchone()
-            return int(row["id"])
-
-        self.connection.execute(
-            """
-            UPDATE drivers
-            SET carrier_id = %s, is_active = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-            """,
-            (carrier_id, bool(is_active), existing),
-        )
-        return existing
+    @staticmethod
+    def _route_point_items(task_id: int, task: Any) -> list[tuple[int, str, list[Any], list[bool]]]:
+        processed_unloads = task.processing.processed_unloads
+        return [(task_id, "load", task.route_plan.loads, processed_unloads),
+                (task_id, "unload", task.route_plan.unloads, processed_unloads)]
 
     def _lookup(self) -> PostgresTaskLookup:
         return PostgresTaskLookup(self.connection, self.source_key)
@@ -9,6 +9,35 @@ PASSWORD_SCHEME = "pbkdf2_sha256"
 PASSWORD_ITERATIONS = 260_000
 MIN_PASSWORD_LENGTH = 8
 
+HAS_ACTIVE_ADMIN_API_KEYS_SQL = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM api_keys k
+        JOIN app_users u ON u.id = k.user_id
+        WHERE k.revoked_at IS NULL
+          AND (k.expires_at IS NULL OR k.expires_at > CURRENT_TIMESTAMP)
+          AND u.is_active = true
+          AND u.role = 'admin'
+    ) AS has_keys
+"""
+
+USER_BY_API_KEY_HASH_SQL = """
+    SELECT
+        u.id,
+        u.username,
+        u.display_name,
+        u.role,
+        u.is_active,
+        k.id AS api_key_id,
+        k.expires_at AS api_key_expires_at
+    FROM api_keys k
+    JOIN app_users u ON u.id = k.user_id
+    WHERE k.key_hash = %(key_hash)s
+      AND k.revoked_at IS NULL
+      AND (k.expires_at IS NULL OR k.expires_at > CURRENT_TIMESTAMP)
+      AND u.is_active = true
+"""
+
 
 def hash_api_key(api_key: str) -> str:
     return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
@@ -53,18 +82,7 @@ class PostgresUserRepository:
         return bool(row and row["has_keys"])
 
     def has_active_admin_api_keys(self) -> bool:
-        row = self.connection.execute(
-            """
-            SELECT EXISTS (
-                SELECT 1
-                FROM api_keys k
-                JOIN app_users u ON u.id = k.user_id
-                WHERE k.revoked_at IS NULL
-                  AND (k.expires_at IS NULL OR k.expires_at > CURRENT_TIMESTAMP)
-                  AND u.is_active = true
-                  AND u.role = 'admin'
-            ) AS has_keys
-            """).fetchone()
+        row = self.connection.execute(HAS_ACTIVE_ADMIN_API_KEYS_SQL).fetchone()
 
         return bool(row and row["has_keys"])
 
@@ -82,44 +100,55 @@ class PostgresUserRepository:
         return bool(row and row["has_users"])
 
     def get_user_by_api_key(self, api_key: str) -> dict[str, Any] | None:
-        row = self.connection.execute(
-            """
-            SELECT
-                u.id,
-                u.username,
-                u.display_name,
-                u.role,
-                u.is_active,
-                k.id AS api_key_id
-            FROM api_keys k
-            JOIN app_users u ON u.id = k.user_id
-            WHERE k.key_hash = %(key_hash)s
-              AND k.revoked_at IS NULL
-              AND (k.expires_at IS NULL OR k.expires_at > CURRENT_TIMESTAMP)
-              AND u.is_active = true
-            """, {"key_hash": hash_api_key(api_key)}, ).fetchone()
+        user = self.find_user_by_api_key_hash(hash_api_key(api_key))
+        if not user:
+            return None
+
+        user.pop("api_key_expires_at", None)
+        self.touch_api_keys([user["api_key_id"]])
+        return user
 
+    def find_user_by_api_key_hash(self, key_hash: str) -> dict[str, Any] | None:
+        row = self.connection.execute(USER_BY_API_KEY_HASH_SQL, {"key_hash": key_hash}).fetchone()
+        return self._api_key_user(row)
+
+    @staticmethod
+    def _api_key_user(row: dict[str, Any] | None) -> dict[str, Any] | None:
         if not row:
             return None
 
-        self.connection.execute(
-            """
-            UPDATE api_keys
-            SET last_used_at = CURRENT_TIMESTAMP,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %(api_key_id)s
-            """, {"api_key_id": row["api_key_id"]})
-
         return {"id": row["id"],
                 "username": row["username"],
                 "display_name": row["display_name"],
                 "role": row["role"],
                 "is_active": row["is_active"],
-                "api_key_id": row["api_key_id"]}
+                "api_key_id": row["api_key_id"],
+                "api_key_expires_at": row["api_key_expires_at"]}
+
+    def touch_api_keys(self, key_ids: list[int]) -> None:
+        if not key_ids:
+            return
+        self.connection.execute(
+            """
+            UPDATE api_keys
+            SET last_used_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ANY(%(key_ids)s)
+            """, {"key_ids": [int(key_id) for key_id in key_ids]})
 
     def authenticate(self, username: str, password: str) -> dict[str, Any] | None:
+        if not password:
+            return None
+
+        user = self.find_login_user(username)
+        if not user or not verify_password(password, user.pop("password_hash")):
+            return None
+        return user
+
+    def find_login_user(self, username: str) -> dict[str, Any] | None:
+        """Активный пользователь с password_hash для проверки пароля вне соединения (см. PasswordHasher)."""
         username = (username or "").strip()
-        if not username or not password:
+        if not username:
             return None
 
         row = self.connection.execute(
@@ -131,15 +160,15 @@ class PostgresUserRepository:
             """,
             {"username": username},
         ).fetchone()
-
-        if not row or not verify_password(password, row["password_hash"]):
+        if not row:
             return None
 
         return {"id": row["id"],
                 "username": row["username"],
                 "display_name": row["display_name"],
                 "role": row["role"],
-                "is_active": row["is_active"]}
+                "is_active": row["is_active"],
+                "password_hash": row["password_hash"]}
 
     def list_users(self) -> list[dict[str, Any]]:
         rows = self.connection.execute(
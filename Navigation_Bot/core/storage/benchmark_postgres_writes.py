@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from typing import Any
+
+from Navigation_Bot.core.database_config import DatabaseConfig
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter
+from Navigation_Bot.core.storage.postgres_connection import POSTGRES_SCHEMA_FILE, _import_psycopg
+
+# (название, POSTGRES_PIPELINE, prepare_threshold)
+MODES = (("plain", "0", None),
+         ("prepared", "0", 1),
+         ("pipeline", "1", None),
+         ("pipeline+prepared", "1", 1))
+
+
+def main() -> int:
+    """
+    Сравнивает построчную запись рейсов (PostgresTaskWriter.upsert_from_row) с pipeline mode
+    и prepared statements и без них: время на строку и число обменов с сервером.
+
+    Работает во временной схеме и удаляет её после себя:
+    python -m Navigation_Bot.core.storage.benchmark_postgres_writes --rows 200
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", default="")
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+
+    psycopg, dict_row = _import_psycopg()
+    schema = f"write_benchmark_{uuid.uuid4().hex[:8]}"
+    dsn = args.dsn or DatabaseConfig.from_env().postgres_dsn
+    pipeline_env = os.environ.get("POSTGRES_PIPELINE")
+    with psycopg.connect(dsn, row_factory=dict_row, autocommit=True) as connection:
+        connection.execute(f"CREATE SCHEMA {schema}")
+        try:
+            connection.execute(f"SET search_path TO {schema}")
+            connection.execute(POSTGRES_SCHEMA_FILE.read_text(encoding="utf-8"))
+            print(f"{'mode':<20}{'insert ms/row':>15}{'round trips':>13}{'update ms/row':>15}{'round trips':>13}")
+            for name, pipeline, threshold in MODES:
+                os.environ["POSTGRES_PIPELINE"] = pipeline
+                connection.prepare_threshold = threshold
+                connection.execute("TRUNCATE tasks, vehicles, drivers, carriers RESTART IDENTITY CASCADE")
+                writer = PostgresTaskWriter(connection, "benchmark")
+                rows = [_row(number) for number in range(1, args.rows + 1)]
+                insert_ms = _measure(writer, rows)
+                insert_trips = _round_trips(connection, writer, _row(args.rows + 1))
+                _touch(rows)
+                update_ms = _measure(writer, rows)
+                _touch(rows[-1:])
+                update_trips = _round_trips(connection, writer, rows[-1])
+                print(f"{name:<20}{insert_ms:>15.3f}{insert_trips:>13}{update_ms:>15.3f}{update_trips:>13}")
+        finally:
+            if pipeline_env is None:
+                os.environ.pop("POSTGRES_PIPELINE", None)
+            else:
+                os.environ["POSTGRES_PIPELINE"] = pipeline_env
+            connection.execute(f"DROP SCHEMA {schema} CASCADE")
+    return 0
+
+
+def _measure(writer: PostgresTaskWriter, rows: list[dict[str, Any]]) -> float:
+    started = time.perf_counter()
+    for row in rows:
+        writer.upsert_from_row(row)
+    return (time.perf_counter() - started) * 1000 / len(rows)
+
+
+def _round_trips(connection: Any, writer: PostgresTaskWriter, row: dict[str, Any]) -> int:
+    """Сколько раз клиент ждал ответа сервера при записи одной строки (по трассировке протокола libpq)."""
+    from psycopg import pq
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8", errors="replace") as trace:
+        connection.pgconn.trace(trace.fileno())
+        connection.pgconn.set_trace_flags(pq.Trace.SUPPRESS_TIMESTAMPS)
+        try:
+            writer.upsert_from_row(row)
+        finally:
+            connection.pgconn.untrace()
+        trace.seek(0)
+        trips, server_answered = 0, True
+        for line in trace:
+            direction = line.split("\t", 1)[0]
+            if direction == "F" and server_answered:
+                trips += 1
+                server_answered = False
+            elif direction == "B":
+                server_answered = True
+    return trips
+
+
+def _touch(rows: list[dict[str, Any]]) -> None:
+    for row in rows:
+        row["loads"][0]["address"] += " (изменено)"
+
+
+def _row(number: int) -> dict[str, Any]:
+    return {"google_sheet_row": number,
+            "vehicle_plate": f"Т{number:03d}ТТ",
+            "vehicle_monitoring_id": 900000 + number,
+            "driver_name": f"Водитель {number}",
+            "driver_phone": f"+7900{number:07d}",
+            "carrier_name": f"Перевозчик {number % 7}",
+            "loads": [{"address": f"Склад {number}", "date": "18.10.2026", "time": "09:00"}],
+            "unloads": [{"address": "Казань", "date": "19.10.2026", "time": "18:00"},
+                        {"address": f"Точка {number}", "date": "20.10.2026"}]}
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
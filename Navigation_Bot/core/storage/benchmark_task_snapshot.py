@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any
+
+from Navigation_Bot.core.repositories.api_task_repository import ApiTaskRepository
+
+
+class _OfflineClient:
+    """Отвечает на запись рейсов как API, без сети: в замер попадает только работа репозитория."""
+
+    def post(self, path: str, json: Any = None) -> dict[str, Any]:
+        if path == "/api/v1/tasks/batch":
+            return {"items": [{"task_id": row.get("db_task_id"), "trip_number": row.get("trip_number")}
+                              for row in json["rows"]]}
+        return {"task_id": json["row"].get("db_task_id"), "trip_number": json["row"].get("trip_number")}
+
+
+def main() -> int:
+    """
+    Задержка одной правки строки в ApiTaskRepository в зависимости от размера листа:
+    save(rows=[row]) — правка из GUI, save() — сохранение без подсказки (сравниваются все строки),
+    upsert_from_row и _merge_rows одной строки из обновления с сервера.
+
+    python -m Navigation_Bot.core.storage.benchmark_task_snapshot --rows 1000 5000 10000
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--edits", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8}{'save(rows) ms':>16}{'save() ms':>12}{'upsert ms':>12}{'merge ms':>12}")
+    for size in args.rows:
+        repository = ApiTaskRepository(_OfflineClient(), current_source_key="benchmark")
+        repository._replace_data([_row(number) for number in range(1, size + 1)])
+        data = repository.get()
+        edits = [data[number * size // args.edits] for number in range(args.edits)]
+
+        touched_ms = _measure(edits, lambda row: repository.save(source="user", rows=[row]))
+        full_ms = _measure(edits[:10], lambda row: repository.save(source="user"))
+        upsert_ms = _measure(edits, lambda row: repository.upsert_from_row(row))
+        merge_ms = _measure(edits, lambda row: repository._merge_rows([dict(row)]))
+        print(f"{size:>8}{touched_ms:>16.3f}{full_ms:>12.3f}{upsert_ms:>12.3f}{merge_ms:>12.3f}")
+    return 0
+
+
+def _measure(rows: list[dict[str, Any]], action) -> float:
+    started = time.perf_counter()
+    for row in rows:
+        row["Выгрузка"][0]["Время 1"] = f"{time.perf_counter_ns() % 24:02d}:00"
+        action(row)
+    return (time.perf_counter() - started) * 1000 / len(rows)
+
+
+def _row(number: int) -> dict[str, Any]:
+    return {"db_task_id": number,
+            "trip_number": number,
+            "google_sheet_row": number,
+            "index": number,
+            "ТС": f"Т{number:03d}ТТ 77",
+            "id": 900000 + number,
+            "Телефон": f"+7900{number:07d}",
+            "ФИО": f"Водитель {number}",
+            "КА": f"Перевозчик {number % 7}",
+            "status": "active",
+            "Погрузка": [{"Погрузка 1": f"Склад {number}", "Дата 1": "18.10.2026", "Время 1": "09:00"}],
+            "Выгрузка": [{"Выгрузка 1": "Казань", "Дата 1": "19.10.2026", "Время 1": "18:00"},
+                         {"Выгрузка 2": f"Точка {number}", "Дата 2": "20.10.2026", "Время 2": ""}],
+            "processed": [False, False],
+            "raw_load": f"Склад {number} 18.10.2026 09:00",
+            "raw_unload": f"Казань 19.10.2026 18:00\nТочка {number} 20.10.2026"}
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
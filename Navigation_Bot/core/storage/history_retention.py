@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import re
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+from psycopg import sql
+
+from Navigation_Bot.core.paths import HISTORY_ARCHIVE_DIR
+from Navigation_Bot.core.storage.postgres_connection import connect_postgres, initialize_postgres_schema
+
+PARTITIONED_TABLES_SQL = "SELECT parent_name, key_column FROM history_partitioned_tables()"
+
+ENSURE_PARTITIONS_SQL = "SELECT ensure_history_partitions(%s) AS created"
+
+PARTITIONS_SQL = """
+    SELECT child.relname AS partition_name
+    FROM pg_inherits inheritance
+    JOIN pg_class child ON child.oid = inheritance.inhrelid
+    WHERE inheritance.inhparent = to_regclass(%s)
+    ORDER BY child.relname
+"""
+
+PARTITION_MONTH_RE = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+class PartitionChangedError(RuntimeError):
+    """В партицию записали строки, пока она выгружалась в архив."""
+
+
+@dataclass(slots=True)
+class ArchivedPartition:
+    parent_name: str
+    partition_name: str
+    rows: int
+    path: Path | None
+
+
+def expired_partitions(connection: Any, *, keep_months: int, today: date | None = None) -> list[tuple[str, str]]:
+    """Помесячные партиции, целиком лежащие раньше последних keep_months месяцев (текущий не считается)."""
+    today = today or date.today()
+    cutoff = _shift_month(today.replace(day=1), -keep_months)
+    result: list[tuple[str, str]] = []
+    for table in connection.execute(PARTITIONED_TABLES_SQL).fetchall():
+        parent_name = table["parent_name"]
+        for row in connection.execute(PARTITIONS_SQL, (parent_name,)).fetchall():
+            partition_name = row["partition_name"]
+            match = PARTITION_MONTH_RE.search(partition_name)
+            if not match or partition_name != f"{parent_name}{match.group(0)}":
+                continue
+            if date(int(match.group(1)), int(match.group(2)), 1) < cutoff:
+                result.append((parent_name, partition_name))
+    return result
+
+
+def archive_partition(connection: Any, parent_name: str, partition_name: str, archive_dir: Path) -> ArchivedPartition:
+    """
+    Выгружает партицию в <archive_dir>/<partition>.csv.gz, затем отсоединяет и удаляет её.
+
+    COPY идёт без блокировки родителя, поэтому удаление — в одной транзакции с DETACH и проверкой:
+    после DETACH в партицию никто не пишет, и если строк в ней больше, чем попало в архив
+    (запись пришла во время выгрузки), транзакция откатывается и партиция остаётся в базе
+    до следующего запуска. Файл пишется во временный и переименовывается только перед COMMIT.
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{partition_name}.csv.gz"
+    partial_path = path.with_name(f"{path.name}.partial")
+    partition = sql.Identifier(partition_name)
+
+    rows = 0
+    with gzip.open(partial_path, "wb") as target, connection.cursor() as cursor:
+        with cursor.copy(sql.SQL("COPY {} TO STDOUT (FORMAT csv, HEADER)").format(partition)) as copy:
+            for data in copy:
+                target.write(data)
+        rows = max(cursor.rowcount, 0)
+    with partial_path.open("rb") as written:
+        os.fsync(written.fileno())
+
+    with connection.transaction():
+        connection.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(parent_name),
+                                                                                 partition))
+        current_rows = connection.execute(sql.SQL("SELECT count(*) AS rows FROM {}").format(partition)).fetchone()
+        if current_rows["rows"] != rows:
+            raise PartitionChangedError(f"{partition_name}: {current_rows['rows']} rows in table, "
+                                        f"{rows} archived; partition kept")
+        connection.execute(sql.SQL("DROP TABLE {}").format(partition))
+        os.replace(partial_path, path)
+    return ArchivedPartition(parent_name=parent_name, partition_name=partition_name, rows=rows, path=path)
+
+
+def apply_retention(connection: Any,
+                    *,
+                    keep_months: int,
+                    archive_dir: Path = HISTORY_ARCHIVE_DIR,
+                    months_ahead: int = 3,
+                    dry_run: bool = False) -> list[ArchivedPartition]:
+    # Сначала раскладываем строки из _default по месяцам, чтобы в архив попали и они.
+    connection.execute(ENSURE_PARTITIONS_SQL, (months_ahead,))
+    expired = expired_partitions(connection, keep_months=keep_months)
+    if dry_run:
+        return [ArchivedPartition(parent_name=parent_name, partition_name=partition_name, rows=0, path=None)
+                for parent_name, partition_name in expired]
+    return [archive_partition(connection, parent_name, partition_name, archive_dir)
+            for parent_name, partition_name in expired]
+
+
+def _shift_month(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive and drop old monthly history/audit partitions.")
+    parser.add_argument("--keep-months", type=int, default=12)
+    parser.add_argument("--archive-dir", type=Path, default=HISTORY_ARCHIVE_DIR)
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--dry-run", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    initialize_postgres_schema()
+    with connect_postgres() as connection:
+        archived = apply_retention(connection,
+                                   keep_months=args.keep_months,
+                                   archive_dir=args.archive_dir,
+                                   months_ahead=args.months_ahead,
+                                   dry_run=args.dry_run)
+    for item in archived:
+        target = item.path or "dry run"
+        print(f"{item.partition_name}: {item.rows} rows -> {target}")
+    print(f"History retention complete: {len(archived)} partitions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 from typing import Any
 
@@ -7,6 +8,19 @@ from Navigation_Bot.core.database_config import DatabaseConfig
 
 POSTGRES_SCHEMA_FILE = Path(__file__).with_name("postgres_schema.sql")
 
+HEALTHCHECK_SQL = """
+    SELECT
+        current_user AS current_user,
+        current_database() AS current_database,
+        version() AS version
+"""
+
+PUBLIC_TABLE_COUNT_SQL = """
+    SELECT COUNT(*) AS count
+    FROM information_schema.tables
+    WHERE table_schema = 'public'
+"""
+
 
 def _import_psycopg():
     try:
@@ -21,7 +35,27 @@ def _import_psycopg():
 def connect_postgres(dsn: str | None = None):
     psycopg, dict_row = _import_psycopg()
     config = DatabaseConfig.from_env()
-    return psycopg.connect(dsn or config.postgres_dsn, row_factory=dict_row, autocommit=True)
+    return psycopg.connect(dsn or config.postgres_dsn,
+                           row_factory=dict_row,
+                           autocommit=True,
+                           prepare_threshold=postgres_prepare_threshold())
+
+
+def postgres_prepare_threshold() -> int | None:
+    """
+    POSTGRES_PREPARE_THRESHOLD: после скольких выполнений одного SQL psycopg делает
+    из него prepared statement на сервере и дальше отправляет только параметры.
+
+    По умолчанию 1: повторяющиеся запросы репозиториев готовятся со второго выполнения,
+    разовые не готовятся. off — без prepared statements (PgBouncer в transaction mode).
+    """
+    value = os.getenv("POSTGRES_PREPARE_THRESHOLD", "1").strip().lower()
+    if value in {"off", "none", "no", "false"}:
+        return None
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        return 1
 
 
 def initialize_postgres_schema(dsn: str | None = None) -> None:
@@ -39,21 +73,18 @@ def postgres_healthcheck(dsn: str | None = None, connection: Any | None = None)
 
 
 def _postgres_healthcheck(connection: Any) -> dict[str, Any]:
-    row = connection.execute(
-        """
-        SELECT
-            current_user AS current_user,
-            current_database() AS current_database,
-            version() AS version
-        """
-    ).fetchone()
-    table_count = connection.execute(
-        """
-        SELECT COUNT(*) AS count
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-        """
-    ).fetchone()
+    row = connection.execute(HEALTHCHECK_SQL).fetchone()
+    table_count = connection.execute(PUBLIC_TABLE_COUNT_SQL).fetchone()
+    return _healthcheck_info(row, table_count)
+
+
+async def async_postgres_healthcheck(connection: Any) -> dict[str, Any]:
+    row = await (await connection.execute(HEALTHCHECK_SQL)).fetchone()
+    table_count = await (await connection.execute(PUBLIC_TABLE_COUNT_SQL)).fetchone()
+    return _healthcheck_info(row, table_count)
+
+
+def _healthcheck_info(row: dict[str, Any], table_count: dict[str, Any]) -> dict[str, Any]:
     return {"current_user": row["current_user"],
             "current_database": row["current_database"],
             "version": row["version"],
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import os
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any
+
+
+@contextmanager
+def postgres_pipeline(connection: Any) -> Iterator[None]:
+    """
+    Выполняет блок в pipeline mode psycopg.
+
+    Запросы уходят на сервер без ожидания ответа на каждый; ответы читаются пачкой
+    при первом fetch*() из курсора или на выходе из блока. Поэтому независимые
+    запросы нужно отправить до того, как читать результат любого из них.
+
+    Вложенный вызов, подключение без pipeline mode (старый libpq, тестовые заглушки)
+    и POSTGRES_PIPELINE=0 выполняют блок как обычно. COPY внутри блока не поддерживается.
+    """
+    if not _can_enter_pipeline(connection):
+        yield
+        return
+    with connection.pipeline():
+        yield
+
+
+@asynccontextmanager
+async def async_postgres_pipeline(connection: Any) -> AsyncIterator[None]:
+    """Async-вариант postgres_pipeline для AsyncConnection."""
+    if not _can_enter_pipeline(connection):
+        yield
+        return
+    async with connection.pipeline():
+        yield
+
+
+def _can_enter_pipeline(connection: Any) -> bool:
+    pgconn = getattr(connection, "pgconn", None)
+    if pgconn is None or not _pipeline_enabled():
+        return False
+
+    from psycopg import capabilities, pq
+
+    return capabilities.has_pipeline() and pgconn.pipeline_status == pq.PipelineStatus.OFF
+
+
+def _pipeline_enabled() -> bool:
+    return os.getenv("POSTGRES_PIPELINE", "1").strip().lower() not in {"0", "false", "no", "off"}
@@ -4,6 +4,8 @@ import os
 from typing import Any
 
 from Navigation_Bot.core.database_config import DatabaseConfig
+from Navigation_Bot.core.env import env_int
+from Navigation_Bot.core.storage.postgres_connection import postgres_prepare_threshold
 
 
 def _import_pool():
@@ -16,23 +18,40 @@ def _import_pool():
     return ConnectionPool, dict_row
 
 
-def create_postgres_pool(dsn: str | None = None) -> Any:
+def _import_async_pool():
+    try:
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+    except ModuleNotFoundError as exc:
+        raise RuntimeError(
+            "PostgreSQL connection pool is not installed. Run: python -m pip install psycopg_pool==3.3.0") from exc
+    return AsyncConnectionPool, dict_row
+
+
+def create_postgres_pool(dsn: str | None = None, *, cursor_factory: type | None = None) -> Any:
+    """cursor_factory — класс курсора для соединений пула (например, с замером времени запросов)."""
     ConnectionPool, dict_row = _import_pool()
-    config = DatabaseConfig.from_env()
-    min_size = _env_int("POSTGRES_POOL_MIN_SIZE", 2)
-    max_size = _env_int("POSTGRES_POOL_MAX_SIZE", 10)
-    timeout = float(os.getenv("POSTGRES_POOL_TIMEOUT", "10") or "10")
-    return ConnectionPool(conninfo=dsn or config.postgres_dsn,
-                          min_size=min_size,
-                          max_size=max(min_size, max_size),
-                          timeout=timeout,
-                          kwargs={"autocommit": True,
-                                  "row_factory": dict_row, },
-                          open=False)
+    return ConnectionPool(**_pool_settings(dsn, dict_row, cursor_factory), open=False)
 
 
-def _env_int(name: str, default: int) -> int:
-    try:
-        return int(os.getenv(name, str(default)) or default)
-    except (TypeError, ValueError):
-        return default
+def create_async_postgres_pool(dsn: str | None = None, *, cursor_factory: type | None = None) -> Any:
+    """AsyncConnectionPool с теми же настройками POSTGRES_POOL_*; открывается через await pool.open()."""
+    AsyncConnectionPool, dict_row = _import_async_pool()
+    return AsyncConnectionPool(**_pool_settings(dsn, dict_row, cursor_factory), open=False)
+
+
+def _pool_settings(dsn: str | None, dict_row: Any, cursor_factory: type | None = None) -> dict[str, Any]:
+    config = DatabaseConfig.from_env()
+    min_size = env_int("POSTGRES_POOL_MIN_SIZE", 2)
+    max_size = env_int("POSTGRES_POOL_MAX_SIZE", 10)
+    timeout = float(os.getenv("POSTGRES_POOL_TIMEOUT", "10") or "10")
+    kwargs: dict[str, Any] = {"autocommit": True,
+                              "row_factory": dict_row,
+                              "prepare_threshold": postgres_prepare_threshold(), }
+    if cursor_factory is not None:
+        kwargs["cursor_factory"] = cursor_factory
+    return {"conninfo": dsn or config.postgres_dsn,
+            "min_size": min_size,
+            "max_size": max(min_size, max_size),
+            "timeout": timeout,
+            "kwargs": kwargs}
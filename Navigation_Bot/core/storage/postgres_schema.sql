@@ -114,7 +114,7 @@ CREATE TABLE IF NOT EXISTS route_points (
 );
 
 CREATE TABLE IF NOT EXISTS status_events (
-    id bigserial PRIMARY KEY,
+    id bigserial,
     task_id bigint NOT NULL REFERENCES tasks(id) ON UPDATE CASCADE ON DELETE CASCADE,
     route_point_id bigint REFERENCES route_points(id) ON UPDATE CASCADE ON DELETE SET NULL,
     user_id bigint REFERENCES app_users(id) ON UPDATE CASCADE ON DELETE SET NULL,
@@ -124,8 +124,9 @@ CREATE TABLE IF NOT EXISTS status_events (
     new_value text,
     message text NOT NULL DEFAULT '',
     source text NOT NULL DEFAULT 'user',
-    created_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
+    created_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 CREATE TABLE IF NOT EXISTS task_notes (
     id bigserial PRIMARY KEY,
@@ -141,7 +142,7 @@ CREATE TABLE IF NOT EXISTS task_notes (
 );
 
 CREATE TABLE IF NOT EXISTS route_estimates (
-    id bigserial PRIMARY KEY,
+    id bigserial,
     task_id bigint NOT NULL REFERENCES tasks(id) ON UPDATE CASCADE ON DELETE CASCADE,
     target_route_point_id bigint REFERENCES route_points(id) ON UPDATE CASCADE ON DELETE SET NULL,
     target_sequence integer NOT NULL DEFAULT 0,
@@ -151,11 +152,12 @@ CREATE TABLE IF NOT EXISTS route_estimates (
     on_time boolean NOT NULL DEFAULT false,
     buffer_minutes integer NOT NULL DEFAULT 0,
     time_buffer_text text NOT NULL DEFAULT '',
-    calculated_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
+    calculated_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, calculated_at)
+) PARTITION BY RANGE (calculated_at);
 
 CREATE TABLE IF NOT EXISTS vehicle_navigation_history (
-    id bigserial PRIMARY KEY,
+    id bigserial,
     vehicle_id bigint NOT NULL REFERENCES vehicles(id) ON UPDATE CASCADE ON DELETE CASCADE,
     task_id bigint REFERENCES tasks(id) ON UPDATE CASCADE ON DELETE SET NULL,
     latitude double precision,
@@ -169,11 +171,34 @@ CREATE TABLE IF NOT EXISTS vehicle_navigation_history (
     has_fresh_coordinates boolean NOT NULL DEFAULT false,
     is_navigation_stale boolean NOT NULL DEFAULT false,
     collected_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    created_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP
+    created_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, collected_at)
+) PARTITION BY RANGE (collected_at);
+
+CREATE TABLE IF NOT EXISTS task_latest_state (
+    task_id bigint PRIMARY KEY REFERENCES tasks(id) ON UPDATE CASCADE ON DELETE CASCADE,
+    navigation_id bigint,
+    navigation_collected_at timestamptz,
+    geo_text text,
+    geo_zona text,
+    coordinates text,
+    speed_kmh double precision,
+    gps_fix_text text,
+    gps_fix_age_seconds integer,
+    has_fresh_coordinates boolean,
+    estimate_id bigint,
+    estimate_calculated_at timestamptz,
+    distance_km double precision,
+    duration_minutes integer,
+    arrival_time text,
+    on_time boolean,
+    buffer_minutes integer,
+    time_buffer_text text,
+    updated_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS audit_log (
-    id bigserial PRIMARY KEY,
+    id bigserial,
     user_id bigint REFERENCES app_users(id) ON UPDATE CASCADE ON DELETE SET NULL,
     username text NOT NULL DEFAULT '',
     role text NOT NULL DEFAULT '',
@@ -184,8 +209,9 @@ CREATE TABLE IF NOT EXISTS audit_log (
     after_data jsonb,
     changed_fields jsonb,
     source text NOT NULL DEFAULT 'api',
-    created_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
+    created_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 ALTER TABLE status_events
     ADD COLUMN IF NOT EXISTS user_id bigint REFERENCES app_users(id) ON UPDATE CASCADE ON DELETE SET NULL;
@@ -196,6 +222,151 @@ ALTER TABLE task_notes
 ALTER TABLE app_users
     ADD COLUMN IF NOT EXISTS password_hash text NOT NULL DEFAULT '';
 
+-- История и аудит разбиты на помесячные партиции по времени записи: <таблица>_pYYYYMM
+-- и <таблица>_default для строк вне созданных месяцев. Старые месяцы отсоединяет и
+-- архивирует python -m Navigation_Bot.core.storage.history_retention
+CREATE OR REPLACE FUNCTION history_partitioned_tables()
+    RETURNS TABLE (parent_name text, key_column text)
+    LANGUAGE sql IMMUTABLE AS $$
+    VALUES ('status_events', 'created_at'),
+           ('route_estimates', 'calculated_at'),
+           ('vehicle_navigation_history', 'collected_at'),
+           ('audit_log', 'created_at')
+$$;
+
+-- Создаёт партицию месяца; строки этого месяца, попавшие в _default, переносятся в неё.
+CREATE OR REPLACE FUNCTION ensure_history_partition(parent_name text, key_column text, month_value timestamptz)
+    RETURNS boolean
+    LANGUAGE plpgsql AS $$
+DECLARE
+    month_start timestamptz := date_trunc('month', month_value);
+    month_end timestamptz := date_trunc('month', month_value) + interval '1 month';
+    partition_name text := parent_name || '_p' || to_char(date_trunc('month', month_value), 'YYYYMM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                   partition_name, parent_name);
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM moved',
+                   parent_name || '_default', key_column, month_start, key_column, month_end, partition_name);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   parent_name, partition_name, month_start, month_end);
+    RETURN true;
+END
+$$;
+
+-- Партиции с прошлого месяца на months_ahead вперёд плюс месяцы, накопившиеся в _default.
+CREATE OR REPLACE FUNCTION ensure_history_partitions(months_ahead integer DEFAULT 3) RETURNS integer
+    LANGUAGE plpgsql AS $$
+DECLARE
+    partitioned record;
+    month_value timestamptz;
+    created integer := 0;
+BEGIN
+    -- Несколько процессов API стартуют одновременно: партиции создаёт один из них.
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_history_partitions'));
+    FOR partitioned IN SELECT * FROM history_partitioned_tables() LOOP
+        FOR month_value IN EXECUTE format(
+            'SELECT generate_series(date_trunc(''month'', now()) - interval ''1 month'', '
+            '                       date_trunc(''month'', now()) + make_interval(months => %s), '
+            '                       interval ''1 month'') '
+            'UNION SELECT DISTINCT date_trunc(''month'', %I) FROM %I',
+            months_ahead, partitioned.key_column, partitioned.parent_name || '_default'
+        ) LOOP
+            IF ensure_history_partition(partitioned.parent_name, partitioned.key_column, month_value) THEN
+                created := created + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+    RETURN created;
+END
+$$;
+
+-- Старая база: обычная таблица переезжает в партиционированную с теми же колонками,
+-- внешними ключами и последовательностью id. Индексы и триггеры ниже создаются заново.
+CREATE OR REPLACE FUNCTION convert_history_table_to_partitions(parent_name text, key_column text) RETURNS void
+    LANGUAGE plpgsql AS $$
+DECLARE
+    legacy_name text := parent_name || '_unpartitioned';
+    id_sequence text := pg_get_serial_sequence(parent_name, 'id');
+    foreign_key record;
+    month_value timestamptz;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass(parent_name)) IS DISTINCT FROM 'r' THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', parent_name, legacy_name);
+    EXECUTE format('ALTER INDEX IF EXISTS %I RENAME TO %I', parent_name || '_pkey', legacy_name || '_pkey');
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS, PRIMARY KEY (id, %I)) '
+                   'PARTITION BY RANGE (%I)',
+                   parent_name, legacy_name, key_column, key_column);
+    FOR foreign_key IN
+        SELECT conname, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = to_regclass(legacy_name) AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I %s', parent_name, foreign_key.conname, foreign_key.definition);
+    END LOOP;
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.id', id_sequence, parent_name);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent_name || '_default', parent_name);
+
+    FOR month_value IN EXECUTE format('SELECT DISTINCT date_trunc(''month'', %I) FROM %I', key_column, legacy_name) LOOP
+        PERFORM ensure_history_partition(parent_name, key_column, month_value);
+    END LOOP;
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', parent_name, legacy_name);
+    EXECUTE format('DROP TABLE %I', legacy_name);
+END
+$$;
+
+SELECT convert_history_table_to_partitions(parent_name, key_column) FROM history_partitioned_tables();
+
+CREATE TABLE IF NOT EXISTS status_events_default PARTITION OF status_events DEFAULT;
+CREATE TABLE IF NOT EXISTS route_estimates_default PARTITION OF route_estimates DEFAULT;
+CREATE TABLE IF NOT EXISTS vehicle_navigation_history_default PARTITION OF vehicle_navigation_history DEFAULT;
+CREATE TABLE IF NOT EXISTS audit_log_default PARTITION OF audit_log DEFAULT;
+
+SELECT ensure_history_partitions(3);
+
+-- Дата рейса из текстовых полей 'DD.MM.YYYY ...' или 'YYYY-MM-DD ...'.
+-- Разбор не зависит от DateStyle, поэтому функция IMMUTABLE и годится для generated-колонки.
+-- Любой другой текст и несуществующая дата (31.02, месяц 13, год 0000) дают NULL: функция
+-- проверяет значения сама и не бросает ошибок, иначе одна старая строка сорвала бы
+-- ADD COLUMN при старте схемы.
+CREATE OR REPLACE FUNCTION task_text_date(value text) RETURNS date
+    LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+DECLARE
+    value_year integer;
+    value_month integer;
+    value_day integer;
+BEGIN
+    IF value ~ '^[0-9]{2}\.[0-9]{2}\.[0-9]{4}' THEN
+        value_year := substr(value, 7, 4)::integer;
+        value_month := substr(value, 4, 2)::integer;
+        value_day := substr(value, 1, 2)::integer;
+    ELSIF value ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}' THEN
+        value_year := substr(value, 1, 4)::integer;
+        value_month := substr(value, 6, 2)::integer;
+        value_day := substr(value, 9, 2)::integer;
+    ELSE
+        RETURN NULL;
+    END IF;
+    IF value_year < 1 OR value_month NOT BETWEEN 1 AND 12 OR value_day < 1
+       OR value_day > extract(DAY FROM make_date(value_year, value_month, 1) + interval '1 month - 1 day') THEN
+        RETURN NULL;
+    END IF;
+    RETURN make_date(value_year, value_month, value_day);
+END
+$$;
+
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS task_date date GENERATED ALWAYS AS (
+        task_text_date(COALESCE(NULLIF(planned_start_at, ''), NULLIF(planned_end_at, ''), NULLIF(completed_at, '')))
+    ) STORED;
+
 CREATE INDEX IF NOT EXISTS idx_vehicles_carrier_id
     ON vehicles(carrier_id);
 
@@ -231,6 +402,9 @@ CREATE INDEX IF NOT EXISTS idx_tasks_active_source_updated
     ON tasks(google_worksheet_title, updated_at, id)
     WHERE status NOT IN ('completed', 'archived', 'cancelled');
 
+CREATE INDEX IF NOT EXISTS idx_tasks_source_task_date
+    ON tasks(google_worksheet_title, task_date);
+
 CREATE INDEX IF NOT EXISTS idx_route_points_task_sequence
     ON route_points(task_id, sequence);
 
@@ -243,9 +417,6 @@ CREATE INDEX IF NOT EXISTS idx_status_events_task_created
 CREATE INDEX IF NOT EXISTS idx_status_events_user_created
     ON status_events(user_id, created_at DESC);
 
-CREATE INDEX IF NOT EXISTS idx_status_events_dedupe
-    ON status_events(task_id, event_type, field_name, created_at);
-
 CREATE INDEX IF NOT EXISTS idx_task_notes_task_created
     ON task_notes(task_id, created_at);
 
@@ -255,18 +426,12 @@ CREATE INDEX IF NOT EXISTS idx_task_notes_author_created
 CREATE INDEX IF NOT EXISTS idx_route_estimates_task_calculated
     ON route_estimates(task_id, calculated_at DESC, id DESC);
 
-CREATE INDEX IF NOT EXISTS idx_route_estimates_dedupe
-    ON route_estimates(task_id, target_sequence, calculated_at);
-
 CREATE INDEX IF NOT EXISTS idx_vehicle_navigation_vehicle_collected
     ON vehicle_navigation_history(vehicle_id, collected_at DESC, id DESC);
 
 CREATE INDEX IF NOT EXISTS idx_vehicle_navigation_task_collected
     ON vehicle_navigation_history(task_id, collected_at DESC, id DESC);
 
-CREATE INDEX IF NOT EXISTS idx_vehicle_navigation_dedupe
-    ON vehicle_navigation_history(vehicle_id, task_id, collected_at);
-
 CREATE INDEX IF NOT EXISTS idx_api_keys_user_id
     ON api_keys(user_id);
 
@@ -283,6 +448,292 @@ CREATE INDEX IF NOT EXISTS idx_audit_log_user_created
 CREATE INDEX IF NOT EXISTS idx_audit_log_created
     ON audit_log(created_at DESC, id DESC);
 
+-- task_latest_state: последняя навигация и последний расчёт маршрута по рейсу.
+-- Обновляется statement-триггерами по вставленным строкам (одна upsert-команда на INSERT),
+-- более старая запись не затирает более новую. После ручных правок или удаления истории
+-- таблицу перестраивает python -m Navigation_Bot.core.storage.task_latest_state rebuild
+CREATE OR REPLACE FUNCTION task_latest_state_apply_navigation() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO task_latest_state AS state (
+        task_id, navigation_id, navigation_collected_at, geo_text, geo_zona, coordinates,
+        speed_kmh, gps_fix_text, gps_fix_age_seconds, has_fresh_coordinates
+    )
+    SELECT DISTINCT ON (task_id)
+           task_id, id, collected_at, geo_text, geo_zona, coordinates,
+           speed_kmh, gps_fix_text, gps_fix_age_seconds, has_fresh_coordinates
+    FROM inserted_rows
+    WHERE task_id IS NOT NULL
+    ORDER BY task_id, collected_at DESC, id DESC
+    ON CONFLICT (task_id) DO UPDATE SET
+        navigation_id = excluded.navigation_id,
+        navigation_collected_at = excluded.navigation_collected_at,
+        geo_text = excluded.geo_text,
+        geo_zona = excluded.geo_zona,
+        coordinates = excluded.coordinates,
+        speed_kmh = excluded.speed_kmh,
+        gps_fix_text = excluded.gps_fix_text,
+        gps_fix_age_seconds = excluded.gps_fix_age_seconds,
+        has_fresh_coordinates = excluded.has_fresh_coordinates,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE state.navigation_id IS NULL
+       OR (excluded.navigation_collected_at, excluded.navigation_id)
+          > (state.navigation_collected_at, state.navigation_id);
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION task_latest_state_apply_estimates() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO task_latest_state AS state (
+        task_id, estimate_id, estimate_calculated_at, distance_km, duration_minutes,
+        arrival_time, on_time, buffer_minutes, time_buffer_text
+    )
+    SELECT DISTINCT ON (task_id)
+           task_id, id, calculated_at, distance_km, duration_minutes,
+           arrival_time, on_time, buffer_minutes, time_buffer_text
+    FROM inserted_rows
+    ORDER BY task_id, calculated_at DESC, id DESC
+    ON CONFLICT (task_id) DO UPDATE SET
+        estimate_id = excluded.estimate_id,
+        estimate_calculated_at = excluded.estimate_calculated_at,
+        distance_km = excluded.distance_km,
+        duration_minutes = excluded.duration_minutes,
+        arrival_time = excluded.arrival_time,
+        on_time = excluded.on_time,
+        buffer_minutes = excluded.buffer_minutes,
+        time_buffer_text = excluded.time_buffer_text,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE state.estimate_id IS NULL
+       OR (excluded.estimate_calculated_at, excluded.estimate_id)
+          > (state.estimate_calculated_at, state.estimate_id);
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION task_latest_state_rebuild() RETURNS bigint
+    LANGUAGE plpgsql AS $$
+DECLARE
+    rebuilt bigint;
+BEGIN
+    -- Вставки истории во время перестройки ждут блокировку и применяются поверх результата.
+    LOCK TABLE task_latest_state IN EXCLUSIVE MODE;
+    DELETE FROM task_latest_state;
+    WITH navigation AS (
+        SELECT DISTINCT ON (task_id) *
+        FROM vehicle_navigation_history
+        WHERE task_id IS NOT NULL
+        ORDER BY task_id, collected_at DESC, id DESC
+    ),
+    estimates AS (
+        SELECT DISTINCT ON (task_id) *
+        FROM route_estimates
+        ORDER BY task_id, calculated_at DESC, id DESC
+    )
+    INSERT INTO task_latest_state (
+        task_id, navigation_id, navigation_collected_at, geo_text, geo_zona, coordinates,
+        speed_kmh, gps_fix_text, gps_fix_age_seconds, has_fresh_coordinates,
+        estimate_id, estimate_calculated_at, distance_km, duration_minutes,
+        arrival_time, on_time, buffer_minutes, time_buffer_text
+    )
+    SELECT COALESCE(n.task_id, e.task_id), n.id, n.collected_at, n.geo_text, n.geo_zona, n.coordinates,
+           n.speed_kmh, n.gps_fix_text, n.gps_fix_age_seconds, n.has_fresh_coordinates,
+           e.id, e.calculated_at, e.distance_km, e.duration_minutes,
+           e.arrival_time, e.on_time, e.buffer_minutes, e.time_buffer_text
+    FROM navigation n
+    FULL JOIN estimates e ON e.task_id = n.task_id;
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END
+$$;
+
+-- Триггеры создаются один раз; тогда же таблица заполняется по уже накопленной истории.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger
+                   WHERE tgrelid = to_regclass('vehicle_navigation_history')
+                     AND tgname = 'trg_navigation_latest_state') THEN
+        CREATE TRIGGER trg_navigation_latest_state
+            AFTER INSERT ON vehicle_navigation_history
+            REFERENCING NEW TABLE AS inserted_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION task_latest_state_apply_navigation();
+        CREATE TRIGGER trg_route_estimates_latest_state
+            AFTER INSERT ON route_estimates
+            REFERENCING NEW TABLE AS inserted_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION task_latest_state_apply_estimates();
+        PERFORM task_latest_state_rebuild();
+    END IF;
+END $$;
+
+-- Текстовые представления для JSON-проекции строк GUI (PostgresTaskJsonReader).
+-- Повторяют то, что даёт сборка строки в Python: repr(float), datetime через to_jsonable_python,
+-- и format_coordinate_pair.
+CREATE OR REPLACE FUNCTION gui_float_text(value double precision) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN value = trunc(value) AND abs(value) < 1e15 THEN value::text || '.0'
+        ELSE value::text
+    END
+$$;
+
+CREATE OR REPLACE FUNCTION gui_timestamp_text(value timestamptz) RETURNS text
+    LANGUAGE sql STABLE PARALLEL SAFE AS $$
+    SELECT to_char(value, 'YYYY-MM-DD"T"HH24:MI:SS')
+        || CASE WHEN to_char(value, 'US') = '000000' THEN '' ELSE to_char(value, '.US') END
+        || CASE WHEN to_char(value, 'TZH:TZM') = '+00:00' THEN 'Z' ELSE to_char(value, 'TZH:TZM') END
+$$;
+
+CREATE OR REPLACE FUNCTION gui_coordinate_pair_text(latitude double precision, longitude double precision)
+    RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN latitude IS NULL OR longitude IS NULL THEN ''
+        ELSE rtrim(rtrim(to_char(latitude, 'FM999999990.000000') || ', '
+                         || to_char(longitude, 'FM999999990.000000'), '0'), '.')
+    END
+$$;
+
+-- Лента изменений для GUI: после записи рейса, его точек или последнего состояния
+-- NOTIFY task_changes с {"source_key": ..., "task_ids": [...]}, не больше 500 id на сообщение.
+-- Уведомления уходят при COMMIT; API раздаёт их подписчикам GET /api/v1/tasks/changes.
+CREATE OR REPLACE FUNCTION notify_task_changes() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format($query$
+        SELECT pg_notify('task_changes',
+                         json_build_object('source_key', source_key,
+                                           'task_ids', array_agg(task_id ORDER BY task_id))::text)
+        FROM (
+            SELECT changed.task_id,
+                   COALESCE(t.google_worksheet_title, '') AS source_key,
+                   (ROW_NUMBER() OVER (PARTITION BY t.google_worksheet_title ORDER BY changed.task_id) - 1) / 500 AS chunk
+            FROM (SELECT DISTINCT %I AS task_id FROM changed_rows) changed
+            JOIN tasks t ON t.id = changed.task_id
+        ) grouped
+        GROUP BY source_key, chunk
+    $query$, TG_ARGV[0]);
+    RETURN NULL;
+END
+$$;
+
+-- Триггер с transition table допускает одно событие, поэтому по триггеру на INSERT/UPDATE/DELETE.
+DO $$
+DECLARE
+    target record;
+    trigger_name text;
+BEGIN
+    FOR target IN
+        SELECT *
+        FROM (VALUES ('tasks', 'id', 'INSERT', 'NEW'),
+                     ('tasks', 'id', 'UPDATE', 'NEW'),
+                     ('route_points', 'task_id', 'INSERT', 'NEW'),
+                     ('route_points', 'task_id', 'UPDATE', 'NEW'),
+                     ('route_points', 'task_id', 'DELETE', 'OLD'),
+                     ('task_latest_state', 'task_id', 'INSERT', 'NEW'),
+                     ('task_latest_state', 'task_id', 'UPDATE', 'NEW')) AS triggers(table_name, task_column, event, transition)
+    LOOP
+        trigger_name := format('trg_%s_notify_%s', target.table_name, lower(target.event));
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(target.table_name) AND tgname = trigger_name) THEN
+            EXECUTE format('CREATE TRIGGER %I AFTER %s ON %I REFERENCING %s TABLE AS changed_rows '
+                           'FOR EACH STATEMENT EXECUTE FUNCTION notify_task_changes(%L)',
+                           trigger_name, target.event, target.table_name, target.transition, target.task_column);
+        END IF;
+    END LOOP;
+END $$;
+
+-- Номера новых рейсов выдаёт последовательность. Сдвигается только вперёд:
+-- на старой базе или после ручной вставки номеров она догоняет MAX(trip_number).
+CREATE SEQUENCE IF NOT EXISTS tasks_trip_number_seq AS integer OWNED BY tasks.trip_number;
+
+SELECT setval('tasks_trip_number_seq', current_max.value)
+FROM (SELECT MAX(trip_number) AS value FROM tasks) AS current_max
+WHERE current_max.value > (
+    SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END
+    FROM tasks_trip_number_seq
+);
+
+ALTER TABLE tasks
+    ALTER COLUMN trip_number SET DEFAULT nextval('tasks_trip_number_seq');
+
+-- Явные номера рейсов (из таблицы или клиента) тоже сдвигают последовательность вперёд,
+-- иначе следующий nextval может выдать уже занятый номер. Блокировка — только когда нужно сдвигать.
+CREATE OR REPLACE FUNCTION tasks_trip_number_seq_catch_up() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+DECLARE
+    inserted_max integer;
+BEGIN
+    SELECT MAX(trip_number) INTO inserted_max FROM inserted_rows;
+    IF inserted_max IS NULL OR inserted_max <= (
+        SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END
+        FROM tasks_trip_number_seq
+    ) THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('tasks_trip_number_seq'));
+    PERFORM setval('tasks_trip_number_seq', GREATEST(last_value, inserted_max))
+    FROM tasks_trip_number_seq;
+    RETURN NULL;
+END
+$$;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass('tasks') AND tgname = 'trg_tasks_trip_number_seq') THEN
+        CREATE TRIGGER trg_tasks_trip_number_seq
+            AFTER INSERT ON tasks
+            REFERENCING NEW TABLE AS inserted_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION tasks_trip_number_seq_catch_up();
+    END IF;
+END $$;
+
+-- Ключи дедупликации истории. Пакетная запись идёт через INSERT ... ON CONFLICT DO NOTHING,
+-- поэтому индексы уникальные; при первом создании из старой базы удаляются накопленные дубли.
+DO $$
+BEGIN
+    IF to_regclass('uq_status_events_dedupe') IS NULL THEN
+        DELETE FROM status_events duplicate
+        USING status_events kept
+        WHERE duplicate.id > kept.id
+          AND duplicate.task_id = kept.task_id
+          AND duplicate.event_type = kept.event_type
+          AND duplicate.field_name = kept.field_name
+          AND duplicate.created_at = kept.created_at
+          AND duplicate.message = kept.message;
+        CREATE UNIQUE INDEX uq_status_events_dedupe
+            ON status_events(task_id, event_type, field_name, created_at, message);
+    END IF;
+
+    IF to_regclass('uq_route_estimates_dedupe') IS NULL THEN
+        DELETE FROM route_estimates duplicate
+        USING route_estimates kept
+        WHERE duplicate.id > kept.id
+          AND duplicate.task_id = kept.task_id
+          AND duplicate.target_sequence = kept.target_sequence
+          AND duplicate.calculated_at = kept.calculated_at
+          AND duplicate.arrival_time = kept.arrival_time;
+        CREATE UNIQUE INDEX uq_route_estimates_dedupe
+            ON route_estimates(task_id, target_sequence, calculated_at, arrival_time);
+    END IF;
+
+    IF to_regclass('uq_vehicle_navigation_dedupe') IS NULL THEN
+        DELETE FROM vehicle_navigation_history duplicate
+        USING vehicle_navigation_history kept
+        WHERE duplicate.id > kept.id
+          AND duplicate.vehicle_id = kept.vehicle_id
+          AND duplicate.task_id IS NOT DISTINCT FROM kept.task_id
+          AND duplicate.collected_at = kept.collected_at
+          AND duplicate.coordinates = kept.coordinates
+          AND duplicate.geo_text = kept.geo_text;
+        CREATE UNIQUE INDEX uq_vehicle_navigation_dedupe
+            ON vehicle_navigation_history(vehicle_id, (COALESCE(task_id, 0)), collected_at, coordinates, geo_text);
+    END IF;
+END $$;
+
+DROP INDEX IF EXISTS idx_status_events_dedupe;
+DROP INDEX IF EXISTS idx_route_estimates_dedupe;
+DROP INDEX IF EXISTS idx_vehicle_navigation_dedupe;
+
 INSERT INTO schema_migrations(version)
 VALUES (1)
 ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any
+
+from Navigation_Bot.core.repositories.postgres_task_reader import LATEST_STATE_SQL
+from Navigation_Bot.core.storage.postgres_connection import connect_postgres, initialize_postgres_schema
+
+REBUILD_SQL = "SELECT task_latest_state_rebuild() AS count"
+
+BENCHMARK_TASK_IDS_SQL = """
+    SELECT id
+    FROM tasks
+    WHERE status = 'active'
+    ORDER BY id DESC
+    LIMIT %s
+"""
+
+# Прежний путь чтения: DISTINCT ON по всей истории задачи на каждый запрос списка.
+DISTINCT_ON_NAVIGATION_SQL = """
+    SELECT DISTINCT ON (task_id)
+           task_id, geo_text, geo_zona, coordinates, speed_kmh,
+           gps_fix_text, gps_fix_age_seconds, has_fresh_coordinates
+    FROM vehicle_navigation_history
+    WHERE task_id = ANY(%s)
+    ORDER BY task_id, collected_at DESC, id DESC
+"""
+
+DISTINCT_ON_ROUTE_ESTIMATES_SQL = """
+    SELECT DISTINCT ON (task_id)
+           task_id, distance_km, duration_minutes, arrival_time,
+           on_time, buffer_minutes, time_buffer_text
+    FROM route_estimates
+    WHERE task_id = ANY(%s)
+    ORDER BY task_id, calculated_at DESC, id DESC
+"""
+
+
+def rebuild_task_latest_state(connection: Any) -> int:
+    """Пересобирает task_latest_state по истории навигации и расчётов; возвращает число задач."""
+    row = connection.execute(REBUILD_SQL).fetchone()
+    return int(row["count"] or 0)
+
+
+def benchmark_task_latest_state(connection: Any, *, limit: int = 500, repeat: int = 20) -> dict[str, Any]:
+    """Медианное время чтения последнего состояния для активных задач: DISTINCT ON против task_latest_state."""
+    task_ids = [int(row["id"]) for row in connection.execute(BENCHMARK_TASK_IDS_SQL, (limit,)).fetchall()]
+
+    def distinct_on() -> None:
+        connection.execute(DISTINCT_ON_NAVIGATION_SQL, (task_ids,)).fetchall()
+        connection.execute(DISTINCT_ON_ROUTE_ESTIMATES_SQL, (task_ids,)).fetchall()
+
+    def latest_state() -> None:
+        connection.execute(LATEST_STATE_SQL, (task_ids,)).fetchall()
+
+    return {"tasks": len(task_ids),
+            "distinct_on_ms": _median_ms(distinct_on, repeat),
+            "latest_state_ms": _median_ms(latest_state, repeat)}
+
+
+def _median_ms(query: Any, repeat: int) -> float:
+    query()
+    elapsed: list[float] = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        query()
+        elapsed.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(elapsed), 3)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain the task_latest_state table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild", help="Rebuild latest navigation/estimate per task from history.")
+    benchmark = commands.add_parser("benchmark", help="Compare DISTINCT ON reads with task_latest_state.")
+    benchmark.add_argument("--limit", type=int, default=500)
+    benchmark.add_argument("--repeat", type=int, default=20)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    initialize_postgres_schema()
+    with connect_postgres() as connection:
+        if args.command == "rebuild":
+            print(f"task_latest_state rebuilt: {rebuild_task_latest_state(connection)} tasks")
+            return 0
+
+        result = benchmark_task_latest_state(connection, limit=args.limit, repeat=args.repeat)
+    print(f"Active tasks: {result['tasks']}")
+    print(f"DISTINCT ON history:  {result['distinct_on_ms']:.3f} ms")
+    print(f"task_latest_state:    {result['latest_state_ms']:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -213,6 +213,7 @@ class AppServices:
             c.row_highlighter.highlight_completed_rows()
 
         c.table_manager.after_display = _after_display
+        c.task_table_controller.start_change_feed(g.ui_bridge.call.emit)
 
     def shutdown(self):
         g = self.gui
@@ -223,6 +224,12 @@ class AppServices:
         except Exception as e:
             g.log(f"Не удалось сохранить настройки окна: {e}")
 
+        try:
+            if hasattr(c, "task_table_controller"):
+                c.task_table_controller.stop_change_feed()
+        except Exception as e:
+            g.log(f"Не удалось остановить подписку на изменения: {e}")
+
         try:
             if hasattr(c, "hotkeys"):
                 c.hotkeys.stop()
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 import time
-from threading import Lock
+from threading import Event, Lock, Thread
 from typing import Any, Callable
 
 
@@ -29,6 +29,7 @@ class TaskTableController:
         self._data_lock = Lock()
         self._last_reload_signature: tuple[str, bool] | None = None
         self._last_reload_at = 0.0
+        self._change_feed_stop: Event | None = None
 
     def reload_and_show(self) -> None:
         with self._data_lock:
@@ -54,6 +55,32 @@ class TaskTableController:
 
         self.display_current_data()
 
+    def start_change_feed(self, post_to_gui: Callable[[Callable[[], None]], None]) -> None:
+        """
+        Push-обновление таблицы: фоновый поток слушает ленту изменений API, а применение
+        события и перерисовка выполняются в GUI-потоке через post_to_gui.
+        """
+        listen = getattr(self.task_repository, "listen_changes", None)
+        if not self._use_change_feed() or listen is None or self._change_feed_stop is not None:
+            return
+        self._change_feed_stop = Event()
+        Thread(target=listen,
+               args=(lambda event, data: post_to_gui(lambda: self._apply_change_event(event, data)),),
+               kwargs={"stop": self._change_feed_stop},
+               name="task-change-feed",
+               daemon=True).start()
+
+    def stop_change_feed(self) -> None:
+        if self._change_feed_stop is not None:
+            self._change_feed_stop.set()
+            self._change_feed_stop = None
+
+    def _apply_change_event(self, event: str, data: Any) -> None:
+        with self._data_lock:
+            changed = self.task_repository.apply_change_event(event, data)
+        if changed:
+            self.display_current_data()
+
     def display_current_data(self) -> None:
         with self._data_lock:
             self.on_rows_changed(self.task_repository.get())
@@ -79,3 +106,7 @@ class TaskTableController:
     @staticmethod
     def _use_incremental_refresh() -> bool:
         return os.getenv("NAV_API_INCREMENTAL_REFRESH", "").strip().lower() in {"1", "true", "yes", "on"}
+
+    @staticmethod
+    def _use_change_feed() -> bool:
+        return os.getenv("NAV_API_PUSH_UPDATES", "").strip().lower() in {"1", "true", "yes", "on"}
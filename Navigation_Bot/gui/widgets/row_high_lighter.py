@@ -90,7 +90,7 @@ class RowHighlighter:
                 if 0 <= visual_row < self.table.rowCount():
                     self._paint_row(visual_row, enabled=False)
 
-            self.task_repository.save(source="user")
+            self.task_repository.save(source="user", rows=[rec])
             return False  # выключили
 
         # если нет → включить на длительность из настроек
@@ -155,7 +155,7 @@ class RowHighlighter:
 
         # сохранить в JSON запись
         rec["highlight_until"] = expiry_iso
-        self.task_repository.save(source="user")
+        self.task_repository.save(source="user", rows=[rec])
 
         # сохранить в runtime-map
         self.until_map[row_identity] = expiry_dt
@@ -270,7 +270,7 @@ class RowHighlighter:
         # очистить JSON-метку
         if rec.get("highlight_until"):
             rec["highlight_until"] = ""
-            self.task_repository.save(source="user")
+            self.task_repository.save(source="user", rows=[rec])
 
         self.until_map.pop(row_identity, None)
 
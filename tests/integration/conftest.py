@@ -0,0 +1,24 @@
+import os
+import uuid
+
+import pytest
+
+from Navigation_Bot.core.storage.postgres_connection import POSTGRES_SCHEMA_FILE, connect_postgres
+
+DSN = os.getenv("NAV_TEST_POSTGRES_DSN")
+
+
+@pytest.fixture
+def postgres_schema_connection():
+    """Соединение с чистой схемой navigation (отдельный search_path на тест), удаляется после теста."""
+    if not DSN:
+        pytest.skip("NAV_TEST_POSTGRES_DSN is not set")
+    schema = f"nav_test_{uuid.uuid4().hex[:8]}"
+    with connect_postgres(DSN) as connection:
+        connection.execute(f"CREATE SCHEMA {schema}")
+        try:
+            connection.execute(f"SET search_path TO {schema}")
+            connection.execute(POSTGRES_SCHEMA_FILE.read_text(encoding="utf-8"))
+            yield connection
+        finally:
+            connection.execute(f"DROP SCHEMA {schema} CASCADE")
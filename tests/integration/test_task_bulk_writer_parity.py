@@ -0,0 +1,109 @@
+import copy
+
+import pytest
+
+from Navigation_Bot.core.repositories.postgres_task_repository import PostgresTaskRepository
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter, TaskConflictError
+
+STATE_SQL = """
+    SELECT t.trip_number, t.google_sheet_row, t.google_worksheet_title, t.status,
+           t.planned_start_at, t.planned_end_at, t.raw_load, t.raw_unload, t.highlight_until, t.task_date,
+           v.plate_number, v.monitoring_id, v.is_active AS vehicle_is_active, vc.name AS vehicle_carrier,
+           d.full_name, d.phone, dc.name AS driver_carrier, c.name AS carrier,
+           (SELECT json_agg(json_build_array(p.point_type, p.sequence, p.location, p.scheduled_time, p.is_processed)
+                            ORDER BY p.point_type, p.sequence)
+            FROM route_points p WHERE p.task_id = t.id) AS route_points
+    FROM tasks t
+    LEFT JOIN vehicles v ON v.id = t.vehicle_id
+    LEFT JOIN carriers vc ON vc.id = v.carrier_id
+    LEFT JOIN drivers d ON d.id = t.driver_id
+    LEFT JOIN carriers dc ON dc.id = d.carrier_id
+    LEFT JOIN carriers c ON c.id = t.carrier_id
+    ORDER BY t.trip_number
+"""
+
+COUNTS_SQL = """
+    SELECT (SELECT count(*) FROM tasks) AS tasks, (SELECT count(*) FROM vehicles) AS vehicles,
+           (SELECT count(*) FROM drivers) AS drivers, (SELECT count(*) FROM carriers) AS carriers,
+           (SELECT count(*) FROM route_points) AS route_points
+"""
+
+
+def _row(google_sheet_row, plate, driver, phone, carrier, unloads, **extra):
+    return {"google_sheet_row": google_sheet_row, "ТС": plate, "ФИО": driver, "Телефон": phone, "КА": carrier,
+            "Погрузка": [{"Погрузка 1": f"Склад {google_sheet_row}", "Дата 1": "18.10.2026", "Время 1": "09:00"}],
+            "Выгрузка": [{f"Выгрузка {number}": address, f"Дата {number}": day, f"Время {number}": ""}
+                         for number, (address, day) in enumerate(unloads, start=1)],
+            "processed": [False] * len(unloads),
+            **extra}
+
+
+SEED = [
+    _row(2, "А001АА 77", "Петров П.", "+7900", "Вектор", [("Казань", "19.10.2026")]),
+    _row(3, "В002ВВ 77", "Иванов И.", "+7901", "Вектор", [("Тверь", "20.10.2026"), ("Клин", "21.10.2026")]),
+]
+
+# Обновление по trip_number и по строке таблицы, новые рейсы с номером и без, повтор машины
+# (второй сегмент пакета), смена перевозчика у существующей машины и общий водитель.
+BATCH = [
+    _row(2, "А001АА 77", "Петров П.", "+7999", "Вектор", [("Самара", "22.10.2026")], trip_number=1),
+    _row(3, "В002ВВ 77", "Иванов И.", "+7901", "Магистраль", [("Тверь", "20.10.2026")]),
+    _row(4, "С003СС 77", "Сидоров С.", "+7902", "Магистраль", [("Уфа", "2026-10-23")]),
+    _row(5, "Е004ЕЕ 77", "Сидоров С.", "+7902", "", [], trip_number=50),
+    _row(6, "А001АА 77", "Орлов О.", "", "Вектор", [("Пермь", "31.02.2026")]),
+]
+
+
+@pytest.fixture
+def repository(postgres_schema_connection):
+    writer = PostgresTaskWriter(postgres_schema_connection, "sheet")
+    for row in SEED:
+        writer.upsert_from_row(copy.deepcopy(row))
+    return PostgresTaskRepository(postgres_schema_connection, current_source_key="sheet")
+
+
+def _state(connection):
+    return connection.execute(STATE_SQL).fetchall(), connection.execute(COUNTS_SQL).fetchone()
+
+
+def _next_trip_number(connection):
+    row = connection.execute("SELECT last_value, is_called FROM tasks_trip_number_seq").fetchone()
+    return row["last_value"] + 1 if row["is_called"] else row["last_value"]
+
+
+def test_bulk_upsert_matches_row_by_row_writer(repository):
+    connection = repository.connection
+    next_trip_number = _next_trip_number(connection)
+
+    with connection.transaction(force_rollback=True):
+        writer = PostgresTaskWriter(connection, "sheet")
+        row_results = [writer.upsert_from_row(row) for row in copy.deepcopy(BATCH)]
+        row_state = _state(connection)
+    connection.execute("SELECT setval('tasks_trip_number_seq', %s, false)", (next_trip_number,))
+
+    batch_rows = copy.deepcopy(BATCH)
+    batch_results = repository.upsert_rows_batch(batch_rows)
+
+    assert _state(connection) == row_state
+    assert [(result["trip_number"], result["created"]) for result in batch_results] == [
+        (result["trip_number"], result["created"]) for result in row_results]
+    assert [result["trip_number"] for result in batch_results] == [1, 2, 3, 50, 51]
+    assert [row["db_task_id"] for row in batch_rows] == [result["task_id"] for result in batch_results]
+
+
+def test_conflict_reports_row_number_and_rolls_back_whole_batch(repository):
+    connection = repository.connection
+    before = _state(connection)
+    current = {row["trip_number"]: row["updated_at"]
+               for row in connection.execute("SELECT trip_number, updated_at FROM tasks").fetchall()}
+    batch = copy.deepcopy(BATCH[:3])
+    batch[0]["updated_at"] = current[1]
+    batch[1].update(trip_number=2, updated_at="2000-01-01T00:00:00+00:00")
+
+    with pytest.raises(TaskConflictError) as raised:
+        repository.upsert_rows_batch(batch)
+
+    assert raised.value.row_number == 2
+    assert str(raised.value.current_updated_at) == str(current[2])
+    assert _state(connection) == before
+    assert "db_task_id" not in batch[0]
@@ -0,0 +1,99 @@
+import json
+import os
+import uuid
+
+import pytest
+from pydantic_core import to_jsonable_python
+
+from Navigation_Bot.core.repositories.postgres_task_json_reader import PostgresTaskJsonReader
+from Navigation_Bot.core.repositories.postgres_task_reader import PostgresTaskReader
+from Navigation_Bot.core.storage.postgres_connection import POSTGRES_SCHEMA_FILE, connect_postgres
+
+DSN = os.getenv("NAV_TEST_POSTGRES_DSN")
+
+pytestmark = pytest.mark.skipif(not DSN, reason="NAV_TEST_POSTGRES_DSN is not set")
+
+FIXTURE_SQL = """
+    INSERT INTO carriers (id, name) VALUES (1, 'ООО "Вектор"\\ \t'), (2, 'ИП Ёлкин');
+    INSERT INTO vehicles (id, plate_number, monitoring_id) VALUES (1, 'А123ВС 77', 501), (2, 'В777ОР', NULL);
+    INSERT INTO drivers (id, full_name, phone) VALUES (1, 'Петров П.', '+7 900 000-00-00'), (2, E'Ли\\nКо', '');
+
+    INSERT INTO tasks (id, trip_number, google_worksheet_title, google_sheet_row, vehicle_id, driver_id, carrier_id,
+                       status, raw_load, raw_unload, highlight_until, updated_at)
+    VALUES (1, 10, 'sheet', 2, 1, 1, 1, 'new', E'Москва\\n"склад"', 'Казань', '18.10.2026 12:00',
+            '2026-10-18 10:00:00.120000+00'),
+           (2, 11, 'sheet', NULL, 2, 2, 2, 'in_progress', '', E'\\u0001', '', '2026-10-18 10:00:00+00'),
+           (3, 12, NULL, 5, NULL, NULL, NULL, 'new', '', '', NULL, '2026-01-31 23:59:59.000001+00'),
+           (4, 13, 'sheet', 7, 1, NULL, 2, 'completed', '', '', NULL, '2026-07-01 00:00:00+00');
+
+    INSERT INTO route_points (task_id, sequence, point_type, location, scheduled_time, comment,
+                              latitude, longitude, is_processed)
+    VALUES (1, 1, 'load', 'Москва, ул. Ленина 1', '18.10.2026 09:00', '', 55.7558265, 37.6173, false),
+           (1, 2, 'load', '', '  19.10.2026   10:30 extra ', 'позвонить "заранее"', NULL, 37.6, false),
+           (1, 1, 'unload', 'Казань', '20.10.2026', E'ворота\\t3', 55.79, 49.1221, true),
+           (1, 2, 'unload', '', '', 'только комментарий', 0.0, -0.5, false),
+           (1, 3, 'unload', '', '14:30', '', -33.8688, 151.2093, true),
+           (1, 4, 'unload', '', NULL, '', NULL, NULL, false),
+           (2, 1, 'unload', 'Точка\\путь', '  ', '', 90.0, 180.0, false),
+           (4, 1, 'load', 'Тверь', '01.07.2026 08:00', '', 56.8587, 35.9176, true);
+
+    INSERT INTO task_latest_state (task_id, navigation_id, geo_text, geo_zona, coordinates, speed_kmh,
+                                   gps_fix_text, gps_fix_age_seconds, has_fresh_coordinates,
+                                   estimate_id, distance_km, duration_minutes, arrival_time,
+                                   on_time, buffer_minutes, time_buffer_text)
+    VALUES (1, 100, 'М-11, 120 км', 'zone', '56.1, 36.2', 87.5, '5 мин', 300, true,
+            200, 732.0, 540, '19.10.2026 18:00', true, 95, '1 ч 35 мин'),
+           (2, 101, '', '', '', NULL, '', NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL),
+           (3, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL,
+            201, 0.1, 15, '', false, -20, ''),
+           (4, 102, 'Тверь', '', '', 0.0, 'старые', NULL, false,
+            202, 12.345678901, 0, '', NULL, 0, '');
+"""
+
+
+@pytest.fixture
+def connection():
+    schema = f"task_json_parity_{uuid.uuid4().hex[:8]}"
+    with connect_postgres(DSN) as connection:
+        connection.execute(f"CREATE SCHEMA {schema}")
+        try:
+            connection.execute(f"SET search_path TO {schema}")
+            connection.execute(POSTGRES_SCHEMA_FILE.read_text(encoding="utf-8"))
+            connection.execute(FIXTURE_SQL)
+            yield connection
+        finally:
+            connection.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def _python_lines(rows: list[dict]) -> list[str]:
+    return [json.dumps(to_jsonable_python(row), ensure_ascii=False, separators=(",", ":")) for row in rows]
+
+
+@pytest.mark.parametrize("time_zone", ["UTC", "Europe/Moscow", "America/New_York"])
+def test_json_projection_matches_python_rows_byte_for_byte(connection, time_zone):
+    connection.execute(f"SET TIME ZONE '{time_zone}'")
+    python_rows = [row for chunk in PostgresTaskReader(connection).iter_active_row_chunks(include_completed=True)
+                   for row in chunk]
+    json_rows = [row for chunk in PostgresTaskJsonReader(connection).iter_active_json_chunks(include_completed=True)
+                 for row in chunk]
+
+    assert len(python_rows) == 4
+    assert [row["item_json"] for row in json_rows] == _python_lines(python_rows)
+    assert [(row["updated_at"], row["db_task_id"]) for row in json_rows] == [
+        (row["updated_at"], row["db_task_id"]) for row in python_rows]
+
+
+def test_json_keyset_pages_match_python_pages(connection):
+    python_reader = PostgresTaskReader(connection)
+    json_reader = PostgresTaskJsonReader(connection)
+
+    python_rows, python_after, python_total = python_reader.load_active_rows_after("sheet", limit=1,
+                                                                                   include_total=True)
+    json_rows, json_after, json_total = json_reader.load_active_json_after("sheet", limit=1, include_total=True)
+    assert [row["item_json"] for row in json_rows] == _python_lines(python_rows)
+    assert (json_after, json_total) == (python_after, python_total)
+
+    python_rows, python_after, _ = python_reader.load_active_rows_after("sheet", limit=5, after=python_after)
+    json_rows, json_after, _ = json_reader.load_active_json_after("sheet", limit=5, after=json_after)
+    assert [row["item_json"] for row in json_rows] == _python_lines(python_rows)
+    assert json_after is None and python_after is None
@@ -0,0 +1,105 @@
+import pytest
+
+FIXTURE_SQL = """
+    INSERT INTO vehicles (id, plate_number) VALUES (1, 'А123ВС 77'), (2, 'В777ОР');
+    INSERT INTO tasks (id, trip_number) VALUES (1, 10), (2, 11), (3, 12);
+"""
+
+# Каждая строка — отдельный INSERT: несколько строк на один рейс, порядок не по времени,
+# одинаковое время (решает id), строки в разных месячных партициях и навигация без рейса.
+NAVIGATION_INSERTS = [
+    """
+    INSERT INTO vehicle_navigation_history (vehicle_id, task_id, geo_text, speed_kmh, collected_at)
+    VALUES (1, 1, 'nav 1-b', 40, '2026-10-18 10:00+00'),
+           (1, 1, 'nav 1-a', 30, '2026-10-18 09:00+00'),
+           (2, 2, 'nav 2-a', 50, '2026-09-30 23:59+00'),
+           (2, NULL, 'no task', 10, '2026-10-19 00:00+00')
+    """,
+    """
+    INSERT INTO vehicle_navigation_history (vehicle_id, task_id, geo_text, speed_kmh, collected_at)
+    VALUES (1, 1, 'nav 1-old', 20, '2026-10-17 10:00+00'),
+           (2, 2, 'nav 2-b', 55, '2026-10-01 00:01+00'),
+           (2, 2, 'nav 2-tie', 56, '2026-10-01 00:01+00')
+    """,
+    """
+    INSERT INTO vehicle_navigation_history (vehicle_id, task_id, geo_text, speed_kmh, collected_at)
+    VALUES (2, 3, 'nav 3-a', 0, '2026-08-01 12:00+00')
+    """,
+]
+
+ESTIMATE_INSERTS = [
+    """
+    INSERT INTO route_estimates (task_id, distance_km, arrival_time, on_time, calculated_at)
+    VALUES (1, 100, 'b', true, '2026-10-18 10:00+00'),
+           (1, 120, 'a', false, '2026-10-18 08:00+00'),
+           (3, 5, 'c', true, '2026-10-18 11:00+00')
+    """,
+    """
+    INSERT INTO route_estimates (task_id, distance_km, arrival_time, on_time, calculated_at)
+    VALUES (1, 90, 'old', true, '2026-09-18 10:00+00'),
+           (3, 4, 'tie-1', true, '2026-10-18 11:00+00'),
+           (3, 3, 'tie-2', false, '2026-10-18 11:00+00')
+    """,
+]
+
+STATE_SQL = """
+    SELECT task_id, navigation_id, navigation_collected_at, geo_text, speed_kmh,
+           estimate_id, estimate_calculated_at, distance_km, arrival_time, on_time
+    FROM task_latest_state
+    ORDER BY task_id
+"""
+
+EXPECTED_SQL = """
+    WITH navigation AS (
+        SELECT DISTINCT ON (task_id) task_id, id, collected_at, geo_text, speed_kmh
+        FROM vehicle_navigation_history
+        WHERE task_id IS NOT NULL
+        ORDER BY task_id, collected_at DESC, id DESC
+    ),
+    estimates AS (
+        SELECT DISTINCT ON (task_id) task_id, id, calculated_at, distance_km, arrival_time, on_time
+        FROM route_estimates
+        ORDER BY task_id, calculated_at DESC, id DESC
+    )
+    SELECT COALESCE(n.task_id, e.task_id) AS task_id,
+           n.id AS navigation_id, n.collected_at AS navigation_collected_at, n.geo_text, n.speed_kmh,
+           e.id AS estimate_id, e.calculated_at AS estimate_calculated_at, e.distance_km, e.arrival_time, e.on_time
+    FROM navigation n
+    FULL JOIN estimates e ON e.task_id = n.task_id
+    ORDER BY 1
+"""
+
+
+@pytest.fixture
+def connection(postgres_schema_connection):
+    postgres_schema_connection.execute(FIXTURE_SQL)
+    return postgres_schema_connection
+
+
+def _state(connection):
+    return connection.execute(STATE_SQL).fetchall()
+
+
+def test_triggers_keep_latest_state_equal_to_history(connection):
+    for navigation, estimate in zip(NAVIGATION_INSERTS, ESTIMATE_INSERTS + [None]):
+        connection.execute(navigation)
+        if estimate is not None:
+            connection.execute(estimate)
+        assert _state(connection) == connection.execute(EXPECTED_SQL).fetchall()
+
+    latest = {row["task_id"]: (row["geo_text"], row["arrival_time"]) for row in _state(connection)}
+    assert latest == {1: ("nav 1-b", "b"), 2: ("nav 2-tie", None), 3: ("nav 3-a", "tie-2")}
+
+
+def test_rebuild_matches_history_after_manual_changes(connection):
+    for statement in NAVIGATION_INSERTS + ESTIMATE_INSERTS:
+        connection.execute(statement)
+    connection.execute("DELETE FROM vehicle_navigation_history WHERE geo_text IN ('nav 1-b', 'nav 2-tie')")
+    connection.execute("DELETE FROM route_estimates WHERE task_id = 3")
+
+    rebuilt = connection.execute("SELECT task_latest_state_rebuild() AS rows").fetchone()["rows"]
+
+    assert rebuilt == 3
+    assert _state(connection) == connection.execute(EXPECTED_SQL).fetchall()
+    latest = {row["task_id"]: (row["geo_text"], row["arrival_time"]) for row in _state(connection)}
+    assert latest == {1: ("nav 1-a", "b"), 2: ("nav 2-b", None), 3: ("nav 3-a", None)}
@@ -0,0 +1,74 @@
+import re
+from datetime import date, datetime
+
+from Navigation_Bot.bots.route_info_parser import RouteInfoParser
+from Navigation_Bot.core.domain.value_objects.route_point import RoutePoint
+from Navigation_Bot.core.storage.postgres_connection import POSTGRES_SCHEMA_FILE
+
+ROUTE_TEXTS = [
+    "Москва, ул. Ленина 1 19.10.26 10:00",
+    "1) Казань 5.1 2) Самара 31/12/2025 14:30",
+    "Тверь 29.02.2024 08:00; Клин 30.02.25",
+    "Склад 7.3.2026",
+]
+
+# Что ещё встречается в planned_start_at/planned_end_at/completed_at: ISO из API, время без даты,
+# мусор из таблицы и несуществующие даты.
+STORED_TEXTS = [
+    "", "14:30", "завтра", "  19.10.2026", "19.10.2026", "2026-10-19", "2026-10-19T08:00:00+03:00",
+    "29.02.2024 08:00", "29.02.2025", "31.04.2026", "00.10.2026", "19.13.2026", "99.99.9999",
+    "0000-01-01", "2026-02-30", "2026-00-10", "19.10.26", "1.10.2026", "19/10/2026",
+    "١٩.١٠.٢٠٢٦", "３１.１２.２０２６",
+]
+
+FORMATS = ((r"[0-9]{2}\.[0-9]{2}\.[0-9]{4}", "%d.%m.%Y"), (r"[0-9]{4}-[0-9]{2}-[0-9]{2}", "%Y-%m-%d"))
+
+
+def _python_task_date(value: str) -> date | None:
+    for pattern, date_format in FORMATS:
+        if re.match(pattern, value):
+            try:
+                return datetime.strptime(value[:10], date_format).date()
+            except ValueError:
+                return None
+    return None
+
+
+def _parsed_route_texts() -> list[str]:
+    parser = RouteInfoParser()
+    texts = []
+    for text in ROUTE_TEXTS:
+        for sequence, block in enumerate(parser.parse(text, "Выгрузка"), start=1):
+            if "Дата 1" in block:
+                point = RoutePoint("unload", sequence, block["Выгрузка 1"], block["Дата 1"], block.get("Время 1", ""))
+                texts.append(point.planned_datetime_text())
+    return texts
+
+
+def test_sql_task_date_matches_python_parsing(postgres_schema_connection):
+    route_texts = _parsed_route_texts()
+    values = route_texts + STORED_TEXTS
+
+    rows = postgres_schema_connection.execute(
+        "SELECT value, task_text_date(value) AS task_date FROM unnest(%s::text[]) AS value",
+        (values,),
+    ).fetchall()
+
+    assert len(route_texts) >= 4
+    assert [(row["value"], row["task_date"]) for row in rows] == [(value, _python_task_date(value)) for value in values]
+
+
+def test_schema_init_backfills_task_date_over_malformed_rows(postgres_schema_connection):
+    connection = postgres_schema_connection
+    connection.execute("DROP INDEX idx_tasks_source_task_date")
+    connection.execute("ALTER TABLE tasks DROP COLUMN task_date")
+    connection.execute(
+        "INSERT INTO tasks (trip_number, planned_start_at, planned_end_at, completed_at) "
+        "SELECT row_number() OVER (), start_at, end_at, NULL FROM unnest(%s::text[], %s::text[]) AS v(start_at, end_at)",
+        (["99.99.9999", "", "31.02.2026 10:00", "завтра"], ["", "2026-10-19", "", "20.10.2026"]),
+    )
+
+    connection.execute(POSTGRES_SCHEMA_FILE.read_text(encoding="utf-8"))
+
+    rows = connection.execute("SELECT task_date FROM tasks ORDER BY trip_number").fetchall()
+    assert [row["task_date"] for row in rows] == [None, date(2026, 10, 19), None, None]
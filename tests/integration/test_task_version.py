@@ -0,0 +1,38 @@
+from Navigation_Bot.core.repositories.postgres_task_reader import PostgresTaskReader
+
+FIXTURE_SQL = """
+    INSERT INTO vehicles (id, plate_number) VALUES (1, 'А123ВС 77'), (2, 'В777ОР');
+    INSERT INTO tasks (id, trip_number, vehicle_id, google_worksheet_title)
+    VALUES (1, 10, 1, 'Лист A'), (2, 11, 2, 'Лист B');
+"""
+
+
+def _versions(reader):
+    return (reader.active_rows_version("Лист A", include_null_source=False),
+            reader.active_rows_version("Лист B", include_null_source=False))
+
+
+def test_version_changes_only_for_source_whose_tasks_changed(postgres_schema_connection):
+    connection = postgres_schema_connection
+    connection.execute(FIXTURE_SQL)
+    reader = PostgresTaskReader(connection)
+    sheet_a, sheet_b = _versions(reader)
+
+    connection.execute("""
+        INSERT INTO vehicle_navigation_history (vehicle_id, task_id, geo_text, collected_at)
+        VALUES (2, 2, 'nav', '2026-10-18 10:00+00')
+    """)
+    connection.execute("""
+        INSERT INTO route_estimates (task_id, distance_km, calculated_at)
+        VALUES (2, 100, '2026-10-18 10:00+00')
+    """)
+    connection.execute("UPDATE vehicles SET brand = 'MAN', updated_at = now() + interval '1 minute' WHERE id = 2")
+    changed_a, changed_b = _versions(reader)
+    assert changed_a == sheet_a and changed_b != sheet_b
+
+    connection.execute("""
+        INSERT INTO vehicle_navigation_history (vehicle_id, task_id, geo_text, collected_at)
+        VALUES (1, 1, 'nav', '2026-10-18 11:00+00')
+    """)
+    latest_a, latest_b = _versions(reader)
+    assert latest_a != changed_a and latest_b == changed_b
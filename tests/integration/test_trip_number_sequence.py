@@ -0,0 +1,27 @@
+from Navigation_Bot.core.repositories.postgres_task_bulk_writer import PostgresTaskBulkWriter
+from Navigation_Bot.core.repositories.postgres_task_lookup import PostgresTaskLookup
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter
+
+
+def _row(google_sheet_row, plate, trip_number=None):
+    row = {"google_sheet_row": google_sheet_row, "vehicle_plate": plate, "loads": [], "unloads": []}
+    if trip_number is not None:
+        row["trip_number"] = trip_number
+    return row
+
+
+def test_explicit_trip_numbers_move_sequence_past_them(postgres_schema_connection):
+    connection = postgres_schema_connection
+    writer = PostgresTaskWriter(connection, "sheet")
+
+    assert writer.upsert_from_row(_row(2, "А001АА"))["trip_number"] == 1
+    assert writer.upsert_from_row(_row(3, "А002АА", trip_number=2))["trip_number"] == 2
+    assert writer.upsert_from_row(_row(4, "А003АА"))["trip_number"] == 3
+
+    results = PostgresTaskBulkWriter(connection, "sheet").upsert_rows([_row(5, "А004АА", trip_number=500),
+                                                                        _row(6, "А005АА", trip_number=40),
+                                                                        _row(7, "А006АА")])
+    assert [result["trip_number"] for result in results] == [500, 40, 501]
+
+    assert PostgresTaskLookup(connection, "sheet").next_trip_number() == 502
+    assert writer.upsert_from_row(_row(8, "А007АА"))["trip_number"] == 503
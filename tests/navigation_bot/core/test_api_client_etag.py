@@ -0,0 +1,58 @@
+import json
+
+from Navigation_Bot.core.infrastructure.api.api_client import NavigationApiClient
+from Navigation_Bot.core.infrastructure.api.routes import _etag, _etag_matches
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, etag=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.headers = {"ETag": etag} if etag else {}
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def test_client_sends_if_none_match_and_reuses_payload_on_304(monkeypatch):
+    sent_headers = []
+    responses = [FakeResponse(200, {"items": [{"id": 1}]}, etag='W/"v1"'), FakeResponse(304)]
+
+    def fake_request(method, url, headers=None, **_kwargs):
+        sent_headers.append(dict(headers or {}))
+        return responses.pop(0)
+
+    client = NavigationApiClient("http://api")
+    monkeypatch.setattr(client.session, "request", fake_request)
+
+    first = client.get("/api/v1/tasks", params={"limit": 10})
+    first["items"].append({"id": 2})
+    second = client.get("/api/v1/tasks", params={"limit": 10})
+
+    assert "If-None-Match" not in sent_headers[0]
+    assert sent_headers[1]["If-None-Match"] == 'W/"v1"'
+    assert second == {"items": [{"id": 1}]}
+    assert client.call_stats["GET /api/v1/tasks"].count == 2
+
+
+def test_client_session_retries_only_idempotent_reads():
+    client = NavigationApiClient("http://api", retries=2, pool_size=4)
+    adapter = client.session.get_adapter("http://api/api/v1/tasks")
+
+    assert adapter.max_retries.total == 2
+    assert adapter.max_retries.is_retry("GET", 503)
+    assert not adapter.max_retries.is_retry("POST", 503)
+    assert "gzip" in client.session.headers["Accept-Encoding"]
+
+
+def test_server_etag_match_uses_weak_comparison():
+    etag = _etag("tasks", "3|2026-01-01")
+
+    assert _etag_matches(etag, etag)
+    assert _etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert _etag_matches("*", etag)
+    assert not _etag_matches(_etag("tasks", "4|2026-01-01"), etag)
+    assert not _etag_matches(None, etag)
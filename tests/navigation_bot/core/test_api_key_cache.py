@@ -0,0 +1,57 @@
+from Navigation_Bot.core.infrastructure.api.api_key_cache import ApiKeyUserCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeConnection:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, query, params=None):
+        self.calls.append((query, params))
+        return self
+
+
+def _user(user_id=1, api_key_id=10):
+    return {"id": user_id, "username": "user", "role": "viewer", "api_key_id": api_key_id}
+
+
+def test_cached_user_expires_after_ttl():
+    clock = FakeClock()
+    cache = ApiKeyUserCache(30, clock=clock)
+    cache.put("hash", _user())
+
+    clock.now = 29
+    assert cache.get("hash")["id"] == 1
+    clock.now = 31
+    assert cache.get("hash") is None
+
+
+def test_revoke_and_user_update_invalidate_entries():
+    cache = ApiKeyUserCache(30)
+    cache.put("a", _user(user_id=1, api_key_id=10))
+    cache.put("b", _user(user_id=2, api_key_id=20))
+
+    cache.invalidate_api_key(10)
+    cache.invalidate_user(2)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+
+
+def test_touches_are_coalesced_into_one_update():
+    cache = ApiKeyUserCache(30)
+    connection = FakeConnection()
+    for key_id in (20, 10, 20, 10):
+        cache.touch(key_id)
+
+    assert cache.flush(connection) == 2
+    assert cache.flush(connection) == 0
+    assert len(connection.calls) == 1
+    assert connection.calls[0][1] == {"key_ids": [10, 20]}
@@ -0,0 +1,64 @@
+import pytest
+
+from Navigation_Bot.core.infrastructure.api.metrics import ApiMetrics, statement_labels
+
+
+class FakePool:
+    def get_stats(self):
+        return {"pool_min": 2, "pool_max": 10, "pool_size": 3, "pool_available": 1, "requests_num": 7}
+
+
+class FakeAuditBuffer:
+    def pending_count(self):
+        return 4
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM tasks WHERE id = %s", ("SELECT", "tasks")),
+    ("\n    insert into route_points (task_id) values (%s)", ("INSERT", "route_points")),
+    ("UPDATE tasks SET status = %s", ("UPDATE", "tasks")),
+    ("COPY audit_log (user_id) FROM STDIN", ("COPY", "audit_log")),
+    ("SELECT x FROM unnest(%s::bigint[]) AS x JOIN vehicles v ON v.id = x", ("SELECT", "vehicles")),
+    ("SELECT 1", ("SELECT", "")),
+])
+def test_statement_labels(query, expected):
+    assert statement_labels(query) == expected
+
+
+def test_render_histograms_counters_and_pool_stats():
+    metrics = ApiMetrics(slow_statement_seconds=0.05, buckets=(0.01, 0.1))
+    with metrics.track_request() as timings:
+        metrics.observe_pool_wait(0.002)
+        metrics.observe_statement("SELECT * FROM tasks", 0.005)
+        metrics.observe_statement("SELECT * FROM tasks", 0.06)
+        metrics.observe_statement("UPDATE tasks SET status = 'x'", 0.2, failed=True)
+    metrics.observe_request("GET", "/api/v1/tasks/{task_id}", 200, 0.3, timings)
+    metrics.watch_pool("sync", FakePool())
+    metrics.watch_audit_buffer(FakeAuditBuffer())
+
+    lines = metrics.render().splitlines()
+
+    assert timings.db_seconds == pytest.approx(0.265)
+    assert timings.pool_wait_seconds == pytest.approx(0.002)
+    assert 'nav_api_statement_duration_seconds_bucket{operation="SELECT",table="tasks",le="0.01"} 1' in lines
+    assert 'nav_api_statement_duration_seconds_bucket{operation="SELECT",table="tasks",le="0.1"} 2' in lines
+    assert 'nav_api_statement_duration_seconds_bucket{operation="SELECT",table="tasks",le="+Inf"} 2' in lines
+    assert 'nav_api_statement_duration_seconds_bucket{operation="UPDATE",table="tasks",le="0.1"} 0' in lines
+    assert 'nav_api_statement_errors_total{operation="UPDATE",table="tasks"} 1' in lines
+    assert 'nav_api_slow_statements_total{operation="SELECT",table="tasks"} 1' in lines
+    assert ('nav_api_request_duration_seconds_count{method="GET",route="/api/v1/tasks/{task_id}",status="200"} 1'
+            in lines)
+    assert "# TYPE nav_api_request_duration_seconds histogram" in lines
+    assert "nav_api_requests_in_progress 0" in lines
+    assert "nav_api_audit_pending 4" in lines
+    assert 'nav_api_pool_available{pool="sync"} 1' in lines
+    assert 'nav_api_pool_requests_num_total{pool="sync"} 7' in lines
+    assert 'nav_api_pool_requests_errors_total{pool="sync"} 0' in lines
+
+
+def test_statement_outside_request_is_still_counted():
+    metrics = ApiMetrics()
+    metrics.observe_pool_wait(1.0)
+    metrics.observe_statement("SELECT 1", 0.001)
+
+    assert 'nav_api_statement_duration_seconds_count{operation="SELECT",table=""} 1' in metrics.render().splitlines()
@@ -0,0 +1,71 @@
+from Navigation_Bot.core.repositories.api_task_repository import ApiTaskRepository
+
+
+class FakeClient:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def get(self, path, params=None):
+        self.calls.append(dict(params or {}))
+        return self.pages[params.get("cursor", "")]
+
+
+def _row(task_id):
+    return {"db_task_id": task_id, "trip_number": task_id, "updated_at": f"2026-01-01T00:00:0{task_id}+00:00"}
+
+
+def test_reload_all_paged_follows_cursor_without_total():
+    client = FakeClient({
+        "": {"items": [_row(1), _row(2)], "next_cursor": "c2", "last_cursor": "c2"},
+        "c2": {"items": [_row(3)], "next_cursor": None, "last_cursor": "c3"},
+        "c3": {"items": [], "next_cursor": None, "last_cursor": "c3"},
+    })
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+
+    repository.reload_all_paged(limit=2)
+
+    assert [row["db_task_id"] for row in repository.data] == [1, 2, 3]
+    assert [call["cursor"] for call in client.calls] == ["", "c2"]
+    assert all(call["include_total"] == "false" and "offset" not in call for call in client.calls)
+
+    repository.reload_incremental_all(limit=2)
+
+    assert client.calls[-1]["cursor"] == "c3"
+    assert client.calls[-1]["updated_since"] == "2026-01-01T00:00:03+00:00"
+
+
+class StreamingClient(FakeClient):
+    def __init__(self, pages, lines):
+        super().__init__(pages)
+        self.lines = lines
+        self.stream_calls = []
+
+    def iter_ndjson(self, path, params=None):
+        self.stream_calls.append((path, dict(params or {})))
+        yield from self.lines
+
+
+def test_reload_uses_export_stream_and_keeps_trailer_cursor():
+    client = StreamingClient({}, [_row(1), _row(2), {"_export_end": True, "count": 2, "last_cursor": "c2"}])
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+
+    repository.reload()
+
+    assert [row["db_task_id"] for row in repository.data] == [1, 2]
+    assert repository._last_loaded_cursor == "c2"
+    path, params = client.stream_calls[0]
+    assert path == "/api/v1/tasks/export"
+    assert "limit" not in params and params["chunk_size"] == 500
+    assert client.calls == []
+
+
+def test_reload_falls_back_to_pages_when_stream_is_truncated():
+    client = StreamingClient({"": {"items": [_row(1), _row(2)], "next_cursor": None, "last_cursor": "c2"}},
+                             [_row(1)])
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+
+    repository.reload()
+
+    assert [row["db_task_id"] for row in repository.data] == [1, 2]
+    assert [call["cursor"] for call in client.calls] == [""]
@@ -0,0 +1,152 @@
+from Navigation_Bot.core.infrastructure.api.api_client import NavigationApiError
+from Navigation_Bot.core.repositories.api_task_repository import ApiTaskRepository
+
+
+class RecordingClient:
+    def __init__(self, patch_error=None):
+        self.posts = []
+        self.patches = []
+        self.patch_error = patch_error
+
+    def post(self, path, json=None):
+        self.posts.append((path, json))
+        if path == "/api/v1/tasks/batch":
+            return {"items": [{"task_id": row.get("db_task_id"), "trip_number": row.get("trip_number")}
+                              for row in json["rows"]]}
+        return {}
+
+    def patch(self, path, json=None):
+        self.patches.append((path, json))
+        if self.patch_error is not None:
+            raise self.patch_error
+        return {"items": [{"task_id": item["trip_number"], "trip_number": item["trip_number"],
+                           "updated_at": "2026-10-18T12:00:00+00:00"} for item in json["items"]],
+                "skipped": []}
+
+
+def _row(number):
+    return {"db_task_id": number, "trip_number": number, "google_sheet_row": number, "index": number,
+            "Телефон": f"+7900{number:07d}",
+            "Выгрузка": [{"Выгрузка 1": f"Точка {number}", "Дата 1": "19.10.2026"}]}
+
+
+def _synced_rows(client):
+    return ([row["trip_number"] for path, body in client.posts if path == "/api/v1/tasks/batch" for row in body["rows"]]
+            + [item["trip_number"] for _path, body in client.patches for item in body["items"]])
+
+
+def test_save_with_touched_rows_detects_nested_edits_in_place():
+    client = RecordingClient()
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+    repository._replace_data([_row(number) for number in range(1, 6)])
+    data = repository.get()
+
+    repository.save(source="user", rows=[data[1]])
+    assert client.posts == []
+
+    data[1]["Выгрузка"][0]["Дата 1"] = "20.10.2026"
+    assert repository._changed_fields(repository._snapshot, data[1]) == {"Выгрузка"}
+    repository.save(source="user", rows=[data[1]])
+    assert _synced_rows(client) == [2]
+
+    repository.save(source="user", rows=[data[1]])
+    assert _synced_rows(client) == [2]
+
+
+def test_full_save_and_merge_update_only_changed_rows():
+    client = RecordingClient()
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+    repository._replace_data([_row(number) for number in range(1, 6)])
+
+    repository._merge_rows([{**_row(3), "Телефон": "+70000000000"}, {**_row(4), "status": "completed"}])
+    repository.get()[0]["Телефон"] = "+71111111111"
+    repository.save(source="user")
+
+    assert _synced_rows(client) == [1]
+    assert "trip_number:4" not in repository._snapshot
+    assert len({id(fingerprint) for fingerprint in repository._snapshot.values()}) == 4
+
+
+class StreamingClient(RecordingClient):
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+
+    def iter_ndjson(self, path, params=None):
+        yield from self.rows
+        yield {"_export_end": True, "count": len(self.rows), "last_cursor": "c1"}
+
+
+def _containers(value, found):
+    if isinstance(value, (dict, list)):
+        found.add(id(value))
+        for item in value.values() if isinstance(value, dict) else value:
+            _containers(item, found)
+    return found
+
+
+def test_reload_and_merge_adopt_decoded_rows_without_sharing_state_with_snapshot():
+    decoded = [_row(number) for number in range(1, 4)]
+    client = StreamingClient(decoded)
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+
+    repository.reload()
+    incoming = {**_row(2), "Телефон": "+70000000000"}
+    repository._merge_rows([incoming])
+    data = repository.get()
+
+    assert data[0] is decoded[0] and data[1] is incoming
+    assert not _containers(list(repository._snapshot.values()), set()) & _containers(list(data), set())
+
+    data[1]["Выгрузка"][0]["Дата 1"] = "21.10.2026"
+    repository.save(source="user")
+    assert _synced_rows(client) == [2]
+
+
+def test_merge_advances_updated_at_mark_without_scanning_the_sheet(monkeypatch):
+    repository = ApiTaskRepository(RecordingClient(), current_source_key="sheet")
+    repository._replace_data([{**_row(number), "updated_at": f"2026-10-18T10:{number % 60:02d}:00+00:00"}
+                              for number in range(1, 1001)])
+    scanned = []
+    max_updated_at = ApiTaskRepository._max_updated_at
+    monkeypatch.setattr(ApiTaskRepository, "_max_updated_at",
+                        staticmethod(lambda rows: scanned.append(len(rows)) or max_updated_at(rows)))
+
+    repository._merge_rows([{**_row(5), "updated_at": "2026-10-18T09:00:00+00:00"}])
+    assert repository._last_loaded_updated_at == "2026-10-18T10:59:00+00:00"
+
+    repository._merge_rows([{**_row(6), "updated_at": "2026-10-18T11:00:00+00:00"}])
+    assert repository._last_loaded_updated_at == "2026-10-18T11:00:00+00:00"
+    assert scanned == [1, 1]
+
+
+def test_phone_edit_is_sent_as_field_patch_and_route_edit_as_full_row():
+    client = RecordingClient()
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+    repository._replace_data([_row(number) for number in range(1, 4)])
+    data = repository.get()
+
+    data[0]["Телефон"] = data[0]["driver_phone"] = "+70000000001"
+    data[1]["Выгрузка"][0]["Дата 1"] = "22.10.2026"
+    repository.save(source="user")
+
+    assert client.patches == [("/api/v1/tasks", {"items": [{"trip_number": 1, "updated_at": None,
+                                                             "fields": {"driver_phone": "+70000000001"}}],
+                                                  "source": "user", "source_key": "sheet"})]
+    assert [row["trip_number"] for row in client.posts[0][1]["rows"]] == [2]
+    assert data[0]["updated_at"] == "2026-10-18T12:00:00+00:00"
+
+
+def test_field_patch_falls_back_to_full_rows_on_server_without_patch():
+    client = RecordingClient(patch_error=NavigationApiError("PATCH failed", status_code=405))
+    repository = ApiTaskRepository(client, current_source_key="sheet")
+    repository._replace_data([_row(number) for number in range(1, 4)])
+    data = repository.get()
+
+    data[2]["highlight_until"] = "18.10.2026 15:00"
+    repository.save(source="user", rows=[data[2]])
+    data[0]["highlight_until"] = "18.10.2026 16:00"
+    repository.save(source="user", rows=[data[0]])
+
+    assert len(client.patches) == 1
+    assert [row["trip_number"] for _path, body in client.posts for row in body["rows"]] == [3, 1]
@@ -0,0 +1,68 @@
+import asyncio
+import inspect
+from types import SimpleNamespace
+
+from fastapi.routing import APIRoute
+
+from Navigation_Bot.core.infrastructure.api.main import create_app
+from Navigation_Bot.core.repositories.postgres_async_route_point_repository import PostgresAsyncRoutePointRepository
+
+
+class FakeAsyncCursor:
+    def __init__(self, rows):
+        self._rows = rows
+
+    async def fetchall(self):
+        return self._rows
+
+
+class FakeAsyncConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def execute(self, query, params=()):
+        self.calls.append((" ".join(query.split()), params))
+        return FakeAsyncCursor(self.rows if query.lstrip().startswith("SELECT") else [])
+
+
+def _point(kind, sequence, address):
+    return SimpleNamespace(kind=kind, sequence=sequence, address=address, comment="", latitude=None,
+                           longitude=None, geocoding_source="", planned_datetime_text=lambda: "")
+
+
+def test_async_route_point_sync_uses_shared_statements():
+    existing = [{"id": 10, "task_id": 1, "point_type": "load", "sequence": 1, "location": "Old",
+                 "scheduled_time": "", "comment": "", "is_processed": False, "latitude": None,
+                 "longitude": None, "geocoding_source": ""}]
+    connection = FakeAsyncConnection(existing)
+
+    asyncio.run(PostgresAsyncRoutePointRepository(connection).sync_route_points_batch(
+        [(1, "load", [_point("load", 1, "New"), _point("load", 2, "Next")], [])],
+        "user",
+    ))
+
+    queries = [query for query, _ in connection.calls]
+    assert len(queries) == 3
+    assert "task_id = ANY(%s)" in queries[0]
+    assert queries[1].startswith("INSERT INTO route_points")
+    assert queries[2].startswith("UPDATE route_points")
+    assert connection.calls[2][1][:2] == [[10], ["New"]]
+
+
+def _api_routes(app):
+    return [route for route in app.routes if isinstance(route, APIRoute)]
+
+
+def test_async_app_replaces_hot_routes_without_duplicates():
+    sync_app = create_app()
+    async_app = create_app(async_mode=True)
+
+    def keys(app):
+        return sorted((route.path, method) for route in _api_routes(app) for method in route.methods)
+
+    assert keys(async_app) == keys(sync_app)
+    endpoints = {(route.path, method): route.endpoint for route in _api_routes(async_app) for method in route.methods}
+    assert inspect.iscoroutinefunction(endpoints[("/api/v1/tasks", "GET")])
+    assert inspect.iscoroutinefunction(endpoints[("/api/v1/tasks/{row_identity}/complete", "POST")])
+    assert not inspect.iscoroutinefunction(endpoints[("/api/v1/tasks/batch", "POST")])
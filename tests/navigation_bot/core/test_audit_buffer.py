@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+
+import pytest
+
+from Navigation_Bot.core.infrastructure.api.audit_buffer import AuditBuffer
+from Navigation_Bot.core.repositories.postgres_audit_repository import AUDIT_COLUMNS, PostgresAuditRepository
+
+
+class FakeCopy:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+
+class FakeConnection:
+    def __init__(self, *, fail=False):
+        self.fail = fail
+        self.executed = []
+        self.copied = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        return self
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    @contextmanager
+    def copy(self, _query):
+        if self.fail:
+            raise RuntimeError("db down")
+        yield FakeCopy(self.copied)
+
+
+def _record(repository, action):
+    repository.record(user={"id": 1, "username": "admin", "role": "admin"},
+                      entity_type="tasks",
+                      entity_id=5,
+                      action=action,
+                      before_data={"status": "active"},
+                      after_data={"status": "completed"})
+
+
+def test_buffered_records_are_copied_in_one_batch(tmp_path):
+    buffer = AuditBuffer(spool_path=tmp_path / "spool.jsonl")
+    request_connection = FakeConnection()
+    repository = PostgresAuditRepository(request_connection, buffer)
+    _record(repository, "update")
+    repository.record_compact(user={"id": 1}, entity_type="tasks", action="complete", summary={"batch": True})
+
+    assert request_connection.executed == []
+    with pytest.raises(RuntimeError):
+        buffer.flush(FakeConnection(fail=True))
+    assert buffer.pending_count() == 2
+
+    flush_connection = FakeConnection()
+    assert buffer.flush(flush_connection) == 2
+    assert [row[AUDIT_COLUMNS.index("action")] for row in flush_connection.copied] == ["update", "complete"]
+    assert buffer.pending_count() == 0
+
+
+def test_spooled_records_are_replayed_once(tmp_path):
+    buffer = AuditBuffer(spool_path=tmp_path / "spool.jsonl")
+    _record(PostgresAuditRepository(None, buffer), "update")
+
+    assert buffer.spool() == 1
+    connection = FakeConnection()
+    assert AuditBuffer(spool_path=tmp_path / "spool.jsonl").replay_spool(connection) == 1
+    assert AuditBuffer(spool_path=tmp_path / "spool.jsonl").replay_spool(connection) == 0
+
+    row = dict(zip(AUDIT_COLUMNS, connection.copied[0]))
+    assert row["changed_fields"].obj == {"status": {"before": "active", "after": "completed"}}
+    assert row["created_at"]
+    assert list(tmp_path.iterdir()) == []
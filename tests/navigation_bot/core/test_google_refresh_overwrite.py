@@ -9,7 +9,7 @@ class FakeRepository:
     def get(self):
         return self.data
 
-    def save(self, *, source="user"):
+    def save(self, *, source="user", rows=None):
         self.saved_sources.append(source)
 
 
@@ -0,0 +1,74 @@
+import pytest
+
+from Navigation_Bot.core.application.services.api_history_services import ApiRouteEstimateHistoryService
+from Navigation_Bot.core.application.services.postgres_history_services import PostgresStatusEventService
+from Navigation_Bot.core.infrastructure.api.api_client import NavigationApiError
+
+
+class FakeConnection:
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.calls = []
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.calls.append((" ".join(query.split()), params))
+        if "ON CONFLICT" in query:
+            self.rowcount = len(params[0])
+        return self
+
+    def fetchall(self):
+        return self.tasks
+
+
+class FakeClient:
+    def __init__(self, *, cross_trip_status=None):
+        self.cross_trip_status = cross_trip_status
+        self.posts = []
+
+    def post(self, path, *, json=None):
+        self.posts.append((path, [row["trip_number"] for row in json["items"]]))
+        if self.cross_trip_status is not None and not path.startswith("/api/v1/tasks/"):
+            raise NavigationApiError(f"POST failed: HTTP {self.cross_trip_status}", status_code=self.cross_trip_status)
+        return {"ok": True}
+
+
+def test_status_events_for_many_trips_use_one_lookup_and_one_insert():
+    connection = FakeConnection([{"id": 10, "trip_number": 1, "vehicle_id": None},
+                                 {"id": 11, "trip_number": 2, "vehicle_id": None}])
+    items = [{"trip_number": trip_number, "event_type": "status", "created_at": "2026-03-01 10:00"}
+             for trip_number in (2, 1, 99, "2")]
+
+    inserted, skipped = PostgresStatusEventService(connection).append_many(items)
+
+    assert len(connection.calls) == 2
+    assert connection.calls[0][1] == ([1, 2, 99],)
+    query, params = connection.calls[1]
+    assert "ON CONFLICT (task_id, event_type, field_name, created_at, message) DO NOTHING" in query
+    assert params[0] == [11, 10, 11]
+    assert inserted == 3
+    assert skipped == [{"index": 2, "trip_number": 99, "reason": "task_not_found"}]
+
+
+def test_client_sends_history_of_all_trips_in_one_request_with_per_trip_fallback():
+    items = [{"trip_number": 1}, {"trip_number": 2}, {"trip_number": None}, {"trip_number": 1}]
+
+    client = FakeClient()
+    ApiRouteEstimateHistoryService(client).append_many(items)
+    assert client.posts == [("/api/v1/route-estimates/batch", [1, 2, 1])]
+
+    client = FakeClient(cross_trip_status=404)
+    ApiRouteEstimateHistoryService(client).append_many(items)
+    assert client.posts == [("/api/v1/route-estimates/batch", [1, 2, 1]),
+                            ("/api/v1/tasks/1/route-estimates/batch", [1, 1]),
+                            ("/api/v1/tasks/2/route-estimates/batch", [2])]
+
+
+@pytest.mark.parametrize("status_code", [401, 422, 500])
+def test_cross_trip_history_errors_other_than_missing_endpoint_are_raised(status_code):
+    client = FakeClient(cross_trip_status=status_code)
+
+    with pytest.raises(NavigationApiError):
+        ApiRouteEstimateHistoryService(client).append_many([{"trip_number": 1}, {"trip_number": 2}])
+
+    assert client.posts == [("/api/v1/route-estimates/batch", [1, 2])]
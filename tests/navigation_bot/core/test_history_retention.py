@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
+from Navigation_Bot.core.storage.history_retention import PartitionChangedError, archive_partition, expired_partitions
+
+
+class FakeConnection:
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.rows = []
+
+    def execute(self, query, params=None):
+        if "history_partitioned_tables" in query:
+            self.rows = [{"parent_name": name, "key_column": "created_at"} for name in self.partitions]
+        else:
+            self.rows = [{"partition_name": name} for name in self.partitions[params[0]]]
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_only_whole_months_before_retention_window_expire():
+    connection = FakeConnection({
+        "audit_log": ["audit_log_default", "audit_log_p202509", "audit_log_p202510", "audit_log_p202610"],
+        "status_events": ["status_events_p202412", "status_events_p202611", "status_events_manual_p202401"],
+    })
+
+    expired = expired_partitions(connection, keep_months=12, today=date(2026, 10, 18))
+
+    assert expired == [("audit_log", "audit_log_p202509"), ("status_events", "status_events_p202412")]
+
+
+class ArchiveConnection:
+    """COPY отдаёт copied_rows строк, а после DETACH в таблице оказывается table_rows."""
+
+    def __init__(self, copied_rows, table_rows):
+        self.copied_rows = copied_rows
+        self.table_rows = table_rows
+        self.rowcount = copied_rows
+        self.statements = []
+        self.committed = None
+
+    def cursor(self):
+        return self
+
+    def copy(self, statement):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        return iter([b"id\n"] + [b"1\n"] * self.copied_rows)
+
+    @contextmanager
+    def transaction(self):
+        try:
+            yield
+        except Exception:
+            self.committed = False
+            raise
+        self.committed = True
+
+    def execute(self, statement, params=None):
+        self.statements.append(statement.as_string(None).split()[0])
+        return self
+
+    def fetchone(self):
+        return {"rows": self.table_rows}
+
+
+def test_partition_is_dropped_only_when_archive_holds_every_row(tmp_path):
+    connection = ArchiveConnection(copied_rows=2, table_rows=2)
+
+    archived = archive_partition(connection, "audit_log", "audit_log_p202509", tmp_path)
+
+    assert archived.rows == 2 and archived.path.exists()
+    assert connection.statements == ["ALTER", "SELECT", "DROP"] and connection.committed
+
+
+def test_rows_written_during_copy_keep_partition_attached(tmp_path):
+    connection = ArchiveConnection(copied_rows=2, table_rows=3)
+
+    with pytest.raises(PartitionChangedError):
+        archive_partition(connection, "audit_log", "audit_log_p202509", tmp_path)
+
+    assert "DROP" not in connection.statements and connection.committed is False
+    assert not (tmp_path / "audit_log_p202509.csv.gz").exists()
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from Navigation_Bot.core.infrastructure.api.password_hasher import LoginBusyError, PasswordHasher
+
+
+def test_verify_in_threadpool_without_workers():
+    async def scenario():
+        hasher = PasswordHasher(workers=0)
+        stored_hash = await hasher.hash("password123")
+        return await hasher.verify("password123", stored_hash), await hasher.verify("wrong-password", stored_hash)
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_queued_login_times_out_when_all_slots_are_busy():
+    async def scenario():
+        hasher = PasswordHasher(workers=0, concurrency=1, queue_timeout_seconds=0.01)
+        hasher.start()
+        await hasher._slots.acquire()
+        with pytest.raises(LoginBusyError):
+            await hasher.verify("password123", "")
+
+    asyncio.run(scenario())
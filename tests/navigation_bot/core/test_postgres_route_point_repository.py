@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from Navigation_Bot.core.repositories.postgres_route_point_repository import PostgresRoutePointRepository
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def execute(self, query, params=()):
+        self.calls.append((" ".join(query.split()), params))
+        return FakeCursor(self.rows if query.lstrip().startswith("SELECT") else [])
+
+
+def _point(kind, sequence, address):
+    return SimpleNamespace(kind=kind, sequence=sequence, address=address, comment="", latitude=None,
+                           longitude=None, geocoding_source="", planned_datetime_text=lambda: "")
+
+
+def test_sync_route_points_batch_uses_one_statement_per_operation():
+    existing = [
+        {"id": 10, "task_id": 1, "point_type": "load", "sequence": 1, "location": "Old", "scheduled_time": "",
+         "comment": "", "is_processed": False, "latitude": None, "longitude": None, "geocoding_source": ""},
+        {"id": 11, "task_id": 2, "point_type": "unload", "sequence": 2, "location": "Gone", "scheduled_time": "",
+         "comment": "", "is_processed": False, "latitude": None, "longitude": None, "geocoding_source": ""},
+    ]
+    connection = FakeConnection(existing)
+
+    PostgresRoutePointRepository(connection).sync_route_points_batch(
+        [(1, "load", [_point("load", 1, "New")], []),
+         (1, "unload", [_point("unload", 1, "A"), _point("unload", 2, "B")], [True]),
+         (2, "unload", [_point("unload", 1, "C")], [])],
+        "user",
+    )
+
+    queries = [query for query, _ in connection.calls]
+    assert len(queries) == 4
+    assert "task_id = ANY(%s)" in queries[0]
+    assert connection.calls[0][1] == ([1, 2],)
+    assert queries[1].startswith("INSERT INTO route_points")
+    assert connection.calls[1][1][0] == [1, 1, 2]
+    assert connection.calls[1][1][6] == [True, False, False]
+    assert queries[2].startswith("UPDATE route_points")
+    assert connection.calls[2][1][:2] == [[10], ["New"]]
+    assert connection.calls[3] == ("DELETE FROM route_points WHERE id = ANY(%s)", ([11],))
@@ -0,0 +1,22 @@
+from Navigation_Bot.core.repositories.postgres_task_bulk_writer import PostgresTaskBulkWriter
+
+
+class FakeConnection:
+    def execute(self, query, params=()):
+        raise AssertionError("staging must not touch the database")
+
+
+def _row(plate, google_sheet_row, driver="Ivan"):
+    return {"vehicle_plate": plate, "driver_name": driver, "google_sheet_row": google_sheet_row,
+            "loads": [], "unloads": []}
+
+
+def test_next_segment_stops_on_repeated_vehicle_or_sheet_row():
+    writer = PostgresTaskBulkWriter(FakeConnection())
+    rows = [_row("A1", 1, "Ivan"), _row("B2", 2, "Petr"), _row("A1", 3, "Oleg"), _row("C3", 2, "Anna")]
+
+    staged = writer._stage_rows(rows + ["not a row"])
+
+    assert [item.position for item in staged] == [0, 1, 2, 3]
+    assert [item.position for item in writer._next_segment(staged, 0)] == [0, 1]
+    assert [item.position for item in writer._next_segment(staged, 2)] == [2, 3]
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+
+from Navigation_Bot.core.infrastructure.api.routes import _batch_completion
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def execute(self, query, params=None):
+        self.calls.append((" ".join(query.split()), params))
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_complete_tasks_uses_one_update_and_reports_missing_identities():
+    connection = FakeConnection([{"id": 10, "trip_number": 1, "google_sheet_row": 7},
+                                 {"id": 11, "trip_number": 2, "google_sheet_row": None}])
+    writer = PostgresTaskWriter(connection, "sheet")
+
+    found = writer.complete_tasks([2, "1", 7, 99, 2], source="dispatcher")
+    completed, skipped = _batch_completion([2, 1, 7, 99, 2], found)
+
+    assert len(connection.calls) == 1
+    query, params = connection.calls[0]
+    assert "trip_number = ANY(%(identities)s)" in query
+    assert params == {"identities": [1, 2, 7, 99], "source": "dispatcher", "source_key": "sheet"}
+    assert {identity: row["id"] for identity, row in found.items()} == {1: 10, 2: 11, 7: 10}
+    assert completed == [2, 1, 7, 2]
+    assert skipped == [{"row_identity": 99, "reason": "task_not_found"}]
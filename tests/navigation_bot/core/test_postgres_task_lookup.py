@@ -17,7 +17,7 @@ class FakeConnection:
         self.calls.append((query, params))
         if "google_worksheet_title IS NULL" in query:
             return FakeCursor({"trip_number": 42})
-        if "COALESCE(MAX(trip_number)" in query:
+        if "nextval" in query:
             return FakeCursor({"value": 99})
         return FakeCursor(None)
 
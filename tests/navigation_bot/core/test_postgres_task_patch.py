@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+from Navigation_Bot.core.infrastructure.api.main import create_app
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter
+
+
+class FakeConnection:
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        self.calls.append((query, params))
+        self.current = next((row for prefix, row in self.answers if query.startswith(prefix)), None)
+        return self
+
+    def fetchone(self):
+        return self.current
+
+
+class FakePool:
+    def __init__(self):
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+        return self
+
+    def fetchone(self):
+        return {"has_keys": False}
+
+
+def test_phone_patch_relinks_driver_and_updates_only_driver_id():
+    connection = FakeConnection([
+        ("SELECT t.id, t.carrier_id", {"id": 7, "carrier_id": 3, "driver_name": "Петров П.", "driver_phone": "+7900"}),
+        ("SELECT id FROM drivers", {"id": 42}),
+        ("UPDATE tasks", {"updated_at": "2026-10-18T12:00:00+00:00", "before_data": {}, "after_data": {}}),
+    ])
+
+    result = PostgresTaskWriter(connection, "sheet").patch_task(10, {"driver_phone": " +7911 "},
+                                                                expected_updated_at="2026-10-18T11:00:00+00:00")
+
+    assert [query.split()[0] for query, _params in connection.calls] == ["SELECT", "SELECT", "UPDATE"]
+    assert connection.calls[1][1] == ("Петров П.", "+7911")
+    update, params = connection.calls[2]
+    assert "SET driver_id = %(driver_id)s, updated_at = CURRENT_TIMESTAMP" in update
+    assert params == {"driver_id": 42, "task_id": 7, "expected_updated_at": "2026-10-18T11:00:00+00:00"}
+    assert result["task_id"] == 7 and result["trip_number"] == 10 and result["created"] is False
+
+
+@pytest.mark.parametrize("fields", [{"Выгрузка": []}, {}])
+def test_patch_rejects_fields_outside_targeted_columns(fields):
+    with pytest.raises(ValueError):
+        PostgresTaskWriter(FakeConnection([]), "sheet").patch_task(10, fields)
+
+
+def test_patch_route_rejects_item_without_fields(monkeypatch):
+    monkeypatch.delenv("NAV_API_KEY", raising=False)
+    app = create_app()
+    app.state.postgres_pool = FakePool()
+
+    response = TestClient(app).patch("/api/v1/tasks", json={"items": [{"trip_number": 10, "fields": {}}]})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "items", 0, "fields"]
+    assert not any("tasks" in query for query in app.state.postgres_pool.queries)
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+
+from Navigation_Bot.core.repositories.postgres_task_writer import PostgresTaskWriter
+
+
+class FakeCursor:
+    def __init__(self, log, query, row):
+        self.log = log
+        self.query = query
+        self.row = row
+
+    def fetchone(self):
+        self.log.append(("fetch", self.query))
+        return self.row
+
+    def fetchall(self):
+        self.log.append(("fetch", self.query))
+        return []
+
+
+class FakeConnection:
+    def __init__(self):
+        self.log = []
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def execute(self, query, params=()):
+        text = " ".join(query.split()[:3])
+        self.log.append(("send", text))
+        row = {"id": 7, "updated_at": "2026-10-18T10:00:00+00:00", "before_data": {}, "after_data": {}}
+        return FakeCursor(self.log, text, row)
+
+
+def test_upsert_sends_independent_statements_before_reading_answers():
+    connection = FakeConnection()
+    row = {"trip_number": 15, "vehicle_plate": "A1", "vehicle_monitoring_id": 501, "driver_name": "Ivan",
+           "carrier_name": "Vector", "loads": [{"address": "Moscow"}], "unloads": []}
+
+    result = PostgresTaskWriter(connection).upsert_from_row(row)
+
+    assert result["task_id"] == 7 and result["created"] is False
+    assert connection.log[:6] == [
+        ("send", "INSERT INTO carriers(name)"),
+        ("send", "SELECT id FROM"),
+        ("send", "SELECT id FROM"),
+        ("send", "SELECT id FROM"),
+        ("fetch", "INSERT INTO carriers(name)"),
+        ("fetch", "SELECT id FROM"),
+    ]
+    sends_before_task_read = [entry for entry in connection.log[:connection.log.index(
+        ("fetch", "UPDATE tasks AS"))] if entry[0] == "send"]
+    assert sends_before_task_read[-4:] == [("send", "UPDATE vehicles SET"),
+                                           ("send", "UPDATE drivers SET"),
+                                           ("send", "UPDATE tasks AS"),
+                                           ("send", "SELECT id, task_id,")]
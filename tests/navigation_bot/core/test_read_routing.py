@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from Navigation_Bot.core.infrastructure.api.api_key_cache import ApiKeyUserCache
+from Navigation_Bot.core.infrastructure.api.dependencies import current_user, read_postgres_connection, read_user
+from Navigation_Bot.core.infrastructure.api.main import create_app
+from Navigation_Bot.core.infrastructure.api.read_routing import RecentWrites
+from Navigation_Bot.core.repositories.postgres_user_repository import hash_api_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_recent_writes_expire_after_window_per_api_key():
+    clock = FakeClock()
+    recent_writes = RecentWrites(5.0, clock=clock)
+
+    recent_writes.mark("key-a")
+    clock.now += 4.9
+
+    assert recent_writes.wrote_recently("key-a")
+    assert not recent_writes.wrote_recently("key-b")
+    assert not recent_writes.wrote_recently(None)
+
+    clock.now += 0.2
+    assert not recent_writes.wrote_recently("key-a")
+
+
+def test_zero_window_disables_stickiness():
+    recent_writes = RecentWrites(0, clock=FakeClock())
+    recent_writes.mark("key-a")
+
+    assert not recent_writes.wrote_recently("key-a")
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return []
+
+
+class FakePool:
+    """Пишет в log, из какого пула выполнен запрос и сколько соединений primary заняты в этот момент."""
+
+    def __init__(self, name, log, slots):
+        self.name = name
+        self.log = log
+        self.slots = slots
+        self.opened = 0
+
+    @contextmanager
+    def connection(self):
+        self.opened += 1
+        self.slots[self.name] += 1
+        try:
+            yield self
+        finally:
+            self.slots[self.name] -= 1
+
+    def execute(self, query, params=None):
+        self.log.append((self.name, self.slots["primary"]))
+        return FakeCursor({"has_keys": False} if "has_keys" in query else None)
+
+
+def _replica_app():
+    log, slots = [], {"primary": 0, "replica": 0}
+    app = create_app()
+    app.state.postgres_pool = FakePool("primary", log, slots)
+    app.state.postgres_replica_pool = FakePool("replica", log, slots)
+    app.state.recent_writes = RecentWrites(5.0)
+    return app, log
+
+
+def test_replica_read_releases_primary_slot_before_query(monkeypatch):
+    monkeypatch.delenv("NAV_API_KEY", raising=False)
+    app, log = _replica_app()
+
+    response = TestClient(app).get("/api/v1/vehicles")
+
+    assert response.status_code == 200
+    assert log == [("primary", 1), ("replica", 0)]
+
+
+def test_recent_writer_reads_from_primary(monkeypatch):
+    monkeypatch.setenv("NAV_API_KEY", "key-a")
+    app, log = _replica_app()
+    app.state.recent_writes.mark("key-a")
+
+    response = TestClient(app).get("/api/v1/vehicles", headers={"X-API-Key": "key-a"})
+
+    assert response.status_code == 200
+    assert log == [("primary", 1), ("primary", 1)]
+
+
+def test_cached_api_key_reads_without_primary_connection(monkeypatch):
+    monkeypatch.delenv("NAV_API_KEY", raising=False)
+    app, log = _replica_app()
+    app.state.api_key_cache = ApiKeyUserCache(30.0)
+    app.state.api_key_cache.put(hash_api_key("key-a"), {"id": 1, "role": "viewer", "api_key_id": 7})
+
+    response = TestClient(app).get("/api/v1/vehicles", headers={"X-API-Key": "key-a"})
+
+    assert response.status_code == 200
+    assert app.state.postgres_pool.opened == 0
+    assert log == [("replica", 0)]
+
+
+def test_read_routes_authenticate_through_short_primary_connection():
+    routes = [route for route in create_app().routes if isinstance(route, APIRoute)]
+    read_routes = [route for route in routes
+                   if read_postgres_connection in {dependency.call for dependency in route.dependant.dependencies}]
+
+    assert len(read_routes) == 8
+    for route in read_routes:
+        user_calls = {sub.call for dependency in route.dependant.dependencies for sub in dependency.dependencies}
+        assert read_user in user_calls and current_user not in user_calls, route.path
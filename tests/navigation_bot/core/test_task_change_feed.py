@@ -0,0 +1,69 @@
+import asyncio
+from contextlib import contextmanager
+
+from Navigation_Bot.core.infrastructure.api.task_change_feed import RESET_EVENT, TaskChangeFeed
+
+
+class FakeConnection:
+    def __init__(self):
+        self.params = []
+
+    def execute(self, query, params=None):
+        self.params.append(params)
+        return self
+
+    def fetchall(self):
+        return []
+
+
+class FakePool:
+    def __init__(self):
+        self.connection_calls = 0
+        self.last_connection = None
+
+    @contextmanager
+    def connection(self):
+        self.connection_calls += 1
+        self.last_connection = FakeConnection()
+        yield self.last_connection
+
+
+def test_publish_loads_rows_once_and_delivers_to_matching_subscribers():
+    async def scenario():
+        pool = FakePool()
+        feed = TaskChangeFeed(pool)
+        sheet = feed.subscribe("sheet-a", strict_source_key=True)
+        loose = feed.subscribe("sheet-a")
+        everything = feed.subscribe("")
+        other = feed.subscribe("sheet-b", strict_source_key=True)
+
+        assert feed.publish({"source_key": "sheet-a", "task_ids": [3, 1]}) == 3
+        assert feed.publish({"source_key": "", "task_ids": [5]}) == 2
+        await asyncio.sleep(0)
+
+        assert pool.connection_calls == 2
+        assert pool.last_connection.params[0] == ([5],)
+        assert sheet.queue.qsize() == 1
+        assert loose.queue.qsize() == 2
+        assert everything.queue.qsize() == 2
+        assert other.queue.empty()
+        assert (await sheet.queue.get())["items"] == []
+
+    asyncio.run(scenario())
+
+
+def test_overflowing_subscriber_gets_single_reset():
+    async def scenario():
+        feed = TaskChangeFeed(FakePool())
+        subscription = feed.subscribe("")
+        for task_id in range(subscription.queue.maxsize + 5):
+            feed.publish({"source_key": "", "task_ids": [task_id]})
+        await asyncio.sleep(0)
+
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        assert events[0] == RESET_EVENT
+        assert len(events) == 5
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+from Navigation_Bot.core.domain.task_store import TaskStore
+from Navigation_Bot.core.repositories.api_task_repository import ApiTaskRepository
+
+
+def _row(number, **fields):
+    return {"db_task_id": number, "trip_number": number, "index": number + 100, **fields}
+
+
+def test_lookups_follow_list_mutations():
+    store = TaskStore([_row(1), _row(2), _row(3)])
+
+    store.pop(0)
+    store.append(_row(4))
+    store[0] = _row(5)
+
+    assert store.find_position("trip_number", 3) == 1
+    assert store.find_position("index", 104) == 2
+    assert store.find_row("trip_number", 2) is None
+    assert store.find_position("db_task_id", "5") == 0
+
+
+def test_key_changed_in_place_is_found_after_reindex_or_stale_hit():
+    store = TaskStore([_row(1), {"index": 7}])
+
+    store[1]["trip_number"] = 70
+    store.reindex(store[1])
+    store[0]["trip_number"] = 10
+
+    assert store.find_position("trip_number", 70) == 1
+    assert store.find_row("trip_number", 1) is None
+    assert store.find_position("trip_number", 10) == 0
+
+
+def test_merge_rows_updates_appends_and_removes_in_one_pass():
+    repository = ApiTaskRepository(client=None, data=TaskStore([_row(1), _row(2), _row(3)]))
+
+    repository._merge_rows([_row(2, status="completed"),
+                            _row(3, status="active", comment="changed"),
+                            _row(4, status="active"),
+                            _row(1, status="archived")])
+
+    assert [row["trip_number"] for row in repository.data] == [3, 4]
+    assert repository.data[0]["comment"] == "changed"
+    assert repository.data.find_position("trip_number", 4) == 1